@@ -0,0 +1,272 @@
+"""
+Experiment Assignment Cache
+In-process tables for hot-path variant assignment
+
+ExperimentService.get_variant_for_user used to query the experiment by name,
+then the user's assignment, then the variant, and insert + commit an
+assignment row for new users: three or four round trips per chat message.
+Assignment is a pure function of the MD5 bucket and the variants' traffic
+allocation, so this module keeps:
+
+- a snapshot of every running experiment with its variants and cumulative
+  allocation table, reloaded after start/stop and at most every TTL seconds
+  (so other workers pick up status changes)
+- an LRU of known assignments (experiment, user/session) -> variant, used by
+  record_result without a query
+- a write-behind buffer of new assignment rows, inserted in batches by a
+  scheduled job or when the buffer fills; rows that already exist are skipped
+
+Configuration (env):
+    EXPERIMENT_CACHE_TTL_SECONDS          - running-experiment snapshot lifetime (default 60, 0 disables the cache)
+    EXPERIMENT_ASSIGNMENT_CACHE_SIZE      - known assignments kept per process (default 100000)
+    EXPERIMENT_ASSIGNMENT_BATCH_SIZE      - buffered assignments that trigger an inline flush (default 500)
+    EXPERIMENT_ASSIGNMENT_FLUSH_SECONDS   - scheduled flush interval (default 10)
+"""
+
+import os
+import time
+import bisect
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import sys
+sys.path.append('..')
+from ab_testing_models import Experiment, ExperimentVariant, ExperimentAssignment, ExperimentStatus
+
+logger = logging.getLogger(__name__)
+
+# (experiment_id, user_id, session_id); session_id is None when user_id is set
+AssignmentKey = Tuple[int, Optional[int], Optional[str]]
+
+
+def hash_bucket(hash_input: str) -> int:
+    """The deterministic MD5 bucket used for inclusion and assignment"""
+    return int(hashlib.md5(hash_input.encode()).hexdigest(), 16)
+
+
+def assignment_key(experiment_id: int, user_id: Optional[int], session_id: Optional[str]) -> Optional[AssignmentKey]:
+    if user_id:
+        return (experiment_id, user_id, None)
+    if session_id:
+        return (experiment_id, None, session_id)
+    return None
+
+
+@dataclass
+class CachedVariant:
+    id: int
+    name: str
+    response: Dict[str, Any]
+
+
+@dataclass
+class CachedExperiment:
+    id: int
+    name: str
+    target_percentage: float
+    variants: List[CachedVariant]
+    # Running sum of traffic_allocation, in variant ID order
+    cumulative: List[float] = field(default_factory=list)
+    variants_by_id: Dict[int, CachedVariant] = field(default_factory=dict)
+
+    def includes(self, user_id: Optional[int], context: Optional[Dict]) -> bool:
+        """Same sampling as ExperimentService._should_include"""
+        if self.target_percentage >= 100.0:
+            return True
+        hash_input = f"{self.id}:{user_id or (context or {}).get('session_id', '')}"
+        return (hash_bucket(hash_input) % 100) < self.target_percentage
+
+    def assign(self, user_id: Optional[int], session_id: Optional[str]) -> CachedVariant:
+        """Same selection as ExperimentService._assign_variant"""
+        random_value = (hash_bucket(f"{self.id}:{user_id or session_id}") % 100000) / 1000.0  # 0-100
+        index = bisect.bisect_left(self.cumulative, random_value)
+        return self.variants[index] if index < len(self.variants) else self.variants[0]
+
+
+class ExperimentCache:
+    """Running experiments by name, known assignments, and pending assignment rows"""
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[float] = None,
+        max_assignments: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("EXPERIMENT_CACHE_TTL_SECONDS", "60"))
+        self.max_assignments = max_assignments or int(os.getenv("EXPERIMENT_ASSIGNMENT_CACHE_SIZE", "100000"))
+        self.batch_size = batch_size or int(os.getenv("EXPERIMENT_ASSIGNMENT_BATCH_SIZE", "500"))
+        self.flush_interval_seconds = int(os.getenv("EXPERIMENT_ASSIGNMENT_FLUSH_SECONDS", "10"))
+        self._experiments: Dict[str, CachedExperiment] = {}
+        self._loaded_at: Optional[float] = None
+        self._assignments: "OrderedDict[AssignmentKey, int]" = OrderedDict()
+        self._pending: Dict[AssignmentKey, Tuple[int, datetime]] = {}
+        self._lock = threading.Lock()
+        self.counters = {"reloads": 0, "assignments": 0, "rows_written": 0, "flushes": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    # Running experiments
+
+    def invalidate(self):
+        """Reload running experiments on next use (call after start/stop)"""
+        with self._lock:
+            self._loaded_at = None
+
+    def _load(self, db) -> Dict[str, CachedExperiment]:
+        experiments = db.query(Experiment).filter(Experiment.status == ExperimentStatus.RUNNING).all()
+        variants = defaultdict(list)
+        if experiments:
+            for variant in db.query(ExperimentVariant).filter(
+                ExperimentVariant.experiment_id.in_([e.id for e in experiments])
+            ).order_by(ExperimentVariant.id):
+                variants[variant.experiment_id].append(variant)
+
+        snapshot = {}
+        for experiment in experiments:
+            if not variants[experiment.id]:
+                continue
+            cached = CachedExperiment(experiment.id, experiment.name, experiment.target_percentage or 100.0, [])
+            total = 0.0
+            for variant in variants[experiment.id]:
+                total += variant.traffic_allocation
+                cached.cumulative.append(total)
+                cached.variants.append(CachedVariant(variant.id, variant.name, {
+                    "variant_id": variant.id,
+                    "variant_name": variant.name,
+                    "is_control": variant.is_control,
+                    "config": variant.config,
+                    "experiment_id": experiment.id,
+                    "experiment_name": experiment.name,
+                    "experiment_type": experiment.experiment_type.value
+                }))
+            cached.variants_by_id = {v.id: v for v in cached.variants}
+            # Names are not unique; like the old .first() lookup, keep the first
+            snapshot.setdefault(experiment.name, cached)
+        return snapshot
+
+    def get_experiment(self, db, name: str) -> Optional[CachedExperiment]:
+        now = time.monotonic()
+        with self._lock:
+            fresh = self._loaded_at is not None and now - self._loaded_at < self.ttl_seconds
+            if fresh:
+                return self._experiments.get(name)
+        snapshot = self._load(db)
+        with self._lock:
+            self._experiments, self._loaded_at = snapshot, now
+            self.counters["reloads"] += 1
+        return snapshot.get(name)
+
+    # Assignments
+
+    def known_assignment(self, key: AssignmentKey) -> Optional[int]:
+        with self._lock:
+            variant_id = self._assignments.get(key)
+            if variant_id is not None:
+                self._assignments.move_to_end(key)
+            return variant_id
+
+    def remember(self, key: AssignmentKey, variant_id: int):
+        """Cache an assignment already stored in the database"""
+        with self._lock:
+            self._remember(key, variant_id)
+
+    def _remember(self, key: AssignmentKey, variant_id: int):
+        self._assignments[key] = variant_id
+        self._assignments.move_to_end(key)
+        while len(self._assignments) > self.max_assignments:
+            self._assignments.popitem(last=False)
+
+    def record_assignment(self, key: AssignmentKey, variant_id: int) -> bool:
+        """Remember an assignment and queue its row unless already known; returns True when queued"""
+        with self._lock:
+            self.counters["assignments"] += 1
+            if self._assignments.get(key) == variant_id:
+                self._assignments.move_to_end(key)
+                return False
+            self._remember(key, variant_id)
+            self._pending[key] = (variant_id, datetime.now(timezone.utc))
+            return True
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self, db) -> int:
+        """Insert buffered assignments missing from the database; returns rows written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        try:
+            existing = set()
+            by_experiment = defaultdict(lambda: ([], []))
+            for experiment_id, user_id, session_id in pending:
+                users, sessions = by_experiment[experiment_id]
+                (users if user_id else sessions).append(user_id or session_id)
+            for experiment_id, (users, sessions) in by_experiment.items():
+                for column, values, to_key in (
+                    (ExperimentAssignment.user_id, users, lambda v: (experiment_id, v, None)),
+                    (ExperimentAssignment.session_id, sessions, lambda v: (experiment_id, None, v)),
+                ):
+                    for start in range(0, len(values), 500):
+                        rows = db.query(column).filter(
+                            ExperimentAssignment.experiment_id == experiment_id,
+                            column.in_(values[start:start + 500])
+                        ).all()
+                        existing.update(to_key(row[0]) for row in rows)
+
+            rows = [
+                {
+                    "experiment_id": experiment_id,
+                    "variant_id": variant_id,
+                    "user_id": user_id,
+                    "session_id": session_id,
+                    "assigned_at": assigned_at,
+                    "assignment_method": "deterministic",
+                }
+                for (experiment_id, user_id, session_id), (variant_id, assigned_at) in pending.items()
+                if (experiment_id, user_id, session_id) not in existing
+            ]
+            if rows:
+                db.execute(ExperimentAssignment.__table__.insert(), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending.setdefault(key, value)
+            raise
+
+        with self._lock:
+            self.counters["flushes"] += 1
+            self.counters["rows_written"] += len(rows)
+        return len(rows)
+
+    def clear(self):
+        with self._lock:
+            self._experiments, self._loaded_at = {}, None
+            self._assignments.clear()
+            self._pending.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "ttl_seconds": self.ttl_seconds,
+                "running_experiments": len(self._experiments),
+                "known_assignments": len(self._assignments),
+                "pending": len(self._pending),
+                **self.counters,
+            }
+
+
+# Shared by every ExperimentService in the process
+experiment_cache = ExperimentCache()
@@ -1,6 +1,12 @@
 """
 Experiment Service
 Handles A/B test variant assignment and experiment management
+
+Assignment and result recording go through the process-wide
+ExperimentCache (ab_testing.assignment_cache): running experiments and
+known assignments are served from memory and new assignment rows are
+written in batches. With EXPERIMENT_CACHE_TTL_SECONDS=0 every call queries
+and commits as before.
 """
 import hashlib
 import logging
@@ -15,6 +21,8 @@ from ab_testing_models import (
     Experiment, ExperimentVariant, ExperimentAssignment, ExperimentResult,
     ExperimentStatus, ExperimentType
 )
+from .assignment_cache import CachedExperiment, ExperimentCache, assignment_key, experiment_cache
+from .result_aggregates import add_result_to_aggregate
 
 logger = logging.getLogger(__name__)
 
@@ -22,8 +30,9 @@ logger = logging.getLogger(__name__)
 class ExperimentService:
     """Service for managing A/B testing experiments"""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, cache: Optional[ExperimentCache] = None):
         self.db = db
+        self.cache = cache or experiment_cache
 
     def get_variant_for_user(
         self,
@@ -46,6 +55,9 @@ class ExperimentService:
             Variant config dict or None
         """
         try:
+            if self.cache.enabled:
+                return self._get_cached_variant(experiment_name, user_id, session_id, context)
+
             # Get experiment
             experiment = self.db.query(Experiment).filter(
                 Experiment.name == experiment_name,
@@ -90,6 +102,8 @@ class ExperimentService:
     ) -> bool:
         """
         Record an experiment result/outcome
+        Also updates the variant's running aggregate in the same transaction;
+        if that fails the raw result is still recorded
 
         Args:
             experiment_name: Name of the experiment
@@ -104,28 +118,29 @@ class ExperimentService:
         """
         try:
             # Get experiment
-            experiment = self.db.query(Experiment).filter(
-                Experiment.name == experiment_name,
-                Experiment.status == ExperimentStatus.RUNNING
-            ).first()
+            if self.cache.enabled:
+                experiment = self.cache.get_experiment(self.db, experiment_name)
+            else:
+                experiment = self.db.query(Experiment).filter(
+                    Experiment.name == experiment_name,
+                    Experiment.status == ExperimentStatus.RUNNING
+                ).first()
 
             if not experiment:
                 logger.warning(f"Cannot record result - experiment '{experiment_name}' not found")
                 return False
 
             # Get user's variant assignment
-            assignment = self._get_existing_assignment(
-                experiment.id, user_id, session_id
-            )
+            variant_id = self._get_assigned_variant_id(experiment, user_id, session_id)
 
-            if not assignment:
+            if variant_id is None:
                 logger.warning(f"Cannot record result - no assignment found for experiment '{experiment_name}'")
                 return False
 
             # Create result record
             result = ExperimentResult(
                 experiment_id=experiment.id,
-                variant_id=assignment.variant_id,
+                variant_id=variant_id,
                 user_id=user_id,
                 session_id=session_id,
                 metric_name=metric_name,
@@ -134,11 +149,18 @@ class ExperimentService:
             )
 
             self.db.add(result)
+            self.db.flush()
+            try:
+                with self.db.begin_nested():
+                    add_result_to_aggregate(self.db, experiment.id, variant_id, metric_name, metric_value)
+            except Exception as e:
+                # The raw result is the record of truth; startup rebuilds aggregates that miss it
+                logger.warning(f"Could not update result aggregate for experiment '{experiment_name}': {e}")
             self.db.commit()
 
             logger.info(
                 f"Recorded result for experiment '{experiment_name}': "
-                f"{metric_name}={metric_value} (variant_id={assignment.variant_id})"
+                f"{metric_name}={metric_value} (variant_id={variant_id})"
             )
             return True
 
@@ -238,6 +260,7 @@ class ExperimentService:
             experiment.status = ExperimentStatus.RUNNING
             experiment.started_at = datetime.now(timezone.utc)
             self.db.commit()
+            self.cache.invalidate()
 
             logger.info(f"Started experiment '{experiment.name}'")
             return True
@@ -271,6 +294,7 @@ class ExperimentService:
                     experiment.winner_declared_at = datetime.now(timezone.utc)
 
             self.db.commit()
+            self.cache.invalidate()
             logger.info(f"Stopped experiment '{experiment.name}'")
             return True
 
@@ -281,6 +305,66 @@ class ExperimentService:
 
     # Private helper methods
 
+    def _get_cached_variant(
+        self,
+        experiment_name: str,
+        user_id: Optional[int],
+        session_id: Optional[str],
+        context: Optional[Dict]
+    ) -> Optional[Dict[str, Any]]:
+        """get_variant_for_user from the in-process experiment tables"""
+        experiment = self.cache.get_experiment(self.db, experiment_name)
+        if not experiment:
+            logger.debug(f"Experiment '{experiment_name}' not found or not running")
+            return None
+
+        if not experiment.includes(user_id, context):
+            return None
+
+        # Assignment is deterministic, so a persisted row always matches the hash
+        variant = experiment.assign(user_id, session_id)
+        key = assignment_key(experiment.id, user_id, session_id)
+        if key is not None and self.cache.record_assignment(key, variant.id):
+            if self.cache.pending() >= self.cache.batch_size:
+                try:
+                    self.cache.flush(self.db)
+                except Exception as e:
+                    # Kept in the buffer for the scheduled flush
+                    logger.error(f"Error writing experiment assignments: {e}")
+        return dict(variant.response)
+
+    def _get_assigned_variant_id(
+        self,
+        experiment,
+        user_id: Optional[int],
+        session_id: Optional[str]
+    ) -> Optional[int]:
+        """
+        Variant of the user's assignment: cached, else from the database.
+        With the cache on, an assignment made by another worker may still be
+        in that worker's write buffer, so a missing row falls back to the
+        deterministic assignment of the cached experiment.
+        """
+        experiment_id = experiment.id
+        key = assignment_key(experiment_id, user_id, session_id)
+        if key is None:
+            return None
+        if self.cache.enabled:
+            variant_id = self.cache.known_assignment(key)
+            if variant_id is not None:
+                return variant_id
+
+        assignment = self._get_existing_assignment(experiment_id, user_id, session_id)
+        if not assignment:
+            if isinstance(experiment, CachedExperiment) and experiment.includes(user_id, {"session_id": session_id}):
+                variant_id = experiment.assign(user_id, session_id).id
+                self.cache.remember(key, variant_id)
+                return variant_id
+            return None
+        if self.cache.enabled:
+            self.cache.remember(key, assignment.variant_id)
+        return assignment.variant_id
+
     def _should_include(
         self,
         experiment: Experiment,
@@ -0,0 +1,178 @@
+"""
+Experiment Result Aggregates
+Running per-experiment, per-variant, per-metric statistics in ab_result_aggregates
+
+ExperimentService.record_result stores the raw ExperimentResult row and, in
+a savepoint of the same transaction, folds the value into the matching
+aggregate row (count, sum, sum of squares, min, max) with one UPDATE.
+Increments are computed by the database, so concurrent writers never lose
+an update. StatisticalAnalyzer reads these rows instead of scanning
+ab_results.
+
+When an experiment gets its first row for a variant and metric, the missing
+rows are built from all of the experiment's results, so results recorded
+before the table existed are never left out of the analysis.
+
+ensure_result_aggregates runs at startup: it creates the table on installs
+that predate it and rebuilds any experiment whose aggregates do not count
+all of its results. rebuild_result_aggregates can also be run by hand:
+    python backend/rebuild_experiment_aggregates.py [experiment_id]
+    POST /api/v1/experiments/{experiment_id}/rebuild-aggregates
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, delete, func, inspect, literal, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import sys
+sys.path.append('..')
+from ab_testing_models import ExperimentResult, ExperimentResultAggregate
+
+logger = logging.getLogger(__name__)
+
+
+def add_result_to_aggregate(
+    db: Session,
+    experiment_id: int,
+    variant_id: int,
+    metric_name: str,
+    value: float
+):
+    """Fold one (already flushed) result into its aggregate row (caller commits)"""
+    table = ExperimentResultAggregate.__table__
+    now = datetime.now(timezone.utc)
+    update = table.update().where(
+        table.c.experiment_id == experiment_id,
+        table.c.variant_id == variant_id,
+        table.c.metric_name == metric_name
+    ).values(
+        result_count=table.c.result_count + 1,
+        value_sum=table.c.value_sum + value,
+        value_sum_sq=table.c.value_sum_sq + value * value,
+        value_min=case((table.c.value_min <= value, table.c.value_min), else_=literal(value)),
+        value_max=case((table.c.value_max >= value, table.c.value_max), else_=literal(value)),
+        updated_at=now
+    )
+    if db.execute(update).rowcount:
+        return
+
+    try:
+        with db.begin_nested():
+            # Includes this result and any recorded before the aggregates existed
+            _insert_missing_aggregates(db, experiment_id, now)
+    except IntegrityError:
+        # Another writer created the row first
+        db.execute(update)
+
+
+def _aggregate_source(now: datetime):
+    results = ExperimentResult.__table__
+    value = results.c.metric_value
+    return select(
+        results.c.experiment_id,
+        results.c.variant_id,
+        results.c.metric_name,
+        func.count(),
+        func.sum(value),
+        func.sum(value * value),
+        func.min(value),
+        func.max(value),
+        literal(now, ExperimentResultAggregate.__table__.c.updated_at.type)
+    ).group_by(results.c.experiment_id, results.c.variant_id, results.c.metric_name)
+
+
+_AGGREGATE_COLUMNS = [
+    "experiment_id", "variant_id", "metric_name", "result_count",
+    "value_sum", "value_sum_sq", "value_min", "value_max", "updated_at"
+]
+
+
+def _insert_missing_aggregates(db: Session, experiment_id: int, now: datetime):
+    """Build the experiment's missing aggregate rows from its results"""
+    aggregates = ExperimentResultAggregate.__table__
+    results = ExperimentResult.__table__
+    existing = select(aggregates.c.id).where(
+        aggregates.c.experiment_id == results.c.experiment_id,
+        aggregates.c.variant_id == results.c.variant_id,
+        aggregates.c.metric_name == results.c.metric_name
+    ).exists()
+    source = _aggregate_source(now).where(results.c.experiment_id == experiment_id, ~existing)
+    db.execute(aggregates.insert().from_select(_AGGREGATE_COLUMNS, source))
+
+
+def stale_aggregate_experiments(db: Session) -> List[int]:
+    """Experiments whose aggregates do not count every one of their results"""
+    aggregates = ExperimentResultAggregate.__table__
+    results = ExperimentResult.__table__
+    recorded = select(results.c.experiment_id, func.count().label("results")) \
+        .group_by(results.c.experiment_id).subquery()
+    folded = select(aggregates.c.experiment_id, func.sum(aggregates.c.result_count).label("results")) \
+        .group_by(aggregates.c.experiment_id).subquery()
+    rows = db.execute(
+        select(recorded.c.experiment_id)
+        .select_from(recorded.outerjoin(folded, folded.c.experiment_id == recorded.c.experiment_id))
+        .where(or_(folded.c.results.is_(None), folded.c.results != recorded.c.results))
+        .order_by(recorded.c.experiment_id)
+    ).all()
+    return [row.experiment_id for row in rows]
+
+
+def ensure_result_aggregates(db: Session) -> List[int]:
+    """
+    Startup check: create ab_result_aggregates if the A/B tables predate it and
+    rebuild experiments with results missing from their aggregates.
+    Returns the rebuilt experiment IDs.
+    """
+    bind = db.get_bind()
+    if not inspect(bind).has_table(ExperimentResult.__tablename__):
+        # A/B tables not migrated yet; the migration creates this table too
+        return []
+    ExperimentResultAggregate.__table__.create(bind, checkfirst=True)
+
+    stale = stale_aggregate_experiments(db)
+    for experiment_id in stale:
+        rebuild_result_aggregates(db, experiment_id)
+    return stale
+
+
+def rebuild_result_aggregates(db: Session, experiment_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Recompute aggregates from ab_results for one experiment (or all)
+
+    Results recorded while the rebuild runs may be missed; run it again
+    (or while the experiment is paused) if that matters.
+
+    Returns:
+        {"experiments": n, "rows": aggregate rows written, "results": results folded in}
+    """
+    aggregates = ExperimentResultAggregate.__table__
+    results = ExperimentResult.__table__
+
+    clear = delete(aggregates)
+    source = _aggregate_source(datetime.now(timezone.utc))
+    if experiment_id is not None:
+        clear = clear.where(aggregates.c.experiment_id == experiment_id)
+        source = source.where(results.c.experiment_id == experiment_id)
+
+    try:
+        db.execute(clear)
+        db.execute(aggregates.insert().from_select(_AGGREGATE_COLUMNS, source))
+
+        summary = db.query(
+            func.count(func.distinct(ExperimentResultAggregate.experiment_id)),
+            func.count(ExperimentResultAggregate.id),
+            func.coalesce(func.sum(ExperimentResultAggregate.result_count), 0)
+        )
+        if experiment_id is not None:
+            summary = summary.filter(ExperimentResultAggregate.experiment_id == experiment_id)
+        experiments, rows, folded = summary.one()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    logger.info(f"Rebuilt {rows} result aggregates from {folded} results ({experiments} experiments)")
+    return {"experiments": int(experiments), "rows": int(rows), "results": int(folded)}
@@ -1,23 +1,195 @@
 """
 Statistical Analysis for A/B Testing
 Calculates significance, confidence intervals, and winner recommendations
+
+Variants are summarised by their sufficient statistics (count, sum, sum of
+squares, min, max), read from the ab_result_aggregates rows maintained by
+record_result, so analysis is O(variants) whatever the number of results. Every treatment is compared with the
+control using Welch's t-test with exact Student-t p-values and confidence
+intervals (vectorized NumPy, no scipy); p-values are Holm-adjusted across
+the comparisons.
 """
 import logging
 import math
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Optional, Tuple
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from collections import defaultdict
+
+import numpy as np
 
 import sys
 sys.path.append('..')
 from ab_testing_models import (
-    Experiment, ExperimentVariant, ExperimentResult, ExperimentInsight
+    Experiment, ExperimentVariant, ExperimentResult, ExperimentResultAggregate, ExperimentInsight
 )
 
 logger = logging.getLogger(__name__)
 
+# Above this many degrees of freedom the t-distribution is replaced by the
+# normal (p-values differ by less than 1e-5)
+NORMAL_DF = 1e5
+
+_lgamma = np.vectorize(math.lgamma, otypes=[float])
+_erfc = np.vectorize(math.erfc, otypes=[float])
+
+
+def _betacf(a: np.ndarray, b: np.ndarray, x: np.ndarray, max_iter: int = 10000) -> np.ndarray:
+    """Continued fraction for the incomplete beta function (modified Lentz), elementwise"""
+    tiny, eps = 1e-300, 1e-15
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c = np.ones_like(x)
+    d = 1.0 - qab * x / qap
+    d = 1.0 / np.where(np.abs(d) < tiny, tiny, d)
+    h = d.copy()
+    active = np.ones(x.shape, dtype=bool)
+    for m in range(1, max_iter + 1):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / np.where(np.abs(d) < tiny, tiny, d)
+        c = 1.0 + aa / c
+        c = np.where(np.abs(c) < tiny, tiny, c)
+        h = np.where(active, h * d * c, h)
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / np.where(np.abs(d) < tiny, tiny, d)
+        c = 1.0 + aa / c
+        c = np.where(np.abs(c) < tiny, tiny, c)
+        delta = d * c
+        h = np.where(active, h * delta, h)
+        active &= np.abs(delta - 1.0) >= eps
+        if not active.any():
+            break
+    return h
+
+
+def betainc(a, b, x) -> np.ndarray:
+    """Regularized incomplete beta function I_x(a, b), elementwise"""
+    a, b, x = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (a, b, x)))
+    result = np.where(x >= 1.0, 1.0, 0.0)
+    inside = (x > 0.0) & (x < 1.0)
+    if not inside.any():
+        return result
+    a, b, x = a[inside], b[inside], x[inside]
+
+    # The continued fraction converges quickly below (a + 1) / (a + b + 2);
+    # above it use I_x(a, b) = 1 - I_(1-x)(b, a)
+    swap = x > (a + 1.0) / (a + b + 2.0)
+    a, b, x = np.where(swap, b, a), np.where(swap, a, b), np.where(swap, 1.0 - x, x)
+    front = np.exp(_lgamma(a + b) - _lgamma(a) - _lgamma(b) + a * np.log(x) + b * np.log1p(-x)) / a
+    value = front * _betacf(a, b, x)
+    result[inside] = np.where(swap, 1.0 - value, value)
+    return result
+
+
+def student_t_sf(t, df) -> np.ndarray:
+    """P(T > t) for Student's t with df degrees of freedom, elementwise"""
+    t, df = np.broadcast_arrays(np.asarray(t, dtype=float), np.asarray(df, dtype=float))
+    normal = df > NORMAL_DF
+    tail = np.empty(t.shape)
+    # P(|T| > |t|) / 2
+    tail[~normal] = 0.5 * betainc(df[~normal] / 2.0, 0.5, df[~normal] / (df[~normal] + t[~normal] ** 2))
+    tail[normal] = 0.5 * _erfc(np.abs(t[normal]) / math.sqrt(2.0))
+    return np.where(t >= 0, tail, 1.0 - tail)
+
+
+def student_t_pdf(t, df) -> np.ndarray:
+    """Density of Student's t, elementwise"""
+    t, df = np.broadcast_arrays(np.asarray(t, dtype=float), np.asarray(df, dtype=float))
+    normal = df > NORMAL_DF
+    v = np.where(normal, 1.0, df)
+    log_density = _lgamma((v + 1) / 2) - _lgamma(v / 2) - 0.5 * np.log(v * math.pi) - (v + 1) / 2 * np.log1p(t ** 2 / v)
+    return np.where(normal, np.exp(-t ** 2 / 2) / math.sqrt(2 * math.pi), np.exp(log_density))
+
+
+def student_t_ppf(q, df) -> np.ndarray:
+    """Quantile of Student's t (inverse CDF) for q in (0, 1)"""
+    q, df = np.broadcast_arrays(np.asarray(q, dtype=float), np.asarray(df, dtype=float))
+    tail = np.where(q < 0.5, q, 1.0 - q)
+    # Newton on sf(t) = tail from t = 0: the upper tail is convex, so the
+    # iterates increase monotonically to the root
+    t = np.zeros(q.shape)
+    for _ in range(100):
+        step = (student_t_sf(t, df) - tail) / student_t_pdf(t, df)
+        t = t + step
+        if np.all(np.abs(step) <= 1e-12 * np.maximum(t, 1.0)):
+            break
+    return np.where(q < 0.5, -t, t)
+
+
+def summarize_variant(count: int, total: float, total_sq: float, minimum: float, maximum: float) -> Dict:
+    """Mean, sample std and range from a variant's sufficient statistics"""
+    mean = total / count
+    # Sample variance (n - 1); clamped against rounding in sum_sq - sum^2/n
+    variance = max(total_sq - total * mean, 0.0) / (count - 1) if count > 1 else 0.0
+    return {
+        "count": int(count),
+        "sum": float(total),
+        "sum_sq": float(total_sq),
+        "mean": mean,
+        "std": math.sqrt(variance),
+        "min": float(minimum),
+        "max": float(maximum),
+    }
+
+
+def welch_comparisons(
+    control: Dict,
+    treatments: Dict[int, Dict],
+    confidence_level: float
+) -> Dict[int, Dict]:
+    """
+    Welch's t-test of every treatment against the control, vectorized
+
+    Returns:
+        {variant_id: {"difference", "relative_lift", "t_stat", "df", "p_value",
+                      "adjusted_p_value", "ci_lower", "ci_upper"}}
+        p-values are two-sided; adjusted p-values use Holm's step-down method.
+        Comparisons without variance (or with a single sample) get p = 1.
+    """
+    ids = list(treatments)
+    if not ids:
+        return {}
+    n = np.array([treatments[i]["count"] for i in ids], dtype=float)
+    mean = np.array([treatments[i]["mean"] for i in ids])
+    var = np.array([treatments[i]["std"] for i in ids]) ** 2
+    n0, mean0, var0 = float(control["count"]), control["mean"], control["std"] ** 2
+
+    a, b = var / n, var0 / n0
+    se = np.sqrt(a + b)
+    valid = (se > 0) & (n > 1) & (n0 > 1)
+    se_safe = np.where(valid, se, 1.0)
+    difference = mean - mean0
+    t_stat = np.where(valid, difference / se_safe, 0.0)
+    # Welch-Satterthwaite degrees of freedom
+    denominator = a ** 2 / np.maximum(n - 1, 1) + b ** 2 / max(n0 - 1, 1)
+    df = np.where(valid, (a + b) ** 2 / np.where(valid, denominator, 1.0), 1.0)
+
+    p_value = np.where(valid, np.minimum(2.0 * student_t_sf(np.abs(t_stat), df), 1.0), 1.0)
+    critical = student_t_ppf(0.5 + confidence_level / 2.0, df)
+    margin = np.where(valid, critical * se, 0.0)
+
+    # Holm: k-th smallest p-value scaled by (m - k + 1), kept monotone
+    order = np.argsort(p_value)
+    scaled = np.minimum(p_value[order] * (len(ids) - np.arange(len(ids))), 1.0)
+    adjusted = np.empty_like(p_value)
+    adjusted[order] = np.maximum.accumulate(scaled)
+
+    return {
+        variant_id: {
+            "difference": float(difference[k]),
+            "relative_lift": float(difference[k] / mean0 * 100) if mean0 else None,
+            "t_stat": float(t_stat[k]),
+            "df": float(df[k]),
+            "p_value": float(p_value[k]),
+            "adjusted_p_value": float(adjusted[k]),
+            "ci_lower": float(difference[k] - margin[k]),
+            "ci_upper": float(difference[k] + margin[k]),
+        }
+        for k, variant_id in enumerate(ids)
+    }
+
 
 class StatisticalAnalyzer:
     """Analyzes A/B test results and determines statistical significance"""
@@ -54,14 +226,28 @@ class StatisticalAnalyzer:
                 logger.warning(f"Not enough data for experiment {experiment_id}")
                 return None
 
-            # Calculate statistical significance
-            p_value, is_significant = self._calculate_p_value(variant_stats)
+            confidence_level = experiment.confidence_level or 0.95
+            control_id = self._control_variant_id(experiment_id, variant_stats)
+
+            # Compare every treatment with the control
+            comparisons = welch_comparisons(
+                variant_stats[control_id],
+                {k: v for k, v in variant_stats.items() if k != control_id},
+                confidence_level
+            )
+            for variant_id, stats in variant_stats.items():
+                stats["is_control"] = variant_id == control_id
+                if variant_id in comparisons:
+                    stats["vs_control"] = comparisons[variant_id]
+
+            p_value = min(c["adjusted_p_value"] for c in comparisons.values())
+            is_significant = p_value < 1 - confidence_level
 
             # Determine winner
-            recommended_winner_id, confidence, reason = self._recommend_winner(
+            recommended_winner_id, confidence, reason, interval = self._recommend_winner(
                 variant_stats,
-                is_significant,
-                experiment.confidence_level
+                control_id,
+                confidence_level
             )
 
             # Check sample size
@@ -84,6 +270,7 @@ class StatisticalAnalyzer:
             }
             insight.p_value = p_value
             insight.is_significant = is_significant
+            insight.confidence_interval = interval
             insight.recommended_winner_id = recommended_winner_id
             insight.recommendation_confidence = confidence
             insight.recommendation_reason = reason
@@ -112,179 +299,123 @@ class StatisticalAnalyzer:
         metric_name: str
     ) -> Dict[int, Dict]:
         """
-        Calculate statistics for each variant
+        Calculate statistics for each variant from its running aggregate
+        (or from the raw results if the experiment has no aggregates yet)
 
         Returns:
-            {variant_id: {"mean": float, "std": float, "count": int, "values": list}}
+            {variant_id: {"count", "sum", "sum_sq", "mean", "std", "min", "max"}}
         """
         try:
-            # Get all results for this experiment and metric
-            results = self.db.query(ExperimentResult).filter(
+            variant_stats = self._load_aggregate_stats(experiment_id, metric_name)
+            if variant_stats:
+                return variant_stats
+
+            # No aggregates yet (table missing or not rebuilt since startup); scan the results
+            value = ExperimentResult.metric_value
+            rows = self.db.query(
+                ExperimentResult.variant_id,
+                func.count(value),
+                func.sum(value),
+                func.sum(value * value),
+                func.min(value),
+                func.max(value)
+            ).filter(
                 ExperimentResult.experiment_id == experiment_id,
                 ExperimentResult.metric_name == metric_name
-            ).all()
-
-            # Group by variant
-            variant_data = defaultdict(list)
-            for result in results:
-                variant_data[result.variant_id].append(result.metric_value)
-
-            # Calculate statistics
-            variant_stats = {}
-            for variant_id, values in variant_data.items():
-                if not values:
-                    continue
-
-                mean = sum(values) / len(values)
-                variance = sum((x - mean) ** 2 for x in values) / len(values)
-                std = math.sqrt(variance) if variance > 0 else 0.0
-
-                variant_stats[variant_id] = {
-                    "mean": mean,
-                    "std": std,
-                    "count": len(values),
-                    "values": values,
-                    "min": min(values),
-                    "max": max(values),
-                    "median": sorted(values)[len(values) // 2]
-                }
+            ).group_by(ExperimentResult.variant_id).all()
 
-            return variant_stats
+            return {
+                variant_id: summarize_variant(count, total, total_sq, minimum, maximum)
+                for variant_id, count, total, total_sq, minimum, maximum in rows
+                if count
+            }
 
         except Exception as e:
             logger.error(f"Error calculating variant stats: {e}")
             return {}
 
-    def _calculate_p_value(
-        self,
-        variant_stats: Dict[int, Dict]
-    ) -> Tuple[float, bool]:
-        """
-        Calculate p-value using two-sample t-test
-
-        Returns:
-            (p_value, is_significant)
-        """
-        try:
-            # For simplicity, compare control vs best performing variant
-            # Find control variant
-            control_id = None
-            control_stats = None
-
-            for variant_id, stats in variant_stats.items():
-                # Assuming control has lowest variant_id or check is_control flag
-                if control_id is None or variant_id < control_id:
-                    control_id = variant_id
-                    control_stats = stats
-
-            if not control_stats:
-                return 1.0, False
-
-            # Find best performing variant (highest mean)
-            best_id = max(variant_stats.keys(), key=lambda k: variant_stats[k]["mean"])
-            best_stats = variant_stats[best_id]
-
-            if best_id == control_id:
-                # Control is already best
-                return 1.0, False
-
-            # Calculate t-statistic
-            mean1 = control_stats["mean"]
-            mean2 = best_stats["mean"]
-            std1 = control_stats["std"]
-            std2 = best_stats["std"]
-            n1 = control_stats["count"]
-            n2 = best_stats["count"]
-
-            # Pooled standard error
-            se = math.sqrt((std1 ** 2 / n1) + (std2 ** 2 / n2))
-
-            if se == 0:
-                return 1.0, False
-
-            t_stat = abs(mean2 - mean1) / se
-
-            # Degrees of freedom (Welch's approximation)
-            df = ((std1 ** 2 / n1 + std2 ** 2 / n2) ** 2) / \
-                 ((std1 ** 2 / n1) ** 2 / (n1 - 1) + (std2 ** 2 / n2) ** 2 / (n2 - 1))
-
-            # Simplified p-value calculation (two-tailed)
-            # For production, use scipy.stats.t.sf(t_stat, df) * 2
-            # This is a rough approximation
-            if t_stat > 2.0:  # Roughly corresponds to p < 0.05 for large samples
-                p_value = 0.01
-                is_significant = True
-            elif t_stat > 1.65:  # Roughly corresponds to p < 0.10
-                p_value = 0.08
-                is_significant = False
-            else:
-                p_value = 0.20
-                is_significant = False
-
-            return p_value, is_significant
-
-        except Exception as e:
-            logger.error(f"Error calculating p-value: {e}")
-            return 1.0, False
+    def _load_aggregate_stats(self, experiment_id: int, metric_name: str) -> Dict[int, Dict]:
+        rows = self.db.query(ExperimentResultAggregate).filter(
+            ExperimentResultAggregate.experiment_id == experiment_id,
+            ExperimentResultAggregate.metric_name == metric_name
+        ).all()
+        return {
+            row.variant_id: summarize_variant(row.result_count, row.value_sum, row.value_sum_sq, row.value_min, row.value_max)
+            for row in rows
+            if row.result_count
+        }
+
+    def _control_variant_id(self, experiment_id: int, variant_stats: Dict[int, Dict]) -> int:
+        """The variant flagged is_control, else the lowest variant ID with results"""
+        control = self.db.query(ExperimentVariant.id).filter(
+            ExperimentVariant.experiment_id == experiment_id,
+            ExperimentVariant.is_control == True
+        ).first()
+        if control and control.id in variant_stats:
+            return control.id
+        return min(variant_stats)
 
     def _recommend_winner(
         self,
         variant_stats: Dict[int, Dict],
-        is_significant: bool,
+        control_id: int,
         confidence_level: float
-    ) -> Tuple[Optional[int], float, str]:
+    ) -> Tuple[Optional[int], float, str, Optional[Dict]]:
         """
         Recommend winning variant
 
+        The best treatment that beats the control at the adjusted significance
+        level wins; the control wins only when every treatment is
+        significantly worse.
+
         Returns:
-            (variant_id, confidence, reason)
+            (variant_id, confidence, reason, confidence_interval)
         """
         try:
-            if not is_significant:
-                return (
-                    None,
-                    0.0,
-                    "No statistically significant difference found. Need more data or variants perform similarly."
+            alpha = 1 - confidence_level
+            control = variant_stats[control_id]
+            comparisons = {k: v["vs_control"] for k, v in variant_stats.items() if "vs_control" in v}
+            better = [k for k, c in comparisons.items() if c["adjusted_p_value"] < alpha and c["difference"] > 0]
+            level = f"{confidence_level:.0%}"
+
+            if better:
+                best_id = max(better, key=lambda k: variant_stats[k]["mean"])
+                best, comparison = variant_stats[best_id], comparisons[best_id]
+                lift = f"{comparison['relative_lift']:.1f}% improvement" if comparison["relative_lift"] is not None \
+                    else f"{comparison['difference']:+.3f} difference"
+                reason = (
+                    f"Variant {best_id} shows {lift} over control "
+                    f"with {best['count']} samples. Mean: {best['mean']:.3f} "
+                    f"(vs control: {control['mean']:.3f}), {level} CI for the difference "
+                    f"[{comparison['ci_lower']:.3f}, {comparison['ci_upper']:.3f}], "
+                    f"adjusted p={comparison['adjusted_p_value']:.3g}"
                 )
+                interval = {
+                    "variant_id": best_id,
+                    "level": confidence_level,
+                    "lower": comparison["ci_lower"],
+                    "upper": comparison["ci_upper"],
+                }
+                return best_id, 1 - comparison["adjusted_p_value"], reason, interval
 
-            # Find variant with highest mean
-            best_id = max(variant_stats.keys(), key=lambda k: variant_stats[k]["mean"])
-            best_stats = variant_stats[best_id]
-
-            # Calculate confidence based on sample size and effect size
-            sample_size = best_stats["count"]
-
-            # Simple confidence calculation
-            if sample_size < 100:
-                confidence = 0.6
-            elif sample_size < 500:
-                confidence = 0.75
-            elif sample_size < 1000:
-                confidence = 0.85
-            else:
-                confidence = 0.95
-
-            # Calculate improvement percentage
-            control_id = min(variant_stats.keys())
-            control_mean = variant_stats[control_id]["mean"]
-            best_mean = best_stats["mean"]
-
-            if control_mean > 0:
-                improvement = ((best_mean - control_mean) / control_mean) * 100
-            else:
-                improvement = 0
-
-            reason = (
-                f"Variant {best_id} shows {improvement:.1f}% improvement "
-                f"with {sample_size} samples. Mean: {best_mean:.3f} "
-                f"(vs control: {control_mean:.3f})"
-            )
+            if comparisons and all(c["adjusted_p_value"] < alpha and c["difference"] < 0 for c in comparisons.values()):
+                worst_p = max(c["adjusted_p_value"] for c in comparisons.values())
+                reason = (
+                    f"Control (variant {control_id}) outperforms every treatment. "
+                    f"Mean: {control['mean']:.3f} with {control['count']} samples"
+                )
+                return control_id, 1 - worst_p, reason, None
 
-            return best_id, confidence, reason
+            return (
+                None,
+                0.0,
+                "No statistically significant difference found. Need more data or variants perform similarly.",
+                None
+            )
 
         except Exception as e:
             logger.error(f"Error recommending winner: {e}")
-            return None, 0.0, f"Error in analysis: {str(e)}"
+            return None, 0.0, f"Error in analysis: {str(e)}", None
 
     def get_experiment_summary(self, experiment_id: int) -> Optional[Dict]:
         """
@@ -311,15 +442,22 @@ class StatisticalAnalyzer:
                 ExperimentVariant.experiment_id == experiment_id
             ).all()
 
+            # Live counts and means from the running aggregates; comparisons from the last analysis
+            live_stats = self._load_aggregate_stats(experiment_id, experiment.primary_metric)
+
             variant_details = []
             for variant in variants:
                 stats = insight.variant_stats.get(str(variant.id), {}) if insight else {}
+                comparison = stats.get("vs_control", {})
+                live = live_stats.get(variant.id, stats)
                 variant_details.append({
                     "id": variant.id,
                     "name": variant.name,
                     "is_control": variant.is_control,
-                    "mean": stats.get("mean", 0),
-                    "count": stats.get("count", 0),
+                    "mean": live.get("mean", 0),
+                    "count": live.get("count", 0),
+                    "relative_lift": comparison.get("relative_lift"),
+                    "p_value": comparison.get("adjusted_p_value"),
                     "is_winner": variant.id == insight.recommended_winner_id if insight else False
                 })
 
@@ -331,10 +469,12 @@ class StatisticalAnalyzer:
                 "variants": variant_details,
                 "is_significant": insight.is_significant if insight else False,
                 "p_value": insight.p_value if insight else None,
+                "confidence_interval": insight.confidence_interval if insight else None,
                 "recommended_winner_id": insight.recommended_winner_id if insight else None,
                 "recommendation_reason": insight.recommendation_reason if insight else None,
                 "sufficient_sample_size": insight.sufficient_sample_size if insight else False,
-                "current_sample_size": insight.current_sample_size if insight else 0,
+                "current_sample_size": sum(s["count"] for s in live_stats.values()) if live_stats
+                else (insight.current_sample_size if insight else 0),
                 "started_at": experiment.started_at.isoformat() if experiment.started_at else None,
                 "ended_at": experiment.ended_at.isoformat() if experiment.ended_at else None
             }
@@ -344,19 +484,3 @@ class StatisticalAnalyzer:
         except Exception as e:
             logger.error(f"Error getting experiment summary: {e}")
             return None
-
-
-# Helper function for better p-value calculation (if scipy is available)
-def calculate_p_value_scipy(values1: List[float], values2: List[float]) -> float:
-    """
-    Calculate p-value using scipy (more accurate)
-    Install: pip install scipy
-    """
-    try:
-        from scipy import stats
-
-        t_stat, p_value = stats.ttest_ind(values1, values2)
-        return p_value
-    except ImportError:
-        logger.warning("scipy not available, using simplified p-value calculation")
-        return None
@@ -2,7 +2,7 @@
 A/B Testing Database Models
 Supports experimentation for AI prompts, models, agent configurations, and features
 """
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, JSON, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, JSON, UniqueConstraint, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 import enum
@@ -159,6 +159,30 @@ class ExperimentResult(Base):
     variant = relationship("ExperimentVariant", back_populates="results")
 
 
+class ExperimentResultAggregate(Base):
+    """
+    Running sufficient statistics per experiment, variant and metric
+    Updated with each recorded result so analysis reads O(variants) rows
+    """
+    __tablename__ = "ab_result_aggregates"
+    __table_args__ = (
+        UniqueConstraint("experiment_id", "variant_id", "metric_name", name="uq_ab_result_aggregates"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    experiment_id = Column(Integer, ForeignKey("ab_experiments.id"), nullable=False, index=True)
+    variant_id = Column(Integer, ForeignKey("ab_variants.id"), nullable=False)
+    metric_name = Column(String(100), nullable=False)
+
+    result_count = Column(Integer, nullable=False, default=0)
+    value_sum = Column(Float, nullable=False, default=0.0)
+    value_sum_sq = Column(Float, nullable=False, default=0.0)  # Sum of squared values (for variance)
+    value_min = Column(Float)
+    value_max = Column(Float)
+
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+
 class ExperimentInsight(Base):
     """
     Aggregated insights and statistical analysis for experiments
@@ -13,6 +13,7 @@ from database import get_db
 from ab_testing_models import ExperimentType, ExperimentStatus
 from ab_testing.experiment_service import ExperimentService
 from ab_testing.statistical_analysis import StatisticalAnalyzer
+from ab_testing.result_aggregates import rebuild_result_aggregates
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1/experiments", tags=["A/B Testing"])
@@ -284,6 +285,7 @@ async def analyze_experiment(
             "variant_stats": insight.variant_stats,
             "p_value": insight.p_value,
             "is_significant": insight.is_significant,
+            "confidence_interval": insight.confidence_interval,
             "recommended_winner_id": insight.recommended_winner_id,
             "recommendation_confidence": insight.recommendation_confidence,
             "recommendation_reason": insight.recommendation_reason,
@@ -299,6 +301,32 @@ async def analyze_experiment(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/{experiment_id}/rebuild-aggregates")
+async def rebuild_experiment_aggregates(
+    experiment_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Recompute the experiment's running result aggregates from its raw results
+
+    Needed once for experiments recorded before aggregates existed
+    """
+    try:
+        from ab_testing_models import Experiment
+
+        if not db.query(Experiment.id).filter(Experiment.id == experiment_id).first():
+            raise HTTPException(status_code=404, detail="Experiment not found")
+
+        result = rebuild_result_aggregates(db, experiment_id)
+        return {"message": f"Rebuilt aggregates for experiment {experiment_id}", **result}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error rebuilding experiment aggregates: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/{experiment_id}/summary")
 async def get_experiment_summary(
     experiment_id: int,
@@ -434,7 +462,7 @@ async def delete_experiment(
 ):
     """Delete an experiment (only if DRAFT or ARCHIVED)"""
     try:
-        from ab_testing_models import Experiment
+        from ab_testing_models import Experiment, ExperimentResultAggregate
 
         experiment = db.query(Experiment).filter(Experiment.id == experiment_id).first()
 
@@ -447,6 +475,9 @@ async def delete_experiment(
                 detail="Can only delete DRAFT or ARCHIVED experiments"
             )
 
+        db.query(ExperimentResultAggregate).filter(
+            ExperimentResultAggregate.experiment_id == experiment_id
+        ).delete(synchronize_session=False)
         db.delete(experiment)
         db.commit()
 
@@ -4,13 +4,11 @@ Provides context-aware AI responses using conversation history
 """
 import logging
 from typing import Optional, Dict, List
-from datetime import datetime, timezone
 from sqlalchemy.orm import Session
-import anthropic
-import json
 
-from integrations.pinecone_service import vector_memory
-from main import ConversationMemory, Lead, Loan, User
+from ai_providers.llm_client import ANTHROPIC, LLMStream, get_llm_client
+from integrations.pinecone_service import VectorQueueFullError, vector_memory
+from main import ConversationMemory, Lead, Loan, User, memory_access
 
 logger = logging.getLogger(__name__)
 
@@ -18,13 +16,11 @@ logger = logging.getLogger(__name__)
 class ContextAwareAI:
     """Enhanced AI service with memory and context retrieval"""
 
-    def __init__(self):
-        self.anthropic_api_key = anthropic.api_key
-        if not self.anthropic_api_key:
-            import os
-            self.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY", "")
+    CHAT_MODEL = "claude-3-5-sonnet-20241022"
 
-        self.client = anthropic.Anthropic(api_key=self.anthropic_api_key)
+    def __init__(self):
+        # Shared async client: completions never block the event loop
+        self.llm = get_llm_client()
         self.vector_memory = vector_memory
 
     async def get_intelligent_response(
@@ -51,94 +47,31 @@ class ContextAwareAI:
             Dict with response, context_used, and metadata
         """
         try:
-            # 1. Retrieve relevant past context if enabled
-            relevant_history = []
-            if include_context and self.vector_memory.enabled:
-                filter_metadata = {}
-                if lead_id:
-                    filter_metadata["lead_id"] = lead_id
-
-                relevant_history = await self.vector_memory.retrieve_relevant_context(
-                    user_id=user_id,
-                    current_query=current_message,
-                    top_k=5,
-                    filter_metadata=filter_metadata if filter_metadata else None
-                )
-
-                # Update access tracking in database
-                for context in relevant_history:
-                    pinecone_id = context.get("metadata", {}).get("pinecone_id")
-                    if pinecone_id:
-                        await self._update_memory_access(db, pinecone_id)
-
-            # 2. Get lead/loan context if provided
-            lead_context = ""
-            if lead_id:
-                lead_context = await self._get_lead_context(db, lead_id)
-
-            loan_context = ""
-            if loan_id:
-                loan_context = await self._get_loan_context(db, loan_id)
-
-            # 3. Build enhanced system prompt with context
-            system_prompt = self._build_system_prompt(
-                relevant_history,
-                lead_context,
-                loan_context
+            prepared = await self.prepare_response(
+                db, user_id, current_message, lead_id=lead_id, loan_id=loan_id, include_context=include_context
             )
 
             # 4. Generate response with Claude
-            response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
+            response = await self.llm.complete(
+                ANTHROPIC,
+                self.CHAT_MODEL,
+                [{"role": "user", "content": current_message}],
+                system=prepared["system_prompt"],
                 max_tokens=2000,
-                system=system_prompt,
-                messages=[{
-                    "role": "user",
-                    "content": current_message
-                }]
+                purpose="smart_chat"
             )
 
-            ai_response = response.content[0].text
+            ai_response = response.text
 
-            # 5. Extract key information from conversation
-            conversation_metadata = await self._extract_conversation_metadata(
-                current_message,
-                ai_response
+            # 5-6. Extract metadata and store the conversation for future context
+            conversation_metadata = await self.remember_conversation(
+                db, user_id, current_message, ai_response, lead_id=lead_id, loan_id=loan_id
             )
 
-            # 6. Store this conversation for future context
-            conversation_text = f"User: {current_message}\n\nAssistant: {ai_response}"
-
-            if self.vector_memory.enabled:
-                pinecone_id = await self.vector_memory.store_conversation(
-                    user_id=user_id,
-                    conversation_text=conversation_text,
-                    metadata={
-                        "lead_id": lead_id,
-                        "loan_id": loan_id,
-                        **conversation_metadata
-                    }
-                )
-
-                # Store metadata in database
-                memory_record = ConversationMemory(
-                    user_id=user_id,
-                    lead_id=lead_id,
-                    loan_id=loan_id,
-                    conversation_summary=conversation_text[:500],  # First 500 chars
-                    key_points=conversation_metadata.get("key_points", {}),
-                    sentiment=conversation_metadata.get("sentiment", "neutral"),
-                    intent=conversation_metadata.get("intent", "unknown"),
-                    pinecone_id=pinecone_id,
-                    relevance_score=1.0  # New memories start with high relevance
-                )
-                db.add(memory_record)
-                db.commit()
-
             return {
                 "response": ai_response,
-                "context_used": len(relevant_history) > 0,
-                "context_count": len(relevant_history),
+                "context_used": prepared["context_count"] > 0,
+                "context_count": prepared["context_count"],
                 "metadata": conversation_metadata,
                 "has_memory": self.vector_memory.enabled
             }
@@ -151,6 +84,119 @@ class ContextAwareAI:
                 "error": str(e)
             }
 
+    async def prepare_response(
+        self,
+        db: Session,
+        user_id: int,
+        current_message: str,
+        lead_id: Optional[int] = None,
+        loan_id: Optional[int] = None,
+        include_context: bool = True
+    ) -> Dict:
+        """
+        Retrieve past context and lead/loan details and build the system prompt
+
+        Returns:
+            Dict with system_prompt and context_count
+        """
+        # 1. Retrieve relevant past context if enabled
+        relevant_history = []
+        if include_context and self.vector_memory.enabled:
+            filter_metadata = {}
+            if lead_id:
+                filter_metadata["lead_id"] = lead_id
+
+            relevant_history = await self.vector_memory.retrieve_relevant_context(
+                user_id=user_id,
+                current_query=current_message,
+                top_k=5,
+                filter_metadata=filter_metadata if filter_metadata else None
+            )
+
+            # Access tracking is buffered and written in bulk off the request path
+            memory_access.record(context["id"] for context in relevant_history if context.get("id"))
+
+        # 2. Get lead/loan context if provided
+        lead_context = ""
+        if lead_id:
+            lead_context = await self._get_lead_context(db, lead_id)
+
+        loan_context = ""
+        if loan_id:
+            loan_context = await self._get_loan_context(db, loan_id)
+
+        # 3. Build enhanced system prompt with context
+        return {
+            "system_prompt": self._build_system_prompt(relevant_history, lead_context, loan_context),
+            "context_count": len(relevant_history)
+        }
+
+    def stream_response(self, prepared: Dict, current_message: str) -> LLMStream:
+        """Stream the reply for a prepared prompt; iterate for text deltas"""
+        return self.llm.stream(
+            ANTHROPIC,
+            self.CHAT_MODEL,
+            [{"role": "user", "content": current_message}],
+            system=prepared["system_prompt"],
+            max_tokens=2000,
+            purpose="smart_chat"
+        )
+
+    async def remember_conversation(
+        self,
+        db: Session,
+        user_id: int,
+        current_message: str,
+        ai_response: str,
+        lead_id: Optional[int] = None,
+        loan_id: Optional[int] = None
+    ) -> Dict:
+        """
+        Extract metadata from a finished exchange and store it in vector memory
+
+        Streaming chat runs this after the stream has closed.
+
+        Returns:
+            The extracted conversation metadata
+        """
+        conversation_metadata = await self._extract_conversation_metadata(
+            current_message,
+            ai_response
+        )
+
+        conversation_text = f"User: {current_message}\n\nAssistant: {ai_response}"
+
+        if self.vector_memory.enabled:
+            # Store metadata in database; pinecone_id is set once the vector is written
+            memory_record = ConversationMemory(
+                user_id=user_id,
+                lead_id=lead_id,
+                loan_id=loan_id,
+                conversation_summary=conversation_text[:500],  # First 500 chars
+                key_points=conversation_metadata.get("key_points", {}),
+                sentiment=conversation_metadata.get("sentiment", "neutral"),
+                intent=conversation_metadata.get("intent", "unknown"),
+                relevance_score=1.0  # New memories start with high relevance
+            )
+            db.add(memory_record)
+            db.commit()
+
+            try:
+                await self.vector_memory.store_conversation(
+                    user_id=user_id,
+                    conversation_text=conversation_text,
+                    metadata={
+                        "lead_id": lead_id,
+                        "loan_id": loan_id,
+                        **conversation_metadata
+                    },
+                    memory_id=memory_record.id
+                )
+            except VectorQueueFullError as e:
+                logger.error(f"Conversation memory {memory_record.id} not added to vector memory: {e}")
+
+        return conversation_metadata
+
     def _build_system_prompt(
         self,
         relevant_history: List[Dict],
@@ -273,17 +319,16 @@ Extract and return ONLY a JSON object with:
 
 Return ONLY valid JSON, no other text."""
 
-            response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
+            response = await self.llm.complete(
+                ANTHROPIC,
+                self.CHAT_MODEL,
+                [{"role": "user", "content": analysis_prompt}],
                 max_tokens=500,
-                messages=[{
-                    "role": "user",
-                    "content": analysis_prompt
-                }]
+                purpose="chat_metadata"
             )
 
             # Parse JSON response
-            analysis = json.loads(response.content[0].text)
+            analysis = response.json()
             return analysis
 
         except Exception as e:
@@ -294,20 +339,6 @@ Return ONLY valid JSON, no other text."""
                 "key_points": {}
             }
 
-    async def _update_memory_access(self, db: Session, pinecone_id: str):
-        """Update access tracking for a memory"""
-        try:
-            memory = db.query(ConversationMemory).filter(
-                ConversationMemory.pinecone_id == pinecone_id
-            ).first()
-
-            if memory:
-                memory.access_count += 1
-                memory.last_accessed_at = datetime.now(timezone.utc)
-                db.commit()
-        except Exception as e:
-            logger.error(f"Error updating memory access: {e}")
-
 
 # Global instance
 context_ai = ContextAwareAI()
@@ -9,7 +9,7 @@ from sqlalchemy.orm import Session
 import anthropic
 import json
 
-from integrations.pinecone_service import vector_memory
+from integrations.pinecone_service import VectorQueueFullError, vector_memory
 from main import ConversationMemory, Lead, Loan, User
 from ab_testing.experiment_service import ExperimentService
 
@@ -134,17 +134,7 @@ class ContextAwareAIWithExperiments:
             conversation_text = f"User: {current_message}\n\nAssistant: {ai_response}"
 
             if self.vector_memory.enabled:
-                pinecone_id = await self.vector_memory.store_conversation(
-                    user_id=user_id,
-                    conversation_text=conversation_text,
-                    metadata={
-                        "lead_id": lead_id,
-                        "loan_id": loan_id,
-                        "experiment_variant": variant["variant_name"] if variant else "none",
-                        **conversation_metadata
-                    }
-                )
-
+                # pinecone_id is set once the vector is written
                 memory_record = ConversationMemory(
                     user_id=user_id,
                     lead_id=lead_id,
@@ -153,12 +143,26 @@ class ContextAwareAIWithExperiments:
                     key_points=conversation_metadata.get("key_points", {}),
                     sentiment=conversation_metadata.get("sentiment", "neutral"),
                     intent=conversation_metadata.get("intent", "unknown"),
-                    pinecone_id=pinecone_id,
                     relevance_score=1.0
                 )
                 db.add(memory_record)
                 db.commit()
 
+                try:
+                    await self.vector_memory.store_conversation(
+                        user_id=user_id,
+                        conversation_text=conversation_text,
+                        metadata={
+                            "lead_id": lead_id,
+                            "loan_id": loan_id,
+                            "experiment_variant": variant["variant_name"] if variant else "none",
+                            **conversation_metadata
+                        },
+                        memory_id=memory_record.id
+                    )
+                except VectorQueueFullError as e:
+                    logger.error(f"Conversation memory {memory_record.id} not added to vector memory: {e}")
+
             return {
                 "response": ai_response,
                 "context_used": len(relevant_history) > 0,
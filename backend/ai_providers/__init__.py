@@ -4,5 +4,6 @@ Supports multiple AI providers for email parsing
 """
 
 from .claude_parser import ClaudeEmailParser
+from .llm_client import LLMClient, LLMResponse, LLMStream, FakeLLMProvider, get_llm_client
 
-__all__ = ['ClaudeEmailParser']
+__all__ = ['ClaudeEmailParser', 'LLMClient', 'LLMResponse', 'LLMStream', 'FakeLLMProvider', 'get_llm_client']
@@ -3,12 +3,12 @@ Claude 4 Sonnet Email Parser
 Comprehensive AI-powered email parsing for all CRM profile types
 """
 
-import os
 import json
 import logging
 from typing import Dict, List, Optional, Any
 from datetime import datetime
-import anthropic
+
+from .llm_client import ANTHROPIC, get_llm_client
 
 logger = logging.getLogger(__name__)
 
@@ -220,11 +220,10 @@ class ClaudeEmailParser:
 
     def __init__(self):
         """Initialize Claude client"""
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
+        self.llm = get_llm_client()
+        if not self.llm.available(ANTHROPIC):
             raise ValueError("ANTHROPIC_API_KEY environment variable not set")
 
-        self.client = anthropic.Anthropic(api_key=api_key)
         self.model = "claude-sonnet-4-20250514"
         logger.info("Claude Email Parser initialized")
 
@@ -261,18 +260,17 @@ class ClaudeEmailParser:
 
             # Call Claude API
             logger.info(f"Calling Claude API for {profile_type} email parsing")
-            response = self.client.messages.create(
-                model=self.model,
+            response = await self.llm.complete(
+                ANTHROPIC,
+                self.model,
+                [{"role": "user", "content": prompt}],
                 max_tokens=4000,
                 temperature=0.1,  # Low temperature for consistent extraction
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }]
+                purpose="email_parse"
             )
 
             # Parse Claude's JSON response
-            response_text = response.content[0].text
+            response_text = response.text
 
             # Extract JSON from response (Claude may wrap it in markdown)
             extracted = self._extract_json(response_text)
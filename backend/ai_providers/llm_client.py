@@ -0,0 +1,594 @@
+"""
+Async LLM Client
+Shared, non-blocking completion layer for Anthropic and OpenAI
+
+Chat, email parsing, agent reasoning and the DRE used to create their own
+synchronous SDK clients and call them from async handlers, blocking the
+event loop for the whole completion. All of them now go through one
+LLMClient:
+
+- One async SDK client per provider (AsyncAnthropic / AsyncOpenAI), so HTTP
+  connections are pooled and reused across requests
+- Per-call timeout and a per-provider cap on in-flight calls
+- Per-purpose metrics: calls, errors, timeouts, rate limits, latency and
+  queue-wait p50/p95, input/output tokens
+- Streaming: LLMClient.stream() yields text deltas as they arrive (for SSE
+  chat) and records time-to-first-token alongside total latency
+- FakeLLMProvider for load tests and local runs without API keys
+
+Configuration (env):
+    LLM_TIMEOUT_SECONDS    - per-call timeout (default 60)
+    LLM_MAX_CONCURRENCY    - in-flight calls per provider (default 8)
+    LLM_FAKE_PROVIDER      - "true" routes every provider to FakeLLMProvider
+    LLM_FAKE_LATENCY_MS    - fake completion latency (default 200)
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ANTHROPIC = "anthropic"
+OPENAI = "openai"
+
+
+class LLMError(Exception):
+    """A completion failed"""
+
+
+class LLMRateLimitError(LLMError):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMTimeoutError(LLMError):
+    """A completion exceeded its timeout"""
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    provider: str
+    model: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    latency_ms: float = 0.0
+    first_token_ms: Optional[float] = None
+    # OpenAI function calls: [{"id", "name", "arguments"}] (arguments is a JSON string)
+    tool_calls: List[Dict[str, str]] = field(default_factory=list)
+
+    def json(self) -> Any:
+        """Parse the completion as JSON, tolerating a ```json fenced block"""
+        text = self.text.strip()
+        if text.startswith("```"):
+            text = text.split("\n", 1)[1] if "\n" in text else ""
+            text = text.rsplit("```", 1)[0]
+        return json.loads(text)
+
+
+# ============================================================================
+# PROVIDERS
+# ============================================================================
+
+class LLMProvider:
+    """One SDK client; messages are [{"role": "user"|"assistant", "content": str}]"""
+
+    name = "base"
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        system: Optional[str] = None,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        json_mode: bool = False,
+        max_retries: Optional[int] = None,
+        tools: Optional[List[Dict]] = None,
+    ) -> LLMResponse:
+        """Run one completion; tool calls are returned in response.tool_calls"""
+        raise NotImplementedError
+
+    def stream(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        response: LLMResponse,
+        system: Optional[str] = None,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        tools: Optional[List[Dict]] = None,
+    ) -> AsyncIterator[str]:
+        """Yield text deltas; token usage and tool calls are written to `response`"""
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+
+class AnthropicProvider(LLMProvider):
+    name = ANTHROPIC
+
+    def __init__(self, api_key: str, timeout_seconds: float):
+        from anthropic import AsyncAnthropic
+
+        self.client = AsyncAnthropic(api_key=api_key, timeout=timeout_seconds)
+
+    async def complete(self, model, messages, system=None, max_tokens=1024, temperature=0.7,
+                       json_mode=False, max_retries=None, tools=None) -> LLMResponse:
+        import anthropic
+
+        if tools:
+            raise LLMError("Tool calls are only supported on the OpenAI provider")
+        client = self.client if max_retries is None else self.client.with_options(max_retries=max_retries)
+        kwargs = {"system": system} if system else {}
+        try:
+            response = await client.messages.create(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                messages=messages,
+                **kwargs
+            )
+        except anthropic.RateLimitError as e:
+            raise LLMRateLimitError(str(e), _retry_after(e))
+        except anthropic.APITimeoutError as e:
+            raise LLMTimeoutError(str(e))
+
+        text = "".join(block.text for block in response.content if getattr(block, "type", "text") == "text")
+        usage = getattr(response, "usage", None)
+        return LLMResponse(
+            text=text,
+            provider=self.name,
+            model=model,
+            input_tokens=getattr(usage, "input_tokens", 0) or 0,
+            output_tokens=getattr(usage, "output_tokens", 0) or 0,
+        )
+
+    async def stream(self, model, messages, response, system=None, max_tokens=1024, temperature=0.7,
+                     tools=None):
+        import anthropic
+
+        if tools:
+            raise LLMError("Tool calls are only supported on the OpenAI provider")
+        kwargs = {"system": system} if system else {}
+        try:
+            async with self.client.messages.stream(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                messages=messages,
+                **kwargs
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                final = await stream.get_final_message()
+        except anthropic.RateLimitError as e:
+            raise LLMRateLimitError(str(e), _retry_after(e))
+        except anthropic.APITimeoutError as e:
+            raise LLMTimeoutError(str(e))
+
+        usage = getattr(final, "usage", None)
+        response.input_tokens = getattr(usage, "input_tokens", 0) or 0
+        response.output_tokens = getattr(usage, "output_tokens", 0) or 0
+
+    async def aclose(self):
+        await self.client.close()
+
+
+class OpenAIProvider(LLMProvider):
+    name = OPENAI
+
+    def __init__(self, api_key: str, timeout_seconds: float):
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(api_key=api_key, timeout=timeout_seconds)
+
+    async def complete(self, model, messages, system=None, max_tokens=1024, temperature=0.7,
+                       json_mode=False, max_retries=None, tools=None) -> LLMResponse:
+        import openai
+
+        client = self.client if max_retries is None else self.client.with_options(max_retries=max_retries)
+        kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+        if tools:
+            kwargs.update(tools=tools, tool_choice="auto")
+        try:
+            response = await client.chat.completions.create(
+                model=model,
+                messages=([{"role": "system", "content": system}] if system else []) + messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                **kwargs
+            )
+        except openai.RateLimitError as e:
+            raise LLMRateLimitError(str(e), _retry_after(e))
+        except openai.APITimeoutError as e:
+            raise LLMTimeoutError(str(e))
+
+        message = response.choices[0].message
+        usage = getattr(response, "usage", None)
+        return LLMResponse(
+            text=message.content or "",
+            provider=self.name,
+            model=model,
+            input_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            output_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            tool_calls=[
+                {"id": call.id, "name": call.function.name, "arguments": call.function.arguments or ""}
+                for call in message.tool_calls or []
+            ],
+        )
+
+    async def stream(self, model, messages, response, system=None, max_tokens=1024, temperature=0.7,
+                     tools=None):
+        import openai
+
+        kwargs = {"tools": tools, "tool_choice": "auto"} if tools else {}
+        calls: Dict[int, Dict[str, str]] = {}
+        try:
+            chunks = await self.client.chat.completions.create(
+                model=model,
+                messages=([{"role": "system", "content": system}] if system else []) + messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True},
+                **kwargs
+            )
+            async for chunk in chunks:
+                if chunk.usage is not None:
+                    response.input_tokens = chunk.usage.prompt_tokens or 0
+                    response.output_tokens = chunk.usage.completion_tokens or 0
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                # Function calls arrive as fragments keyed by index
+                for call in delta.tool_calls or []:
+                    entry = calls.setdefault(call.index, {"id": "", "name": "", "arguments": ""})
+                    if call.id:
+                        entry["id"] = call.id
+                    if call.function is not None:
+                        entry["name"] += call.function.name or ""
+                        entry["arguments"] += call.function.arguments or ""
+                if delta.content:
+                    yield delta.content
+        except openai.RateLimitError as e:
+            raise LLMRateLimitError(str(e), _retry_after(e))
+        except openai.APITimeoutError as e:
+            raise LLMTimeoutError(str(e))
+
+        response.tool_calls = [calls[index] for index in sorted(calls)]
+
+    async def aclose(self):
+        await self.client.close()
+
+
+class FakeLLMProvider(LLMProvider):
+    """
+    In-memory provider for load tests.
+
+    - latency: seconds each completion sleeps
+    - responder(model, messages, system, json_mode) -> text; by default
+      returns "{}" in JSON mode and an echo of the last message otherwise
+    - token_delay: seconds between streamed words (latency is the time to
+      the first one)
+    Tracks call count and the peak number of concurrent calls.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.2, responder: Optional[Callable[..., str]] = None,
+                 token_delay: float = 0.0):
+        self.latency = latency
+        self.responder = responder
+        self.token_delay = token_delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def complete(self, model, messages, system=None, max_tokens=1024, temperature=0.7,
+                       json_mode=False, max_retries=None, tools=None) -> LLMResponse:
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            text = self._respond(model, messages, system, json_mode)
+        finally:
+            self.in_flight -= 1
+
+        return LLMResponse(text=text, provider=self.name, model=model,
+                           input_tokens=self._prompt_chars(messages, system) // 4, output_tokens=len(text) // 4)
+
+    async def stream(self, model, messages, response, system=None, max_tokens=1024, temperature=0.7,
+                     tools=None):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            text = self._respond(model, messages, system, False)
+            words = text.split(" ")
+            for i, word in enumerate(words):
+                if i and self.token_delay:
+                    await asyncio.sleep(self.token_delay)
+                yield word if i == len(words) - 1 else word + " "
+        finally:
+            self.in_flight -= 1
+
+        response.input_tokens = self._prompt_chars(messages, system) // 4
+        response.output_tokens = len(text) // 4
+
+    def _respond(self, model, messages, system, json_mode) -> str:
+        if self.responder is not None:
+            return self.responder(model, messages, system, json_mode)
+        if json_mode:
+            return "{}"
+        return f"[fake {model}] {messages[-1]['content'][:200] if messages else ''}"
+
+    @staticmethod
+    def _prompt_chars(messages, system) -> int:
+        return len(system or "") + sum(len(m.get("content") or "") for m in messages)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+# ============================================================================
+# CLIENT
+# ============================================================================
+
+class _CallStats:
+    """Counters plus a rolling latency window for one (provider, purpose)"""
+
+    def __init__(self, window: int = 500):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.rate_limited = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.queue_waits: Deque[float] = deque(maxlen=window)
+        self.first_tokens: Deque[float] = deque(maxlen=window)
+
+    @staticmethod
+    def _percentile(samples: List[float], pct: float) -> Optional[float]:
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct))], 1)
+
+    def summary(self) -> Dict[str, Any]:
+        latencies, waits = list(self.latencies), list(self.queue_waits)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "rate_limited": self.rate_limited,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "latency_p50_ms": self._percentile(latencies, 0.5),
+            "latency_p95_ms": self._percentile(latencies, 0.95),
+            "queue_wait_p95_ms": self._percentile(waits, 0.95),
+            "first_token_p50_ms": self._percentile(list(self.first_tokens), 0.5),
+            "first_token_p95_ms": self._percentile(list(self.first_tokens), 0.95),
+        }
+
+
+class LLMClient:
+    """Routes completions to registered providers with timeouts, concurrency caps and metrics"""
+
+    def __init__(self, max_concurrency: Optional[int] = None, timeout_seconds: Optional[float] = None):
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.timeout_seconds = timeout_seconds or float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+        self.providers: Dict[str, LLMProvider] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[tuple, _CallStats] = {}
+        self._in_flight: Dict[str, int] = {}
+
+    def register(self, name: str, provider: LLMProvider):
+        self.providers[name] = provider
+        self._semaphores[name] = asyncio.Semaphore(self.max_concurrency)
+        self._in_flight[name] = 0
+
+    def available(self, name: str) -> bool:
+        return name in self.providers
+
+    async def complete(
+        self,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        *,
+        system: Optional[str] = None,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        json_mode: bool = False,
+        tools: Optional[List[Dict]] = None,
+        purpose: str = "default",
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+    ) -> LLMResponse:
+        """
+        Run one completion. Raises LLMError (LLMRateLimitError, LLMTimeoutError)
+        or the provider SDK's own exception for other API errors.
+        """
+        backend = self.providers.get(provider)
+        if backend is None:
+            raise LLMError(f"LLM provider '{provider}' is not configured")
+
+        stats = self._stats.setdefault((provider, purpose), _CallStats())
+        stats.calls += 1
+        queued = time.perf_counter()
+        async with self._semaphores[provider]:
+            started = time.perf_counter()
+            stats.queue_waits.append((started - queued) * 1000)
+            self._in_flight[provider] += 1
+            try:
+                response = await asyncio.wait_for(
+                    backend.complete(model, messages, system=system, max_tokens=max_tokens,
+                                     temperature=temperature, json_mode=json_mode, max_retries=max_retries,
+                                     tools=tools),
+                    timeout=timeout or self.timeout_seconds,
+                )
+            except (asyncio.TimeoutError, LLMTimeoutError) as e:
+                stats.timeouts += 1
+                raise LLMTimeoutError(f"{provider} {model} timed out after {timeout or self.timeout_seconds}s") from e
+            except LLMRateLimitError:
+                stats.rate_limited += 1
+                raise
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                self._in_flight[provider] -= 1
+
+        response.latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        stats.latencies.append(response.latency_ms)
+        stats.input_tokens += response.input_tokens
+        stats.output_tokens += response.output_tokens
+        return response
+
+    def stream(
+        self,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        *,
+        system: Optional[str] = None,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        tools: Optional[List[Dict]] = None,
+        purpose: str = "default",
+        timeout: Optional[float] = None,
+    ) -> "LLMStream":
+        """
+        Start a streamed completion. Iterate the result for text deltas; once
+        exhausted, `.response` holds the full text, usage and any tool calls.
+        `timeout` bounds the wait for each delta, not the whole stream.
+        """
+        backend = self.providers.get(provider)
+        if backend is None:
+            raise LLMError(f"LLM provider '{provider}' is not configured")
+        return LLMStream(self, provider, backend, model, messages, system=system, max_tokens=max_tokens,
+                         temperature=temperature, tools=tools, purpose=purpose,
+                         timeout=timeout or self.timeout_seconds)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "timeout_seconds": self.timeout_seconds,
+            "max_concurrency": self.max_concurrency,
+            "providers": {
+                name: {"backend": provider.name, "in_flight": self._in_flight.get(name, 0)}
+                for name, provider in self.providers.items()
+            },
+            "calls": {
+                f"{provider}:{purpose}": stats.summary()
+                for (provider, purpose), stats in sorted(self._stats.items())
+            },
+        }
+
+    async def aclose(self):
+        for provider in self.providers.values():
+            try:
+                await provider.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing LLM provider {provider.name}: {e}")
+
+
+class LLMStream:
+    """One streamed completion; holds its provider slot until exhausted or closed"""
+
+    def __init__(self, client: LLMClient, provider: str, backend: LLMProvider, model: str,
+                 messages: List[Dict[str, Any]], *, system, max_tokens, temperature, tools, purpose, timeout):
+        self.client = client
+        self.provider = provider
+        self.backend = backend
+        self.purpose = purpose
+        self.timeout = timeout
+        self.response = LLMResponse(text="", provider=provider, model=model)
+        self._args = dict(model=model, messages=messages, system=system, max_tokens=max_tokens,
+                          temperature=temperature, tools=tools)
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._run()
+
+    async def _run(self) -> AsyncIterator[str]:
+        client, provider = self.client, self.provider
+        stats = client._stats.setdefault((provider, self.purpose), _CallStats())
+        stats.calls += 1
+        parts: List[str] = []
+        queued = time.perf_counter()
+        async with client._semaphores[provider]:
+            started = time.perf_counter()
+            stats.queue_waits.append((started - queued) * 1000)
+            client._in_flight[provider] += 1
+            deltas = self.backend.stream(response=self.response, **self._args)
+            try:
+                while True:
+                    try:
+                        text = await asyncio.wait_for(deltas.__anext__(), timeout=self.timeout)
+                    except StopAsyncIteration:
+                        break
+                    if self.response.first_token_ms is None:
+                        self.response.first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+                        stats.first_tokens.append(self.response.first_token_ms)
+                    parts.append(text)
+                    yield text
+            except (asyncio.TimeoutError, LLMTimeoutError) as e:
+                stats.timeouts += 1
+                raise LLMTimeoutError(f"{provider} {self.response.model} stream stalled for {self.timeout}s") from e
+            except LLMRateLimitError:
+                stats.rate_limited += 1
+                raise
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                # Also runs when the consumer stops early (client disconnected),
+                # leaving the partial text on the response
+                await deltas.aclose()
+                client._in_flight[provider] -= 1
+                self.response.text = "".join(parts)
+
+        self.response.latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        stats.latencies.append(self.response.latency_ms)
+        stats.input_tokens += self.response.input_tokens
+        stats.output_tokens += self.response.output_tokens
+
+
+# Shared instance
+_llm_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    """Process-wide client; providers are registered from the environment on first use"""
+    global _llm_client
+    if _llm_client is None:
+        client = LLMClient()
+        if os.getenv("LLM_FAKE_PROVIDER", "false").lower() == "true":
+            fake = FakeLLMProvider(latency=float(os.getenv("LLM_FAKE_LATENCY_MS", "200")) / 1000)
+            client.register(ANTHROPIC, fake)
+            client.register(OPENAI, fake)
+            logger.warning("LLM_FAKE_PROVIDER enabled: all LLM calls return fake completions")
+        else:
+            if os.getenv("ANTHROPIC_API_KEY"):
+                client.register(ANTHROPIC, AnthropicProvider(os.getenv("ANTHROPIC_API_KEY"), client.timeout_seconds))
+            if os.getenv("OPENAI_API_KEY"):
+                client.register(OPENAI, OpenAIProvider(os.getenv("OPENAI_API_KEY"), client.timeout_seconds))
+        _llm_client = client
+    return _llm_client
@@ -3,7 +3,6 @@ AI Architecture Services
 Core orchestration and management services for the AI system
 """
 
-import os
 import json
 import uuid
 import asyncio
@@ -11,18 +10,14 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Callable, Union
 from sqlalchemy import text, Engine
 from sqlalchemy.orm import Session
-import openai
 
+from ai_providers.llm_client import OPENAI, get_llm_client
 from ai_models import (
     AgentConfig, ToolDefinition, AgentEvent, AgentMessage,
     AgentExecution, ExecutionStatus, ToolContext, ContextPacket,
     AgentPlan, AgentPlanStep, EventStatus, MessageType, Priority
 )
 
-# Initialize OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-
 # ============================================================================
 # DATABASE HELPER
 # ============================================================================
@@ -689,17 +684,17 @@ What action should you take?
     ) -> str:
         """Call LLM for agent reasoning"""
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": f"You are {agent.name}."},
-                    {"role": "user", "content": prompt}
-                ],
+            response = await get_llm_client().complete(
+                OPENAI,
+                "gpt-4",
+                [{"role": "user", "content": prompt}],
+                system=f"You are {agent.name}.",
                 temperature=0.7,
-                max_tokens=1000
+                max_tokens=1000,
+                purpose=f"agent:{agent.id}"
             )
 
-            return response.choices[0].message.content
+            return response.text
         except Exception as e:
             print(f"LLM call failed: {e}")
             return f"Error calling LLM: {e}"
@@ -0,0 +1,46 @@
+"""
+Backfill Loan -> Lead Links
+Sets loans.lead_id for existing loans by matching borrower names to the
+loan officer's leads, so scorecard referral attribution can use a SQL join
+"""
+import os
+import sys
+
+# Get database URL from environment
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./mortgage_crm.db")
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+def run_backfill(user_id=None):
+    """Link unlinked loans for one user (or all users)"""
+    try:
+        # Import the backfill job from main (uses the same DATABASE_URL)
+        from main import SessionLocal, backfill_loan_lead_links
+
+        db = SessionLocal()
+
+        print("=" * 70)
+        print("BACKFILLING LOAN -> LEAD LINKS")
+        print("=" * 70)
+
+        result = backfill_loan_lead_links(db, user_id)
+
+        print("\n📊 RESULTS:")
+        print(f"   Users scanned: {result['users']}")
+        print(f"   Unlinked loans scanned: {result['loans_scanned']}")
+        print(f"   Loans linked: {result['loans_linked']}")
+        print(f"{'='*70}\n")
+
+        db.close()
+        return True
+
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    user_arg = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    success = run_backfill(user_arg)
+    sys.exit(0 if success else 1)
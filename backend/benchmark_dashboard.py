@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Dashboard Query Benchmark
+Compares the legacy one-query-per-counter dashboard against the aggregated
+counters (aggregate_dashboard_counters) on a seeded dataset.
+
+Reports database round trips and latency for each approach.
+
+Run with:
+    python backend/benchmark_dashboard.py                      # SQLite only
+    BENCHMARK_POSTGRES_URL=postgresql://... python backend/benchmark_dashboard.py
+
+Options (env):
+    BENCHMARK_LEADS  - leads to seed (default 20000)
+    BENCHMARK_LOANS  - loans to seed (default 5000)
+    BENCHMARK_RUNS   - timed iterations per approach (default 20)
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+import statistics
+from datetime import date, datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "benchmark_dashboard.db"))
+
+from sqlalchemy import create_engine, event, func, extract
+from sqlalchemy.orm import sessionmaker
+
+from main import (
+    Base, User, Lead, Loan, LeadStage, LoanStage,
+    aggregate_dashboard_counters
+)
+
+LEADS = int(os.getenv("BENCHMARK_LEADS", "20000"))
+LOANS = int(os.getenv("BENCHMARK_LOANS", "5000"))
+RUNS = int(os.getenv("BENCHMARK_RUNS", "20"))
+
+
+def seed(session):
+    """Seed one loan officer with a realistic mix of leads and loans"""
+    random.seed(42)
+    user = User(email="benchmark@example.com", hashed_password="x", full_name="Benchmark LO")
+    session.add(user)
+    session.commit()
+
+    now = datetime.now(timezone.utc)
+    lead_stages = list(LeadStage)
+    loan_stages = list(LoanStage)
+
+    session.bulk_insert_mappings(Lead, [{
+        "name": f"Borrower {i}",
+        "email": f"borrower{i}@example.com",
+        "stage": random.choice(lead_stages),
+        "ai_score": random.randint(20, 100),
+        "owner_id": user.id,
+        "created_at": now - timedelta(days=random.randint(0, 720)),
+    } for i in range(LEADS)])
+
+    session.bulk_insert_mappings(Loan, [{
+        "loan_number": f"BENCH-{i:07d}",
+        "borrower_name": f"Borrower {i}",
+        "stage": random.choice(loan_stages),
+        "amount": random.randint(150, 900) * 1000,
+        "days_in_stage": random.randint(0, 30),
+        "funded_date": now - timedelta(days=random.randint(0, 720)),
+        "loan_officer_id": user.id,
+    } for i in range(LOANS)])
+
+    session.commit()
+    return user.id
+
+
+def legacy_dashboard_counters(db, user_id):
+    """The pre-aggregation query pattern: one round trip per counter"""
+    today = date.today()
+    start_of_month = today.replace(day=1)
+    start_of_week = today - timedelta(days=today.weekday())
+    now = datetime.now(timezone.utc)
+
+    def loan_count(*criteria):
+        return db.query(func.count(Loan.id)).filter(Loan.loan_officer_id == user_id, *criteria).scalar() or 0
+
+    def lead_count(*criteria):
+        return db.query(func.count(Lead.id)).filter(Lead.owner_id == user_id, *criteria).scalar() or 0
+
+    def loans(*criteria):
+        return db.query(Loan).filter(Loan.loan_officer_id == user_id, *criteria).all()
+
+    funded = Loan.stage == LoanStage.FUNDED
+    return {
+        "annual_funded": loan_count(funded, extract('year', Loan.funded_date) == today.year),
+        "monthly_funded": loan_count(funded, Loan.funded_date >= start_of_month),
+        "weekly_funded": loan_count(funded, Loan.funded_date >= start_of_week),
+        "daily_funded": loan_count(funded, Loan.funded_date == today),
+        "leads_new": lead_count(Lead.stage == LeadStage.NEW),
+        "leads_uncontacted": lead_count(Lead.stage == LeadStage.NEW, Lead.created_at < now - timedelta(hours=24)),
+        "leads_preapproved": lead_count(Lead.stage == LeadStage.PRE_APPROVED),
+        "processing": len(loans(Loan.stage == LoanStage.PROCESSING)),
+        "underwriting": len(loans(Loan.stage == LoanStage.UW_RECEIVED)),
+        "ctc": len(loans(Loan.stage == LoanStage.CTC)),
+        "monthly_funded_rows": len(loans(funded, Loan.funded_date >= start_of_month)),
+        "leads_new_today": lead_count(Lead.created_at >= now.replace(hour=0, minute=0, second=0)),
+        "leads_hot": lead_count(Lead.ai_score >= 80, Lead.stage.in_([LeadStage.NEW, LeadStage.ATTEMPTED_CONTACT])),
+        "leads_total": lead_count(),
+        "applications": loan_count(),
+        "leads_high_intent": lead_count(Lead.ai_score >= 75, Lead.stage == LeadStage.ATTEMPTED_CONTACT),
+    }
+
+
+def measure(label, session_factory, engine, fn, user_id):
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        timings = []
+        for _ in range(RUNS):
+            db = session_factory()
+            try:
+                start = time.perf_counter()
+                fn(db, user_id)
+                timings.append((time.perf_counter() - start) * 1000)
+            finally:
+                db.close()
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    round_trips = len(statements) // RUNS
+    print(f"   {label:<12} round trips: {round_trips:>3}   "
+          f"p50: {statistics.median(timings):8.2f} ms   max: {max(timings):8.2f} ms")
+    return round_trips
+
+
+def run_backend(name, url):
+    print(f"\n{'=' * 70}\n{name}: {LEADS} leads, {LOANS} loans, {RUNS} runs\n{'=' * 70}")
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    db = session_factory()
+    user_id = seed(db)
+    db.close()
+
+    measure("legacy", session_factory, engine, legacy_dashboard_counters, user_id)
+    measure("aggregated", session_factory, engine, aggregate_dashboard_counters, user_id)
+
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def main():
+    sqlite_path = os.path.join(tempfile.gettempdir(), "benchmark_dashboard.db")
+    run_backend("SQLite", f"sqlite:///{sqlite_path}")
+
+    postgres_url = os.getenv("BENCHMARK_POSTGRES_URL")
+    if postgres_url:
+        if postgres_url.startswith("postgres://"):
+            postgres_url = postgres_url.replace("postgres://", "postgresql://", 1)
+        run_backend("PostgreSQL", postgres_url)
+    else:
+        print("\nℹ️  Set BENCHMARK_POSTGRES_URL to also benchmark against PostgreSQL")
+
+
+if __name__ == "__main__":
+    main()
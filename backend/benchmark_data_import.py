@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Data Import Benchmark
+Times the bulk import engine (services/data_import.py) on large generated
+files: analyze, a first import (all inserts), and a re-import of the same
+file (all upserts), for leads and loans from CSV and loans from XLSX.
+
+For comparison, the legacy path - one ORM object and one commit per row, as
+populate_portfolio.py does through POST /api/v1/loans/ - is timed on a
+sample and extrapolated.
+
+Run with:
+    python backend/benchmark_data_import.py
+    BENCHMARK_ROWS=250000 BENCHMARK_XLSX_ROWS=50000 python backend/benchmark_data_import.py
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "benchmark_import.db"))
+
+from openpyxl import Workbook
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from main import Base, User, Loan, data_importer
+
+ROWS = int(os.getenv("BENCHMARK_ROWS", "100000"))
+XLSX_ROWS = int(os.getenv("BENCHMARK_XLSX_ROWS", "20000"))
+LEGACY_SAMPLE = 1000
+STAGES = ["Disclosed", "Processing", "Approved", "CTC", "Funded"]
+LOAN_HEADERS = ["Loan Number", "Borrower Name", "Loan Amount", "Interest Rate", "Term", "Loan Type",
+                "Status", "Closing Date", "Funded Date", "Processor"]
+
+
+def lead_csv(rows: int) -> bytes:
+    random.seed(rows)
+    lines = ["First Name,Last Name,Email,Phone,Credit Score,Loan Amount,Annual Income,City,State,Zip Code,Notes"]
+    for i in range(rows):
+        lines.append(f"Pat{i},Lee{i},pat{i}@example.com,555-{i % 10000:04d},{random.randint(580, 820)},"
+                     f"\"${random.randint(150, 900) * 1000:,}\",{random.randint(40, 300) * 1000},Austin,TX,787{i % 100:02d},"
+                     f"imported row {i}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def loan_rows(rows: int):
+    random.seed(rows + 1)
+    start = datetime(2024, 1, 1)
+    for i in range(rows):
+        stage = random.choice(STAGES)
+        closing = start + timedelta(days=random.randint(0, 700))
+        yield [f"BM-{i:07d}", f"Borrower {i}", random.randint(150, 900) * 1000, f"{random.uniform(5.5, 7.5):.3f}%",
+               random.choice([180, 360]), random.choice(["Conventional", "FHA", "VA"]), stage,
+               closing.strftime("%m/%d/%Y"), closing.strftime("%Y-%m-%d") if stage == "Funded" else "",
+               random.choice(["Sarah", "Mike", "Jennifer"])]
+
+
+def loan_csv(rows: int) -> bytes:
+    lines = [",".join(LOAN_HEADERS)] + [",".join(str(cell) for cell in row) for row in loan_rows(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def loan_xlsx(rows: int) -> bytes:
+    # A regular workbook, so the file has shared strings and a dimension like Excel's
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(LOAN_HEADERS)
+    for row in loan_rows(rows):
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def import_file(session, user_id, filename, data, destination):
+    source = io.BytesIO(data)
+    start = time.perf_counter()
+    analysis = data_importer.analyze(source, filename)
+    analyzed = time.perf_counter() - start
+    plan = data_importer.plan(filename, analysis["headers"], destination, analysis["mappings"][destination])
+    start = time.perf_counter()
+    for progress in data_importer.run(session, plan, source, user_id):
+        pass
+    return analyzed, time.perf_counter() - start, progress
+
+
+def legacy_loan_inserts(session, user_id, rows: int) -> float:
+    """One Loan object and one commit per row"""
+    start = time.perf_counter()
+    for i, row in enumerate(loan_rows(rows)):
+        session.add(Loan(loan_number=f"LEGACY-{i:07d}", borrower_name=row[1], amount=row[2],
+                         rate=float(row[3].rstrip("%")), term=row[4], loan_type=row[5], loan_officer_id=user_id))
+        session.commit()
+    return time.perf_counter() - start
+
+
+def main():
+    db_path = os.path.join(tempfile.gettempdir(), "benchmark_data_import.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    user = User(email="import-benchmark@example.com", hashed_password="x", full_name="Benchmark LO")
+    session.add(user)
+    session.commit()
+
+    print(f"batch size {data_importer.batch_size}\n")
+    print(f"{'file':<22} {'rows':>8} {'analyze s':>10} {'insert s':>10} {'upsert s':>10} {'rows/s':>10}")
+    cases = [
+        ("leads.csv", lead_csv(ROWS), "leads", ROWS),
+        ("loans.csv", loan_csv(ROWS), "loans", ROWS),
+        ("loans.xlsx", loan_xlsx(XLSX_ROWS), "loans", XLSX_ROWS),
+    ]
+    for filename, data, destination, rows in cases:
+        if filename.endswith(".xlsx"):
+            session.query(Loan).delete()
+            session.commit()
+        analyzed, inserted, first = import_file(session, user.id, filename, data, destination)
+        _, upserted, second = import_file(session, user.id, filename, data, destination)
+        assert first["inserted"] == rows and second["updated"] == rows, (first, second)
+        print(f"{filename:<22} {rows:>8} {analyzed:>10.2f} {inserted:>10.2f} {upserted:>10.2f} {rows / inserted:>10.0f}")
+
+    legacy = legacy_loan_inserts(session, user.id, LEGACY_SAMPLE)
+    print(f"\nlegacy per-row commits: {LEGACY_SAMPLE / legacy:.0f} rows/s "
+          f"(~{legacy * ROWS / LEGACY_SAMPLE:.0f}s for {ROWS} rows)")
+
+    session.close()
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+    os.remove(db_path)
+
+
+if __name__ == "__main__":
+    main()
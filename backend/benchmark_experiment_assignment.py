@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Experiment Assignment Benchmark
+Assignments per second through ExperimentService.get_variant_for_user for:
+- the database path (EXPERIMENT_CACHE_TTL_SECONDS=0): experiment, assignment
+  and variant queries per call, insert + commit for new users
+- the cached path: in-process experiment tables, batched assignment inserts
+  (flush time included)
+
+Each simulated user sends several chat messages, so the first call is a new
+assignment and the rest are repeats. Also measures record_result throughput.
+
+Run with:
+    python backend/benchmark_experiment_assignment.py
+
+Options (env):
+    BENCHMARK_USERS      - distinct users (default 2000)
+    BENCHMARK_MESSAGES   - messages per user (default 5)
+    DATABASE_URL         - database to benchmark against (default: temporary SQLite file)
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "benchmark_experiment_assignment.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+
+from sqlalchemy import Column, Integer, Table
+
+from database import Base, engine, SessionLocal
+
+# ab_testing_models reference users.id, which lives in main's metadata
+if "users" not in Base.metadata.tables:
+    Table("users", Base.metadata, Column("id", Integer, primary_key=True))
+
+from ab_testing_models import ExperimentType
+from ab_testing.assignment_cache import ExperimentCache
+from ab_testing.experiment_service import ExperimentService
+
+USERS = int(os.getenv("BENCHMARK_USERS", "2000"))
+MESSAGES = int(os.getenv("BENCHMARK_MESSAGES", "5"))
+VARIANTS = [
+    {"name": "Control", "is_control": True, "traffic_allocation": 50.0, "config": {"prompt": "v1"}},
+    {"name": "Treatment", "traffic_allocation": 50.0, "config": {"prompt": "v2"}},
+]
+
+
+def run(label: str, cache: ExperimentCache, experiment_name: str):
+    db = SessionLocal()
+    service = ExperimentService(db, cache)
+    try:
+        started = time.perf_counter()
+        for _ in range(MESSAGES):
+            for user_id in range(1, USERS + 1):
+                service.get_variant_for_user(experiment_name, user_id=user_id)
+        cache.flush(db)
+        assign_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for user_id in range(1, USERS + 1):
+            service.record_result(experiment_name, "resolution_rate", 1.0, user_id=user_id)
+        record_seconds = time.perf_counter() - started
+    finally:
+        db.close()
+
+    calls = USERS * MESSAGES
+    print(f"{label:<28}{calls / assign_seconds:>16,.0f}{assign_seconds / calls * 1e6:>14.1f}{USERS / record_seconds:>16,.0f}")
+
+
+def main():
+    print("=" * 80)
+    print(f"EXPERIMENT ASSIGNMENT BENCHMARK ({USERS} users x {MESSAGES} messages, {engine.url.get_backend_name()})")
+    print("=" * 80)
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        setup = ExperimentService(db, ExperimentCache(ttl_seconds=0))
+        for name in ("Benchmark database path", "Benchmark cached path"):
+            experiment = setup.create_experiment(name, "benchmark", ExperimentType.PROMPT, "resolution_rate", VARIANTS)
+            setup.start_experiment(experiment.id)
+    finally:
+        db.close()
+
+    try:
+        print(f"\n{'path':<28}{'assignments/s':>16}{'us/call':>14}{'results/s':>16}")
+        run("database (TTL 0)", ExperimentCache(ttl_seconds=0), "Benchmark database path")
+        run("cached", ExperimentCache(ttl_seconds=60), "Benchmark cached path")
+    finally:
+        engine.dispose()
+        if os.environ["DATABASE_URL"] == f"sqlite:///{DB_PATH}":
+            os.remove(DB_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Lead Scoring Benchmark
+Rescoring a large leads table (services/lead_scoring.py):
+- per-object: load every Lead, calculate_lead_score() in Python, one commit
+  (what a naive rescoring job would do)
+- bulk: LeadScorer full run, SQL CASE UPDATE per id range, stale rows only
+- incremental: LeadScorer run after 1% of leads changed, and with nothing changed
+
+Run with:
+    python backend/benchmark_lead_scoring.py
+
+Options (env):
+    BENCHMARK_LEADS   - leads in the table (default 100000)
+    DATABASE_URL      - database to benchmark against (default: temporary SQLite file)
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "benchmark_lead_scoring.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from main import Base, engine, User, Lead, calculate_lead_score
+from services.lead_scoring import LeadScorer, sentiment_for
+
+LEADS = int(os.getenv("BENCHMARK_LEADS", "100000"))
+# Last edit time given to every lead, outside the incremental window
+EDITED_AT = datetime.now(timezone.utc) - timedelta(days=1)
+# Without the app's flush hooks, so the per-object path only pays for the ORM itself
+Session = sessionmaker(bind=engine)
+
+
+def lead_rows(owner_id: int):
+    random.seed(LEADS)
+    for i in range(LEADS):
+        yield {
+            "name": f"Lead {i}",
+            "owner_id": owner_id,
+            "email": f"lead{i}@example.com" if random.random() < 0.9 else None,
+            "phone": f"555-{i % 10000:04d}" if random.random() < 0.8 else None,
+            "credit_score": random.choice([None, random.randint(540, 820)]),
+            "preapproval_amount": random.choice([None, 0.0, random.randint(150, 900) * 1000.0]),
+            "debt_to_income": random.choice([None, round(random.uniform(0.1, 0.6), 3)]),
+            "updated_at": EDITED_AT,
+        }
+
+
+def reset_scores(db):
+    table = Lead.__table__
+    db.execute(table.update().values(ai_score=50, sentiment="neutral", updated_at=EDITED_AT))
+    db.commit()
+
+
+def per_object(db) -> float:
+    start = time.perf_counter()
+    for lead in db.query(Lead).yield_per(5000):
+        lead.ai_score = calculate_lead_score(lead)
+        lead.sentiment = sentiment_for(lead.ai_score)
+    db.commit()
+    return time.perf_counter() - start
+
+
+def timed_run(scorer: LeadScorer, db, **kwargs):
+    start = time.perf_counter()
+    result = scorer.run(db, **kwargs)
+    return time.perf_counter() - start, result["rescored"]
+
+
+def main():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    db = Session()
+    user = User(email="scoring-benchmark@example.com", hashed_password="x", full_name="Benchmark LO")
+    db.add(user)
+    db.commit()
+    db.execute(Lead.__table__.insert(), list(lead_rows(user.id)))
+    db.commit()
+
+    print(f"{LEADS} leads\n")
+    print(f"{'path':<34} {'seconds':>9} {'rescored':>10} {'leads/s':>10}")
+
+    def report(label, seconds, rescored):
+        print(f"{label:<34} {seconds:>9.3f} {rescored:>10} {LEADS / seconds:>10.0f}")
+
+    reset_scores(db)
+    report("per-object ORM + commit", per_object(db), LEADS)
+    db.expunge_all()
+
+    reset_scores(db)
+    scorer = LeadScorer(Lead)
+    report("bulk SQL (full run)", *timed_run(scorer, db))
+    report("bulk SQL (full run, all current)", *timed_run(scorer, db, full=True))
+
+    table = Lead.__table__
+    changed = [row.id for row in db.execute(select(table.c.id).order_by(table.c.id)).all()[::100]]
+    db.execute(table.update().where(table.c.id.in_(changed)).values(
+        credit_score=500, updated_at=datetime.now(timezone.utc)))
+    db.commit()
+    report(f"incremental ({len(changed)} changed)", *timed_run(scorer, db))
+    report("incremental (nothing changed)", *timed_run(scorer, db))
+
+    db.close()
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter Benchmark
+Measures RateLimitMiddleware dispatch overhead and counter memory for:
+- the legacy per-IP list of (timestamp, path) tuples
+- the in-process sliding-window backend
+- the Redis sliding-window backend (when BENCHMARK_REDIS=1)
+
+Each simulated client sends a steady stream of requests; dispatch is timed
+with a no-op downstream app so only the limiter is measured.
+
+Run with:
+    python backend/benchmark_rate_limiter.py
+    BENCHMARK_REDIS=1 REDIS_HOST=localhost python backend/benchmark_rate_limiter.py
+
+Options (env):
+    BENCHMARK_CLIENTS   - distinct client IPs (default 200)
+    BENCHMARK_REQUESTS  - requests per client (default 500)
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tracemalloc
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from security_middleware import (
+    RateLimitMiddleware, InMemoryRateLimitBackend, RedisRateLimitBackend, RouteGroup, RateLimit
+)
+
+CLIENTS = int(os.getenv("BENCHMARK_CLIENTS", "200"))
+REQUESTS = int(os.getenv("BENCHMARK_REQUESTS", "500"))
+
+ROUTE_GROUPS = [
+    RouteGroup("auth", ("/token",), (RateLimit(100000, 60), RateLimit(1000000, 3600))),
+    RouteGroup("ai", ("/api/v1/ai/",), (RateLimit(100000, 60), RateLimit(1000000, 3600))),
+]
+
+
+class LegacyRateLimiter:
+    """The previous list-scanning limiter, kept here for comparison"""
+
+    def __init__(self, requests_per_minute: int, requests_per_hour: int):
+        self.requests_per_minute = requests_per_minute
+        self.requests_per_hour = requests_per_hour
+        self.request_history = {}
+
+    async def dispatch(self, request: Request, call_next):
+        client_ip = request.headers.get("X-Forwarded-For")
+        current_time = time.time()
+        history = [(ts, path) for ts, path in self.request_history.get(client_ip, []) if current_time - ts < 3600]
+        self.request_history[client_ip] = history
+        if sum(1 for ts, _ in history if ts > current_time - 60) >= self.requests_per_minute:
+            return Response(status_code=429)
+        if sum(1 for ts, _ in history if ts > current_time - 3600) >= self.requests_per_hour:
+            return Response(status_code=429)
+        history.append((current_time, str(request.url.path)))
+        return await call_next(request)
+
+
+def make_request(ip: str, path: str) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": b"",
+        "headers": [(b"x-forwarded-for", ip.encode())],
+        "server": ("testserver", 80),
+        "scheme": "http",
+    })
+
+
+async def call_next(request):
+    return Response("ok")
+
+
+async def run(label: str, limiter) -> dict:
+    paths = ["/api/v1/leads", "/api/v1/loans", "/api/v1/ai/chat", "/api/v1/dashboard"]
+    requests = [make_request(f"10.0.{c // 250}.{c % 250}", paths[(c + r) % len(paths)])
+                for r in range(REQUESTS) for c in range(CLIENTS)]
+
+    tracemalloc.start()
+    samples = []
+    rejected = 0
+    for request in requests:
+        started = time.perf_counter()
+        response = await limiter.dispatch(request, call_next)
+        samples.append((time.perf_counter() - started) * 1e6)
+        rejected += response.status_code == 429
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples.sort()
+    return {
+        "label": label,
+        "p50_us": round(statistics.median(samples), 1),
+        "p95_us": round(samples[int(len(samples) * 0.95)], 1),
+        "rejected": rejected,
+        "peak_kb": round(peak / 1024),
+    }
+
+
+async def main():
+    print("=" * 80)
+    print(f"RATE LIMITER BENCHMARK ({CLIENTS} clients x {REQUESTS} requests)")
+    print("=" * 80)
+
+    # Generous limits so every request walks the full history / counter path
+    limiters = [
+        ("legacy list", LegacyRateLimiter(100000, 1000000)),
+        ("sliding window (memory)", RateLimitMiddleware(
+            None, requests_per_minute=100000, requests_per_hour=1000000,
+            route_groups=ROUTE_GROUPS, backend=InMemoryRateLimitBackend())),
+    ]
+    if os.getenv("BENCHMARK_REDIS") == "1":
+        from services.redis_cache_service import RedisCacheService
+        limiters.append(("sliding window (redis)", RateLimitMiddleware(
+            None, requests_per_minute=100000, requests_per_hour=1000000,
+            route_groups=ROUTE_GROUPS, backend=RedisRateLimitBackend(RedisCacheService()))))
+
+    print(f"\n{'limiter':<26}{'p50 µs':>10}{'p95 µs':>10}{'rejected':>10}{'peak KB':>10}")
+    for label, limiter in limiters:
+        result = await run(label, limiter)
+        print(f"{result['label']:<26}{result['p50_us']:>10}{result['p95_us']:>10}{result['rejected']:>10}{result['peak_kb']:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
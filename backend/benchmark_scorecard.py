@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Scorecard Benchmark
+Times /api/v1/analytics/scorecard as the lead count grows, alongside the
+legacy per-lead name scan used for referral-source attribution.
+
+The endpoint reads daily KPI rollups plus one grouped lead/loan join, so its
+latency should stay roughly flat while the legacy scan grows with
+leads × funded loans.
+
+Run with:
+    python backend/benchmark_scorecard.py
+    BENCHMARK_SIZES=1000,10000,50000 python backend/benchmark_scorecard.py
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "benchmark_scorecard.db"))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from main import (
+    Base, User, Lead, Loan, LeadStage, LoanStage,
+    get_scorecard_metrics, rebuild_kpi_rollups, backfill_loan_lead_links
+)
+
+SIZES = [int(s) for s in os.getenv("BENCHMARK_SIZES", "1000,5000,20000").split(",")]
+FUNDED_RATIO = 0.25
+SOURCES = ["Website", "Zillow", "Referral - Realtor", "Referral - Past Client", "Open House"]
+
+
+def seed(session, lead_count):
+    random.seed(lead_count)
+    user = User(email=f"scorecard{lead_count}@example.com", hashed_password="x", full_name="Benchmark LO")
+    session.add(user)
+    session.commit()
+
+    now = datetime.now(timezone.utc)
+    start_of_year = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    year_span = max((now - start_of_year).days, 1)
+
+    session.bulk_insert_mappings(Lead, [{
+        "name": f"Borrower {i}",
+        "stage": random.choice(list(LeadStage)),
+        "source": random.choice(SOURCES),
+        "owner_id": user.id,
+        "created_at": start_of_year + timedelta(days=random.randint(0, year_span - 1)),
+    } for i in range(lead_count)])
+
+    funded = int(lead_count * FUNDED_RATIO)
+    session.bulk_insert_mappings(Loan, [{
+        "loan_number": f"SC-{lead_count}-{i:07d}",
+        "borrower_name": f"Borrower {i}",
+        "stage": LoanStage.FUNDED,
+        "loan_type": random.choice(["Conventional", "FHA", "VA"]),
+        "amount": random.randint(150, 900) * 1000,
+        "funded_date": now - timedelta(days=random.randint(0, year_span - 1)),
+        "loan_officer_id": user.id,
+    } for i in range(funded)])
+    session.commit()
+
+    rebuild_kpi_rollups(session, user.id)
+    backfill_loan_lead_links(session, user.id)
+    return user
+
+
+def legacy_referral_attribution(session, user_id):
+    """The pre-linkage O(leads × funded loans) attribution loop"""
+    year = datetime.now().year
+    leads = [l for l in session.query(Lead).filter(Lead.owner_id == user_id).all()
+             if l.created_at and l.created_at.year == year]
+    funded_loans = session.query(Loan).filter(
+        Loan.loan_officer_id == user_id, Loan.stage == LoanStage.FUNDED
+    ).all()
+
+    volume = {}
+    for lead in leads:
+        lead_loan = next((l for l in funded_loans if l.borrower_name == lead.name), None)
+        if lead_loan and lead_loan.amount:
+            volume[lead.source] = volume.get(lead.source, 0) + lead_loan.amount
+    return volume
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    db_path = os.path.join(tempfile.gettempdir(), "benchmark_scorecard.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    print(f"{'leads':>8} {'endpoint ms':>14} {'legacy scan ms':>16}")
+    for size in SIZES:
+        session = session_factory()
+        user = seed(session, size)
+
+        endpoint_ms = min(
+            timed(lambda: asyncio.run(get_scorecard_metrics(db=session, current_user=user)))
+            for _ in range(5)
+        )
+        legacy_ms = timed(lambda: legacy_referral_attribution(session, user.id))
+        print(f"{size:>8} {endpoint_ms:>14.2f} {legacy_ms:>16.2f}")
+        session.close()
+
+    Base.metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main()
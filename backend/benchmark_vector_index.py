@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Vector Index Benchmark
+Recall@k and query latency of the local vector store against brute force:
+- brute force: NumPy dot product over an in-RAM matrix (ground truth)
+- local store, exact search over the memory-mapped namespace
+- local store, HNSW search at several beam widths (ef)
+- the pure-Python in-memory store (small namespaces only)
+Each is measured unfiltered and with a lead_id filter matching ~10% of rows.
+
+Vectors are clustered (like conversations about the same borrowers) and
+queries are perturbed copies of stored vectors.
+
+Run with:
+    python backend/benchmark_vector_index.py
+
+Options (env):
+    BENCHMARK_VECTORS   - vectors in the namespace (default 10000)
+    BENCHMARK_DIM       - dimension (default 256; 1536 matches OpenAI embeddings)
+    BENCHMARK_QUERIES   - queries per mode (default 200)
+    BENCHMARK_TOP_K     - k for recall@k (default 10)
+    BENCHMARK_EF        - comma-separated HNSW beam widths (default 64,128,256)
+"""
+
+import os
+import sys
+import time
+import asyncio
+import shutil
+import tempfile
+import statistics
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from integrations.local_vector_store import LocalVectorStore
+from integrations.vector_store import InMemoryVectorStore
+
+VECTORS = int(os.getenv("BENCHMARK_VECTORS", "10000"))
+DIM = int(os.getenv("BENCHMARK_DIM", "256"))
+QUERIES = int(os.getenv("BENCHMARK_QUERIES", "200"))
+TOP_K = int(os.getenv("BENCHMARK_TOP_K", "10"))
+EF = [int(ef) for ef in os.getenv("BENCHMARK_EF", "64,128,256").split(",")]
+LEADS = 10
+NAMESPACE = "user_1"
+
+
+def make_data(rng: np.random.Generator):
+    centers = rng.normal(size=(VECTORS // 50 + 1, DIM)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), VECTORS)] + 0.35 * rng.normal(size=(VECTORS, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    leads = rng.integers(0, LEADS, VECTORS)
+    queries = vectors[rng.integers(0, VECTORS, QUERIES)] + 0.1 * rng.normal(size=(QUERIES, DIM)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors, leads, queries
+
+
+def brute_force(vectors, leads, query, lead_id=None):
+    if lead_id is None:
+        return np.argsort(-(vectors @ query))[:TOP_K].tolist()
+    rows = np.flatnonzero(leads == lead_id)
+    sims = vectors[rows] @ query
+    return [int(rows[i]) for i in np.argsort(-sims)[:TOP_K]]
+
+
+def measure(search, truth, queries, lead_ids):
+    latencies, recalls = [], []
+    for query, lead_id, expected in zip(queries, lead_ids, truth):
+        started = time.perf_counter()
+        found = search(query, lead_id)
+        latencies.append((time.perf_counter() - started) * 1000)
+        recalls.append(len(set(found) & set(expected)) / len(expected))
+    latencies.sort()
+    return {
+        "recall": round(statistics.mean(recalls), 3),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)], 3),
+    }
+
+
+async def main():
+    print("=" * 80)
+    print(f"VECTOR INDEX BENCHMARK ({VECTORS} vectors x {DIM} dims, {QUERIES} queries, recall@{TOP_K})")
+    print("=" * 80)
+
+    rng = np.random.default_rng(7)
+    vectors, leads, queries = make_data(rng)
+    path = tempfile.mkdtemp(prefix="vector_index_")
+    records = [(f"conv_{i}", vectors[i].tolist(), {"lead_id": int(leads[i])}) for i in range(VECTORS)]
+
+    try:
+        exact = LocalVectorStore(os.path.join(path, "exact"), search="exact")
+        started = time.perf_counter()
+        for start in range(0, VECTORS, 500):
+            await exact.upsert(NAMESPACE, records[start:start + 500])
+        print(f"\nLocal store write: {VECTORS / (time.perf_counter() - started):,.0f} vectors/s")
+
+        hnsw = LocalVectorStore(os.path.join(path, "exact"), search="hnsw")
+        started = time.perf_counter()
+        await hnsw.build_index(NAMESPACE)
+        print(f"HNSW build (reload from disk + graph): {time.perf_counter() - started:.1f}s")
+
+        def local(store, ef=None):
+            def search(q, lead):
+                if ef is not None:
+                    store.hnsw_ef = ef
+                return [row for _, row in store.search_rows(
+                    NAMESPACE, q, TOP_K, {"lead_id": lead} if lead is not None else None)]
+            return search
+
+        stores = [
+            ("brute force (RAM)", lambda q, lead: brute_force(vectors, leads, q, lead)),
+            ("local exact (mmap)", local(exact)),
+        ] + [(f"local hnsw ef={ef}", local(hnsw, ef)) for ef in EF]
+        if VECTORS <= 20000:
+            memory = InMemoryVectorStore()
+            await memory.upsert(NAMESPACE, records)
+            ids = {f"conv_{i}": i for i in range(VECTORS)}
+            stores.append(("in-memory (pure Python)", None))
+
+        for label, lead_ids in (("unfiltered", [None] * QUERIES),
+                                ("lead_id filter", rng.integers(0, LEADS, QUERIES).tolist())):
+            truth = [brute_force(vectors, leads, q, lead) for q, lead in zip(queries, lead_ids)]
+            print(f"\n{label}")
+            print(f"{'backend':<26}{'recall':>10}{'p50 ms':>10}{'p95 ms':>10}")
+            for name, search in stores:
+                if search is None:
+                    # Pure-Python store is async and slow; sample a tenth of the queries
+                    sample = slice(0, max(1, QUERIES // 10))
+                    results = []
+                    for q, lead in zip(queries[sample], lead_ids[sample]):
+                        started = time.perf_counter()
+                        matches = await memory.query(NAMESPACE, q.tolist(), TOP_K,
+                                                     {"lead_id": lead} if lead is not None else None)
+                        results.append(((time.perf_counter() - started) * 1000, [ids[m.id] for m in matches]))
+                    latencies = sorted(r[0] for r in results)
+                    recall = statistics.mean(len(set(found) & set(expected)) / len(expected)
+                                             for (_, found), expected in zip(results, truth[sample]))
+                    result = {"recall": round(recall, 3), "p50_ms": round(statistics.median(latencies), 3),
+                              "p95_ms": round(latencies[int(len(latencies) * 0.95)], 3)}
+                else:
+                    result = measure(search, truth, queries, lead_ids)
+                print(f"{name:<26}{result['recall']:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}")
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,167 @@
+"""
+Embeddings
+Async text embedding providers plus a content-hash cache for vector memory
+
+- OpenAIEmbedder: AsyncOpenAI embeddings, many texts per request
+- HashingEmbedder: deterministic feature-hashing embedder with no network,
+  for tests, benchmarks and local runs without an OpenAI key
+- CachedEmbedder: LRU cache keyed by SHA-256 of (model, text); repeated
+  texts (retries, identical queries, re-stored conversations) skip the API,
+  and duplicate texts within one batch are embedded once
+
+Configuration (env):
+    EMBEDDING_PROVIDER         - "openai" (default when OPENAI_API_KEY is set) or "hashing"
+    EMBEDDING_MODEL            - OpenAI model (default text-embedding-3-small)
+    EMBEDDING_CACHE_ENTRIES    - cached embeddings per process (default 5000, 0 disables)
+"""
+
+import os
+import re
+import math
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# text-embedding-3-small dimension
+OPENAI_EMBEDDING_DIMENSION = 1536
+
+
+class Embedder:
+    """Turns a batch of texts into vectors (one per text, same order)"""
+
+    name = "base"
+    model = "base"
+    dimension = 0
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+
+class OpenAIEmbedder(Embedder):
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str = "text-embedding-3-small",
+                 dimension: int = OPENAI_EMBEDDING_DIMENSION, max_batch: int = 256):
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(api_key=api_key)
+        self.model = model
+        self.dimension = dimension
+        self.max_batch = max_batch
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.max_batch):
+            response = await self.client.embeddings.create(
+                input=texts[start:start + self.max_batch],
+                model=self.model  # 1536 dimensions, $0.02 per 1M tokens
+            )
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return vectors
+
+    async def aclose(self):
+        await self.client.close()
+
+
+class HashingEmbedder(Embedder):
+    """
+    Bag of words and word bigrams hashed into a fixed-size, L2-normalised
+    vector. Texts sharing vocabulary score high on cosine similarity, which
+    is all the memory tests and benchmarks need.
+    """
+
+    name = "hashing"
+
+    _TOKEN = re.compile(r"[a-z0-9]+")
+
+    def __init__(self, dimension: int = 256):
+        self.dimension = dimension
+        self.model = f"hashing-{dimension}"
+        self.calls = 0
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        tokens = self._TOKEN.findall(text.lower())
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector] if norm else vector
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        return [self._vector(text) for text in texts]
+
+
+class CachedEmbedder(Embedder):
+    """LRU cache in front of another embedder, keyed by a hash of the text"""
+
+    def __init__(self, embedder: Embedder, max_entries: Optional[int] = None):
+        self.embedder = embedder
+        self.name = embedder.name
+        self.model = embedder.model
+        self.dimension = embedder.dimension
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("EMBEDDING_CACHE_ENTRIES", "5000"))
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0, "batches": 0}
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+            elif key not in missing:
+                missing[key] = text
+                self.counters["misses"] += 1
+            else:
+                self.counters["hits"] += 1
+
+        fetched: Dict[str, List[float]] = {}
+        if missing:
+            self.counters["batches"] += 1
+            vectors = await self.embedder.embed(list(missing.values()))
+            fetched = dict(zip(missing.keys(), vectors))
+            if self.max_entries > 0:
+                for key, vector in fetched.items():
+                    self._entries[key] = vector
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        return [fetched[key] if key in fetched else self._entries[key] for key in keys]
+
+    def stats(self) -> Dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "entries": len(self._entries),
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else None,
+        }
+
+    async def aclose(self):
+        await self.embedder.aclose()
+
+
+def create_embedder() -> Optional[Embedder]:
+    """Embedder from the environment, wrapped in the cache; None when unavailable"""
+    provider = os.getenv("EMBEDDING_PROVIDER", "").lower()
+    openai_api_key = os.getenv("OPENAI_API_KEY", "")
+
+    if provider == "hashing":
+        embedder: Embedder = HashingEmbedder()
+    elif provider in ("", "openai") and openai_api_key:
+        embedder = OpenAIEmbedder(openai_api_key, model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"))
+    else:
+        return None
+    return CachedEmbedder(embedder)
@@ -0,0 +1,546 @@
+"""
+Local Vector Store
+Embedded, disk-backed alternative to Pinecone for conversation memory
+
+Each namespace (one per user) is a directory under VECTOR_STORE_PATH:
+
+    vectors.f32      L2-normalised float32 rows, memory-mapped; grows by doubling
+    records.jsonl    append-only log of [row, vector_id, metadata]; replayed on load
+    index.json       {"dimension": d}
+
+Vector rows are flushed before their record line is appended, so a crash
+can only lose the tail of a batch, never point an ID at a half-written row.
+Re-upserting an ID overwrites its row in place; if the vector changed, the
+indexing thread relinks the row's graph node. Upserts write and fsync in a
+worker thread, one at a time per namespace, and a vector whose dimension
+differs from the namespace's is rejected with VectorDimensionError.
+
+Search is cosine similarity (a dot product on normalised rows):
+
+- exact: one matrix-vector product over the namespace, or over the rows
+  that pass the metadata filter
+- hnsw: a hierarchical navigable small world graph, built in a worker
+  thread the first time a namespace is used and extended as rows arrive.
+  Searches stay exact until the graph exists; rows not yet linked are
+  searched exactly and merged. Filtered queries search the graph with a
+  wider beam and keep the passing rows, falling back to exact search when
+  the filter is narrow or too few results pass
+- auto (default): exact below LOCAL_VECTOR_HNSW_MIN_SIZE rows, hnsw above
+
+Exact search over a memory-mapped namespace is a single BLAS call and wins
+for per-user sizes (~12 ms at 20k x 1536); the graph pays off beyond
+that. See benchmark_vector_index.py.
+
+Metadata filters use the same Pinecone-style syntax as the other stores.
+Scalar metadata values are indexed (key -> value -> rows), so the usual
+{"lead_id": 123} filter never scans the namespace.
+
+Configuration (env):
+    VECTOR_STORE_PATH             - root directory (default data/vector_memory)
+    LOCAL_VECTOR_SEARCH           - "auto" (default), "exact" or "hnsw"
+    LOCAL_VECTOR_HNSW_MIN_SIZE    - rows before auto switches to hnsw (default 20000)
+    LOCAL_VECTOR_HNSW_M           - graph neighbours per node (default 16)
+    LOCAL_VECTOR_HNSW_EF          - search beam width (default 128)
+"""
+
+import os
+import json
+import math
+import time
+import heapq
+import random
+import shutil
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from integrations.vector_store import VectorDimensionError, VectorMatch, VectorRecord, VectorStore, matches_filter
+
+logger = logging.getLogger(__name__)
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+class HNSWGraph:
+    """
+    Hierarchical navigable small world graph over the rows of a vector array.
+
+    Nodes are row numbers; `vectors` is passed to each call so the graph can
+    follow a memmap that was re-opened after growing.
+    """
+
+    def __init__(self, m: int = 16, ef_construction: int = 100, seed: int = 42):
+        self.m = m
+        self.m0 = 2 * m
+        self.ef_construction = ef_construction
+        self.level_mult = 1 / math.log(m)
+        self.layers: List[Dict[int, List[int]]] = []
+        self.entry: Optional[int] = None
+        self.nodes = 0
+        self._rng = random.Random(seed)
+
+    def _search_layer(self, vectors: np.ndarray, query: np.ndarray, entry_points: List[int],
+                      ef: int, layer: int) -> List[Tuple[float, int]]:
+        """Beam search on one layer; returns up to ef (similarity, node), best first"""
+        links = self.layers[layer]
+        visited: Set[int] = set(entry_points)
+        sims = (vectors[entry_points] @ query).tolist()
+        candidates = [(-sim, node) for sim, node in zip(sims, entry_points)]
+        heapq.heapify(candidates)
+        results = [(sim, node) for sim, node in zip(sims, entry_points)]
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            neg_sim, node = heapq.heappop(candidates)
+            if len(results) >= ef and -neg_sim < results[0][0]:
+                break
+            fresh = [n for n in links.get(node, ()) if n not in visited]
+            if not fresh:
+                continue
+            visited.update(fresh)
+            for sim, neighbour in zip((vectors[fresh] @ query).tolist(), fresh):
+                if len(results) < ef or sim > results[0][0]:
+                    heapq.heappush(candidates, (-sim, neighbour))
+                    heapq.heappush(results, (sim, neighbour))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+
+        return sorted(results, reverse=True)
+
+    def _select_neighbours(self, vectors: np.ndarray, found: List[Tuple[float, int]], m: int) -> List[int]:
+        """
+        HNSW neighbour heuristic: take a candidate only if it is closer to the
+        new node than to every neighbour already taken, so links span
+        clusters instead of all pointing into the nearest one; top up with
+        the closest skipped candidates.
+        """
+        if len(found) <= m:
+            return [node for _, node in found]
+        nodes = [node for _, node in found]
+        candidates = vectors[nodes]
+        gram = candidates @ candidates.T
+        # Highest similarity of each candidate to any neighbour taken so far
+        closest_taken = np.full(len(nodes), -np.inf, dtype=np.float32)
+        selected: List[int] = []
+        skipped: List[int] = []
+        for i, (sim, _) in enumerate(found):
+            if len(selected) >= m:
+                break
+            if closest_taken[i] > sim:
+                skipped.append(i)
+            else:
+                selected.append(i)
+                np.maximum(closest_taken, gram[i], out=closest_taken)
+        return [nodes[i] for i in selected + skipped[:m - len(selected)]]
+
+    def _greedy_descent(self, vectors: np.ndarray, query: np.ndarray, down_to: int) -> List[int]:
+        entry = [self.entry]
+        for layer in range(len(self.layers) - 1, down_to, -1):
+            entry = [self._search_layer(vectors, query, entry, 1, layer)[0][1]]
+        return entry
+
+    def add(self, vectors: np.ndarray, node: int):
+        query = vectors[node]
+        level = int(-math.log(1.0 - self._rng.random()) * self.level_mult)
+        self.nodes += 1
+
+        if self.entry is None:
+            self.layers = [{node: []} for _ in range(level + 1)]
+            self.entry = node
+            return
+
+        top = len(self.layers) - 1
+        entry = self._greedy_descent(vectors, query, min(level, top))
+        self._connect(vectors, node, entry, min(level, top))
+
+        for _ in range(top + 1, level + 1):
+            self.layers.append({node: []})
+        if level > top:
+            self.entry = node
+
+    def _connect(self, vectors: np.ndarray, node: int, entry: List[int], top: int):
+        """Link a node on layers top..0, searching from entry"""
+        query = vectors[node]
+        for layer in range(top, -1, -1):
+            found = [(sim, n) for sim, n in self._search_layer(vectors, query, entry, self.ef_construction, layer)
+                     if n != node]
+            max_links = self.m0 if layer == 0 else self.m
+            neighbours = self._select_neighbours(vectors, found, self.m)
+            links = self.layers[layer]
+            links[node] = neighbours
+            for neighbour in neighbours:
+                back = links.setdefault(neighbour, [])
+                back.append(node)
+                if len(back) > max_links + max_links // 2:
+                    # Re-select the links of the over-full neighbour (with slack,
+                    # so the cost is paid once per max_links / 2 new links)
+                    sims = (vectors[back] @ vectors[neighbour]).tolist()
+                    links[neighbour] = self._select_neighbours(
+                        vectors, sorted(zip(sims, back), reverse=True), max_links
+                    )
+            entry = [n for _, n in found] or entry
+
+    def relink(self, vectors: np.ndarray, node: int):
+        """
+        Re-insert a node whose vector changed. Its links in and out were chosen
+        for the old vector, so they are dropped (a scan of each of its layers)
+        and rebuilt at the same levels.
+        """
+        levels = [layer for layer, links in enumerate(self.layers) if node in links]
+        if not levels:
+            return
+        for layer in levels:
+            links = self.layers[layer]
+            links[node] = []
+            for neighbours in links.values():
+                if node in neighbours:
+                    neighbours.remove(node)
+
+        # Descend from the highest layer holding another node (the node may be the entry point)
+        for start in range(len(self.layers) - 1, -1, -1):
+            start_node = next((n for n in self.layers[start] if n != node), None)
+            if start_node is not None:
+                break
+        else:
+            return
+        query = vectors[node]
+        entry = [start_node]
+        for layer in range(start, levels[-1], -1):
+            entry = [self._search_layer(vectors, query, entry, 1, layer)[0][1]]
+        self._connect(vectors, node, entry, min(levels[-1], start))
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, ef: int) -> List[Tuple[float, int]]:
+        if self.entry is None:
+            return []
+        entry = self._greedy_descent(vectors, query, 0)
+        return self._search_layer(vectors, query, entry, ef, 0)
+
+
+class _Namespace:
+    """One namespace directory: memmapped vectors, record log, metadata postings"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.ids: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self.rows: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[Any, Set[int]]] = defaultdict(lambda: defaultdict(set))
+        self.unindexed: Set[str] = set()
+        self.dimension: Optional[int] = None
+        self.vectors: Optional[np.memmap] = None
+        self.graph: Optional[HNSWGraph] = None
+        # Held by the indexing thread while it links a row; searches never wait on it
+        self.graph_lock = threading.Lock()
+        self.index_task: Optional[asyncio.Task] = None
+        # Rows whose vector was overwritten; the indexing thread relinks them
+        self.relink: Set[int] = set()
+        # Serializes upserts (and deletion) so one write thread runs per namespace
+        self.write_lock = asyncio.Lock()
+
+        if os.path.exists(self._path("index.json")):
+            with open(self._path("index.json")) as f:
+                self.dimension = json.load(f)["dimension"]
+            self._open_vectors()
+            with open(self._path("records.jsonl")) as f:
+                for line in f:
+                    if line.strip():
+                        row, vector_id, metadata = json.loads(line)
+                        self._set_record(row, vector_id, metadata)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self.vectors is None else self.vectors.shape[0]
+
+    def _open_vectors(self):
+        rows = os.path.getsize(self._path("vectors.f32")) // (4 * self.dimension)
+        self.vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r+", shape=(rows, self.dimension))
+
+    def _create(self, dimension: int):
+        os.makedirs(self.directory, exist_ok=True)
+        self.dimension = dimension
+        with open(self._path("vectors.f32"), "wb") as f:
+            f.truncate(64 * 4 * dimension)
+        open(self._path("records.jsonl"), "w").close()
+        with open(self._path("index.json"), "w") as f:
+            json.dump({"dimension": dimension}, f)
+        self._open_vectors()
+
+    def _grow(self, needed: int):
+        capacity = max(self.capacity, 64)
+        while capacity < needed:
+            capacity *= 2
+        # The old mapping stays valid for readers (the indexing thread) until dropped
+        self.vectors.flush()
+        with open(self._path("vectors.f32"), "r+b") as f:
+            f.truncate(capacity * 4 * self.dimension)
+        self._open_vectors()
+
+    def _set_record(self, row: int, vector_id: str, metadata: Dict[str, Any]):
+        if row < len(self.ids):
+            self._unindex(row)
+            self.ids[row], self.metadata[row] = vector_id, metadata
+        else:
+            self.ids.append(vector_id)
+            self.metadata.append(metadata)
+        self.rows[vector_id] = row
+        for key, value in metadata.items():
+            if isinstance(value, _SCALARS):
+                self.postings[key][value].add(row)
+            else:
+                self.unindexed.add(key)
+
+    def _unindex(self, row: int):
+        for key, value in self.metadata[row].items():
+            if isinstance(value, _SCALARS):
+                self.postings[key][value].discard(row)
+
+    def write(self, vectors: List[VectorRecord]) -> Tuple[List[tuple], List[int]]:
+        """
+        Worker thread: write vector rows and their record lines. Returns the
+        (row, vector_id, embedding, metadata) assignments for apply() and the
+        existing rows whose vector changed.
+        """
+        dimension = self.dimension or len(vectors[0][1])
+        for _, embedding, _ in vectors:
+            if len(embedding) != dimension:
+                raise VectorDimensionError(f"Expected {dimension}-dimensional vectors, got {len(embedding)}")
+        if self.dimension is None:
+            self._create(dimension)
+
+        assigned = []
+        batch_rows: Dict[str, int] = {}
+        next_row = self.size
+        for vector_id, embedding, metadata in vectors:
+            row = self.rows.get(vector_id, batch_rows.get(vector_id))
+            if row is None:
+                row, next_row = next_row, next_row + 1
+                batch_rows[vector_id] = row
+            assigned.append((row, vector_id, embedding, metadata))
+        if next_row > self.capacity:
+            self._grow(next_row)
+
+        matrix = np.asarray([embedding for _, _, embedding, _ in assigned], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+        changed = [row for (row, _, _, _), vector in zip(assigned, matrix)
+                   if row < self.size and not np.array_equal(self.vectors[row], vector)]
+        self.vectors[[row for row, _, _, _ in assigned]] = matrix
+        self.vectors.flush()
+
+        with open(self._path("records.jsonl"), "a") as f:
+            for row, vector_id, _, metadata in assigned:
+                f.write(json.dumps([row, vector_id, metadata], default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return assigned, changed
+
+    def apply(self, assigned: List[tuple], changed: List[int]):
+        """Event loop: publish written rows to searches"""
+        for row, vector_id, _, metadata in assigned:
+            self._set_record(row, vector_id, metadata)
+        if self.graph is not None or self.index_task is not None:
+            self.relink.update(changed)
+
+    def filter_rows(self, query_filter: Dict[str, Any]) -> np.ndarray:
+        """Rows passing a metadata filter, from the postings where possible"""
+        if any(key in self.unindexed for key in query_filter):
+            return np.fromiter((row for row, metadata in enumerate(self.metadata)
+                                if matches_filter(metadata, query_filter)), dtype=np.int64)
+
+        rows: Optional[Set[int]] = None
+        for key, condition in query_filter.items():
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            values = self.postings.get(key, {})
+            for op, operand in condition.items():
+                if op == "$eq":
+                    passing = set(values.get(operand, ()))
+                elif op == "$in":
+                    passing = set().union(*(values.get(value, ()) for value in operand))
+                else:
+                    excluded = values.get(operand, set()) if op == "$ne" else \
+                        set().union(*(values.get(value, ()) for value in operand))
+                    passing = set(range(self.size)) - excluded
+                rows = passing if rows is None else rows & passing
+        return np.fromiter(sorted(rows or ()), dtype=np.int64)
+
+    def close(self):
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.vectors = None
+
+
+class LocalVectorStore(VectorStore):
+    """Memory-mapped per-namespace vectors with exact or HNSW search"""
+
+    name = "local"
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        search: Optional[str] = None,
+        hnsw_min_size: Optional[int] = None,
+        hnsw_m: Optional[int] = None,
+        hnsw_ef: Optional[int] = None,
+    ):
+        self.path = path or os.getenv("VECTOR_STORE_PATH") or os.path.join("data", "vector_memory")
+        self.search = (search or os.getenv("LOCAL_VECTOR_SEARCH", "auto")).lower()
+        self.hnsw_min_size = hnsw_min_size if hnsw_min_size is not None else int(os.getenv("LOCAL_VECTOR_HNSW_MIN_SIZE", "20000"))
+        self.hnsw_m = hnsw_m or int(os.getenv("LOCAL_VECTOR_HNSW_M", "16"))
+        self.hnsw_ef = hnsw_ef or int(os.getenv("LOCAL_VECTOR_HNSW_EF", "128"))
+        if self.search not in ("auto", "exact", "hnsw"):
+            raise ValueError(f"LOCAL_VECTOR_SEARCH must be auto, exact or hnsw, not {self.search!r}")
+        self._namespaces: Dict[str, _Namespace] = {}
+        os.makedirs(self.path, exist_ok=True)
+
+    def _namespace(self, namespace: str) -> _Namespace:
+        ns = self._namespaces.get(namespace)
+        if ns is None:
+            ns = self._namespaces[namespace] = _Namespace(os.path.join(self.path, namespace))
+        return ns
+
+    def _use_graph(self, ns: _Namespace) -> bool:
+        return self.search == "hnsw" or (self.search == "auto" and ns.size >= self.hnsw_min_size)
+
+    def _index_graph(self, ns: _Namespace):
+        """Worker thread: build the graph on first use, then link rows appended since"""
+        if ns.graph is None:
+            started = time.perf_counter()
+            graph = HNSWGraph(m=self.hnsw_m)
+            while graph.nodes < ns.size:
+                graph.add(ns.vectors, graph.nodes)
+            ns.graph = graph
+            logger.info(f"Built HNSW graph for {os.path.basename(ns.directory)} "
+                        f"({graph.nodes} vectors, {time.perf_counter() - started:.1f}s)")
+        while ns.graph.nodes < ns.size:
+            with ns.graph_lock:
+                ns.graph.add(ns.vectors, ns.graph.nodes)
+        while ns.relink:
+            row = ns.relink.pop()
+            if row < ns.graph.nodes:
+                with ns.graph_lock:
+                    ns.graph.relink(ns.vectors, row)
+
+    def _schedule_indexing(self, ns: _Namespace, force: bool = False):
+        """Keep the namespace's graph current off the event loop"""
+        if ns.index_task is not None and not ns.index_task.done():
+            return
+        if not (force or self._use_graph(ns)) or (ns.graph is not None and ns.graph.nodes >= ns.size
+                                                  and not ns.relink):
+            return
+
+        async def run():
+            try:
+                await asyncio.to_thread(self._index_graph, ns)
+            except Exception as e:
+                logger.error(f"Error indexing {os.path.basename(ns.directory)}: {e}")
+
+        ns.index_task = asyncio.get_running_loop().create_task(run())
+
+    async def build_index(self, namespace: str):
+        """Build (or catch up) a namespace's HNSW graph and wait for it"""
+        ns = self._namespace(namespace)
+        self._schedule_indexing(ns, force=True)
+        if ns.index_task is not None:
+            await ns.index_task
+
+    async def upsert(self, namespace: str, vectors: List[VectorRecord]):
+        if not vectors:
+            return
+        ns = self._namespace(namespace)
+        async with ns.write_lock:
+            assigned, changed = await asyncio.to_thread(ns.write, vectors)
+            ns.apply(assigned, changed)
+        self._schedule_indexing(ns)
+
+    def _exact(self, ns: _Namespace, query: np.ndarray, top_k: int,
+               rows: Optional[np.ndarray] = None) -> List[Tuple[float, int]]:
+        matrix = ns.vectors[:ns.size] if rows is None else ns.vectors[rows]
+        if matrix.shape[0] == 0:
+            return []
+        sims = matrix @ query
+        k = min(top_k, sims.shape[0])
+        best = np.argpartition(-sims, k - 1)[:k]
+        best = best[np.argsort(-sims[best])]
+        return [(float(sims[i]), int(i if rows is None else rows[i])) for i in best]
+
+    def search_rows(self, namespace: str, vector: List[float], top_k: int,
+                    query_filter: Optional[Dict[str, Any]] = None, exact: bool = False) -> List[Tuple[float, int]]:
+        """
+        (similarity, row) best first; `exact` forces brute force.
+
+        The graph is used once built; rows appended since it was last caught
+        up are searched exactly and merged in. Until it is built, or while
+        the indexing thread holds it, search is exact.
+        """
+        ns = self._namespace(namespace)
+        if ns.size == 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        rows = ns.filter_rows(query_filter) if query_filter else None
+        graph = ns.graph
+        if (exact or graph is None or not self._use_graph(ns)
+                or (rows is not None and len(rows) <= self.hnsw_min_size)
+                or not ns.graph_lock.acquire(blocking=False)):
+            return self._exact(ns, query, top_k, rows)
+
+        # Wider beam when a filter will discard part of it
+        selectivity = 1.0 if rows is None else max(len(rows) / ns.size, 1e-3)
+        ef = min(ns.size, max(self.hnsw_ef, int(top_k / selectivity) * 2))
+        try:
+            indexed = graph.nodes
+            found = graph.search(ns.vectors, query, ef)
+        finally:
+            ns.graph_lock.release()
+
+        if rows is not None:
+            allowed = set(rows.tolist())
+            found = [(sim, row) for sim, row in found if row in allowed]
+        if indexed < ns.size:
+            tail = np.arange(indexed, ns.size)
+            if rows is not None:
+                tail = np.intersect1d(tail, rows)
+            found = sorted(found + self._exact(ns, query, top_k, tail), reverse=True)
+        if len(found) < min(top_k, ns.size if rows is None else len(rows)):
+            return self._exact(ns, query, top_k, rows)
+        return found[:top_k]
+
+    async def query(self, namespace, vector, top_k, query_filter=None) -> List[VectorMatch]:
+        ns = self._namespace(namespace)
+        self._schedule_indexing(ns)
+        return [VectorMatch(ns.ids[row], sim, dict(ns.metadata[row]))
+                for sim, row in self.search_rows(namespace, vector, top_k, query_filter)]
+
+    async def delete_namespace(self, namespace: str):
+        ns = self._namespaces.pop(namespace, None)
+        if ns is not None:
+            async with ns.write_lock:
+                if ns.index_task is not None:
+                    await ns.index_task
+                ns.close()
+        shutil.rmtree(os.path.join(self.path, namespace), ignore_errors=True)
+
+    async def count(self, namespace: str) -> int:
+        return self._namespace(namespace).size
+
+    def close(self):
+        for ns in self._namespaces.values():
+            ns.close()
+        self._namespaces.clear()
@@ -1,69 +1,105 @@
 """
 Pinecone Vector Database Service
 Handles conversation memory storage and semantic search for AI context retrieval
+
+Embeddings come from integrations.embeddings (async, cached by text hash)
+and vectors go to an integrations.vector_store backend (Pinecone, or the
+on-disk local store when no Pinecone key is set). Stores are write-behind: store_conversation returns
+the vector ID at once and queues the text; queued texts are embedded in one
+batch and upserted in groups per namespace when the buffer fills, on the
+scheduled flush, or before a retrieval from the same namespace.
+
+A queued vector does not exist in the store yet, so callers must not record
+its ID as stored. Pass memory_id, and record_written() hands back
+(memory_id, vector_id) once a flush has written the vector. A failed flush re-queues
+its whole batch. Once VECTOR_MAX_PENDING conversations are queued,
+store_conversation flushes first, and raises VectorQueueFullError if the
+backend still fails. Queued vectors are dropped only when the store rejects
+them outright (VectorDimensionError), since no retry could write them.
+
+Configuration (env):
+    VECTOR_EMBED_BATCH_SIZE     - queued conversations that trigger a flush (default 32)
+    VECTOR_UPSERT_BATCH_SIZE    - vectors per upsert request (default 100)
+    VECTOR_FLUSH_SECONDS        - scheduled flush interval (default 5)
+    VECTOR_MAX_PENDING          - queued conversations before new stores are refused
+                                  while the backend is failing (default 10000)
 """
 import os
+import asyncio
 import logging
-from typing import List, Dict, Optional
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
 from datetime import datetime
-from pinecone import Pinecone, ServerlessSpec
-from openai import OpenAI
+
+from integrations.embeddings import Embedder, create_embedder
+from integrations.vector_store import VectorDimensionError, VectorStore, create_vector_store
 
 logger = logging.getLogger(__name__)
 
 
+class VectorQueueFullError(Exception):
+    """The write-behind queue is full and the vector store is failing"""
+
+
+@dataclass
+class PendingVector:
+    namespace: str
+    vector_id: str
+    text: str
+    metadata: Dict
+    memory_id: Optional[int] = None
+
+
 class VectorMemoryService:
     """Service for storing and retrieving conversation context using vector embeddings"""
 
-    def __init__(self):
-        self.pinecone_api_key = os.getenv("PINECONE_API_KEY", "")
-        self.openai_api_key = os.getenv("OPENAI_API_KEY", "")
+    def __init__(self, store: Optional[VectorStore] = None, embedder: Optional[Embedder] = None):
         self.index_name = "crm-conversations"
+        self.embed_batch_size = int(os.getenv("VECTOR_EMBED_BATCH_SIZE", "32"))
+        self.upsert_batch_size = int(os.getenv("VECTOR_UPSERT_BATCH_SIZE", "100"))
+        self.flush_interval_seconds = int(os.getenv("VECTOR_FLUSH_SECONDS", "5"))
+        self.max_pending = int(os.getenv("VECTOR_MAX_PENDING", "10000"))
+        self._pending: List[PendingVector] = []
+        # (namespace, memory_id, vector_id) written since the last record_written()
+        self._written: List[Tuple[str, int, str]] = []
+        self._flush_lock = asyncio.Lock()
+        self._last_id = 0
+        self.store = store
+        self.embedder = embedder
+
+        try:
+            if self.embedder is None:
+                self.embedder = create_embedder()
+            if self.store is None and self.embedder is not None:
+                self.store = create_vector_store(self.embedder.dimension, self.index_name)
+        except Exception as e:
+            logger.error(f"Failed to initialize vector memory service: {e}")
+            self.store = None
 
         # Check if we have credentials
-        if not self.pinecone_api_key or not self.openai_api_key:
-            logger.warning("Pinecone or OpenAI API key not configured - vector memory disabled")
+        if self.store is None or self.embedder is None:
+            logger.warning("Vector store or embeddings not configured - vector memory disabled")
             self.enabled = False
             return
 
-        try:
-            # Initialize Pinecone
-            self.pc = Pinecone(api_key=self.pinecone_api_key)
-
-            # Create index if it doesn't exist
-            if self.index_name not in self.pc.list_indexes().names():
-                logger.info(f"Creating Pinecone index: {self.index_name}")
-                self.pc.create_index(
-                    name=self.index_name,
-                    dimension=1536,  # OpenAI text-embedding-3-small dimension
-                    metric="cosine",
-                    spec=ServerlessSpec(
-                        cloud="aws",
-                        region="us-east-1"
-                    )
-                )
-
-            # Connect to index
-            self.index = self.pc.Index(self.index_name)
+        self.enabled = True
+        logger.info(f"Vector memory service initialized ({self.store.name} store, {self.embedder.model} embeddings)")
 
-            # Initialize OpenAI
-            self.openai = OpenAI(api_key=self.openai_api_key)
+    @staticmethod
+    def _namespace(user_id: int) -> str:
+        return f"user_{user_id}"  # Use namespaces for user isolation
 
-            self.enabled = True
-            logger.info("Vector memory service initialized successfully")
+    def _new_vector_id(self, user_id: int) -> str:
+        # Millisecond timestamps, bumped so IDs stay unique within a burst
+        stamp = max(int(datetime.now().timestamp() * 1000), self._last_id + 1)
+        self._last_id = stamp
+        return f"conv_{user_id}_{stamp}"
 
-        except Exception as e:
-            logger.error(f"Failed to initialize vector memory service: {e}")
-            self.enabled = False
-
-    def _generate_embedding(self, text: str) -> List[float]:
-        """Generate vector embedding for text using OpenAI"""
+    async def _generate_embedding(self, text: str) -> List[float]:
+        """Generate vector embedding for text (cached by text hash)"""
         try:
-            response = self.openai.embeddings.create(
-                input=text,
-                model="text-embedding-3-small"  # 1536 dimensions, $0.02 per 1M tokens
-            )
-            return response.data[0].embedding
+            return (await self.embedder.embed([text]))[0]
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
             return []
@@ -72,57 +108,130 @@ class VectorMemoryService:
         self,
         user_id: int,
         conversation_text: str,
-        metadata: Dict = None
+        metadata: Dict = None,
+        memory_id: Optional[int] = None
     ) -> Optional[str]:
         """
-        Store a conversation in vector database for future retrieval
+        Queue a conversation for storage in the vector database
 
         Args:
             user_id: ID of the user
             conversation_text: The conversation content to store
             metadata: Additional metadata (lead_id, sentiment, intent, etc.)
+            memory_id: ConversationMemory row to link once the vector is written (see record_written)
 
         Returns:
-            The vector ID if successful, None otherwise
+            The vector ID (assigned immediately; the vector is written on the next flush)
+
+        Raises:
+            VectorQueueFullError: max_pending conversations are queued and a flush failed
         """
         if not self.enabled:
             logger.warning("Vector memory not enabled - cannot store conversation")
             return None
 
-        try:
-            # Generate unique ID
-            vector_id = f"conv_{user_id}_{int(datetime.now().timestamp() * 1000)}"
-
-            # Generate embedding
-            embedding = self._generate_embedding(conversation_text)
-
-            if not embedding:
-                return None
-
-            # Prepare metadata
-            vector_metadata = {
-                "user_id": user_id,
-                "text": conversation_text[:1000],  # Store first 1000 chars in metadata
-                "timestamp": datetime.now().isoformat(),
-                "full_text_length": len(conversation_text)
-            }
-
-            # Add custom metadata if provided
-            if metadata:
-                vector_metadata.update(metadata)
-
-            # Store in Pinecone
-            self.index.upsert(
-                vectors=[(vector_id, embedding, vector_metadata)],
-                namespace=f"user_{user_id}"  # Use namespaces for user isolation
-            )
+        if len(self._pending) >= self.max_pending:
+            await self.flush()
+            if len(self._pending) >= self.max_pending:
+                raise VectorQueueFullError(
+                    f"{len(self._pending)} conversation vectors queued and the vector store is failing"
+                )
 
-            logger.info(f"Stored conversation vector: {vector_id} for user {user_id}")
-            return vector_id
+        vector_id = self._new_vector_id(user_id)
 
-        except Exception as e:
-            logger.error(f"Error storing conversation: {e}")
-            return None
+        # Prepare metadata
+        vector_metadata = {
+            "user_id": user_id,
+            "text": conversation_text[:1000],  # Store first 1000 chars in metadata
+            "timestamp": datetime.now().isoformat(),
+            "full_text_length": len(conversation_text)
+        }
+
+        # Add custom metadata if provided
+        if metadata:
+            vector_metadata.update(metadata)
+
+        self._pending.append(PendingVector(self._namespace(user_id), vector_id, conversation_text, vector_metadata,
+                                           memory_id))
+        logger.info(f"Queued conversation vector: {vector_id} for user {user_id}")
+
+        if len(self._pending) >= self.embed_batch_size:
+            await self.flush()
+        return vector_id
+
+    async def flush(self) -> int:
+        """
+        Embed queued conversations in one batch and upsert them per namespace
+
+        Returns:
+            Number of vectors written; on failure the batch is re-queued
+        """
+        if not self.enabled:
+            return 0
+
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+
+            written = 0
+            rejected = set()
+            try:
+                embeddings = await self.embedder.embed([item.text for item in batch])
+
+                by_namespace = defaultdict(list)
+                for item, embedding in zip(batch, embeddings):
+                    by_namespace[item.namespace].append((item.vector_id, embedding, item.metadata))
+
+                for namespace, vectors in by_namespace.items():
+                    for start in range(0, len(vectors), self.upsert_batch_size):
+                        group = vectors[start:start + self.upsert_batch_size]
+                        try:
+                            await self.store.upsert(namespace, group)
+                        except VectorDimensionError as e:
+                            # Retrying cannot help, so the group is dropped rather than re-queued forever
+                            logger.error(f"Dropping {len(group)} conversation vectors for {namespace}: {e}")
+                            rejected.update(vector_id for vector_id, _, _ in group)
+                            continue
+                        written += len(group)
+
+                self._written.extend(
+                    (item.namespace, item.memory_id, item.vector_id) for item in batch
+                    if item.memory_id is not None and item.vector_id not in rejected
+                )
+                logger.info(f"Stored {written} conversation vectors in {len(by_namespace)} namespaces")
+                return written
+
+            except Exception as e:
+                logger.error(f"Error storing conversations: {e}")
+                # Upserts are idempotent, so re-sending already written groups is safe.
+                # Only rejected vectors are dropped; their memory rows are never linked
+                self._pending = [item for item in batch if item.vector_id not in rejected] + self._pending
+                return 0
+
+    async def record_written(self, record: Callable[[List[Tuple[int, str]]], Awaitable]) -> int:
+        """
+        Hand (memory_id, vector_id) for vectors written since the last call to
+        record(links); if it raises, the links are kept for the next call
+
+        Returns:
+            Number of links recorded
+        """
+        written, self._written = self._written, []
+        if not written:
+            return 0
+        try:
+            await record([(memory_id, vector_id) for _, memory_id, vector_id in written])
+        except Exception:
+            self._written = written + self._written
+            raise
+        return len(written)
+
+    def pending_count(self, user_id: Optional[int] = None) -> int:
+        if user_id is None:
+            return len(self._pending)
+        namespace = self._namespace(user_id)
+        return sum(1 for item in self._pending if item.namespace == namespace)
 
     async def retrieve_relevant_context(
         self,
@@ -148,31 +257,29 @@ class VectorMemoryService:
             return []
 
         try:
+            # Read-your-writes: queued conversations for this user are written first
+            if self.pending_count(user_id):
+                await self.flush()
+
             # Generate embedding for current query
-            query_embedding = self._generate_embedding(current_query)
+            query_embedding = await self._generate_embedding(current_query)
 
             if not query_embedding:
                 return []
 
-            # Build filter if provided
-            query_filter = {}
-            if filter_metadata:
-                query_filter.update(filter_metadata)
-
-            # Query Pinecone
-            results = self.index.query(
-                vector=query_embedding,
-                top_k=top_k,
-                namespace=f"user_{user_id}",
-                filter=query_filter if query_filter else None,
-                include_metadata=True
+            matches = await self.store.query(
+                self._namespace(user_id),
+                query_embedding,
+                top_k,
+                query_filter=filter_metadata or None
             )
 
             # Extract and return metadata
             relevant_contexts = []
-            for match in results.matches:
+            for match in matches:
                 if match.score > 0.7:  # Only include high-relevance matches
                     relevant_contexts.append({
+                        "id": match.id,
                         "text": match.metadata.get("text", ""),
                         "timestamp": match.metadata.get("timestamp", ""),
                         "relevance_score": match.score,
@@ -191,28 +298,44 @@ class VectorMemoryService:
         if not self.enabled:
             return
 
+        namespace = self._namespace(user_id)
         try:
-            # Delete namespace for user
-            self.index.delete(namespace=f"user_{user_id}", delete_all=True)
+            async with self._flush_lock:
+                self._pending = [item for item in self._pending if item.namespace != namespace]
+                self._written = [link for link in self._written if link[0] != namespace]
+                await self.store.delete_namespace(namespace)
             logger.info(f"Deleted all conversations for user {user_id}")
         except Exception as e:
             logger.error(f"Error deleting user conversations: {e}")
 
     async def get_conversation_count(self, user_id: int) -> int:
-        """Get count of stored conversations for a user"""
+        """Get count of stored conversations for a user (including queued ones)"""
         if not self.enabled:
             return 0
 
         try:
-            stats = self.index.describe_index_stats()
-            namespace_stats = stats.namespaces.get(f"user_{user_id}", None)
-            if namespace_stats:
-                return namespace_stats.vector_count
-            return 0
+            return await self.store.count(self._namespace(user_id)) + self.pending_count(user_id)
         except Exception as e:
             logger.error(f"Error getting conversation count: {e}")
             return 0
 
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "store": self.store.name if self.store else None,
+            "embedding_model": self.embedder.model if self.embedder else None,
+            "pending": len(self._pending),
+            "written_unlinked": len(self._written),
+            "embedding_cache": self.embedder.stats() if hasattr(self.embedder, "stats") else None,
+        }
+
+    async def aclose(self):
+        """Flush queued conversations and close the embedding client"""
+        if not self.enabled:
+            return
+        await self.flush()
+        await self.embedder.aclose()
+
 
 # Global instance
 vector_memory = VectorMemoryService()
@@ -0,0 +1,249 @@
+"""
+Vector Stores
+Storage backends behind VectorMemoryService
+
+VectorMemoryService only needs namespaced upsert / query / delete / count,
+so the backend is swappable:
+
+- PineconeVectorStore: the hosted index (sync SDK run in worker threads so
+  queries never block the event loop)
+- InMemoryVectorStore: exact cosine search in process, optionally persisted
+  as one JSON file per namespace; used for tests, benchmarks and local runs
+- LocalVectorStore (integrations.local_vector_store): memory-mapped NumPy
+  namespaces on disk with exact or HNSW search; the default when no
+  Pinecone key is configured
+
+Filters follow Pinecone's metadata filter syntax for the subset the CRM
+uses: {"field": value}, {"field": {"$eq"|"$ne": value}}, {"field": {"$in"|"$nin": [...]}}.
+
+Configuration (env):
+    VECTOR_STORE        - "pinecone", "local" or "memory"; defaults to pinecone
+                          when PINECONE_API_KEY is set, otherwise local
+    VECTOR_STORE_PATH   - directory for the local / memory stores' files
+"""
+
+import os
+import json
+import math
+import heapq
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (id, embedding, metadata)
+VectorRecord = Tuple[str, List[float], Dict[str, Any]]
+
+
+class VectorDimensionError(ValueError):
+    """A vector's dimension does not match its namespace; retrying cannot succeed"""
+
+
+@dataclass
+class VectorMatch:
+    id: str
+    score: float
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+def matches_filter(metadata: Dict[str, Any], query_filter: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Pinecone-style metadata filter against one record"""
+    if not query_filter:
+        return True
+    for key, condition in query_filter.items():
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, operand in condition.items():
+            if op == "$eq" and value != operand:
+                return False
+            if op == "$ne" and value == operand:
+                return False
+            if op == "$in" and value not in operand:
+                return False
+            if op == "$nin" and value in operand:
+                return False
+    return True
+
+
+class VectorStore:
+    """Namespaced vector storage; namespaces isolate users"""
+
+    name = "base"
+
+    async def upsert(self, namespace: str, vectors: List[VectorRecord]):
+        raise NotImplementedError
+
+    async def query(
+        self,
+        namespace: str,
+        vector: List[float],
+        top_k: int,
+        query_filter: Optional[Dict[str, Any]] = None
+    ) -> List[VectorMatch]:
+        raise NotImplementedError
+
+    async def delete_namespace(self, namespace: str):
+        raise NotImplementedError
+
+    async def count(self, namespace: str) -> int:
+        raise NotImplementedError
+
+
+class PineconeVectorStore(VectorStore):
+    name = "pinecone"
+
+    def __init__(self, api_key: str, index_name: str, dimension: int):
+        from pinecone import Pinecone, ServerlessSpec
+
+        self.pc = Pinecone(api_key=api_key)
+
+        # Create index if it doesn't exist
+        if index_name not in self.pc.list_indexes().names():
+            logger.info(f"Creating Pinecone index: {index_name}")
+            self.pc.create_index(
+                name=index_name,
+                dimension=dimension,
+                metric="cosine",
+                spec=ServerlessSpec(
+                    cloud="aws",
+                    region="us-east-1"
+                )
+            )
+
+        self.index = self.pc.Index(index_name)
+
+    async def upsert(self, namespace: str, vectors: List[VectorRecord]):
+        # Pinecone rejects null metadata values
+        records = [
+            (vector_id, embedding, {k: v for k, v in metadata.items() if v is not None})
+            for vector_id, embedding, metadata in vectors
+        ]
+        await asyncio.to_thread(self.index.upsert, vectors=records, namespace=namespace)
+
+    async def query(self, namespace, vector, top_k, query_filter=None) -> List[VectorMatch]:
+        results = await asyncio.to_thread(
+            self.index.query,
+            vector=vector,
+            top_k=top_k,
+            namespace=namespace,
+            filter=query_filter or None,
+            include_metadata=True
+        )
+        return [VectorMatch(match.id, match.score, dict(match.metadata or {})) for match in results.matches]
+
+    async def delete_namespace(self, namespace: str):
+        await asyncio.to_thread(self.index.delete, namespace=namespace, delete_all=True)
+
+    async def count(self, namespace: str) -> int:
+        stats = await asyncio.to_thread(self.index.describe_index_stats)
+        namespace_stats = stats.namespaces.get(namespace, None)
+        return namespace_stats.vector_count if namespace_stats else 0
+
+
+class InMemoryVectorStore(VectorStore):
+    """
+    Exact cosine search over normalised vectors held in dicts.
+
+    With `path`, each namespace is loaded from and rewritten to
+    <path>/<namespace>.json on change, so memories survive restarts. File
+    reads and writes run in worker threads, one at a time per namespace.
+    """
+
+    name = "memory"
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._namespaces: Dict[str, Dict[str, Tuple[List[float], Dict[str, Any]]]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    def _file(self, namespace: str) -> str:
+        return os.path.join(self.path, f"{namespace}.json")
+
+    def _lock(self, namespace: str) -> asyncio.Lock:
+        return self._locks.setdefault(namespace, asyncio.Lock())
+
+    def _read(self, namespace: str) -> Dict[str, Tuple[List[float], Dict[str, Any]]]:
+        if not os.path.exists(self._file(namespace)):
+            return {}
+        with open(self._file(namespace)) as f:
+            return {vector_id: (vector, metadata) for vector_id, vector, metadata in json.load(f)}
+
+    def _write(self, namespace: str, rows: List[list]):
+        tmp = self._file(namespace) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(rows, f)
+        os.replace(tmp, self._file(namespace))
+
+    async def _namespace(self, namespace: str) -> Dict[str, Tuple[List[float], Dict[str, Any]]]:
+        records = self._namespaces.get(namespace)
+        if records is None:
+            async with self._lock(namespace):
+                records = self._namespaces.get(namespace)
+                if records is None:
+                    records = await asyncio.to_thread(self._read, namespace) if self.path else {}
+                    self._namespaces[namespace] = records
+        return records
+
+    async def _persist(self, namespace: str):
+        if not self.path:
+            return
+        async with self._lock(namespace):
+            # Snapshot on the loop (records are replaced, never mutated), write in a thread
+            rows = [[vector_id, vector, metadata] for vector_id, (vector, metadata) in self._namespaces[namespace].items()]
+            await asyncio.to_thread(self._write, namespace, rows)
+
+    @staticmethod
+    def _normalise(vector: List[float]) -> List[float]:
+        norm = math.sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector] if norm else list(vector)
+
+    async def upsert(self, namespace: str, vectors: List[VectorRecord]):
+        records = await self._namespace(namespace)
+        for vector_id, embedding, metadata in vectors:
+            records[vector_id] = (self._normalise(embedding), dict(metadata))
+        await self._persist(namespace)
+
+    async def query(self, namespace, vector, top_k, query_filter=None) -> List[VectorMatch]:
+        query = self._normalise(vector)
+        records = await self._namespace(namespace)
+        scored = (
+            (sum(a * b for a, b in zip(query, stored)), vector_id, metadata)
+            for vector_id, (stored, metadata) in records.items()
+            if matches_filter(metadata, query_filter)
+        )
+        return [VectorMatch(vector_id, score, dict(metadata))
+                for score, vector_id, metadata in heapq.nlargest(top_k, scored, key=lambda item: item[0])]
+
+    async def delete_namespace(self, namespace: str):
+        self._namespaces[namespace] = {}
+        if self.path:
+            async with self._lock(namespace):
+                await asyncio.to_thread(self._remove, namespace)
+
+    def _remove(self, namespace: str):
+        if os.path.exists(self._file(namespace)):
+            os.remove(self._file(namespace))
+
+    async def count(self, namespace: str) -> int:
+        return len(await self._namespace(namespace))
+
+
+def create_vector_store(dimension: int, index_name: str = "crm-conversations") -> Optional[VectorStore]:
+    """Vector store from the environment; None when the configured backend is unavailable"""
+    api_key = os.getenv("PINECONE_API_KEY", "")
+    backend = os.getenv("VECTOR_STORE", "pinecone" if api_key else "local").lower()
+    if backend == "memory":
+        return InMemoryVectorStore(os.getenv("VECTOR_STORE_PATH") or None)
+    if backend == "local":
+        from integrations.local_vector_store import LocalVectorStore
+
+        return LocalVectorStore()
+
+    if not api_key:
+        return None
+    return PineconeVectorStore(api_key, index_name, dimension)
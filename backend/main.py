@@ -13,20 +13,23 @@
 # ✅ Zapier Integration via API Keys
 # ============================================================================
 
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, Depends, HTTPException, status, Request, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import JSONResponse, RedirectResponse
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, Date, Text, ForeignKey, JSON, Enum as SQLEnum, func, text, or_
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, Date, Text, ForeignKey, JSON, Enum as SQLEnum, UniqueConstraint, Index, event, func, text, or_
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.orm.attributes import set_committed_value
 from pydantic import BaseModel, EmailStr
 from passlib.context import CryptContext
 from jose import JWTError, jwt
-from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Dict, Any
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Dict, Any, Set
 import uvicorn
 import os
+import copy
 import json
 import enum
 import logging
@@ -43,11 +46,27 @@ import time
 # Import security middleware
 from security_middleware import (
     RateLimitMiddleware,
+    RateLimit,
+    RouteGroup,
     SecurityHeadersMiddleware,
     IPBlockingMiddleware,
     RequestValidationMiddleware,
     SecurityLoggingMiddleware
 )
+from services.lead_dedupe_index import lead_index_registry
+from services.entity_name_index import entity_name_registry
+from services.principal_cache import PrincipalCache, ApiKeyUsageBuffer
+from services.memory_access_buffer import MemoryAccessBuffer
+from services.user_notifications import UserNotificationHub
+from services.data_import import DataImporter, ImportTarget, ImportField, DataImportError, file_kind, read_headers
+from services.lead_scoring import LeadScorer, SCORE_INPUTS, score_lead, sentiment_for
+from services.llm_result_cache import LLMResultCache, prompt_version
+from ai_providers.llm_client import OPENAI, get_llm_client
+from services.dre_pipeline import (
+    DREPipeline, OpenAIDREBackend, KeywordDREBackend, MIN_CLASSIFICATION_CONFIDENCE,
+    CLASSIFY_MODEL, EXTRACT_MODEL, CLASSIFY_SYSTEM_PROMPT, extract_system_prompt,
+    classify_user_message, extract_user_message, keyword_classification
+)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -71,6 +90,9 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 # Initialize OpenAI client
 openai_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 
+# Shared async LLM client (timeouts, concurrency caps, metrics) for chat, parsing and the DRE
+llm_client = get_llm_client()
+
 # Database - Create Base first
 Base = declarative_base()
 
@@ -231,7 +253,8 @@ class Lead(Base):
     # Metadata
     user_metadata = Column(JSON)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    # Indexed for the incremental lead rescoring job
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), index=True)
     owner = relationship("User", back_populates="leads")
     referral_partner = relationship("ReferralPartner", back_populates="leads")
     activities = relationship("Activity", back_populates="lead")
@@ -255,6 +278,7 @@ class Loan(Base):
     closing_date = Column(DateTime)
     funded_date = Column(DateTime)
     loan_officer_id = Column(Integer, ForeignKey("users.id"))
+    lead_id = Column(Integer, ForeignKey("leads.id", ondelete="SET NULL"), nullable=True, index=True)  # Lead this loan originated from
     processor = Column(String)
     underwriter = Column(String)
     realtor_agent = Column(String)
@@ -269,6 +293,7 @@ class Loan(Base):
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     loan_officer = relationship("User", back_populates="loans")
+    lead = relationship("Lead")
     tasks = relationship("AITask", back_populates="loan")
     activities = relationship("Activity", back_populates="loan")
 
@@ -774,7 +799,11 @@ class AIColleagueLearningMetric(Base):
     metric_metadata = Column(JSON)
 
 class AIPerformanceDaily(Base):
-    """Daily rollup of AI performance metrics"""
+    """
+    Daily rollup of AI performance metrics, one row per (date, agent).
+    Maintained from ai_colleague_actions for complete days; Mission Control
+    reads these plus a live aggregate for the current day.
+    """
     __tablename__ = "ai_performance_daily"
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False, index=True)
@@ -802,8 +831,10 @@ class AIPerformanceDaily(Base):
     total_business_value = Column(Float)
 
     # Confidence
-    avg_confidence_score = Column(Float)
+    avg_confidence_score = Column(Float)  # Over scored_actions
     high_confidence_actions = Column(Integer, default=0)
+    scored_actions = Column(Integer, default=0)  # Actions with a non-zero confidence score
+    cleared_actions = Column(Integer, default=0)  # Approved, or not requiring approval
 
     # Metadata
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
@@ -898,13 +929,14 @@ class IncomingDataEvent(Base):
     attachments = Column(JSON)
     received_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     processed = Column(Boolean, default=False)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    claimed_at = Column(DateTime)  # Set while a DRE pipeline worker holds the event
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
 class ExtractedData(Base):
     __tablename__ = "extracted_data"
     id = Column(Integer, primary_key=True, index=True)
-    event_id = Column(Integer, ForeignKey("incoming_data_events.id"))
+    event_id = Column(Integer, ForeignKey("incoming_data_events.id"), index=True)
     category = Column(String)  # 'lead_update', 'loan_update', 'portfolio_update', etc.
     subcategory = Column(String)  # 'rate_lock', 'appraisal', 'title_clear', etc.
     fields = Column(JSON)  # {field_name: {value, confidence}}
@@ -929,6 +961,20 @@ class AITrainingEvent(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
+class LLMResultCacheEntry(Base):
+    """Cached DRE classification/extraction output, see services/llm_result_cache.py"""
+    __tablename__ = "llm_result_cache"
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, index=True, nullable=False)  # sha256 of stage/model/prompt/content
+    stage = Column(String, nullable=False)  # 'classify', 'extract'
+    model = Column(String)
+    prompt_version = Column(String)
+    result = Column(JSON)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    last_hit_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+    expires_at = Column(DateTime, index=True)
+
 class DuplicatePair(Base):
     __tablename__ = "duplicate_pairs"
     id = Column(Integer, primary_key=True, index=True)
@@ -983,6 +1029,7 @@ class MicrosoftOAuthToken(Base):
     last_sync_at = Column(DateTime)
     sync_folder = Column(String, default="Inbox")  # Which folder to sync
     sync_frequency_minutes = Column(Integer, default=15)  # How often to sync
+    mail_delta_link = Column(Text)  # Graph delta cursor for incremental sync of sync_folder
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
@@ -1163,6 +1210,33 @@ class KPISnapshot(Base):
     # Relationships
     profile = relationship("ClientProfile", backref="kpi_history")
 
+class KPIDailyRollup(Base):
+    """
+    Per-officer, per-day KPI counters (companion to KPISnapshot).
+    Maintained on lead/loan flushes so scorecards read pre-aggregated days.
+
+    metric / dimension pairs:
+        lead_start   / lead source      - leads created that day
+        lead_stage   / lead stage       - current stage of leads created that day
+        credit_pull  / ''               - leads created that day with a credit score
+        loan_app     / loan stage       - loans created that day (volume = amount)
+        funded       / loan type        - loans funded that day (volume = amount)
+    """
+    __tablename__ = "kpi_daily_rollups"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    metric = Column(String, nullable=False)
+    dimension = Column(String, nullable=False, default="")
+    count = Column(Integer, default=0)
+    volume = Column(Float, default=0)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'day', 'metric', 'dimension', name='uq_kpi_daily_rollup'),
+        Index('ix_kpi_daily_rollups_user_day', 'user_id', 'day'),
+    )
+
 class ProcessTemplate(Base):
     __tablename__ = "process_templates"
     id = Column(Integer, primary_key=True, index=True)
@@ -1519,6 +1593,7 @@ class LoanCreate(BaseModel):
     program: Optional[str] = None
     rate: Optional[float] = None
     closing_date: Optional[datetime] = None
+    lead_id: Optional[int] = None
 
 class LoanUpdate(BaseModel):
     stage: Optional[LoanStage] = None
@@ -1537,6 +1612,7 @@ class LoanResponse(BaseModel):
     closing_date: Optional[datetime]
     days_in_stage: int
     sla_status: str
+    lead_id: Optional[int] = None
     created_at: datetime
     class Config:
         from_attributes = True
@@ -1961,6 +2037,7 @@ class ConversationCreate(BaseModel):
     lead_id: Optional[int] = None
     loan_id: Optional[int] = None
     context: Optional[Dict[str, Any]] = None
+    stream: bool = False
 
 class ConversationResponse(BaseModel):
     id: int
@@ -2072,6 +2149,12 @@ class ReconciliationRejection(BaseModel):
     extracted_data_id: int
     reason: Optional[str] = None
 
+class ReconciliationBulkAction(BaseModel):
+    extracted_data_ids: List[int]
+    action: str  # 'approve' or 'reject'
+    reason: Optional[str] = None  # For rejections
+    stream: Optional[bool] = None  # Send progress as server-sent events
+
 # ============================================================================
 # MICROSOFT OAUTH SCHEMAS
 # ============================================================================
@@ -2135,7 +2218,18 @@ app.add_middleware(
 app.add_middleware(SecurityHeadersMiddleware)
 app.add_middleware(RequestValidationMiddleware)
 app.add_middleware(IPBlockingMiddleware)
-app.add_middleware(RateLimitMiddleware, requests_per_minute=100, requests_per_hour=2000)
+# Per-route-group limits (override with RATE_LIMIT_ROUTE_GROUPS); other routes use the defaults
+RATE_LIMIT_ROUTE_GROUPS = [
+    RouteGroup("auth", ("/token", "/api/v1/register", "/api/v1/verify-email", "/api/v1/resend-verification",
+                        "/api/v1/create-demo-user"),
+               (RateLimit(10, 60), RateLimit(100, 3600, "Hourly rate limit exceeded. Please try again later."))),
+    RouteGroup("ai", ("/api/v1/ai/", "/api/ai/", "/api/v1/ai-underwriter/", "/api/v1/coach"),
+               (RateLimit(30, 60), RateLimit(500, 3600, "Hourly rate limit exceeded. Please try again later."))),
+    RouteGroup("webhooks", ("/api/v1/webhooks/", "/api/vapi/", "/api/v1/voice/"),
+               (RateLimit(600, 60), RateLimit(20000, 3600, "Hourly rate limit exceeded. Please try again later."))),
+]
+app.add_middleware(RateLimitMiddleware, requests_per_minute=100, requests_per_hour=2000,
+                   route_groups=RATE_LIMIT_ROUTE_GROUPS)
 app.add_middleware(SecurityLoggingMiddleware)
 
 logger.info("✅ Security middleware enabled: Rate limiting, IP blocking, security headers, request validation, and logging")
@@ -2156,6 +2250,95 @@ def create_access_token(data: dict):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+# Authenticated principals are cached briefly; API-key last_used_at writes are batched
+principal_cache = PrincipalCache()
+api_key_usage = ApiKeyUsageBuffer()
+
+def _attach_principal(db: Session, user: User) -> User:
+    """Copy a cached (detached) user into the request session without a SELECT"""
+    attached = db.merge(user, load=False)
+    # JSON is shared by reference on merge; give the request its own copy
+    set_committed_value(attached, 'user_metadata', copy.deepcopy(user.user_metadata))
+    return attached
+
+def _cache_principal(db: Session, cache_key, user: User, api_key_id: Optional[int] = None) -> User:
+    db.expunge(user)
+    principal_cache.put(cache_key, user, api_key_id)
+    return _attach_principal(db, user)
+
+def resolve_api_key_principal(db: Session, key: str) -> Optional[User]:
+    """User for an active API key, or None; records usage for the batched flush"""
+    cache_key = principal_cache.api_key_key(key)
+    cached = principal_cache.get(cache_key)
+    if cached is not None:
+        api_key_usage.record(cached.api_key_id)
+        return _attach_principal(db, cached.user)
+
+    api_key = db.query(ApiKey.id, ApiKey.user_id).filter(
+        ApiKey.key == key,
+        ApiKey.is_active == True
+    ).first()
+    if api_key is None:
+        return None
+
+    user = db.query(User).filter(User.id == api_key.user_id).first()
+    if user is None:
+        return None
+    api_key_usage.record(api_key.id)
+    return _cache_principal(db, cache_key, user, api_key.id)
+
+def resolve_jwt_principal(db: Session, token: str) -> Optional[User]:
+    """User for a valid JWT, or None"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    email = payload.get("sub")
+    if email is None:
+        return None
+
+    cache_key = principal_cache.jwt_key(email)
+    cached = principal_cache.get(cache_key)
+    if cached is not None:
+        return _attach_principal(db, cached.user)
+
+    user = db.query(User).filter(User.email == email).first()
+    if user is None:
+        return None
+    return _cache_principal(db, cache_key, user)
+
+def flush_api_key_usage() -> int:
+    """Write buffered API key last_used_at timestamps (scheduled job + shutdown)"""
+    db = SessionLocal()
+    try:
+        return api_key_usage.flush(db, ApiKey)
+    except Exception as e:
+        logger.error(f"API key usage flush failed: {e}")
+        return 0
+    finally:
+        db.close()
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_principal_changes(session, flush_context):
+    pending = session.info.setdefault('principal_cache_pending', set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            pending.add(('user', obj.id))
+        elif isinstance(obj, ApiKey) and obj.id is not None:
+            pending.add(('api_key', obj.id))
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_principal_changes(session):
+    for kind, entity_id in session.info.pop('principal_cache_pending', ()):
+        if kind == 'user':
+            principal_cache.invalidate_user(entity_id)
+        else:
+            principal_cache.invalidate_api_key(entity_id)
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_principal_changes(session):
+    session.info.pop('principal_cache_pending', None)
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -2163,36 +2346,12 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    # Check if token is an API key (starts with 'sk_')
+    # Tokens starting with 'sk_' are API keys; anything else is a JWT
     if token.startswith('sk_'):
-        api_key = db.query(ApiKey).filter(
-            ApiKey.key == token,
-            ApiKey.is_active == True
-        ).first()
-
-        if api_key is None:
-            raise credentials_exception
-
-        # Update last used timestamp
-        api_key.last_used_at = datetime.now(timezone.utc)
-        db.commit()
-
-        # Get the user associated with this API key
-        user = db.query(User).filter(User.id == api_key.user_id).first()
-        if user is None:
-            raise credentials_exception
-        return user
-
-    # Otherwise, treat it as a JWT token
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        user = resolve_api_key_principal(db, token)
+    else:
+        user = resolve_jwt_principal(db, token)
 
-    user = db.query(User).filter(User.email == email).first()
     if user is None:
         raise credentials_exception
     return user
@@ -2214,31 +2373,17 @@ async def get_current_user_flexible(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    token = None
-
-    # Check X-API-Key header first (for Zapier and similar integrations)
+    # Check X-API-Key header first (for Zapier and similar integrations);
+    # an invalid X-API-Key is rejected rather than falling back to Bearer
     api_key_header = request.headers.get("X-API-Key")
     if api_key_header:
-        # Try to find API key in database
-        api_key = db.query(ApiKey).filter(
-            ApiKey.key == api_key_header,
-            ApiKey.is_active == True
-        ).first()
-
-        if api_key:
-            # Update last used timestamp
-            api_key.last_used_at = datetime.now(timezone.utc)
-            db.commit()
-
-            # Get the user associated with this API key
-            user = db.query(User).filter(User.id == api_key.user_id).first()
-            if user:
-                return user
-
-        # If we have X-API-Key header but it's invalid, raise exception
-        raise credentials_exception
+        user = resolve_api_key_principal(db, api_key_header)
+        if user is None:
+            raise credentials_exception
+        return user
 
     # Check Authorization header (Bearer token)
+    token = None
     auth_header = request.headers.get("Authorization")
     if auth_header and auth_header.startswith("Bearer "):
         token = auth_header.replace("Bearer ", "")
@@ -2246,36 +2391,11 @@ async def get_current_user_flexible(
     if not token:
         raise credentials_exception
 
-    # Check if token is an API key (starts with 'sk_')
     if token.startswith('sk_'):
-        api_key = db.query(ApiKey).filter(
-            ApiKey.key == token,
-            ApiKey.is_active == True
-        ).first()
-
-        if api_key is None:
-            raise credentials_exception
-
-        # Update last used timestamp
-        api_key.last_used_at = datetime.now(timezone.utc)
-        db.commit()
-
-        # Get the user associated with this API key
-        user = db.query(User).filter(User.id == api_key.user_id).first()
-        if user is None:
-            raise credentials_exception
-        return user
-
-    # Otherwise, treat it as a JWT token
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        user = resolve_api_key_principal(db, token)
+    else:
+        user = resolve_jwt_principal(db, token)
 
-    user = db.query(User).filter(User.email == email).first()
     if user is None:
         raise credentials_exception
     return user
@@ -2386,6 +2506,122 @@ async def update_ai_action_outcome(
 # AI MEMORY / SMART CHAT ENDPOINT
 # ============================================================================
 
+# Streaming chat: tokens go out as server-sent events; memory, metadata and
+# Mission Control updates run after the stream closes
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+CHAT_FALLBACK_RESPONSE = "I apologize, but I'm having trouble right now. Please try again."
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def wants_event_stream(request: Request, requested: Optional[bool] = None) -> bool:
+    """Stream when the body asks for it or the client accepts text/event-stream"""
+    return bool(requested) or "text/event-stream" in request.headers.get("accept", "")
+
+
+async def _finish_smart_chat_stream(
+    context_ai,
+    prepared: dict,
+    response,
+    state: dict,
+    message: str,
+    user_id: int,
+    lead_id: Optional[int],
+    loan_id: Optional[int],
+    action_id: Optional[str]
+):
+    """Background work after a smart-chat stream: memory, metadata, Mission Control"""
+    db = SessionLocal()
+    try:
+        if not state["completed"]:
+            if action_id:
+                await update_ai_action_outcome(
+                    db=db,
+                    action_id=action_id,
+                    outcome="failure",
+                    impact_score=0.0,
+                    metadata={"error": state["error"] or "client disconnected", "streamed": True,
+                              "partial_chars": len(response.text)}
+                )
+            return
+
+        await context_ai.remember_conversation(
+            db, user_id, message, response.text, lead_id=lead_id, loan_id=loan_id
+        )
+        if action_id:
+            await update_ai_action_outcome(
+                db=db,
+                action_id=action_id,
+                outcome="success",
+                impact_score=0.7,
+                metadata={
+                    "context_used": prepared["context_count"] > 0,
+                    "context_count": prepared["context_count"],
+                    "has_memory": context_ai.vector_memory.enabled,
+                    "streamed": True,
+                    "first_token_ms": response.first_token_ms
+                }
+            )
+    except Exception as e:
+        logger.error(f"Error finishing smart chat stream: {e}")
+    finally:
+        db.close()
+
+
+def _stream_smart_chat(
+    context_ai,
+    prepared: dict,
+    message: str,
+    user_id: int,
+    lead_id: Optional[int],
+    loan_id: Optional[int],
+    action_id: Optional[str]
+) -> StreamingResponse:
+    """
+    SSE stream for smart chat
+
+    Events: context (once), token (text deltas), then done or error.
+    """
+    stream = context_ai.stream_response(prepared, message)
+    state = {"completed": False, "error": None}
+
+    async def events():
+        yield sse_event("context", {
+            "context_used": prepared["context_count"] > 0,
+            "context_count": prepared["context_count"],
+            "has_memory": context_ai.vector_memory.enabled,
+            "action_id": action_id
+        })
+        try:
+            async for chunk in stream:
+                yield sse_event("token", {"text": chunk})
+        except Exception as e:
+            logger.error(f"Smart chat stream failed: {e}")
+            state["error"] = str(e)
+            yield sse_event("error", {"response": CHAT_FALLBACK_RESPONSE, "error": str(e)})
+            return
+
+        state["completed"] = True
+        yield sse_event("done", {
+            "response": stream.response.text,
+            "first_token_ms": stream.response.first_token_ms,
+            "latency_ms": stream.response.latency_ms
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+        background=BackgroundTask(
+            _finish_smart_chat_stream, context_ai, prepared, stream.response, state,
+            message, user_id, lead_id, loan_id, action_id
+        )
+    )
+
+
 @app.post("/api/v1/ai/smart-chat")
 async def smart_chat_with_memory(
     request: Request,
@@ -2395,6 +2631,9 @@ async def smart_chat_with_memory(
     """
     Enhanced AI chat with conversation memory and context retrieval
     Uses RAG (Retrieval-Augmented Generation) for personalized responses
+
+    Send {"stream": true} (or Accept: text/event-stream) to receive the reply
+    as server-sent events; memory storage then happens after the stream ends.
     """
     action_id = None
 
@@ -2425,6 +2664,19 @@ async def smart_chat_with_memory(
         try:
             from ai_memory_service import context_ai
 
+            if wants_event_stream(request, data.get("stream")):
+                prepared = await context_ai.prepare_response(
+                    db=db,
+                    user_id=current_user.id,
+                    current_message=message,
+                    lead_id=lead_id,
+                    loan_id=loan_id,
+                    include_context=include_context
+                )
+                return _stream_smart_chat(
+                    context_ai, prepared, message, current_user.id, lead_id, loan_id, action_id
+                )
+
             result = await context_ai.get_intelligent_response(
                 db=db,
                 user_id=current_user.id,
@@ -2473,7 +2725,7 @@ async def smart_chat_with_memory(
             # Return fallback response
             return {
                 "success": False,
-                "response": "I apologize, but I'm having trouble right now. Please try again.",
+                "response": CHAT_FALLBACK_RESPONSE,
                 "error": str(ai_error)
             }
 
@@ -2497,11 +2749,62 @@ async def smart_chat_with_memory(
 
         return {
             "success": False,
-            "response": "I apologize, but I'm having trouble right now. Please try again.",
+            "response": CHAT_FALLBACK_RESPONSE,
             "error": str(e)
         }
 
 
+# Smart-chat retrievals record memory accesses here; a job writes them in bulk
+memory_access = MemoryAccessBuffer()
+
+
+def flush_memory_access() -> int:
+    """Write buffered ConversationMemory access counts (scheduled job + shutdown)"""
+    db = SessionLocal()
+    try:
+        return memory_access.flush(db, ConversationMemory)
+    except Exception as e:
+        logger.error(f"Memory access flush failed: {e}")
+        return 0
+    finally:
+        db.close()
+
+
+def _link_conversation_memories(links: List[tuple]):
+    """Record the vector IDs of written conversation vectors on their ConversationMemory rows"""
+    from sqlalchemy import bindparam
+
+    table = ConversationMemory.__table__
+    db = SessionLocal()
+    try:
+        db.execute(
+            table.update().where(table.c.id == bindparam("memory_id")).values(pinecone_id=bindparam("vector_id")),
+            [{"memory_id": memory_id, "vector_id": vector_id} for memory_id, vector_id in links]
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def flush_vector_memory() -> int:
+    """
+    Write queued conversation vectors, then link the written ones to their
+    ConversationMemory rows (scheduled; also runs on shutdown)
+    """
+    from integrations.pinecone_service import vector_memory
+
+    written = await vector_memory.flush()
+    loop = asyncio.get_running_loop()
+    try:
+        await vector_memory.record_written(lambda links: loop.run_in_executor(None, _link_conversation_memories, links))
+    except Exception as e:
+        logger.error(f"Conversation memory link failed: {e}")
+    return written
+
+
 @app.get("/api/v1/ai/memory-stats")
 async def get_memory_stats(
     db: Session = Depends(get_db),
@@ -2532,6 +2835,8 @@ async def get_memory_stats(
             "total_memories": memory_count,
             "vector_count": vector_count,
             "memory_enabled": vector_memory.enabled,
+            "vector_store": vector_memory.get_stats(),
+            "access_tracking": memory_access.stats(),
             "top_memories": [{
                 "summary": m.conversation_summary[:100],
                 "access_count": m.access_count,
@@ -2887,6 +3192,20 @@ app.include_router(mission_control_router, tags=["Mission Control"])
 # Include A/B Testing routes
 from ab_testing_routes import router as ab_testing_router
 app.include_router(ab_testing_router, tags=["A/B Testing"])
+from ab_testing.assignment_cache import experiment_cache
+from ab_testing.result_aggregates import ensure_result_aggregates
+
+
+def flush_experiment_assignments() -> int:
+    """Write buffered experiment assignment rows (scheduled job + shutdown)"""
+    db = SessionLocal()
+    try:
+        return experiment_cache.flush(db)
+    except Exception as e:
+        logger.error(f"Experiment assignment flush failed: {e}")
+        return 0
+    finally:
+        db.close()
 
 # Include AI Receptionist Dashboard routes
 from ai_receptionist_dashboard_routes import router as ai_receptionist_dashboard_router
@@ -2938,148 +3257,719 @@ def generate_ai_insights(loan: Loan) -> str:
 
 def calculate_lead_score(lead: Lead) -> int:
     """Calculate AI score for a lead"""
-    score = 50
-
-    if lead.credit_score:
-        if lead.credit_score >= 740:
-            score += 30
-        elif lead.credit_score >= 680:
-            score += 20
-        elif lead.credit_score >= 620:
-            score += 10
-        else:
-            score -= 10
+    return score_lead(lead)
 
-    if lead.preapproval_amount and lead.preapproval_amount > 0:
-        score += 15
+lead_scorer = LeadScorer(Lead)
 
-    if lead.email:
-        score += 5
+@event.listens_for(SessionLocal, "before_flush")
+def _score_changed_leads(session, flush_context, instances):
+    """Rescore new leads and leads whose score inputs changed (update, merge, reconciliation)"""
+    from sqlalchemy import inspect as sa_inspect
 
-    if lead.phone:
-        score += 5
-
-    if lead.debt_to_income:
-        if lead.debt_to_income < 0.36:
-            score += 10
-        elif lead.debt_to_income > 0.50:
-            score -= 15
+    for obj in (*session.new, *session.dirty):
+        if not isinstance(obj, Lead):
+            continue
+        if obj not in session.new:
+            state = sa_inspect(obj)
+            if not any(state.attrs[f].history.has_changes() for f in SCORE_INPUTS):
+                continue
+        obj.ai_score = calculate_lead_score(obj)
+        obj.sentiment = sentiment_for(obj.ai_score)
 
-    return min(max(score, 0), 100)
+def run_lead_rescoring():
+    """Scheduled: rescore leads changed since the last run (rows written by bulk paths, drift)"""
+    db = SessionLocal()
+    try:
+        result = lead_scorer.run(db)
+        if result["rescored"]:
+            logger.info(f"Lead rescoring: {result['rescored']} leads rescored in {result['seconds']}s")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Lead rescoring failed: {e}")
+    finally:
+        db.close()
 
 # ============================================================================
-# DATA RECONCILIATION ENGINE (DRE) - AI EXTRACTION
+# KPI DAILY ROLLUPS
 # ============================================================================
 
-def classify_email_content(content: str, subject: str) -> Dict[str, Any]:
-    """Use AI to classify email content and determine category"""
+KPI_LEAD_FIELDS = ('owner_id', 'created_at', 'stage', 'source', 'credit_score')
+KPI_LOAN_FIELDS = ('loan_officer_id', 'created_at', 'funded_date', 'stage', 'amount', 'loan_type')
 
-    if not openai_client:
-        logger.warning("OpenAI client not initialized - using fallback classification")
-        # Fallback: Use keyword matching to classify
-        content_lower = content.lower()
-        subject_lower = subject.lower()
-
-        if any(word in subject_lower or word in content_lower for word in ['loan', 'mortgage', 'borrower', 'closing', 'rate lock']):
-            return {"category": "loan_update", "subcategory": "general", "confidence": 0.5}
-        else:
-            return {"category": "loan_update", "subcategory": "general", "confidence": 0.3}
-
-    try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are an email classification expert for mortgage loan processing.
-
-Classify emails into categories:
-- lead_update: New lead information or lead status changes
-- loan_update: Active loan milestone updates
-- rate_lock: Rate lock confirmations or expirations
-- appraisal: Appraisal scheduling or results
-- title: Title work, clear to close
-- insurance: HOI binders, insurance updates
-- closing: Closing date/time, CD delivery
-- document: Document receipt confirmations
-- portfolio: Servicing, escrow, tax updates
-- unrelated: Not mortgage-related
-
-Return JSON: {"category": "...", "subcategory": "...", "confidence": 0.0-1.0}"""
-                },
-                {
-                    "role": "user",
-                    "content": f"Subject: {subject}\n\nContent: {content[:1000]}"
-                }
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.3
-        )
+def _rollup_day(value) -> Optional[date]:
+    """Normalize a timestamp (or SQL date() result) to a UTC calendar day"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.date()
+    return value
+
+def _enum_value(value) -> str:
+    return value.value if hasattr(value, 'value') else (value or "")
+
+def _kpi_touched_days(obj, owner_attr: str, day_attrs: tuple, fields: tuple, changed_only: bool) -> Dict[int, Set[date]]:
+    """(user_id -> days) whose rollups an object write affects, old and new values included"""
+    from sqlalchemy import inspect as sa_inspect
+
+    state = sa_inspect(obj)
+    if changed_only and not any(state.attrs[f].history.has_changes() for f in fields):
+        return {}
 
-        result = json.loads(response.choices[0].message.content)
-        return result
-    except Exception as e:
-        logger.error(f"Email classification error: {e}")
-        # Return loan_update with low confidence so email still gets processed
-        return {"category": "loan_update", "subcategory": "error", "confidence": 0.3}
+    def values(attr):
+        history = state.attrs[attr].history
+        found = set(history.added) | set(history.unchanged) | set(history.deleted)
+        return found or {state.dict.get(attr)}
 
-def extract_loan_fields(content: str, category: str) -> Dict[str, Dict[str, Any]]:
-    """Extract structured loan fields from email content"""
+    touched: Dict[int, Set[date]] = {}
+    for user_id in values(owner_attr):
+        if user_id is None:
+            continue
+        days = touched.setdefault(user_id, set())
+        for attr in day_attrs:
+            days.update(d for d in (_rollup_day(v) for v in values(attr)) if d)
+        if not days:
+            days.add(datetime.now(timezone.utc).date())
+    return touched
+
+def _load_previous_kpi_value(target, value, oldvalue, initiator):
+    return value
+
+# Owner and day columns load their previous value when overwritten on an expired
+# instance (e.g. after a commit); otherwise the day a row moves away from keeps its counts
+for _kpi_attr in (Lead.owner_id, Lead.created_at, Loan.loan_officer_id, Loan.created_at, Loan.funded_date):
+    event.listen(_kpi_attr, "set", _load_previous_kpi_value, active_history=True, retval=True)
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_kpi_rollup_changes(session, flush_context):
+    pending = session.info.setdefault('kpi_rollup_pending', {})
+
+    for changed_only, objects in ((False, session.new), (True, session.dirty), (False, session.deleted)):
+        for obj in objects:
+            if isinstance(obj, Lead):
+                touched = _kpi_touched_days(obj, 'owner_id', ('created_at',), KPI_LEAD_FIELDS, changed_only)
+            elif isinstance(obj, Loan):
+                touched = _kpi_touched_days(obj, 'loan_officer_id', ('created_at', 'funded_date'), KPI_LOAN_FIELDS, changed_only)
+            else:
+                continue
+            for user_id, days in touched.items():
+                pending.setdefault(user_id, set()).update(days)
+
+@event.listens_for(SessionLocal, "after_flush_postexec")
+def _apply_kpi_rollup_changes(session, flush_context):
+    pending = session.info.pop('kpi_rollup_pending', None)
+    if not pending:
+        return
+
+    connection = session.connection()
+    for user_id, days in pending.items():
+        if not days:
+            continue
+        try:
+            with connection.begin_nested():
+                refresh_kpi_rollups(connection, user_id, days)
+        except Exception as e:
+            # Never fail the user's write because of a rollup (e.g. a deadlock); a rebuild repairs drift
+            logger.warning(f"KPI rollup refresh failed for user {user_id}: {e}")
 
-    if not openai_client:
-        logger.warning("OpenAI client not initialized - cannot extract loan fields, returning empty")
-        return {}
+def refresh_kpi_rollups(connection, user_id: int, days: Optional[Set[date]] = None) -> int:
+    """
+    Recompute rollup rows for a user from the source tables.
+    days=None rebuilds the user's full history. Returns rows written.
 
-    try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"""Extract mortgage loan fields from this {category} email.
-
-Extract any present fields:
-- loan_number: string
-- borrower_name: string
-- property_address: string
-- loan_amount: float
-- rate: float (as decimal, e.g., 6.125)
-- rate_lock_date: ISO date
-- lock_expiration: ISO date
-- appraisal_date: ISO date
-- appraisal_value: float
-- closing_date: ISO datetime
-- milestone: string (e.g., "RateLocked", "AppraisalOrdered", "ClearToClose")
-- documents_received: list of strings
-- lender: string
-- realtor_name: string
-- title_company: string
-
-For each field found, return:
-{{"field_name": {{"value": actual_value, "confidence": 0.0-1.0}}}}
-
-Return JSON object. Only include fields you found. Use null for missing."""
-                },
-                {
-                    "role": "user",
-                    "content": content[:2000]
-                }
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.2
+    Rows are upserted on (user_id, day, metric, dimension), so concurrent
+    refreshes of the same officer and day never collide on the unique key.
+    """
+    from sqlalchemy import and_, case, or_, select, tuple_
+
+    leads = Lead.__table__
+    loans = Loan.__table__
+    rollups = KPIDailyRollup.__table__
+
+    # One range per run of consecutive days, so a loan funded months after it
+    # was created scans those two days rather than everything in between
+    runs: List[List[date]] = []
+    for day in sorted(days or ()):
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+
+    def day_range(column):
+        if days is None:
+            return []
+        return [or_(*(
+            and_(column >= datetime.combine(first, datetime.min.time()),
+                 column < datetime.combine(last + timedelta(days=1), datetime.min.time()))
+            for first, last in runs
+        ))]
+
+    counters: Dict[tuple, List[float]] = {}
+
+    def add(day, metric, dimension, count, volume=0):
+        day = _rollup_day(day)
+        if day is None or (days is not None and day not in days):
+            return
+        row = counters.setdefault((day, metric, dimension or ""), [0, 0.0])
+        row[0] += int(count or 0)
+        row[1] += float(volume or 0)
+
+    lead_day = func.date(leads.c.created_at)
+    has_credit = case((leads.c.credit_score.isnot(None), 1), else_=0)
+    for day, source, stage, credit, count in connection.execute(
+        select(lead_day, leads.c.source, leads.c.stage, has_credit, func.count())
+        .where(and_(leads.c.owner_id == user_id, *day_range(leads.c.created_at)))
+        .group_by(lead_day, leads.c.source, leads.c.stage, has_credit)
+    ):
+        add(day, 'lead_start', source or "Unknown", count)
+        add(day, 'lead_stage', _enum_value(stage), count)
+        if credit:
+            add(day, 'credit_pull', "", count)
+
+    loan_day = func.date(loans.c.created_at)
+    for day, stage, count, volume in connection.execute(
+        select(loan_day, loans.c.stage, func.count(), func.sum(loans.c.amount))
+        .where(and_(loans.c.loan_officer_id == user_id, *day_range(loans.c.created_at)))
+        .group_by(loan_day, loans.c.stage)
+    ):
+        add(day, 'loan_app', _enum_value(stage), count, volume)
+
+    funded_day = func.date(loans.c.funded_date)
+    for day, loan_type, count, volume in connection.execute(
+        select(funded_day, loans.c.loan_type, func.count(), func.sum(loans.c.amount))
+        .where(and_(
+            loans.c.loan_officer_id == user_id,
+            loans.c.stage == LoanStage.FUNDED,
+            loans.c.funded_date.isnot(None),
+            *day_range(loans.c.funded_date)
+        ))
+        .group_by(funded_day, loans.c.loan_type)
+    ):
+        add(day, 'funded', loan_type or "Unknown", count, volume)
+
+    # Drop rows whose counters fell to zero (all of them on a full rebuild); the rest are upserted
+    delete_stmt = rollups.delete().where(rollups.c.user_id == user_id)
+    if days is not None:
+        delete_stmt = delete_stmt.where(rollups.c.day.in_(sorted(days)))
+    if days is not None and counters:
+        delete_stmt = delete_stmt.where(
+            tuple_(rollups.c.day, rollups.c.metric, rollups.c.dimension).not_in(sorted(counters))
         )
+    connection.execute(delete_stmt)
 
-        fields = json.loads(response.choices[0].message.content)
-        return fields
-    except Exception as e:
-        logger.error(f"Field extraction error: {e}")
-        return {}
+    now = datetime.now(timezone.utc)
+    rows = [
+        {'user_id': user_id, 'day': day, 'metric': metric, 'dimension': dimension,
+         'count': count, 'volume': volume, 'updated_at': now}
+        for (day, metric, dimension), (count, volume) in sorted(counters.items())
+    ]
+    if rows:
+        if connection.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(rollups)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=['user_id', 'day', 'metric', 'dimension'],
+            set_={'count': stmt.excluded.count, 'volume': stmt.excluded.volume, 'updated_at': stmt.excluded.updated_at}
+        ), rows)
+    return len(rows)
+
+def rebuild_kpi_rollups(db: Session, user_id: Optional[int] = None) -> Dict[str, int]:
+    """Rebuild rollups from scratch for one user (or every user)"""
+    user_ids = [user_id] if user_id else [uid for (uid,) in db.query(User.id).all()]
+    connection = db.connection()
+    rows = 0
+    for uid in user_ids:
+        rows += refresh_kpi_rollups(connection, uid)
+    db.commit()
+    return {'users': len(user_ids), 'rows': rows}
 
-def match_entity(fields: Dict[str, Any], db: Session, user_id: int) -> Dict[str, Any]:
-    """Match extracted fields to existing CRM entities"""
+KPI_ROLLUP_BACKFILL_JOB = "kpi_rollup_backfill"
 
-    match_results = {
-        "entity_type": None,
+def backfill_kpi_rollups(db: Session) -> Optional[Dict[str, int]]:
+    """
+    One-time rebuild of every user's rollups for data written before rollups existed.
+    The run is recorded in system_jobs_log, so an install with nothing to roll up
+    does not rebuild again on every start. Returns None once it has run.
+    """
+    done = db.query(SystemJobsLog.id).filter(
+        SystemJobsLog.job_name == KPI_ROLLUP_BACKFILL_JOB,
+        SystemJobsLog.status == 'success'
+    ).first()
+    if done:
+        return None
+
+    started = time.monotonic()
+    result = rebuild_kpi_rollups(db)
+    db.add(SystemJobsLog(
+        job_name=KPI_ROLLUP_BACKFILL_JOB,
+        job_type='data_pipeline',
+        status='success',
+        duration_ms=int((time.monotonic() - started) * 1000),
+        records_processed=result['rows']
+    ))
+    db.commit()
+    return result
+
+def load_kpi_rollups(db: Session, user_id: int, start: Optional[date] = None, end: Optional[date] = None) -> Dict[tuple, Dict[str, float]]:
+    """Sum rollup counters over [start, end] keyed by (metric, dimension)"""
+    query = db.query(
+        KPIDailyRollup.metric,
+        KPIDailyRollup.dimension,
+        func.sum(KPIDailyRollup.count),
+        func.sum(KPIDailyRollup.volume)
+    ).filter(KPIDailyRollup.user_id == user_id)
+    if start:
+        query = query.filter(KPIDailyRollup.day >= start)
+    if end:
+        query = query.filter(KPIDailyRollup.day <= end)
+
+    return {
+        (metric, dimension): {'count': int(count or 0), 'volume': float(volume or 0)}
+        for metric, dimension, count, volume in query.group_by(KPIDailyRollup.metric, KPIDailyRollup.dimension).all()
+    }
+
+def kpi_total(rollups: Dict[tuple, Dict[str, float]], metric: str, dimensions=None, field: str = 'count'):
+    """Total a rollup metric, optionally restricted to some dimensions"""
+    return sum(
+        values[field] for (m, dimension), values in rollups.items()
+        if m == metric and (dimensions is None or dimension in dimensions)
+    )
+
+def kpi_breakdown(rollups: Dict[tuple, Dict[str, float]], metric: str) -> Dict[str, Dict[str, float]]:
+    return {dimension: values for (m, dimension), values in rollups.items() if m == metric}
+
+# ============================================================================
+# AI PERFORMANCE DAILY ROLLUPS (Mission Control)
+# ============================================================================
+
+AI_ACTION_COUNTERS = ('total', 'autonomous', 'successful', 'failed', 'approved', 'rejected',
+                      'cleared', 'scored', 'confidence_sum')
+
+def _ai_action_counter_columns(actions):
+    """Grouped-aggregate expressions over ai_colleague_actions, in AI_ACTION_COUNTERS order"""
+    from sqlalchemy import and_, case
+
+    def flag(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    confidence = actions.c.confidence_score
+    return [
+        func.count(),
+        flag(actions.c.autonomy_level == 'full'),
+        flag(actions.c.outcome == 'success'),
+        flag(actions.c.outcome == 'failure'),
+        flag(actions.c.status == 'approved'),
+        flag(actions.c.status == 'rejected'),
+        flag(or_(actions.c.status == 'approved', func.coalesce(actions.c.required_approval, False) == False)),
+        flag(and_(confidence.isnot(None), confidence != 0)),
+        func.coalesce(func.sum(confidence), 0.0),
+    ]
+
+def _add_ai_counters(target: Dict[str, float], values) -> Dict[str, float]:
+    for name, value in zip(AI_ACTION_COUNTERS, values):
+        target[name] = target.get(name, 0) + (value or 0)
+    return target
+
+def aggregate_ai_actions(db: Session, start: datetime, end: Optional[datetime] = None,
+                         agent_name: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """Live per-agent counters for actions created in [start, end) - one grouped query"""
+    from sqlalchemy import select
+
+    actions = AIColleagueAction.__table__
+    query = select(actions.c.agent_name, *_ai_action_counter_columns(actions)).where(actions.c.created_at >= start)
+    if end is not None:
+        query = query.where(actions.c.created_at < end)
+    if agent_name:
+        query = query.where(actions.c.agent_name == agent_name)
+
+    return {
+        agent: _add_ai_counters({}, values)
+        for agent, *values in db.execute(query.group_by(actions.c.agent_name))
+    }
+
+def refresh_ai_performance_daily(connection, days: Set[date]) -> int:
+    """Recompute ai_performance_daily rows for the given days (all agents). Returns rows written."""
+    from sqlalchemy import and_, case, select
+
+    if not days:
+        return 0
+    actions = AIColleagueAction.__table__
+    rollups = AIPerformanceDaily.__table__
+    action_day = func.date(actions.c.created_at)
+
+    def response(kind):
+        return func.coalesce(func.sum(case((actions.c.customer_response == kind, 1), else_=0)), 0)
+
+    query = select(
+        action_day, actions.c.agent_name, *_ai_action_counter_columns(actions),
+        func.coalesce(func.sum(case((actions.c.confidence_score >= 0.8, 1), else_=0)), 0),
+        func.avg(actions.c.impact_score),
+        func.avg(actions.c.response_time_minutes),
+        response('positive'), response('negative'), response('neutral'),
+    ).where(and_(
+        actions.c.created_at >= datetime.combine(min(days), datetime.min.time()),
+        actions.c.created_at < datetime.combine(max(days) + timedelta(days=1), datetime.min.time()),
+    )).group_by(action_day, actions.c.agent_name)
+
+    now = datetime.now(timezone.utc)
+    rows = []
+    for day, agent, *values in connection.execute(query):
+        day = _rollup_day(day)
+        if day not in days:
+            continue
+        counters = _add_ai_counters({}, values[:len(AI_ACTION_COUNTERS)])
+        high_confidence, avg_impact, avg_response, positive, negative, neutral = values[len(AI_ACTION_COUNTERS):]
+        total = counters['total']
+        rows.append({
+            'date': day,
+            'agent_name': agent,
+            'total_actions': total,
+            'autonomous_actions': counters['autonomous'],
+            'approved_actions': counters['approved'],
+            'rejected_actions': counters['rejected'],
+            'cleared_actions': counters['cleared'],
+            'successful_actions': counters['successful'],
+            'failed_actions': counters['failed'],
+            'success_rate': counters['successful'] / total if total else None,
+            'avg_confidence_score': counters['confidence_sum'] / counters['scored'] if counters['scored'] else None,
+            'scored_actions': counters['scored'],
+            'high_confidence_actions': high_confidence,
+            'avg_impact_score': avg_impact,
+            'avg_customer_response_time': avg_response,
+            'positive_responses': positive,
+            'negative_responses': negative,
+            'neutral_responses': neutral,
+            'created_at': now,
+            'updated_at': now,
+        })
+
+    connection.execute(rollups.delete().where(rollups.c.date.in_(sorted(days))))
+    if rows:
+        connection.execute(rollups.insert(), rows)
+    return len(rows)
+
+def catch_up_ai_performance_daily(db: Session) -> int:
+    """Roll up every complete day after the latest rollup row (full backfill when empty)"""
+    yesterday = datetime.now(timezone.utc).date() - timedelta(days=1)
+    last_rolled = db.query(func.max(AIPerformanceDaily.date)).scalar()
+    if last_rolled is None:
+        first_action = db.query(func.min(AIColleagueAction.created_at)).scalar()
+        if first_action is None:
+            return 0
+        first_day = _rollup_day(first_action)
+    else:
+        first_day = _rollup_day(last_rolled) + timedelta(days=1)
+    if first_day > yesterday:
+        return 0
+
+    rows = 0
+    connection = db.connection()
+    # Chunked so a long backfill never holds one huge transaction
+    while first_day <= yesterday:
+        chunk_end = min(first_day + timedelta(days=30), yesterday)
+        rows += refresh_ai_performance_daily(
+            connection, {first_day + timedelta(days=i) for i in range((chunk_end - first_day).days + 1)}
+        )
+        db.commit()
+        connection = db.connection()
+        first_day = chunk_end + timedelta(days=1)
+    return rows
+
+def run_ai_performance_rollup():
+    """Scheduled: roll up days completed since the last run"""
+    db = SessionLocal()
+    try:
+        rows = catch_up_ai_performance_daily(db)
+        if rows:
+            logger.info(f"AI performance rollup: {rows} agent-days written")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"AI performance rollup failed: {e}")
+    finally:
+        db.close()
+
+def load_ai_action_counters(db: Session, period_start: datetime, period_end: datetime,
+                            agent_name: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Per-agent counters for actions created in [period_start, period_end].
+
+    Complete days covered by ai_performance_daily come from the rollup; the
+    partial first day and everything after the last rolled-up day (normally
+    just today) are aggregated live.
+    """
+    start_day = _rollup_day(period_start)
+    first_full_day = start_day + timedelta(days=1)
+    last_rolled = db.query(func.max(AIPerformanceDaily.date)).scalar()
+    last_full_day = min(_rollup_day(period_end) - timedelta(days=1), _rollup_day(last_rolled) if last_rolled else start_day)
+
+    if last_full_day < first_full_day:
+        return aggregate_ai_actions(db, period_start, agent_name=agent_name)
+
+    totals: Dict[str, Dict[str, float]] = {}
+    rollup_query = db.query(
+        AIPerformanceDaily.agent_name,
+        func.sum(AIPerformanceDaily.total_actions),
+        func.sum(AIPerformanceDaily.autonomous_actions),
+        func.sum(AIPerformanceDaily.successful_actions),
+        func.sum(AIPerformanceDaily.failed_actions),
+        func.sum(AIPerformanceDaily.approved_actions),
+        func.sum(AIPerformanceDaily.rejected_actions),
+        func.sum(AIPerformanceDaily.cleared_actions),
+        func.sum(AIPerformanceDaily.scored_actions),
+        func.sum(AIPerformanceDaily.avg_confidence_score * AIPerformanceDaily.scored_actions),
+    ).filter(
+        AIPerformanceDaily.date >= first_full_day,
+        AIPerformanceDaily.date <= last_full_day
+    )
+    if agent_name:
+        rollup_query = rollup_query.filter(AIPerformanceDaily.agent_name == agent_name)
+    for agent, *values in rollup_query.group_by(AIPerformanceDaily.agent_name).all():
+        _add_ai_counters(totals.setdefault(agent, {}), values)
+
+    def day_start(day: date) -> datetime:
+        return datetime.combine(day, datetime.min.time())
+
+    for agent, counters in aggregate_ai_actions(db, period_start, day_start(first_full_day), agent_name).items():
+        _add_ai_counters(totals.setdefault(agent, {}), (counters[name] for name in AI_ACTION_COUNTERS))
+    for agent, counters in aggregate_ai_actions(db, day_start(last_full_day + timedelta(days=1)), agent_name=agent_name).items():
+        _add_ai_counters(totals.setdefault(agent, {}), (counters[name] for name in AI_ACTION_COUNTERS))
+    return totals
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_ai_performance_changes(session, flush_context):
+    """Past days whose rollup an action write affects (today is always read live)"""
+    from sqlalchemy import inspect as sa_inspect
+
+    today = datetime.now(timezone.utc).date()
+    pending = None
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, AIColleagueAction):
+            continue
+        history = sa_inspect(obj).attrs['created_at'].history
+        for value in (*history.added, *history.unchanged, *history.deleted):
+            day = _rollup_day(value)
+            if day and day < today:
+                if pending is None:
+                    pending = session.info.setdefault('ai_performance_pending', set())
+                pending.add(day)
+
+@event.listens_for(SessionLocal, "after_flush_postexec")
+def _apply_ai_performance_changes(session, flush_context):
+    from sqlalchemy import select
+
+    days = session.info.pop('ai_performance_pending', None)
+    if not days:
+        return
+    connection = session.connection()
+    try:
+        with connection.begin_nested():
+            # Days after the last rolled-up day are read live until the catch-up job reaches them
+            last_rolled = connection.execute(select(func.max(AIPerformanceDaily.__table__.c.date))).scalar()
+            covered = {day for day in days if last_rolled and day <= _rollup_day(last_rolled)}
+            refresh_ai_performance_daily(connection, covered)
+    except Exception as e:
+        # Never fail the write because of a rollup; the next catch-up or edit repairs it
+        logger.warning(f"AI performance rollup refresh failed for {sorted(days)}: {e}")
+
+# ============================================================================
+# IN-MEMORY NAME INDEXES (borrower-name matching, duplicate lead blocking)
+# ============================================================================
+
+def _entity_index_fingerprint(db: Session, user_id: int):
+    def load():
+        lead_count, lead_max = db.query(func.count(Lead.id), func.max(Lead.updated_at)).filter(
+            Lead.owner_id == user_id
+        ).one()
+        loan_count, loan_max = db.query(func.count(Loan.id), func.max(Loan.updated_at)).filter(
+            Loan.loan_officer_id == user_id
+        ).one()
+        stamps = [ts for ts in (lead_max, loan_max) if ts is not None]
+        return (lead_count or 0) + (loan_count or 0), max(stamps) if stamps else None
+    return load
+
+def _entity_index_rows(db: Session, user_id: int):
+    def load():
+        for lead_id, name, updated_at in db.query(Lead.id, Lead.name, Lead.updated_at).filter(
+            Lead.owner_id == user_id
+        ).yield_per(5000):
+            yield ("lead", lead_id), [name], updated_at
+        for loan_id, borrower, coborrower, updated_at in db.query(
+            Loan.id, Loan.borrower_name, Loan.coborrower_name, Loan.updated_at
+        ).filter(Loan.loan_officer_id == user_id).yield_per(5000):
+            yield ("loan", loan_id), [borrower, coborrower], updated_at
+    return load
+
+# Name and duplicate indexes kept in step with flushed Lead/Loan writes:
+# registry -> {model: (owner attribute, indexed attributes)}
+INDEXED_FIELDS = {
+    entity_name_registry: {
+        Lead: ('owner_id', ('name',)),
+        Loan: ('loan_officer_id', ('borrower_name', 'coborrower_name')),
+    },
+    lead_index_registry: {
+        Lead: ('owner_id', ('name', 'email', 'phone')),
+    },
+}
+
+def _index_ops(registry, obj, deleted: bool) -> List[tuple]:
+    """Registry operations implied by a flushed write: (method, user_id, *args)"""
+    from sqlalchemy import inspect as sa_inspect
+
+    owner_attr, attrs = INDEXED_FIELDS[registry][type(obj)]
+    state = sa_inspect(obj)
+    row_id = state.identity[0] if state.identity else obj.id
+    if registry is entity_name_registry:
+        # Entity name keys span leads and loans; names are passed as one list
+        key, pack = ("lead" if isinstance(obj, Lead) else "loan", row_id), lambda values: (values,)
+    else:
+        key, pack = row_id, tuple
+    owner_history = state.attrs[owner_attr].history
+    owner = state.dict.get(owner_attr)
+
+    if deleted:
+        owners = set(owner_history.deleted) | set(owner_history.unchanged) | {owner}
+        return [("remove", user_id, key) for user_id in owners if user_id is not None]
+
+    ops = [("remove", user_id, key) for user_id in owner_history.deleted if user_id is not None and user_id != owner]
+    if owner is None:
+        return ops
+    updated_at = state.dict.get('updated_at')
+    if all(attr in state.dict for attr in attrs):
+        ops.append(("upsert", owner, key, *pack([state.dict[attr] for attr in attrs]), updated_at))
+    else:
+        ops.append(("touch", owner, updated_at))
+    return ops
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_index_changes(session, flush_context):
+    pending = session.info.setdefault('index_pending', [])
+    for deleted, objects in ((False, session.new), (False, session.dirty), (True, session.deleted)):
+        for obj in objects:
+            for registry, models in INDEXED_FIELDS.items():
+                if type(obj) in models:
+                    pending.extend((registry, *op) for op in _index_ops(registry, obj, deleted))
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_index_changes(session):
+    # Applied only once committed so a rolled-back write never reaches an index
+    for registry, method, user_id, *args in session.info.pop('index_pending', ()):
+        getattr(registry, method)(user_id, *args)
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_index_changes(session):
+    session.info.pop('index_pending', None)
+
+def search_entity_names(db: Session, user_id: int, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    """Ranked lead/loan name matches for a user: [{key: (type, id), name, score}]"""
+    index = entity_name_registry.get(user_id, _entity_index_fingerprint(db, user_id), _entity_index_rows(db, user_id))
+    return index.search(query, limit=limit)
+
+# ============================================================================
+# DATA RECONCILIATION ENGINE (DRE) - AI EXTRACTION
+# ============================================================================
+
+# Content-hash cache shared by the synchronous helpers below and the DRE pipeline
+llm_result_cache = LLMResultCache(LLMResultCacheEntry)
+
+def _store_llm_result(db: Session, cache_key: str, stage: str, model: str, system_prompt: str, result: Any):
+    """Cache a result in a savepoint of the caller's session; the caller commits"""
+    try:
+        with db.begin_nested():
+            llm_result_cache.put(db, cache_key, stage, model, prompt_version(system_prompt), result)
+    except Exception as e:
+        # A concurrent writer cached the same content; the result is still valid
+        logger.warning(f"Could not cache {stage} result: {e}")
+
+async def classify_email_content(content: str, subject: str, db: Optional[Session] = None,
+                                 bypass_cache: bool = False) -> Dict[str, Any]:
+    """
+    Use AI to classify email content and determine category.
+    Pass db to use the result cache; bypass_cache forces a fresh LLM call.
+    """
+
+    if not llm_client.available(OPENAI):
+        logger.warning("OpenAI client not initialized - using fallback classification")
+        # Fallback: Use keyword matching to classify
+        return keyword_classification(content, subject)
+
+    cache_key = llm_result_cache.classification_key(CLASSIFY_MODEL, CLASSIFY_SYSTEM_PROMPT, content, subject) if db is not None else None
+    if cache_key and not bypass_cache:
+        cached = llm_result_cache.get(db, cache_key)
+        if cached is not None:
+            return cached
+    elif cache_key:
+        llm_result_cache.count_bypass()
+
+    try:
+        response = await llm_client.complete(
+            OPENAI,
+            CLASSIFY_MODEL,
+            [{"role": "user", "content": classify_user_message(content, subject)}],
+            system=CLASSIFY_SYSTEM_PROMPT,
+            json_mode=True,
+            temperature=0.3,
+            purpose="dre_classify"
+        )
+
+        result = response.json()
+        if cache_key:
+            _store_llm_result(db, cache_key, "classify", CLASSIFY_MODEL, CLASSIFY_SYSTEM_PROMPT, result)
+        return result
+    except Exception as e:
+        logger.error(f"Email classification error: {e}")
+        # Return loan_update with low confidence so email still gets processed
+        return {"category": "loan_update", "subcategory": "error", "confidence": 0.3}
+
+async def extract_loan_fields(content: str, category: str, db: Optional[Session] = None,
+                              bypass_cache: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    Extract structured loan fields from email content.
+    Pass db to use the result cache; bypass_cache forces a fresh LLM call.
+    """
+
+    if not llm_client.available(OPENAI):
+        logger.warning("OpenAI client not initialized - cannot extract loan fields, returning empty")
+        return {}
+
+    system_prompt = extract_system_prompt(category)
+    cache_key = llm_result_cache.extraction_key(EXTRACT_MODEL, system_prompt, content) if db is not None else None
+    if cache_key and not bypass_cache:
+        cached = llm_result_cache.get(db, cache_key)
+        if cached is not None:
+            return cached
+    elif cache_key:
+        llm_result_cache.count_bypass()
+
+    try:
+        response = await llm_client.complete(
+            OPENAI,
+            EXTRACT_MODEL,
+            [{"role": "user", "content": extract_user_message(content)}],
+            system=system_prompt,
+            json_mode=True,
+            temperature=0.2,
+            max_tokens=2000,
+            purpose="dre_extract"
+        )
+
+        fields = response.json()
+        if cache_key:
+            _store_llm_result(db, cache_key, "extract", EXTRACT_MODEL, system_prompt, fields)
+        return fields
+    except Exception as e:
+        logger.error(f"Field extraction error: {e}")
+        return {}
+
+def match_entity(fields: Dict[str, Any], db: Session, user_id: int) -> Dict[str, Any]:
+    """Match extracted fields to existing CRM entities"""
+
+    match_results = {
+        "entity_type": None,
         "entity_id": None,
         "confidence": 0.0,
         "candidates": []
@@ -3099,31 +3989,18 @@ def match_entity(fields: Dict[str, Any], db: Session, user_id: int) -> Dict[str,
             match_results["confidence"] = 0.95
             return match_results
 
-    # Try to match by borrower name + fuzzy matching
+    # Match borrower name against the user's indexed lead/loan names
     if "borrower_name" in fields and fields["borrower_name"].get("value"):
-        borrower = fields["borrower_name"]["value"].lower()
-
-        # Try leads first
-        leads = db.query(Lead).filter(Lead.owner_id == user_id).all()
-        for lead in leads:
-            if lead.name and borrower in lead.name.lower():
-                match_results["candidates"].append({
-                    "type": "lead",
-                    "id": lead.id,
-                    "name": lead.name,
-                    "confidence": 0.75
-                })
-
-        # Try loans
-        loans = db.query(Loan).filter(Loan.loan_officer_id == user_id).all()
-        for loan in loans:
-            if loan.borrower_name and borrower in loan.borrower_name.lower():
-                match_results["candidates"].append({
-                    "type": "loan",
-                    "id": loan.id,
-                    "name": loan.borrower_name,
-                    "confidence": 0.80
-                })
+        base_confidence = {"lead": 0.75, "loan": 0.80}
+        for match in search_entity_names(db, user_id, str(fields["borrower_name"]["value"])):
+            entity_type, entity_id = match["key"]
+            match_results["candidates"].append({
+                "type": entity_type,
+                "id": entity_id,
+                "name": match["name"],
+                "score": match["score"],
+                "confidence": round(base_confidence[entity_type] * match["score"], 4)
+            })
 
     # Return best candidate if found
     if match_results["candidates"]:
@@ -3134,60 +4011,86 @@ def match_entity(fields: Dict[str, Any], db: Session, user_id: int) -> Dict[str,
 
     return match_results
 
-def apply_extracted_data(extracted_data: ExtractedData, db: Session) -> bool:
-    """Apply extracted data to CRM entities"""
+# CRM models extracted data can be applied to, by match_entity_type
+RECONCILIATION_ENTITY_MODELS = {"loan": Loan, "lead": Lead}
 
-    try:
-        if extracted_data.match_entity_type == "loan" and extracted_data.match_entity_id:
-            loan = db.query(Loan).filter(Loan.id == extracted_data.match_entity_id).first()
-            if not loan:
-                return False
+def extracted_field_updates(extracted_data: ExtractedData) -> Dict[str, Any]:
+    """
+    Column updates for the matched loan or lead from high-confidence fields
 
-            # Apply high-confidence fields
-            fields = extracted_data.fields
+    Raises ValueError/KeyError/TypeError when a field value cannot be converted.
+    """
+    fields = extracted_data.fields or {}
+    updates = {}
 
-            if "rate" in fields and fields["rate"]["confidence"] > 0.85:
-                loan.rate = float(fields["rate"]["value"])
+    def confident(name: str, threshold: float) -> bool:
+        return name in fields and fields[name]["confidence"] > threshold
 
-            if "loan_amount" in fields and fields["loan_amount"]["confidence"] > 0.85:
-                loan.loan_amount = float(fields["loan_amount"]["value"])
+    if extracted_data.match_entity_type == "loan":
+        if confident("rate", 0.85):
+            updates["rate"] = float(fields["rate"]["value"])
 
-            if "closing_date" in fields and fields["closing_date"]["confidence"] > 0.80:
-                loan.closing_date = datetime.fromisoformat(fields["closing_date"]["value"])
+        if confident("loan_amount", 0.85):
+            updates["amount"] = float(fields["loan_amount"]["value"])
 
-            if "milestone" in fields and fields["milestone"]["confidence"] > 0.90:
-                # Update stage based on milestone
-                milestone = fields["milestone"]["value"]
-                if "ClearToClose" in milestone or "CTC" in milestone:
-                    loan.stage = LoanStage.CTC
-                elif "Processing" in milestone:
-                    loan.stage = LoanStage.PROCESSING
+        if confident("closing_date", 0.80):
+            updates["closing_date"] = datetime.fromisoformat(fields["closing_date"]["value"])
 
-            db.commit()
-            return True
+        if confident("milestone", 0.90):
+            # Update stage based on milestone
+            milestone = fields["milestone"]["value"]
+            if "ClearToClose" in milestone or "CTC" in milestone:
+                updates["stage"] = LoanStage.CTC
+            elif "Processing" in milestone:
+                updates["stage"] = LoanStage.PROCESSING
 
-        elif extracted_data.match_entity_type == "lead" and extracted_data.match_entity_id:
-            lead = db.query(Lead).filter(Lead.id == extracted_data.match_entity_id).first()
-            if not lead:
-                return False
+    elif extracted_data.match_entity_type == "lead":
+        if confident("credit_score", 0.85):
+            updates["credit_score"] = int(fields["credit_score"]["value"])
 
-            fields = extracted_data.fields
+        if confident("loan_amount", 0.80):
+            updates["loan_amount"] = float(fields["loan_amount"]["value"])
 
-            if "credit_score" in fields and fields["credit_score"]["confidence"] > 0.85:
-                lead.credit_score = int(fields["credit_score"]["value"])
+    return updates
 
-            if "loan_amount" in fields and fields["loan_amount"]["confidence"] > 0.80:
-                lead.loan_amount = float(fields["loan_amount"]["value"])
+def apply_extracted_data(extracted_data: ExtractedData, db: Session) -> bool:
+    """Apply extracted data to CRM entities"""
 
-            db.commit()
-            return True
+    try:
+        model = RECONCILIATION_ENTITY_MODELS.get(extracted_data.match_entity_type)
+        if not model or not extracted_data.match_entity_id:
+            return False
 
-        return False
+        entity = db.query(model).filter(model.id == extracted_data.match_entity_id).first()
+        if not entity:
+            return False
+
+        for column, value in extracted_field_updates(extracted_data).items():
+            setattr(entity, column, value)
+
+        db.commit()
+        return True
     except Exception as e:
         logger.error(f"Apply extracted data error: {e}")
         db.rollback()
         return False
 
+def reject_extracted_data(extracted_data: ExtractedData, user_id: int, db: Session):
+    """Mark extracted data rejected and label every field as rejected for training (caller commits)"""
+    for field_name, field_data in (extracted_data.fields or {}).items():
+        db.add(AITrainingEvent(
+            extracted_data_id=extracted_data.id,
+            field_name=field_name,
+            original_value=str(field_data.get("value", "")),
+            corrected_value="",  # Empty means rejected
+            label="rejected",
+            user_id=user_id
+        ))
+
+    extracted_data.status = "rejected"
+    extracted_data.reviewed_by = user_id
+    extracted_data.reviewed_at = datetime.now(timezone.utc)
+
 # ============================================================================
 # MICROSOFT OAUTH & EMAIL SYNC FUNCTIONS
 # ============================================================================
@@ -3259,56 +4162,52 @@ async def refresh_microsoft_token(oauth_record: MicrosoftOAuthToken, db: Session
         return False
 
 async def fetch_microsoft_emails(oauth_record: MicrosoftOAuthToken, db: Session, limit: int = 50):
-    """Fetch emails from Microsoft Graph API"""
-    try:
-        # Check if token needs refresh
-        if oauth_record.token_expires_at:
-            # Ensure token_expires_at is timezone-aware
-            token_expiry = oauth_record.token_expires_at
-            if token_expiry.tzinfo is None:
-                token_expiry = token_expiry.replace(tzinfo=timezone.utc)
-
-            if token_expiry < datetime.now(timezone.utc) + timedelta(minutes=5):
-                logger.info("Token expiring soon, refreshing...")
-                if not await refresh_microsoft_token(oauth_record, db):
-                    return {"error": "Failed to refresh token"}
-
-        access_token = decrypt_token(oauth_record.access_token)
-
-        # Microsoft Graph API endpoint
-        folder = oauth_record.sync_folder or "Inbox"
-        # Simplified query - just get recent emails ordered by date
-        graph_url = f"https://graph.microsoft.com/v1.0/me/mailFolders/{folder}/messages?$top={limit}&$orderby=receivedDateTime desc"
-
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
-        }
-
-        response = requests.get(graph_url, headers=headers)
-
-        if response.status_code == 200:
-            emails_data = response.json()
-            emails = emails_data.get("value", [])
+    """
+    Fetch new emails from Microsoft Graph using the stored delta cursor.
 
-            logger.info(f"Fetched {len(emails)} emails from Microsoft for user {oauth_record.user_id}")
+    Returns {"emails", "count", "delta_link"}; "emails" only contains messages
+    not yet ingested. Save delta_link to oauth_record.mail_delta_link once the
+    emails are processed so the next sync continues from there.
+    """
+    try:
+        emails, delta_link = await mailbox_sync_engine.fetch_messages(oauth_record, db, page_size=limit)
+        new_emails = filter_unprocessed_microsoft_emails(db, oauth_record.user_id, emails)
 
-            # Update last sync time
-            oauth_record.last_sync_at = datetime.now(timezone.utc)
-            db.commit()
-
-            return {"emails": emails, "count": len(emails)}
-        else:
-            error_detail = response.text
-            logger.error(f"Failed to fetch Microsoft emails: {response.status_code} - {error_detail}")
-            return {"error": f"Microsoft API error: {response.status_code} - {error_detail[:200]}"}
+        logger.info(f"Fetched {len(emails)} changed emails ({len(new_emails)} new) from Microsoft for user {oauth_record.user_id}")
+        return {"emails": new_emails, "count": len(new_emails), "delta_link": delta_link}
 
     except Exception as e:
         logger.error(f"Error fetching Microsoft emails: {e}")
         return {"error": str(e)}
 
-async def process_microsoft_email_to_dre(email_data: dict, user_id: int, db: Session):
-    """Process a Microsoft Graph email and ingest into DRE"""
+def filter_unprocessed_microsoft_emails(db: Session, user_id: int, emails: List[dict]) -> List[dict]:
+    """Drop Graph messages that were already ingested, using one IN query per chunk"""
+    message_ids = list({e.get("id") for e in emails if e.get("id")})
+    seen = set()
+    for i in range(0, len(message_ids), 500):
+        chunk = message_ids[i:i + 500]
+        seen.update(row[0] for row in db.query(IncomingDataEvent.external_message_id).filter(
+            IncomingDataEvent.user_id == user_id,
+            IncomingDataEvent.external_message_id.in_(chunk)
+        ).all())
+
+    new_emails = []
+    for email_data in emails:
+        message_id = email_data.get("id")
+        if message_id in seen:
+            continue
+        if message_id:
+            # Delta pages can repeat a message that changed twice in one window
+            seen.add(message_id)
+        new_emails.append(email_data)
+    return new_emails
+
+async def process_microsoft_email_to_dre(email_data: dict, user_id: int, db: Session, deduplicated: bool = False):
+    """
+    Process a Microsoft Graph email and ingest into DRE.
+    Pass deduplicated=True when the batch was already run through
+    filter_unprocessed_microsoft_emails.
+    """
     try:
         # Extract email data
         message_id = email_data.get("id", "")  # Microsoft Graph message ID
@@ -3318,7 +4217,7 @@ async def process_microsoft_email_to_dre(email_data: dict, user_id: int, db: Ses
         received_at = email_data.get("receivedDateTime", "")
 
         # Check if this email was already processed (deduplication)
-        if message_id:
+        if message_id and not deduplicated:
             existing_event = db.query(IncomingDataEvent).filter(
                 IncomingDataEvent.external_message_id == message_id,
                 IncomingDataEvent.user_id == user_id
@@ -3352,57 +4251,61 @@ async def process_microsoft_email_to_dre(email_data: dict, user_id: int, db: Ses
 
         logger.info(f"Ingested NEW Microsoft email {db_event.id} from {sender} (msg_id: {message_id[:20]}...)")
 
-        # Trigger extraction
-        content = raw_text or raw_html or ""
-        classification = classify_email_content(content, subject)
+        # Classification and extraction happen in the background DRE pipeline
+        return {"status": "success", "event_id": db_event.id}
 
-        # More lenient extraction - lower confidence threshold and allow emails with no fields
-        # This ensures all emails appear in Reconciliation for user review and AI learning
-        if classification["category"] != "unrelated" and classification["confidence"] >= 0.3:
-            fields = extract_loan_fields(content, classification["category"])
+    except Exception as e:
+        logger.error(f"Error processing Microsoft email: {e}")
+        db.rollback()
+        return {"status": "error", "error": str(e)}
 
-            # Create extracted_data even if no fields found - user can manually review
-            confidences = [field.get("confidence", 0.0) for field in fields.values()] if fields else []
-            avg_confidence = sum(confidences) / len(confidences) if confidences else classification["confidence"]
+def finalize_dre_event(db: Session, event: IncomingDataEvent, classification: Dict[str, Any],
+                      fields: Dict[str, Dict[str, Any]]) -> Optional[ExtractedData]:
+    """
+    Store the pipeline's classification/extraction for one event: match the
+    entity, create the ExtractedData review item, auto-apply when confident
+    and mark the event processed. Unrelated emails are only marked processed.
+    """
+    extracted = None
 
-            entity_match = match_entity(fields, db, user_id) if fields else {"entity_type": None, "entity_id": None, "confidence": 0.0}
+    # Lenient thresholds so every mortgage email shows up in Reconciliation
+    # for user review and AI learning, even when no fields were found
+    if classification["category"] != "unrelated" and classification["confidence"] >= MIN_CLASSIFICATION_CONFIDENCE:
+        confidences = [field.get("confidence", 0.0) for field in fields.values()] if fields else []
+        avg_confidence = sum(confidences) / len(confidences) if confidences else classification["confidence"]
 
-            # Determine status based on confidence
-            status = "needs_review"  # Default to needs_review for safety
-            if fields and avg_confidence > 0.85 and entity_match["confidence"] > 0.90:
-                status = "auto_approved"
-            elif fields and avg_confidence >= 0.60 and entity_match["confidence"] >= 0.50:
-                status = "pending_review"
-            # Everything else stays as needs_review
+        entity_match = match_entity(fields, db, event.user_id) if fields else {"entity_type": None, "entity_id": None, "confidence": 0.0}
 
-            extracted = ExtractedData(
-                event_id=db_event.id,
-                category=classification["category"],
-                subcategory=classification.get("subcategory"),
-                fields=fields or {},  # Use empty dict if no fields
-                match_entity_type=entity_match["entity_type"],
-                match_entity_id=entity_match["entity_id"],
-                match_confidence=entity_match["confidence"],
-                ai_confidence=avg_confidence,
-                status=status
-            )
-            db.add(extracted)
-            db_event.processed = True
-            db.commit()
+        # Determine status based on confidence
+        status = "needs_review"  # Default to needs_review for safety
+        if fields and avg_confidence > 0.85 and entity_match["confidence"] > 0.90:
+            status = "auto_approved"
+        elif fields and avg_confidence >= 0.60 and entity_match["confidence"] >= 0.50:
+            status = "pending_review"
 
-            # Auto-apply if high confidence
-            if status == "auto_approved":
-                if apply_extracted_data(extracted, db):
-                    extracted.status = "applied"
-                    db.commit()
-                    logger.info(f"Auto-applied extraction from email {db_event.id}")
+        extracted = ExtractedData(
+            event_id=event.id,
+            category=classification["category"],
+            subcategory=classification.get("subcategory"),
+            fields=fields or {},
+            match_entity_type=entity_match["entity_type"],
+            match_entity_id=entity_match["entity_id"],
+            match_confidence=entity_match["confidence"],
+            ai_confidence=avg_confidence,
+            status=status
+        )
+        db.add(extracted)
 
-        return {"status": "success", "event_id": db_event.id}
+    event.processed = True
+    db.commit()
 
-    except Exception as e:
-        logger.error(f"Error processing Microsoft email: {e}")
-        db.rollback()
-        return {"status": "error", "error": str(e)}
+    if extracted is not None and extracted.status == "auto_approved":
+        if apply_extracted_data(extracted, db):
+            extracted.status = "applied"
+            db.commit()
+            logger.info(f"Auto-applied extraction from email {event.id}")
+
+    return extracted
 
 # ============================================================================
 # DATA RECONCILIATION ENGINE - API ENDPOINTS
@@ -3447,10 +4350,11 @@ async def ingest_email_data(
 @app.post("/api/v1/reconciliation/extract/{event_id}")
 async def extract_email_data(
     event_id: int,
+    bypass_cache: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Trigger AI extraction on an ingested email event"""
+    """Trigger AI extraction on an ingested email event (bypass_cache=true forces fresh LLM calls)"""
     try:
         # Get the event
         event = db.query(IncomingDataEvent).filter(
@@ -3465,7 +4369,7 @@ async def extract_email_data(
         content = event.raw_text or event.raw_html or ""
         subject = event.subject or ""
 
-        classification = classify_email_content(content, subject)
+        classification = await classify_email_content(content, subject, db=db, bypass_cache=bypass_cache)
 
         if classification["category"] == "unrelated" or classification["confidence"] < 0.5:
             event.processed = True
@@ -3477,7 +4381,7 @@ async def extract_email_data(
             }
 
         # Extract fields
-        fields = extract_loan_fields(content, classification["category"])
+        fields = await extract_loan_fields(content, classification["category"], db=db, bypass_cache=bypass_cache)
 
         if not fields:
             event.processed = True
@@ -3549,59 +4453,179 @@ async def extract_email_data(
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+# Review queue page size; the ReconciliationCenter shows the newest items first
+RECONCILIATION_PAGE_SIZE = 50
+RECONCILIATION_MAX_PAGE_SIZE = 200
+RECONCILIATION_REVIEW_STATUSES = ["pending_review", "needs_review"]
+# Same thresholds as the ReconciliationCenter confidence badges
+RECONCILIATION_HIGH_CONFIDENCE = 0.85
+RECONCILIATION_MEDIUM_CONFIDENCE = 0.65
+
+
+def encode_reconciliation_cursor(item_id: int) -> str:
+    """Opaque cursor for the item after which the next page starts"""
+    return base64.urlsafe_b64encode(json.dumps({"id": item_id}).encode()).decode().rstrip("=")
+
+
+def decode_reconciliation_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded.encode()))["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def reconciliation_queue_query(db: Session, user_id: int, *columns):
+    """Review-queue rows for a user: extracted data joined to its incoming event"""
+    return db.query(*columns).join(
+        IncomingDataEvent,
+        ExtractedData.event_id == IncomingDataEvent.id
+    ).filter(
+        IncomingDataEvent.user_id == user_id,
+        ExtractedData.status.in_(RECONCILIATION_REVIEW_STATUSES)
+    )
+
+
 @app.get("/api/v1/reconciliation/pending")
 async def get_pending_reconciliation(
+    limit: int = RECONCILIATION_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    confidence: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get all pending reconciliation items for review"""
-    try:
-        # Get all extracted data that needs review
-        pending = db.query(ExtractedData).join(
-            IncomingDataEvent,
-            ExtractedData.event_id == IncomingDataEvent.id
-        ).filter(
-            IncomingDataEvent.user_id == current_user.id,
-            ExtractedData.status.in_(["pending_review", "needs_review"])
-        ).order_by(ExtractedData.created_at.desc()).all()
+    """
+    Get pending reconciliation items for review, newest first
 
-        # Format response with event details
-        results = []
-        for item in pending:
-            event = db.query(IncomingDataEvent).filter(
-                IncomingDataEvent.id == item.event_id
-            ).first()
+    Pages are keyset-paginated: pass the returned next_cursor to get the
+    following page. Optional filters: category, and confidence band
+    (high >= 0.85, medium >= 0.65, low otherwise, as shown in the UI).
+    """
+    try:
+        limit = max(1, min(limit, RECONCILIATION_MAX_PAGE_SIZE))
+
+        # One query with the email columns the queue shows; the raw email
+        # bodies are not loaded
+        query = reconciliation_queue_query(
+            db, current_user.id,
+            ExtractedData.id,
+            ExtractedData.event_id,
+            ExtractedData.category,
+            ExtractedData.subcategory,
+            ExtractedData.fields,
+            ExtractedData.match_entity_type,
+            ExtractedData.match_entity_id,
+            ExtractedData.match_confidence,
+            ExtractedData.ai_confidence,
+            ExtractedData.status,
+            ExtractedData.created_at,
+            IncomingDataEvent.subject,
+            IncomingDataEvent.sender,
+            IncomingDataEvent.received_at
+        )
 
-            results.append({
-                "id": item.id,
-                "event_id": item.event_id,
-                "category": item.category,
-                "subcategory": item.subcategory,
-                "fields": item.fields,
-                "match_entity_type": item.match_entity_type,
-                "match_entity_id": item.match_entity_id,
-                "match_confidence": item.match_confidence,
-                "ai_confidence": item.ai_confidence,
-                "status": item.status,
-                "created_at": item.created_at,
-                "email": {
-                    "subject": event.subject,
-                    "sender": event.sender,
-                    "received_at": event.received_at
-                }
-            })
+        if category:
+            query = query.filter(ExtractedData.category == category)
+        if confidence == "high":
+            query = query.filter(ExtractedData.ai_confidence >= RECONCILIATION_HIGH_CONFIDENCE)
+        elif confidence == "medium":
+            query = query.filter(
+                ExtractedData.ai_confidence >= RECONCILIATION_MEDIUM_CONFIDENCE,
+                ExtractedData.ai_confidence < RECONCILIATION_HIGH_CONFIDENCE
+            )
+        elif confidence == "low":
+            query = query.filter(or_(
+                ExtractedData.ai_confidence < RECONCILIATION_MEDIUM_CONFIDENCE,
+                ExtractedData.ai_confidence.is_(None)
+            ))
+        elif confidence:
+            raise HTTPException(status_code=400, detail="confidence must be one of: high, medium, low")
+
+        # IDs increase with created_at, so ordering by ID keeps the newest-first
+        # order and gives a unique keyset
+        if cursor:
+            query = query.filter(ExtractedData.id < decode_reconciliation_cursor(cursor))
+        rows = query.order_by(ExtractedData.id.desc()).limit(limit + 1).all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        results = [{
+            "id": row.id,
+            "event_id": row.event_id,
+            "category": row.category,
+            "subcategory": row.subcategory,
+            "fields": row.fields,
+            "match_entity_type": row.match_entity_type,
+            "match_entity_id": row.match_entity_id,
+            "match_confidence": row.match_confidence,
+            "ai_confidence": row.ai_confidence,
+            "status": row.status,
+            "created_at": row.created_at,
+            "email": {
+                "subject": row.subject,
+                "sender": row.sender,
+                "received_at": row.received_at
+            }
+        } for row in rows]
 
         logger.info(f"Retrieved {len(results)} pending reconciliation items for user {current_user.id}")
 
         return {
             "status": "success",
             "count": len(results),
-            "items": results
+            "items": results,
+            "has_more": has_more,
+            "next_cursor": encode_reconciliation_cursor(rows[-1].id) if has_more else None
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get pending error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v1/reconciliation/pending/count")
+async def get_pending_reconciliation_count(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Pending review counts for badges, by category and confidence band, in one aggregate query"""
+    from sqlalchemy import case
+
+    try:
+        high = func.sum(case((ExtractedData.ai_confidence >= RECONCILIATION_HIGH_CONFIDENCE, 1), else_=0))
+        medium = func.sum(case((
+            (ExtractedData.ai_confidence >= RECONCILIATION_MEDIUM_CONFIDENCE) &
+            (ExtractedData.ai_confidence < RECONCILIATION_HIGH_CONFIDENCE), 1
+        ), else_=0))
+        rows = reconciliation_queue_query(
+            db, current_user.id,
+            ExtractedData.category,
+            func.count(ExtractedData.id),
+            high,
+            medium
+        ).group_by(ExtractedData.category).all()
+
+        by_category = {}
+        by_confidence = {"high": 0, "medium": 0, "low": 0}
+        for category, count, high_count, medium_count in rows:
+            high_count, medium_count = int(high_count or 0), int(medium_count or 0)
+            by_category[category or "uncategorized"] = count
+            by_confidence["high"] += high_count
+            by_confidence["medium"] += medium_count
+            by_confidence["low"] += count - high_count - medium_count
+
+        return {
+            "status": "success",
+            "total": sum(by_category.values()),
+            "by_category": by_category,
+            "by_confidence": by_confidence
+        }
+    except Exception as e:
+        logger.error(f"Get pending count error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/v1/reconciliation/approve")
 async def approve_reconciliation(
     approval: ReconciliationApproval,
@@ -3695,19 +4719,7 @@ async def reject_reconciliation(
             raise HTTPException(status_code=404, detail="Extracted data not found")
 
         # Create training events for all fields (mark as incorrect)
-        for field_name, field_data in extracted.fields.items():
-            training = AITrainingEvent(
-                extracted_data_id=extracted.id,
-                field_name=field_name,
-                original_value=str(field_data.get("value", "")),
-                corrected_value="",  # Empty means rejected
-                label="rejected",
-                user_id=current_user.id,
-                notes=rejection.reason
-            )
-            db.add(training)
-
-        extracted.status = "rejected"
+        reject_extracted_data(extracted, current_user.id, db)
         db.commit()
 
         logger.info(f"Rejected extracted data {extracted.id}: {rejection.reason}")
@@ -3724,6 +4736,168 @@ async def reject_reconciliation(
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+RECONCILIATION_BULK_MAX_ITEMS = 1000
+RECONCILIATION_BULK_QUERY_CHUNK = 500
+
+
+def process_reconciliation_bulk(db: Session, user_id: int, ids: List[int], action: str):
+    """
+    Approve or reject many extracted items for a user
+
+    Items are loaded in batches and grouped by the loan or lead they target;
+    for approvals the targets are loaded in one query per entity type. Each
+    group is applied oldest item first (so newer values win) and committed
+    as one transaction, so a failure only affects that entity's items.
+
+    Yields the list of per-item results for each group as it is committed:
+        {"id", "status": approved|rejected|failed|skipped|not_found, "entity_type", "entity_id", "error"?}
+    """
+    found = {}
+    for start in range(0, len(ids), RECONCILIATION_BULK_QUERY_CHUNK):
+        for item in db.query(ExtractedData).join(
+            IncomingDataEvent,
+            ExtractedData.event_id == IncomingDataEvent.id
+        ).filter(
+            IncomingDataEvent.user_id == user_id,
+            ExtractedData.id.in_(ids[start:start + RECONCILIATION_BULK_QUERY_CHUNK])
+        ):
+            found[item.id] = item
+
+    missing = [{"id": item_id, "status": "not_found"} for item_id in ids if item_id not in found]
+    if missing:
+        yield missing
+
+    def result(item, status, **extra):
+        return {"id": item.id, "status": status, "entity_type": item.match_entity_type,
+                "entity_id": item.match_entity_id, **extra}
+
+    groups = {}
+    skipped = []
+    for item_id in sorted(found):
+        item = found[item_id]
+        if item.status not in RECONCILIATION_REVIEW_STATUSES:
+            skipped.append(result(item, "skipped", error=f"Already {item.status}"))
+            continue
+        key = (item.match_entity_type, item.match_entity_id) \
+            if item.match_entity_type in RECONCILIATION_ENTITY_MODELS and item.match_entity_id else (None, None)
+        groups.setdefault(key, []).append(item)
+    if skipped:
+        yield skipped
+
+    entities = {}
+    if action == "approve":
+        for entity_type, model in RECONCILIATION_ENTITY_MODELS.items():
+            entity_ids = [entity_id for (key_type, entity_id) in groups if key_type == entity_type]
+            for start in range(0, len(entity_ids), RECONCILIATION_BULK_QUERY_CHUNK):
+                for entity in db.query(model).filter(
+                    model.id.in_(entity_ids[start:start + RECONCILIATION_BULK_QUERY_CHUNK])
+                ):
+                    entities[(entity_type, entity.id)] = entity
+
+    # Keep loaded items and entities usable across the per-entity commits
+    expire_on_commit, db.expire_on_commit = db.expire_on_commit, False
+    try:
+        for key, group in groups.items():
+            results = []
+            try:
+                now = datetime.now(timezone.utc)
+                entity = entities.get(key)
+                for item in group:
+                    if action == "reject":
+                        reject_extracted_data(item, user_id, db)
+                        results.append(result(item, "rejected"))
+                        continue
+                    if entity is None:
+                        results.append(result(item, "failed", error="No matching loan or lead"))
+                        continue
+                    try:
+                        updates = extracted_field_updates(item)
+                    except Exception as e:
+                        results.append(result(item, "failed", error=f"Invalid field value: {e}"))
+                        continue
+                    for column, value in updates.items():
+                        setattr(entity, column, value)
+                    item.status = "approved"
+                    item.reviewed_by = user_id
+                    item.reviewed_at = now
+                    item.applied_at = now
+                    results.append(result(item, "approved", fields=sorted(updates)))
+                db.commit()
+            except Exception as e:
+                logger.error(f"Bulk {action} failed for {key[0]} {key[1]}: {e}")
+                db.rollback()
+                results = [result(item, "failed", error=str(e)) for item in group]
+            yield results
+    finally:
+        db.expire_on_commit = expire_on_commit
+
+
+@app.post("/api/v1/reconciliation/bulk")
+async def bulk_reconciliation(
+    bulk: ReconciliationBulkAction,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Approve or reject up to 1000 extracted items in one request
+
+    Returns a summary and per-item results. Send {"stream": true} (or
+    Accept: text/event-stream) to receive a progress event after each
+    loan/lead is committed, then a done event with the summary.
+    """
+    if bulk.action not in ("approve", "reject"):
+        raise HTTPException(status_code=400, detail="action must be 'approve' or 'reject'")
+    ids = list(dict.fromkeys(bulk.extracted_data_ids))
+    if not ids:
+        raise HTTPException(status_code=400, detail="extracted_data_ids is required")
+    if len(ids) > RECONCILIATION_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {RECONCILIATION_BULK_MAX_ITEMS} items per request")
+
+    summary = {"total": len(ids), "processed": 0, "approved": 0, "rejected": 0, "failed": 0, "skipped": 0, "not_found": 0}
+
+    def tally(results):
+        summary["processed"] += len(results)
+        for item in results:
+            summary[item["status"]] += 1
+
+    def log_summary():
+        logger.info(f"Bulk {bulk.action} by user {current_user.id}: {summary}"
+                    + (f" ({bulk.reason})" if bulk.reason else ""))
+
+    if wants_event_stream(request, bulk.stream):
+        async def events():
+            try:
+                for results in process_reconciliation_bulk(db, current_user.id, ids, bulk.action):
+                    tally(results)
+                    yield sse_event("progress", {**summary, "results": results})
+            except Exception as e:
+                logger.error(f"Bulk {bulk.action} stream failed: {e}")
+                yield sse_event("error", {**summary, "error": str(e)})
+                return
+            log_summary()
+            yield sse_event("done", summary)
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    try:
+        results = []
+        for group in process_reconciliation_bulk(db, current_user.id, ids, bulk.action):
+            tally(group)
+            results.extend(group)
+    except Exception as e:
+        logger.error(f"Bulk {bulk.action} error: {e}")
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    log_summary()
+    order = {item_id: index for index, item_id in enumerate(ids)}
+    return {
+        "status": "success",
+        "summary": summary,
+        "results": sorted(results, key=lambda item: order[item["id"]])
+    }
+
 @app.post("/api/v1/reconciliation/correct")
 async def correct_and_train(
     correction: ReconciliationApproval,  # Reuse same schema
@@ -3796,54 +4970,49 @@ async def correct_and_train(
 # DUPLICATE MERGE & AI LEARNING SYSTEM
 # ============================================================================
 
+def _lead_index_fingerprint(db: Session, user_id: int):
+    def load():
+        return db.query(func.count(Lead.id), func.max(Lead.updated_at)).filter(
+            Lead.owner_id == user_id
+        ).one()
+    return load
+
+def _lead_index_rows(db: Session, user_id: int):
+    def load():
+        return db.query(Lead.id, Lead.name, Lead.email, Lead.phone, Lead.updated_at).filter(
+            Lead.owner_id == user_id
+        ).yield_per(5000)
+    return load
+
 def find_duplicate_leads(user_id: int, db: Session, threshold: float = 0.75):
     """
     Find potential duplicate leads based on name, email, phone similarity
+
+    Candidate pairs come from the blocking-key index (shared email, phone or
+    phonetic name key); only those pairs are scored. Lead writes reach the
+    index through the session flush hooks.
     """
-    import difflib
+    index = lead_index_registry.get(user_id, _lead_index_fingerprint(db, user_id), _lead_index_rows(db, user_id))
+    matches = index.find_duplicates(threshold)
+    if not matches:
+        return []
+
+    lead_ids = {lead_id for id1, id2, _ in matches for lead_id in (id1, id2)}
+    leads_by_id = {
+        lead.id: lead
+        for lead in db.query(Lead).filter(Lead.owner_id == user_id, Lead.id.in_(lead_ids)).all()
+    }
 
-    leads = db.query(Lead).filter(Lead.owner_id == user_id).all()
     duplicates = []
-
-    processed_pairs = set()
-
-    for i, lead1 in enumerate(leads):
-        for lead2 in leads[i+1:]:
-            # Skip if already processed
-            pair_id = tuple(sorted([lead1.id, lead2.id]))
-            if pair_id in processed_pairs:
-                continue
-
-            # Calculate similarity
-            similarity_scores = []
-
-            # Name similarity
-            if lead1.name and lead2.name:
-                name_sim = difflib.SequenceMatcher(None, lead1.name.lower(), lead2.name.lower()).ratio()
-                similarity_scores.append(name_sim * 0.4)  # 40% weight
-
-            # Email similarity
-            if lead1.email and lead2.email:
-                email_sim = 1.0 if lead1.email.lower() == lead2.email.lower() else 0.0
-                similarity_scores.append(email_sim * 0.3)  # 30% weight
-
-            # Phone similarity
-            if lead1.phone and lead2.phone:
-                phone1 = ''.join(filter(str.isdigit, lead1.phone))
-                phone2 = ''.join(filter(str.isdigit, lead2.phone))
-                phone_sim = 1.0 if phone1 == phone2 else 0.0
-                similarity_scores.append(phone_sim * 0.3)  # 30% weight
-
-            if similarity_scores:
-                total_similarity = sum(similarity_scores) / len(similarity_scores) * len(similarity_scores)
-
-                if total_similarity >= threshold:
-                    duplicates.append({
-                        'lead1': lead1,
-                        'lead2': lead2,
-                        'similarity': total_similarity
-                    })
-                    processed_pairs.add(pair_id)
+    for id1, id2, similarity in matches:
+        lead1 = leads_by_id.get(id1)
+        lead2 = leads_by_id.get(id2)
+        if lead1 and lead2:
+            duplicates.append({
+                'lead1': lead1,
+                'lead2': lead2,
+                'similarity': similarity
+            })
 
     return duplicates
 
@@ -3931,11 +5100,15 @@ def generate_ai_merge_suggestion(lead1: Lead, lead2: Lead, training_history: lis
 
 @app.get("/api/v1/merge/duplicates")
 async def get_duplicate_leads(
+    skip: int = 0,
+    limit: Optional[int] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Find and return potential duplicate leads that need merging
+
+    Pending pairs are ordered by similarity; use skip/limit to page through them.
     """
     try:
         # Find duplicates
@@ -3950,13 +5123,15 @@ async def get_duplicate_leads(
         existing_pair_ids = {(p.lead_id_1, p.lead_id_2) for p in existing_pairs}
 
         # Create new duplicate pairs for newly found duplicates
+        training_history = None
         for dup in duplicates:
             pair_id = tuple(sorted([dup['lead1'].id, dup['lead2'].id]))
             if pair_id not in existing_pair_ids:
-                # Get training history for AI suggestions
-                training_history = db.query(MergeTrainingEvent).filter(
-                    MergeTrainingEvent.user_id == current_user.id
-                ).all()
+                # Get training history for AI suggestions (once per request)
+                if training_history is None:
+                    training_history = db.query(MergeTrainingEvent).filter(
+                        MergeTrainingEvent.user_id == current_user.id
+                    ).all()
 
                 # Generate AI suggestion
                 ai_suggestion = generate_ai_merge_suggestion(
@@ -3975,16 +5150,28 @@ async def get_duplicate_leads(
 
         db.commit()
 
-        # Get all pending pairs with lead details
-        pending_pairs = db.query(DuplicatePair).filter(
+        # Get pending pairs (one page) with lead details
+        pending_query = db.query(DuplicatePair).filter(
             DuplicatePair.user_id == current_user.id,
             DuplicatePair.status == 'pending'
-        ).all()
+        )
+        total_pending = pending_query.count()
+
+        pending_query = pending_query.order_by(DuplicatePair.similarity_score.desc(), DuplicatePair.id).offset(skip)
+        if limit is not None:
+            pending_query = pending_query.limit(limit)
+        pending_pairs = pending_query.all()
+
+        pair_lead_ids = {lead_id for p in pending_pairs for lead_id in (p.lead_id_1, p.lead_id_2)}
+        leads_by_id = {
+            lead.id: lead
+            for lead in db.query(Lead).filter(Lead.id.in_(pair_lead_ids)).all()
+        } if pair_lead_ids else {}
 
         result = []
         for pair in pending_pairs:
-            lead1 = db.query(Lead).filter(Lead.id == pair.lead_id_1).first()
-            lead2 = db.query(Lead).filter(Lead.id == pair.lead_id_2).first()
+            lead1 = leads_by_id.get(pair.lead_id_1)
+            lead2 = leads_by_id.get(pair.lead_id_2)
 
             if lead1 and lead2:
                 result.append({
@@ -4037,7 +5224,9 @@ async def get_duplicate_leads(
 
         return {
             'pending_pairs': result,
-            'total_count': len(result),
+            'total_count': total_pending,
+            'skip': skip,
+            'limit': limit,
             'ai_training_status': {
                 'total_predictions': ai_model.total_predictions,
                 'correct_predictions': ai_model.correct_predictions,
@@ -4151,6 +5340,12 @@ async def execute_merge(
             ai_model.autopilot_enabled_at = datetime.now(timezone.utc)
             logger.info(f"🎉 Autopilot enabled for user {current_user.id} after 100 consecutive correct predictions!")
 
+        # Move loans linked to the secondary lead onto the principal
+        secondary_lead_id = secondary_lead.id
+        db.query(Loan).filter(Loan.lead_id == secondary_lead_id).update(
+            {Loan.lead_id: principal_lead.id}, synchronize_session=False
+        )
+
         # Delete secondary lead
         db.delete(secondary_lead)
 
@@ -4620,38 +5815,26 @@ async def force_email_sync(
 
         logger.info(f"🔄 Force sync triggered by user {current_user.id} ({current_user.email})")
 
-        # Fetch emails
-        result = await fetch_microsoft_emails(oauth_record, db, limit=50)
+        # Same delta sync the scheduler runs; joins the one in progress if any
+        result = await mailbox_sync_engine.sync_user_shared(oauth_record.id, current_user.id)
 
-        if "error" in result:
-            logger.error(f"Force sync error: {result['error']}")
-            raise HTTPException(status_code=500, detail=result['error'])
+        not_synced = _manual_sync_not_run(result)
+        if not_synced:
+            return {**not_synced, "success": False, "total_emails": 0, "processed_count": 0}
 
-        # Process each email through DRE
-        emails = result.get("emails", [])
-        processed_count = 0
-        new_emails = 0
+        processed_count = result["ingested"]
+        if processed_count and not result.get("shared"):
+            asyncio.create_task(run_dre_pipeline())
 
-        for email_data in emails:
-            process_result = await process_microsoft_email_to_dre(email_data, current_user.id, db)
-            if process_result.get("status") == "success":
-                processed_count += 1
-                if not process_result.get("already_processed"):
-                    new_emails += 1
-
-        # Update last_sync_at
-        oauth_record.last_sync_at = datetime.now(timezone.utc)
-        db.commit()
-
-        logger.info(f"✅ Force sync complete: {processed_count}/{len(emails)} emails processed, {new_emails} new")
+        logger.info(f"✅ Force sync complete: {processed_count}/{result['new']} new emails processed ({result['fetched']} changed)")
 
         return {
             "success": True,
-            "total_emails": len(emails),
+            "total_emails": result["fetched"],
             "processed_count": processed_count,
-            "new_emails": new_emails,
-            "already_processed": processed_count - new_emails,
-            "message": f"Synced {new_emails} new emails successfully" if new_emails > 0 else "No new emails found"
+            "new_emails": processed_count,
+            "already_processed": result["fetched"] - result["new"],
+            "message": f"Synced {processed_count} new emails successfully" if processed_count > 0 else "No new emails found"
         }
 
     except HTTPException:
@@ -4661,6 +5844,16 @@ async def force_email_sync(
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v1/microsoft/sync-metrics")
+async def get_email_sync_metrics(current_user: User = Depends(get_current_user)):
+    """Metrics for recent auto-sync runs (mailboxes synced, emails ingested, lag)"""
+    return {**mailbox_sync_engine.get_metrics(), "notifications": user_notifications.stats()}
+
+@app.get("/api/v1/reconciliation/pipeline-metrics")
+async def get_dre_pipeline_metrics(current_user: User = Depends(get_current_user)):
+    """Queue depth, throughput counters and per-stage latency of the DRE pipeline"""
+    return dre_pipeline.get_metrics()
+
 @app.get("/api/v1/system/diagnostics")
 async def get_system_diagnostics(current_user: User = Depends(get_current_user)):
     """Get system configuration diagnostics"""
@@ -5134,6 +6327,23 @@ async def add_conversation_memory_migration(
             "error": str(e)
         }
 
+# Running per-variant, per-metric result statistics (ab_testing.result_aggregates)
+AB_RESULT_AGGREGATES_DDL = """
+    CREATE TABLE IF NOT EXISTS ab_result_aggregates (
+        id SERIAL PRIMARY KEY,
+        experiment_id INTEGER NOT NULL REFERENCES ab_experiments(id) ON DELETE CASCADE,
+        variant_id INTEGER NOT NULL REFERENCES ab_variants(id) ON DELETE CASCADE,
+        metric_name VARCHAR(100) NOT NULL,
+        result_count INTEGER NOT NULL DEFAULT 0,
+        value_sum FLOAT NOT NULL DEFAULT 0,
+        value_sum_sq FLOAT NOT NULL DEFAULT 0,
+        value_min FLOAT,
+        value_max FLOAT,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        CONSTRAINT uq_ab_result_aggregates UNIQUE (experiment_id, variant_id, metric_name)
+    )
+"""
+
 @app.post("/api/v1/migrations/add-ab-testing-tables")
 async def add_ab_testing_tables_migration(
     current_user: User = Depends(get_current_user),
@@ -5141,7 +6351,8 @@ async def add_ab_testing_tables_migration(
 ):
     """
     Migration: Add A/B testing tables for experiment management
-    Creates 5 tables: experiments, variants, assignments, results, insights
+    Creates 6 tables: experiments, variants, assignments, results, result aggregates, insights
+    Re-running on an existing install adds the result aggregates table
     """
     try:
         logger.info(f"Running migration: add A/B testing tables (user: {current_user.id})")
@@ -5155,9 +6366,11 @@ async def add_ab_testing_tables_migration(
         """))
 
         if result.fetchone():
+            db.execute(text(AB_RESULT_AGGREGATES_DDL))
+            db.commit()
             return {
                 "success": True,
-                "message": "A/B testing tables already exist",
+                "message": "A/B testing tables already exist (result aggregates table ensured)",
                 "already_exists": True
             }
 
@@ -5229,7 +6442,10 @@ async def add_ab_testing_tables_migration(
             )
             """,
 
-            # 5. Insights table
+            # 5. Result aggregates table
+            AB_RESULT_AGGREGATES_DDL,
+
+            # 6. Insights table
             """
             CREATE TABLE ab_insights (
                 id SERIAL PRIMARY KEY,
@@ -5292,8 +6508,8 @@ async def add_ab_testing_tables_migration(
 
         return {
             "success": True,
-            "message": "Successfully created A/B testing tables (5 tables, 10 indices)",
-            "tables_created": ["ab_experiments", "ab_variants", "ab_assignments", "ab_results", "ab_insights"],
+            "message": "Successfully created A/B testing tables (6 tables, 10 indices)",
+            "tables_created": ["ab_experiments", "ab_variants", "ab_assignments", "ab_results", "ab_result_aggregates", "ab_insights"],
             "already_exists": False
         }
 
@@ -5866,6 +7082,22 @@ Respond in JSON format with these keys:
             "analysis": None
         }
 
+def _manual_sync_not_run(result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Response fields for a manual sync that did not run, None if it did.
+    Raises 409 only when another sync holds the mailbox.
+    """
+    if result.get("status") == "success":
+        return None
+    reason = result.get("reason")
+    if reason == "sync_in_progress":
+        raise HTTPException(status_code=409, detail="An email sync is already running for this account")
+    if reason == "deferred":
+        message = "The sync ran out of time and will continue with the next scheduled sync"
+    else:
+        message = "Email sync is disabled or Microsoft 365 was disconnected"
+    return {"status": "skipped", "reason": reason or "not_synced", "message": message}
+
 @app.post("/api/v1/microsoft/sync-now")
 async def sync_microsoft_emails_now(
     current_user: User = Depends(get_current_user),
@@ -5887,30 +7119,33 @@ async def sync_microsoft_emails_now(
         if not oauth_record.sync_enabled:
             raise HTTPException(status_code=400, detail="Email sync is disabled")
 
-        # Fetch emails
-        result = await fetch_microsoft_emails(oauth_record, db, limit=50)
+        # Incremental delta sync through the shared engine. Joins a sync that is
+        # already running for this user, and reuses a result from the last
+        # minute, so page loads and repeated clicks don't pull the mailbox again
+        result = await mailbox_sync_engine.request_sync(oauth_record.id, current_user.id)
 
-        if "error" in result:
-            raise HTTPException(status_code=500, detail=result["error"])
+        not_synced = _manual_sync_not_run(result)
+        if not_synced:
+            return {**not_synced, "fetched_count": 0, "processed_count": 0}
 
-        # Process each email through DRE
-        emails = result.get("emails", [])
-        processed_count = 0
-
-        for email_data in emails:
-            process_result = await process_microsoft_email_to_dre(email_data, current_user.id, db)
-            if process_result.get("status") == "success":
-                processed_count += 1
+        if result.get("cached"):
+            return {
+                "status": "success",
+                "fetched_count": 0,
+                "processed_count": 0,
+                "cached": True,
+                "message": f"Already synced {result['synced_seconds_ago']:.0f}s ago"
+            }
 
-        # Update last_sync_at timestamp
-        oauth_record.last_sync_at = datetime.now(timezone.utc)
-        db.commit()
+        processed_count = result["ingested"]
+        if processed_count and not result.get("shared"):
+            asyncio.create_task(run_dre_pipeline())
 
-        logger.info(f"Synced {processed_count}/{len(emails)} emails for user {current_user.id}")
+        logger.info(f"Synced {processed_count}/{result['new']} new emails for user {current_user.id}")
 
         return {
             "status": "success",
-            "fetched_count": len(emails),
+            "fetched_count": result["fetched"],
             "processed_count": processed_count,
             "message": f"Synced {processed_count} emails successfully"
         }
@@ -5925,10 +7160,14 @@ async def sync_microsoft_emails_now(
 
 @app.post("/api/v1/microsoft/reprocess-emails")
 async def reprocess_unextracted_emails(
+    bypass_cache: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Reprocess emails that were synced but not extracted (for fixing failed extractions)"""
+    """
+    Reprocess emails that were synced but not extracted (for fixing failed extractions).
+    bypass_cache=true skips cached LLM results, e.g. after a model or prompt issue.
+    """
     try:
         # Find all emails without extracted data for this user
         unextracted = db.execute(text("""
@@ -5948,37 +7187,17 @@ async def reprocess_unextracted_emails(
                 "message": "No emails need reprocessing"
             }
 
-        # Reprocess each email
-        success_count = 0
-
-        for email_id, subject, sender, raw_text, raw_html, received_at, recipients in unextracted:
-            # Get the full event
-            event = db.query(IncomingDataEvent).filter(IncomingDataEvent.id == email_id).first()
-
-            if not event:
-                continue
-
-            # Create email_data dict (mimicking Microsoft Graph format)
-            email_data = {
-                "subject": subject,
-                "from": {"emailAddress": {"address": sender}},
-                "toRecipients": [{"emailAddress": {"address": r}} for r in (recipients or [])],
-                "receivedDateTime": received_at.isoformat() if received_at else None,
-                "body": {
-                    "content": raw_text or raw_html or "",
-                    "contentType": "text" if raw_text else "html"
-                }
-            }
-
-            # Delete old event to avoid duplicates
-            db.delete(event)
-            db.commit()
-
-            # Reprocess with new extraction logic
-            result = await process_microsoft_email_to_dre(email_data, current_user.id, db)
+        # Put the events back on the DRE pipeline queue (keeps external_message_id for dedupe)
+        event_ids = [row[0] for row in unextracted]
+        if bypass_cache:
+            dre_pipeline.request_fresh(event_ids)
+        success_count = db.query(IncomingDataEvent).filter(
+            IncomingDataEvent.id.in_(event_ids)
+        ).update({IncomingDataEvent.processed: False}, synchronize_session=False)
+        db.commit()
 
-            if result.get("status") == "success":
-                success_count += 1
+        if success_count:
+            asyncio.create_task(run_dre_pipeline())
 
         logger.info(f"Reprocessed {success_count}/{len(unextracted)} emails for user {current_user.id}")
 
@@ -5986,7 +7205,7 @@ async def reprocess_unextracted_emails(
             "status": "success",
             "reprocessed_count": success_count,
             "total_found": len(unextracted),
-            "message": f"Reprocessed {success_count} emails successfully"
+            "message": f"Queued {success_count} emails for reprocessing"
         }
 
     except Exception as e:
@@ -6132,6 +7351,9 @@ async def update_microsoft_settings(
             oauth_record.sync_enabled = settings.sync_enabled
 
         if settings.sync_folder is not None:
+            if settings.sync_folder != oauth_record.sync_folder:
+                # Delta cursors are per folder; start the new folder fresh
+                oauth_record.mail_delta_link = None
             oauth_record.sync_folder = settings.sync_folder
 
         if settings.sync_frequency_minutes is not None:
@@ -6432,6 +7654,7 @@ async def create_microsoft_oauth_table(db: Session = Depends(get_db)):
                 last_sync_at TIMESTAMP,
                 sync_folder VARCHAR DEFAULT 'Inbox',
                 sync_frequency_minutes INTEGER DEFAULT 15,
+                mail_delta_link TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
@@ -6505,6 +7728,74 @@ async def create_zapier_api_key(db: Session = Depends(get_db)):
             content={"status": "error", "message": str(e)}
         )
 
+@app.post("/admin/backfill-loan-lead-links")
+async def backfill_loan_lead_links_endpoint(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Admin endpoint to link the current user's existing loans to their originating leads"""
+    try:
+        result = backfill_loan_lead_links(db, current_user.id)
+        logger.info(f"✅ Linked {result['loans_linked']} loans to leads for user {current_user.id}")
+        return {
+            "status": "success",
+            "message": "Loan to lead links backfilled",
+            **result
+        }
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Failed to backfill loan lead links: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"status": "error", "message": str(e)}
+        )
+
+@app.post("/admin/rebuild-kpi-rollups")
+async def rebuild_kpi_rollups_endpoint(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Admin endpoint to rebuild the current user's daily KPI rollups from leads and loans"""
+    try:
+        result = rebuild_kpi_rollups(db, current_user.id)
+        logger.info(f"✅ KPI rollups rebuilt for user {current_user.id}: {result['rows']} rows")
+        return {
+            "status": "success",
+            "message": "KPI rollups rebuilt",
+            **result
+        }
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Failed to rebuild KPI rollups: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"status": "error", "message": str(e)}
+        )
+
+@app.post("/admin/rescore-leads")
+async def rescore_leads_endpoint(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Admin endpoint to recompute AI scores for all of the current user's leads"""
+    try:
+        rescored = lead_scorer.rescore(db.connection(), Lead.__table__.c.owner_id == current_user.id)
+        db.commit()
+        logger.info(f"✅ Leads rescored for user {current_user.id}: {rescored} changed")
+        return {
+            "status": "success",
+            "message": "Leads rescored",
+            "rescored": rescored,
+            "scheduler": lead_scorer.stats()
+        }
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Failed to rescore leads: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"status": "error", "message": str(e)}
+        )
+
 # ============================================================================
 # AUTH ROUTES
 # ============================================================================
@@ -6719,20 +8010,78 @@ async def delete_user(
 # DASHBOARD
 # ============================================================================
 
+def aggregate_dashboard_counters(db: Session, user_id: int, today=None) -> Dict[str, Any]:
+    """
+    Compute every production and pipeline counter for the dashboard using
+    conditional aggregation: one grouped query over loans, one over leads.
+    """
+    from datetime import date
+    from sqlalchemy import case, extract
+
+    today = today or date.today()
+    start_of_month = today.replace(day=1)
+    start_of_week = today - timedelta(days=today.weekday())
+    now = datetime.now(timezone.utc)
+    start_of_today = now.replace(hour=0, minute=0, second=0)
+
+    def count_if(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    def volume_if(condition):
+        return func.coalesce(func.sum(case((condition, Loan.amount), else_=0)), 0)
+
+    is_funded = Loan.stage == LoanStage.FUNDED
+    funded_this_month = is_funded & (Loan.funded_date >= start_of_month)
+    is_processing = Loan.stage == LoanStage.PROCESSING
+    is_underwriting = Loan.stage == LoanStage.UW_RECEIVED
+    is_ctc = Loan.stage == LoanStage.CTC
+
+    loan_row = db.query(
+        count_if(is_funded & (extract('year', Loan.funded_date) == today.year)).label('annual_funded'),
+        count_if(funded_this_month).label('monthly_funded'),
+        count_if(is_funded & (Loan.funded_date >= start_of_week)).label('weekly_funded'),
+        count_if(is_funded & (Loan.funded_date == today)).label('daily_funded'),
+        volume_if(funded_this_month).label('monthly_funded_volume'),
+        count_if(is_processing).label('processing'),
+        volume_if(is_processing).label('processing_volume'),
+        count_if(is_processing & (Loan.days_in_stage > 14)).label('processing_delayed'),
+        count_if(is_underwriting).label('underwriting'),
+        volume_if(is_underwriting).label('underwriting_volume'),
+        count_if(Loan.stage == LoanStage.SUSPENDED).label('suspended'),
+        count_if(is_ctc).label('ctc'),
+        volume_if(is_ctc).label('ctc_volume'),
+        func.count(Loan.id).label('applications'),
+    ).filter(Loan.loan_officer_id == user_id).one()
+
+    is_new = Lead.stage == LeadStage.NEW
+    lead_row = db.query(
+        count_if(is_new).label('new'),
+        count_if(is_new & (Lead.created_at < now - timedelta(hours=24))).label('uncontacted'),
+        count_if(Lead.stage == LeadStage.PRE_APPROVED).label('preapproved'),
+        count_if(Lead.created_at >= start_of_today).label('new_today'),
+        count_if((Lead.ai_score >= 80) & Lead.stage.in_([LeadStage.NEW, LeadStage.ATTEMPTED_CONTACT])).label('hot'),
+        count_if((Lead.ai_score >= 75) & (Lead.stage == LeadStage.ATTEMPTED_CONTACT)).label('high_intent'),
+        func.count(Lead.id).label('total'),
+    ).filter(Lead.owner_id == user_id).one()
+
+    counters = {key: int(value or 0) for key, value in loan_row._mapping.items()}
+    counters.update({f"leads_{key}": int(value or 0) for key, value in lead_row._mapping.items()})
+    return counters
+
 @app.get("/api/v1/dashboard")
 async def get_dashboard(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
     Get dashboard data with real metrics from database.
     All values are server-computed from CRM database.
     """
-    from datetime import date, timedelta, datetime, timezone
-    from sqlalchemy import func, extract
+    from datetime import date, timedelta
+    from sqlalchemy import func
 
     # Get current date ranges
     today = date.today()
-    start_of_month = today.replace(day=1)
-    start_of_week = today - timedelta(days=today.weekday())
-    start_of_year = today.replace(month=1, day=1)
+
+    # All production and pipeline counters in two aggregate queries
+    counters = aggregate_dashboard_counters(db, current_user.id, today)
 
     # ============================================================================
     # PRODUCTION METRICS (Goals vs Actuals)
@@ -6743,29 +8092,10 @@ async def get_dashboard(db: Session = Depends(get_db), current_user: User = Depe
     goals = user_metadata.get('goals', {})
 
     # Calculate actuals from funded loans
-    annual_actual = db.query(func.count(Loan.id)).filter(
-        Loan.loan_officer_id == current_user.id,
-        Loan.stage == LoanStage.FUNDED,
-        extract('year', Loan.funded_date) == today.year
-    ).scalar() or 0
-
-    monthly_actual = db.query(func.count(Loan.id)).filter(
-        Loan.loan_officer_id == current_user.id,
-        Loan.stage == LoanStage.FUNDED,
-        Loan.funded_date >= start_of_month
-    ).scalar() or 0
-
-    weekly_actual = db.query(func.count(Loan.id)).filter(
-        Loan.loan_officer_id == current_user.id,
-        Loan.stage == LoanStage.FUNDED,
-        Loan.funded_date >= start_of_week
-    ).scalar() or 0
-
-    daily_actual = db.query(func.count(Loan.id)).filter(
-        Loan.loan_officer_id == current_user.id,
-        Loan.stage == LoanStage.FUNDED,
-        Loan.funded_date == today
-    ).scalar() or 0
+    annual_actual = counters['annual_funded']
+    monthly_actual = counters['monthly_funded']
+    weekly_actual = counters['weekly_funded']
+    daily_actual = counters['daily_funded']
 
     # Use goals from Goal Tracker or defaults
     annual_goal = goals.get('annualGoal', 222)
@@ -6792,115 +8122,60 @@ async def get_dashboard(db: Session = Depends(get_db), current_user: User = Depe
     # PIPELINE STATS (Real loan counts per stage)
     # ============================================================================
 
-    pipeline_stats = []
-
-    # Count leads by stage
-    new_leads = db.query(func.count(Lead.id)).filter(
-        Lead.owner_id == current_user.id,
-        Lead.stage == LeadStage.NEW
-    ).scalar() or 0
-
-    # Leads that haven't been contacted in 24h
-    uncontacted_alerts = db.query(func.count(Lead.id)).filter(
-        Lead.owner_id == current_user.id,
-        Lead.stage == LeadStage.NEW,
-        Lead.created_at < datetime.now(timezone.utc) - timedelta(hours=24)
-    ).scalar() or 0
-
-    pipeline_stats.append({
-        "id": "new",
-        "name": "New Leads",
-        "count": new_leads,
-        "alerts": uncontacted_alerts,
-        "alert_text": "follow-ups needed" if uncontacted_alerts > 0 else "",
-        "volume": None
-    })
-
-    # Pre-approved leads
-    preapproved = db.query(func.count(Lead.id)).filter(
-        Lead.owner_id == current_user.id,
-        Lead.stage == LeadStage.PRE_APPROVED
-    ).scalar() or 0
-
-    pipeline_stats.append({
-        "id": "preapproved",
-        "name": "Pre-Approved",
-        "count": preapproved,
-        "alerts": 0,
-        "alert_text": "",
-        "volume": None
-    })
-
-    # Loans in processing
-    processing = db.query(Loan).filter(
-        Loan.loan_officer_id == current_user.id,
-        Loan.stage == LoanStage.PROCESSING
-    ).all()
-
-    processing_volume = sum(loan.amount for loan in processing if loan.amount)
-    processing_alerts = sum(1 for loan in processing if loan.days_in_stage and loan.days_in_stage > 14)
-
-    pipeline_stats.append({
-        "id": "processing",
-        "name": "In Processing",
-        "count": len(processing),
-        "alerts": processing_alerts,
-        "alert_text": "delayed" if processing_alerts > 0 else "",
-        "volume": int(processing_volume)
-    })
-
-    # Loans in underwriting
-    underwriting = db.query(Loan).filter(
-        Loan.loan_officer_id == current_user.id,
-        Loan.stage == LoanStage.UW_RECEIVED
-    ).all()
-
-    underwriting_volume = sum(loan.amount for loan in underwriting if loan.amount)
-    underwriting_alerts = sum(1 for loan in underwriting if loan.status == "suspended")
-
-    pipeline_stats.append({
-        "id": "underwriting",
-        "name": "In Underwriting",
-        "count": len(underwriting),
-        "alerts": underwriting_alerts,
-        "alert_text": "suspended" if underwriting_alerts > 0 else "",
-        "volume": int(underwriting_volume)
-    })
-
-    # Clear to close
-    ctc = db.query(Loan).filter(
-        Loan.loan_officer_id == current_user.id,
-        Loan.stage == LoanStage.CTC
-    ).all()
-
-    ctc_volume = sum(loan.amount for loan in ctc if loan.amount)
-
-    pipeline_stats.append({
-        "id": "ctc",
-        "name": "Clear to Close",
-        "count": len(ctc),
-        "alerts": 0,
-        "alert_text": "",
-        "volume": int(ctc_volume)
-    })
-
-    # Funded this month
-    funded = db.query(Loan).filter(
-        Loan.loan_officer_id == current_user.id,
-        Loan.stage == LoanStage.FUNDED,
-        Loan.funded_date >= start_of_month
-    ).all()
-
-    funded_volume = sum(loan.amount for loan in funded if loan.amount)
+    uncontacted_alerts = counters['leads_uncontacted']
+    processing_alerts = counters['processing_delayed']
+    underwriting_alerts = counters['suspended']
 
-    pipeline_stats.append({
-        "id": "funded",
-        "name": "Funded This Month",
-        "count": len(funded),
-        "alerts": 0,
-        "alert_text": "",
-        "volume": int(funded_volume)
-    })
+    pipeline_stats = [
+        {
+            "id": "new",
+            "name": "New Leads",
+            "count": counters['leads_new'],
+            "alerts": uncontacted_alerts,
+            "alert_text": "follow-ups needed" if uncontacted_alerts > 0 else "",
+            "volume": None
+        },
+        {
+            "id": "preapproved",
+            "name": "Pre-Approved",
+            "count": counters['leads_preapproved'],
+            "alerts": 0,
+            "alert_text": "",
+            "volume": None
+        },
+        {
+            "id": "processing",
+            "name": "In Processing",
+            "count": counters['processing'],
+            "alerts": processing_alerts,
+            "alert_text": "delayed" if processing_alerts > 0 else "",
+            "volume": counters['processing_volume']
+        },
+        {
+            "id": "underwriting",
+            "name": "In Underwriting",
+            "count": counters['underwriting'],
+            "alerts": underwriting_alerts,
+            "alert_text": "suspended" if underwriting_alerts > 0 else "",
+            "volume": counters['underwriting_volume']
+        },
+        {
+            "id": "ctc",
+            "name": "Clear to Close",
+            "count": counters['ctc'],
+            "alerts": 0,
+            "alert_text": "",
+            "volume": counters['ctc_volume']
+        },
+        {
+            "id": "funded",
+            "name": "Funded This Month",
+            "count": counters['monthly_funded'],
+            "alerts": 0,
+            "alert_text": "",
+            "volume": counters['monthly_funded_volume']
+        },
+    ]
 
     # ============================================================================
     # TASKS FOR TODAY
@@ -6925,26 +8200,14 @@ async def get_dashboard(db: Session = Depends(get_db), current_user: User = Depe
     # ============================================================================
 
     # New leads today
-    new_today = db.query(func.count(Lead.id)).filter(
-        Lead.owner_id == current_user.id,
-        Lead.created_at >= datetime.now(timezone.utc).replace(hour=0, minute=0, second=0)
-    ).scalar() or 0
+    new_today = counters['leads_new_today']
 
     # Hot leads (high AI score)
-    hot_leads = db.query(func.count(Lead.id)).filter(
-        Lead.owner_id == current_user.id,
-        Lead.ai_score >= 80,
-        Lead.stage.in_([LeadStage.NEW, LeadStage.CONTACTED])
-    ).scalar() or 0
+    hot_leads = counters['leads_hot']
 
     # Calculate conversion rate (leads -> applications)
-    total_leads = db.query(func.count(Lead.id)).filter(
-        Lead.owner_id == current_user.id
-    ).scalar() or 1
-
-    applications = db.query(func.count(Loan.id)).filter(
-        Loan.loan_officer_id == current_user.id
-    ).scalar() or 0
+    total_leads = counters['leads_total'] or 1
+    applications = counters['applications']
 
     conversion_rate = int((applications / total_leads * 100)) if total_leads > 0 else 0
 
@@ -6953,11 +8216,7 @@ async def get_dashboard(db: Session = Depends(get_db), current_user: User = Depe
     if uncontacted_alerts > 0:
         alerts.append(f"{uncontacted_alerts} leads haven't been contacted in 24 hours.")
 
-    high_intent_leads = db.query(func.count(Lead.id)).filter(
-        Lead.owner_id == current_user.id,
-        Lead.ai_score >= 75,
-        Lead.stage == LeadStage.CONTACTED
-    ).scalar() or 0
+    high_intent_leads = counters['leads_high_intent']
 
     if high_intent_leads > 0:
         alerts.append(f"{high_intent_leads} leads showed high buying intent.")
@@ -6979,13 +8238,17 @@ async def get_dashboard(db: Session = Depends(get_db), current_user: User = Depe
         ReferralPartner.status == "active"
     ).limit(5).all()
 
+    received_by_source = dict(
+        db.query(Lead.source, func.count(Lead.id)).filter(
+            Lead.owner_id == current_user.id,
+            Lead.source.in_([p.name for p in partners])
+        ).group_by(Lead.source).all()
+    ) if partners else {}
+
     referral_stats = {
         "top_partners": [{
             "name": p.name,
-            "received": db.query(func.count(Lead.id)).filter(
-                Lead.owner_id == current_user.id,
-                Lead.source == p.name
-            ).scalar() or 0,
+            "received": received_by_source.get(p.name, 0),
             "sent": 0,  # TODO: Track sent referrals
             "balance": 0
         } for p in partners],
@@ -7060,73 +8323,28 @@ async def get_scorecard(
         # LOAN STARTS VS. ACTIVITY TOTALS
         # ============================================================================
 
-        # Get all relevant loans and leads for the period
-        all_leads = db.query(Lead).filter(
-            Lead.owner_id == current_user.id,
-            Lead.created_at >= start,
-            Lead.created_at <= end
-        ).all()
-
-        all_loans = db.query(Loan).filter(
-            Loan.loan_officer_id == current_user.id
-        ).all()
+        # Period counters from the daily rollups (one grouped query)
+        period = load_kpi_rollups(db, current_user.id, start, end)
 
         # Calculate counts
-        starts_count = len(all_leads)  # Total leads
+        starts_count = kpi_total(period, 'lead_start')  # Total leads
 
         # Applications (leads that became loans)
-        apps_count = db.query(func.count(Loan.id)).filter(
-            Loan.loan_officer_id == current_user.id,
-            Loan.created_at >= start,
-            Loan.created_at <= end
-        ).scalar() or 0
+        apps_count = kpi_total(period, 'loan_app')
 
         # Funded loans
-        funded_count = db.query(func.count(Loan.id)).filter(
-            Loan.loan_officer_id == current_user.id,
-            Loan.stage == LoanStage.FUNDED,
-            Loan.funded_date >= start,
-            Loan.funded_date <= end
-        ).scalar() or 0
+        funded_count = kpi_total(period, 'funded')
 
         # Credit pulls (assuming leads with credit_score indicate credit pulled)
-        credit_pulls = db.query(func.count(Lead.id)).filter(
-            Lead.owner_id == current_user.id,
-            Lead.created_at >= start,
-            Lead.created_at <= end,
-            Lead.credit_score.isnot(None)
-        ).scalar() or 0
-
-        # Cancelled loans
-        cancelled_count = db.query(func.count(Loan.id)).filter(
-            Loan.loan_officer_id == current_user.id,
-            Loan.stage == LoanStage.CANCELLED,
-            Loan.created_at >= start,
-            Loan.created_at <= end
-        ).scalar() or 0
-
-        # Denied loans
-        denied_count = db.query(func.count(Loan.id)).filter(
-            Loan.loan_officer_id == current_user.id,
-            Loan.stage == LoanStage.DENIED,
-            Loan.created_at >= start,
-            Loan.created_at <= end
-        ).scalar() or 0
+        credit_pulls = kpi_total(period, 'credit_pull')
+
+        # Cancelled / denied loans (no such LoanStage today, so these stay 0 until added)
+        cancelled_count = kpi_total(period, 'loan_app', {"Cancelled"})
+        denied_count = kpi_total(period, 'loan_app', {"Denied"})
 
         # UW to TBDs (underwriting to clear to close)
-        uw_count = db.query(func.count(Loan.id)).filter(
-            Loan.loan_officer_id == current_user.id,
-            Loan.stage == LoanStage.UW_RECEIVED,
-            Loan.created_at >= start,
-            Loan.created_at <= end
-        ).scalar() or 0
-
-        ctc_count = db.query(func.count(Loan.id)).filter(
-            Loan.loan_officer_id == current_user.id,
-            Loan.stage == LoanStage.CTC,
-            Loan.created_at >= start,
-            Loan.created_at <= end
-        ).scalar() or 0
+        uw_count = kpi_total(period, 'loan_app', {LoanStage.UW_RECEIVED.value})
+        ctc_count = kpi_total(period, 'loan_app', {LoanStage.CTC.value})
 
         # Initial lock to funded (loans that locked and funded)
         locked_funded = funded_count  # Simplified - all funded loans were locked
@@ -7216,16 +8434,9 @@ async def get_scorecard(
         current_pull_thru_pct = starts_to_funded_pct
         target_pull_thru_pct = current_pull_thru_pct + 10  # 10% improvement
 
-        # Get funded loans for volume calculations
-        funded_loans = db.query(Loan).filter(
-            Loan.loan_officer_id == current_user.id,
-            Loan.stage == LoanStage.FUNDED,
-            Loan.funded_date >= start,
-            Loan.funded_date <= end
-        ).all()
-
-        current_avg_amount = sum(loan.amount for loan in funded_loans if loan.amount) / len(funded_loans) if funded_loans else 0
-        current_volume = sum(loan.amount for loan in funded_loans if loan.amount)
+        # Funded volume for the period
+        current_volume = kpi_total(period, 'funded', field='volume')
+        current_avg_amount = current_volume / funded_count if funded_count else 0
 
         # Project 10% increase
         target_funded_count = int(funded_count * 1.1)
@@ -7258,53 +8469,30 @@ async def get_scorecard(
         # FUNDING TOTALS
         # ============================================================================
 
-        # Get all funded loans
-        funded_loans_all = db.query(Loan).filter(
-            Loan.loan_officer_id == current_user.id,
-            Loan.stage == LoanStage.FUNDED,
-            Loan.funded_date >= start,
-            Loan.funded_date <= end
-        ).all()
-
         # Calculate totals
-        total_funded_units = len(funded_loans_all)
-        total_funded_volume = sum(loan.amount for loan in funded_loans_all if loan.amount)
+        total_funded_units = funded_count
+        total_funded_volume = current_volume
 
         # Break down by loan type
-        loan_type_breakdown = {}
-        for loan in funded_loans_all:
-            loan_type = loan.loan_type or "Unknown"
-            if loan_type not in loan_type_breakdown:
-                loan_type_breakdown[loan_type] = {"units": 0, "volume": 0}
-            loan_type_breakdown[loan_type]["units"] += 1
-            loan_type_breakdown[loan_type]["volume"] += loan.amount if loan.amount else 0
-
         loan_types = [
             {
                 "type": loan_type,
-                "units": data["units"],
+                "units": data["count"],
                 "volume": data["volume"],
                 "percentage": (data["volume"] / total_funded_volume * 100) if total_funded_volume > 0 else 0
             }
-            for loan_type, data in loan_type_breakdown.items()
+            for loan_type, data in kpi_breakdown(period, 'funded').items()
         ]
 
         # Break down by referral source
-        referral_breakdown = {}
-        for loan in funded_loans_all:
-            source = loan.source or "Unknown"
-            if source not in referral_breakdown:
-                referral_breakdown[source] = {"referrals": 0, "closed_volume": 0}
-            referral_breakdown[source]["referrals"] += 1
-            referral_breakdown[source]["closed_volume"] += loan.amount if loan.amount else 0
-
+        closed_volume_by_source = _referral_source_closed_volume(db, current_user.id, start, end)
         referral_sources = [
             {
                 "source": source,
-                "referrals": data["referrals"],
-                "closed_volume": data["closed_volume"]
+                "referrals": data["count"],
+                "closed_volume": closed_volume_by_source.get(source, 0)
             }
-            for source, data in referral_breakdown.items()
+            for source, data in kpi_breakdown(period, 'lead_start').items()
         ]
 
         funding_totals = {
@@ -7344,9 +8532,7 @@ async def create_lead(lead: LeadCreate, db: Session = Depends(get_db), current_u
         owner_id=current_user.id,
     )
 
-    # Calculate AI score
-    db_lead.ai_score = calculate_lead_score(db_lead)
-    db_lead.sentiment = "positive" if db_lead.ai_score >= 75 else "neutral" if db_lead.ai_score >= 50 else "needs-attention"
+    # AI score and sentiment are set as the lead flushes (_score_changed_leads)
     db_lead.next_action = "Initial contact and needs assessment"
 
     db.add(db_lead)
@@ -7391,8 +8577,6 @@ async def update_lead(lead_id: int, lead_update: LeadUpdate, db: Session = Depen
     for key, value in lead_update.dict(exclude_unset=True).items():
         setattr(lead, key, value)
 
-    # Recalculate AI score
-    lead.ai_score = calculate_lead_score(lead)
     lead.updated_at = datetime.now(timezone.utc)
 
     db.commit()
@@ -7406,9 +8590,10 @@ async def delete_lead(lead_id: int, db: Session = Depends(get_db), current_user:
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
 
+    lead_name = lead.name
     db.delete(lead)
     db.commit()
-    logger.info(f"Lead deleted: {lead.name}")
+    logger.info(f"Lead deleted: {lead_name}")
     return None
 
 # ============================================================================
@@ -7422,7 +8607,14 @@ async def create_loan(loan: LoanCreate, db: Session = Depends(get_db), current_u
         if existing:
             raise HTTPException(status_code=400, detail="Loan number already exists")
 
+        if loan.lead_id is not None:
+            lead = db.query(Lead.id).filter(Lead.id == loan.lead_id, Lead.owner_id == current_user.id).first()
+            if not lead:
+                raise HTTPException(status_code=404, detail="Lead not found")
+
         db_loan = Loan(**loan.model_dump(), loan_officer_id=current_user.id)
+        if db_loan.lead_id is None:
+            db_loan.lead_id = find_lead_for_borrower(db, current_user.id, db_loan.borrower_name)
         db_loan.ai_insights = generate_ai_insights(db_loan)
 
         db.add(db_loan)
@@ -7928,6 +9120,294 @@ async def delete_mum_client(client_id: int, db: Session = Depends(get_db), curre
     logger.info(f"MUM client deleted: {client.name}")
     return None
 
+# ============================================================================
+# DATA IMPORT
+# ============================================================================
+
+# CSV/XLSX uploads from the Data Management page, imported in bulk batches
+# (services/data_import.py). Bulk statements skip the session flush hooks, so
+# lead/loan imports refresh the KPI rollups for the days they touched.
+DATA_IMPORT_MAX_ERRORS = 500
+
+
+def _derive_lead_import(values):
+    """Leads need a name: the full-name column, else first + last name"""
+    parts = [values[name].fillna("") for name in ("first_name", "last_name") if name in values]
+    if parts:
+        combined = (parts[0] + " " + parts[1]).str.strip() if len(parts) == 2 else parts[0]
+        combined = combined.where(combined != "", None)
+        values["name"] = values["name"].fillna(combined) if "name" in values else combined
+    return values
+
+
+def _derive_portfolio_import(values):
+    """Days since funding, as create_mum_client computes it"""
+    if "origination_date" in values:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        values["days_since_funding"] = (now - values["origination_date"]).dt.days.astype("Int64")
+    return values
+
+
+def _refresh_import_kpi_rollups(session: Session, user_id: int, days: Set[date]):
+    connection = session.connection()
+    try:
+        with connection.begin_nested():
+            refresh_kpi_rollups(connection, user_id, days)
+    except Exception as e:
+        # Never fail the import because of a rollup; /admin/rebuild-kpi-rollups repairs drift
+        logger.warning(f"KPI rollup refresh failed for user {user_id} after import: {e}")
+
+
+def _after_lead_import(session: Session, user_id: int, days: Set[date]):
+    """Imported rows bypass the ORM scoring hook; score the user's stale leads in one UPDATE"""
+    connection = session.connection()
+    try:
+        with connection.begin_nested():
+            lead_scorer.rescore(connection, Lead.__table__.c.owner_id == user_id)
+    except Exception as e:
+        # The scheduled rescoring job picks these up on its next run
+        logger.warning(f"Lead rescoring failed for user {user_id} after import: {e}")
+    _refresh_import_kpi_rollups(session, user_id, days)
+
+
+data_importer = DataImporter([
+    ImportTarget(
+        key="leads",
+        label="Leads",
+        description="Prospective borrowers for your pipeline",
+        icon="👤",
+        model=Lead,
+        fields=[
+            ImportField("name", "Full Name", aliases=("borrower name", "client name", "contact name", "borrower")),
+            ImportField("first_name", "First Name", virtual=True, aliases=("first", "given name", "fname")),
+            ImportField("last_name", "Last Name", virtual=True, aliases=("last", "surname", "lname")),
+            ImportField("email", "Email", "email", aliases=("email address", "e-mail")),
+            ImportField("phone", "Phone", aliases=("phone number", "mobile", "cell", "telephone")),
+            ImportField("address", "Address", aliases=("street", "street address", "property address")),
+            ImportField("city", "City"),
+            ImportField("state", "State"),
+            ImportField("zip_code", "Zip Code", aliases=("zip", "postal code")),
+            ImportField("property_type", "Property Type"),
+            ImportField("property_value", "Property Value", "float", aliases=("home value", "purchase price")),
+            ImportField("loan_amount", "Loan Amount", "float"),
+            ImportField("down_payment", "Down Payment", "float"),
+            ImportField("loan_type", "Loan Type"),
+            ImportField("preapproval_amount", "Pre-Approval Amount", "float", aliases=("preapproval",)),
+            ImportField("employment_status", "Employment Status", aliases=("employment",)),
+            ImportField("annual_income", "Annual Income", "float", aliases=("income",)),
+            ImportField("monthly_debts", "Monthly Debts", "float"),
+            ImportField("credit_score", "Credit Score", "int", aliases=("fico", "fico score", "credit")),
+            ImportField("debt_to_income", "Debt-to-Income", "float", aliases=("dti",)),
+            ImportField("source", "Lead Source", aliases=("referral source",)),
+            ImportField("stage", "Stage", "enum", enum=LeadStage, aliases=("status", "lead status")),
+            ImportField("notes", "Notes", aliases=("comments", "note")),
+        ],
+        required=(("name", "first_name", "last_name"),),
+        match_on=("email",),
+        match_case_insensitive=True,
+        owner_column="owner_id",
+        defaults={"source": "Import"},
+        day_columns=("created_at",),
+        derive=_derive_lead_import,
+        after_import=_after_lead_import,
+    ),
+    ImportTarget(
+        key="loans",
+        label="Loans",
+        description="Active loans in your pipeline",
+        icon="🏠",
+        model=Loan,
+        fields=[
+            ImportField("loan_number", "Loan Number", aliases=("loan #", "loan no", "loan id")),
+            ImportField("borrower_name", "Borrower Name", aliases=("borrower", "client name", "full name")),
+            ImportField("co_borrower_name", "Co-Borrower Name", column="coborrower_name", aliases=("co-borrower", "coborrower")),
+            ImportField("property_address", "Property Address", aliases=("address", "subject property")),
+            ImportField("loan_amount", "Loan Amount", "float", column="amount", aliases=("amount", "base loan amount")),
+            ImportField("purchase_price", "Purchase Price", "float", aliases=("sales price", "price")),
+            ImportField("down_payment", "Down Payment", "float"),
+            ImportField("interest_rate", "Interest Rate", "float", column="rate", aliases=("rate", "note rate")),
+            ImportField("loan_term", "Loan Term (months)", "int", column="term", aliases=("term",)),
+            ImportField("loan_type", "Loan Type"),
+            ImportField("program", "Program", aliases=("loan program", "product", "product type")),
+            ImportField("stage", "Stage", "enum", enum=LoanStage, aliases=("status", "loan status", "milestone")),
+            ImportField("closing_date", "Closing Date", "date", aliases=("close date", "estimated closing")),
+            ImportField("funded_date", "Funded Date", "date", aliases=("funding date", "funded")),
+            ImportField("processor", "Processor"),
+            ImportField("underwriter", "Underwriter"),
+            ImportField("realtor_agent", "Realtor", aliases=("agent", "realtor agent", "buyer agent")),
+            ImportField("title_company", "Title Company", aliases=("title",)),
+        ],
+        required=(("loan_number",), ("borrower_name",), ("loan_amount",)),
+        match_on=("loan_number",),
+        owner_column="loan_officer_id",
+        scope_to_owner=False,
+        day_columns=("created_at", "funded_date"),
+        after_import=_refresh_import_kpi_rollups,
+    ),
+    ImportTarget(
+        key="portfolio",
+        label="Portfolio (MUM Clients)",
+        description="Funded loans to watch for refinance opportunities",
+        icon="📈",
+        model=MUMClient,
+        fields=[
+            ImportField("loan_number", "Loan Number", aliases=("loan #", "loan no", "loan id")),
+            ImportField("borrower_name", "Borrower Name", column="name", aliases=("name", "borrower", "client name")),
+            ImportField("origination_date", "Origination / Close Date", "date", column="original_close_date",
+                        aliases=("close date", "closing date", "funded date", "original close date")),
+            ImportField("interest_rate", "Interest Rate", "float", column="original_rate", aliases=("rate", "original rate", "note rate")),
+            ImportField("current_rate", "Current Market Rate", "float", aliases=("market rate",)),
+            ImportField("current_balance", "Current Balance", "float", column="loan_balance",
+                        aliases=("balance", "loan balance", "principal balance", "upb")),
+            ImportField("payment_status", "Status", column="status", aliases=("payment status",)),
+        ],
+        required=(("borrower_name",), ("origination_date",)),
+        match_on=("loan_number",),
+        derive=_derive_portfolio_import,
+    ),
+    ImportTarget(
+        key="partners",
+        label="Referral Partners",
+        description="Realtors, builders and other referral sources",
+        icon="🤝",
+        model=ReferralPartner,
+        fields=[
+            ImportField("name", "Name", aliases=("partner name", "contact name", "full name", "agent name")),
+            ImportField("company", "Company", aliases=("brokerage", "firm", "company name")),
+            ImportField("type", "Partner Type", aliases=("role", "category")),
+            ImportField("phone", "Phone", aliases=("phone number", "mobile", "cell")),
+            ImportField("email", "Email", "email", aliases=("email address", "e-mail")),
+            ImportField("status", "Status"),
+            ImportField("notes", "Notes", aliases=("comments", "note")),
+        ],
+        required=(("name",),),
+        match_on=("name", "company"),
+        match_case_insensitive=True,
+    ),
+])
+
+
+@app.post("/api/v1/data-import/analyze")
+async def analyze_data_import(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Preview an uploaded CSV/XLSX file and suggest where its columns go
+
+    Returns the preview (headers, first rows, row count), the questions the
+    Data Management page asks (destination, what to do with duplicates) with
+    suggested answers, and suggested column mappings for every destination.
+    """
+    try:
+        analysis = await asyncio.get_running_loop().run_in_executor(
+            None, data_importer.analyze, file.file, file.filename
+        )
+    except DataImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Data import analysis failed for {file.filename}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    destination = analysis["destination"]
+    questions = data_importer.questions(destination)
+    return {
+        "filename": file.filename,
+        "file_type": analysis["file_type"],
+        "preview": {
+            "headers": analysis["headers"],
+            "rows": analysis["rows"],
+            "total_rows": analysis["total_rows"],
+        },
+        "questions": questions,
+        "default_answers": {question["id"]: question["default"] for question in questions},
+        "suggested_mappings": analysis["mappings"][destination],
+        "mappings_by_destination": analysis["mappings"],
+        "target_fields": {key: target.describe_fields() for key, target in data_importer.targets.items()},
+    }
+
+
+@app.post("/api/v1/data-import/execute")
+async def execute_data_import(
+    request: Request,
+    file: UploadFile = File(...),
+    answers: str = Form("{}"),
+    mappings: str = Form("{}"),
+    stream: bool = Form(False),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Import an uploaded CSV/XLSX file into leads, loans, portfolio or referral partners
+
+    Form fields: file, answers (JSON with destination and on_duplicate) and
+    mappings (JSON {column: field}). Rows are written in batches with one
+    commit each; rows that fail validation are reported as "Row N: ...".
+    Returns {total, imported, inserted, updated, skipped, failed, destination,
+    errors}. Send stream=true (or Accept: text/event-stream) to receive a
+    progress event with the batch's row errors after each commit, then done.
+    """
+    try:
+        answers = json.loads(answers or "{}")
+        mappings = json.loads(mappings or "{}")
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="answers and mappings must be JSON objects")
+    if not isinstance(answers, dict) or not isinstance(mappings, dict):
+        raise HTTPException(status_code=400, detail="answers and mappings must be JSON objects")
+
+    loop = asyncio.get_running_loop()
+    try:
+        headers = await loop.run_in_executor(None, read_headers, file.file, file_kind(file.filename))
+        plan = data_importer.plan(file.filename, headers, answers.get("destination") or "leads", mappings,
+                                  answers.get("on_duplicate") or "update")
+    except DataImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    summary = {"total": 0, "imported": 0, "inserted": 0, "updated": 0, "skipped": 0, "failed": 0,
+               "destination": plan.target.key, "errors": []}
+    batches = data_importer.run(db, plan, file.file, current_user.id)
+
+    async def next_batch():
+        # Parsing and bulk writes are CPU/DB bound; keep them off the event loop
+        progress = await loop.run_in_executor(None, next, batches, None)
+        if progress is not None:
+            summary.update((key, progress[key]) for key in ("total", "imported", "inserted", "updated", "skipped", "failed"))
+            room = DATA_IMPORT_MAX_ERRORS - len(summary["errors"])
+            summary["errors"].extend(f"Row {error['row']}: {error['error']}" for error in progress["errors"][:max(room, 0)])
+        return progress
+
+    def log_summary():
+        logger.info(f"Data import by user {current_user.id} into {plan.target.key} ({file.filename}): "
+                    + ", ".join(f"{key}={summary[key]}" for key in ("total", "inserted", "updated", "skipped", "failed")))
+
+    if wants_event_stream(request, stream):
+        async def events():
+            try:
+                while (progress := await next_batch()) is not None:
+                    yield sse_event("progress", progress)
+            except Exception as e:
+                logger.error(f"Data import stream failed: {e}")
+                yield sse_event("error", {**summary, "error": str(e)})
+                return
+            log_summary()
+            yield sse_event("done", summary)
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    try:
+        while await next_batch() is not None:
+            pass
+    except DataImportError as e:
+        # The file broke part way through; earlier batches are already committed
+        summary["errors"].append(str(e))
+    except Exception as e:
+        logger.error(f"Data import error: {e}")
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    log_summary()
+    return summary
+
 # ============================================================================
 # ACTIVITIES CRUD
 # ============================================================================
@@ -8303,37 +9783,122 @@ async def get_pipeline_analytics(db: Session = Depends(get_db), current_user: Us
         "stage_breakdown": stage_breakdown
     }
 
+def _normalize_borrower_name(name: Optional[str]) -> str:
+    return " ".join(name.lower().split()) if name else ""
+
+def find_lead_for_borrower(db: Session, user_id: int, borrower_name: Optional[str]) -> Optional[int]:
+    """Most recent lead of this officer whose name matches the borrower (case/whitespace-insensitive)"""
+    normalized = _normalize_borrower_name(borrower_name)
+    if not normalized:
+        return None
+    # SQL narrows to leads containing every word; the comparison itself uses the
+    # same normalization as the backfill, so runs of whitespace still match
+    candidates = db.query(Lead.id, Lead.name).filter(
+        Lead.owner_id == user_id,
+        *(func.lower(Lead.name).contains(word, autoescape=True) for word in normalized.split())
+    ).order_by(Lead.created_at.desc(), Lead.id.desc())
+    for lead_id, name in candidates:
+        if _normalize_borrower_name(name) == normalized:
+            return lead_id
+    return None
+
+def backfill_loan_lead_links(db: Session, user_id: Optional[int] = None, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Link existing loans to their originating lead by borrower name.
+    Only loans without a lead_id are touched; one bulk UPDATE per batch.
+    """
+    user_ids = [user_id] if user_id else [uid for (uid,) in db.query(User.id).all()]
+    linked = scanned = 0
+
+    for uid in user_ids:
+        # Most recent lead wins when several share a name
+        lead_by_name: Dict[str, int] = {}
+        for lead_id, name in db.query(Lead.id, Lead.name).filter(
+            Lead.owner_id == uid
+        ).order_by(Lead.created_at, Lead.id).yield_per(5000):
+            normalized = _normalize_borrower_name(name)
+            if normalized:
+                lead_by_name[normalized] = lead_id
+        if not lead_by_name:
+            continue
+
+        unlinked = db.query(Loan.id, Loan.borrower_name).filter(
+            Loan.loan_officer_id == uid,
+            Loan.lead_id.is_(None)
+        ).all()
+        scanned += len(unlinked)
+
+        updates = []
+        for loan_id, borrower_name in unlinked:
+            lead_id = lead_by_name.get(_normalize_borrower_name(borrower_name))
+            if lead_id:
+                updates.append({'id': loan_id, 'lead_id': lead_id})
+
+        for i in range(0, len(updates), batch_size):
+            db.bulk_update_mappings(Loan, updates[i:i + batch_size])
+            db.commit()
+        linked += len(updates)
+
+    return {'users': len(user_ids), 'loans_scanned': scanned, 'loans_linked': linked}
+
+def _referral_source_closed_volume(db: Session, user_id: int, start: date, end: date) -> Dict[str, float]:
+    """Funded volume grouped by the source of the lead each loan originated from (one grouped join)"""
+    rows = db.query(Lead.source, func.sum(Loan.amount)).join(
+        Lead, Loan.lead_id == Lead.id
+    ).filter(
+        Loan.loan_officer_id == user_id,
+        Loan.stage == LoanStage.FUNDED,
+        Loan.funded_date >= start,
+        Loan.funded_date < end + timedelta(days=1),
+        Lead.created_at >= start,
+        Lead.created_at < end + timedelta(days=1)
+    ).group_by(Lead.source).all()
+
+    return {source or "Unknown": float(volume or 0) for source, volume in rows}
+
+def _avg_days_lead_to_application(db: Session, user_id: int, start: date, end: date) -> Optional[float]:
+    """Average days from lead creation to loan (application) creation over linked loans"""
+    if db.bind.dialect.name == "sqlite":
+        days_between = func.julianday(Loan.created_at) - func.julianday(Lead.created_at)
+    else:
+        days_between = func.extract('epoch', Loan.created_at - Lead.created_at) / 86400.0
+
+    avg_days = db.query(func.avg(days_between)).join(
+        Lead, Loan.lead_id == Lead.id
+    ).filter(
+        Loan.loan_officer_id == user_id,
+        Loan.created_at >= start,
+        Loan.created_at < end + timedelta(days=1),
+        Lead.created_at >= start,
+        Lead.created_at < end + timedelta(days=1)
+    ).scalar()
+    return float(avg_days) if avg_days is not None else None
+
 @app.get("/api/v1/analytics/scorecard")
 async def get_scorecard_metrics(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Get comprehensive scorecard metrics based on real loan activity"""
     from datetime import datetime, timedelta, timezone
-    from sqlalchemy import func, extract
-    
+
     # Get current year for YTD calculations
-    current_year = datetime.now().year
-    
-    # Get all leads and loans for the user
-    leads = db.query(Lead).filter(Lead.owner_id == current_user.id).all()
-    loans = db.query(Loan).filter(Loan.loan_officer_id == current_user.id).all()
-    activities = db.query(Activity).join(Loan).filter(Loan.loan_officer_id == current_user.id).all()
-    
-    # Filter YTD data
-    ytd_leads = [l for l in leads if l.created_at and l.created_at.year == current_year]
-    ytd_loans = [l for l in loans if l.created_at and l.created_at.year == current_year]
-    funded_loans = [l for l in ytd_loans if l.stage == LoanStage.FUNDED]
-    
+    today = datetime.now().date()
+    start_of_year = today.replace(month=1, day=1)
+
+    # YTD counters from the daily rollups (one grouped query)
+    ytd = load_kpi_rollups(db, current_user.id, start_of_year, today)
+
     # Calculate stage-based metrics from real loan activity
-    total_leads = len(ytd_leads)
-    prospect_leads = len([l for l in ytd_leads if l.stage == LeadStage.PROSPECT])
-    app_started = len([l for l in ytd_leads if l.stage in [LeadStage.APPLICATION_STARTED, LeadStage.APPLICATION_COMPLETE, LeadStage.PRE_APPROVED]])
-    pre_approved = len([l for l in ytd_leads if l.stage == LeadStage.PRE_APPROVED])
-    funded_count = len(funded_loans)
-    
-    # Active loans in different stages
-    processing_loans = [l for l in ytd_loans if l.stage == LoanStage.PROCESSING]
-    underwriting_loans = [l for l in ytd_loans if l.stage == LoanStage.UW_RECEIVED]
-    clear_to_close = [l for l in ytd_loans if l.stage == LoanStage.CTC]
-    
+    total_leads = kpi_total(ytd, 'lead_start')
+    prospect_leads = kpi_total(ytd, 'lead_stage', {LeadStage.PROSPECT.value})
+    app_started = kpi_total(ytd, 'lead_stage', {LeadStage.APPLICATION_STARTED.value, LeadStage.APPLICATION_COMPLETE.value, LeadStage.PRE_APPROVED.value})
+    pre_approved = kpi_total(ytd, 'lead_stage', {LeadStage.PRE_APPROVED.value})
+    funded_count = kpi_total(ytd, 'funded')
+
+    # Active loans in different stages (loans started this year)
+    ytd_loan_count = kpi_total(ytd, 'loan_app')
+    processing_count = kpi_total(ytd, 'loan_app', {LoanStage.PROCESSING.value})
+    underwriting_count = kpi_total(ytd, 'loan_app', {LoanStage.UW_RECEIVED.value})
+    ctc_count = kpi_total(ytd, 'loan_app', {LoanStage.CTC.value})
+
     # Calculate conversion metrics from actual data
     conversion_metrics = {
         "starts_to_apps": round((app_started / total_leads * 100) if total_leads > 0 else 0, 1),
@@ -8343,112 +9908,87 @@ async def get_scorecard_metrics(db: Session = Depends(get_db), current_user: Use
     }
 
     # Calculate volume & revenue from real loan data
-    total_volume = sum([l.amount for l in funded_loans if l.amount]) or 0
-    avg_loan_amount = (total_volume / len(funded_loans)) if funded_loans else 0
-    
+    total_volume = kpi_total(ytd, 'funded', field='volume')
+    avg_loan_amount = (total_volume / funded_count) if funded_count else 0
+
     # Calculate commission (assuming 185 basis points average)
     commission_earned = total_volume * 0.0185 if total_volume else 0
 
+    # Portfolio value covers all loans, not just YTD
+    portfolio_value = db.query(func.coalesce(func.sum(KPIDailyRollup.volume), 0)).filter(
+        KPIDailyRollup.user_id == current_user.id,
+        KPIDailyRollup.metric == 'loan_app'
+    ).scalar() or 0
+
     volume_revenue = {
         "total_loans": funded_count,
         "total_volume": total_volume,
         "avg_loan_amount": avg_loan_amount,
         "commission_earned": commission_earned,
-        "referrals": len([l for l in ytd_leads if l.source and 'referral' in l.source.lower()]),
-        "portfolio_value": sum([l.amount for l in loans if l.amount]) or 0  # All loans, not just YTD
+        "referrals": sum(
+            values['count'] for source, values in kpi_breakdown(ytd, 'lead_start').items()
+            if 'referral' in source.lower()
+        ),
+        "portfolio_value": portfolio_value
     }
 
     # Calculate loan type distribution from real data
-    loan_types = {}
-    for loan in funded_loans:
-        loan_type = loan.product_type or "Conventional"
-        if loan_type not in loan_types:
-            loan_types[loan_type] = {"count": 0, "volume": 0}
-        loan_types[loan_type]["count"] += 1
-        loan_types[loan_type]["volume"] += loan.amount if loan.amount else 0
-
     loan_type_distribution = [
         {
-            "type": loan_type,
+            "type": loan_type if loan_type != "Unknown" else "Conventional",
             "units": data["count"],
             "volume": data["volume"],
             "percentage": round((data["volume"] / total_volume * 100) if total_volume > 0 else 0, 2)
         }
-        for loan_type, data in loan_types.items()
+        for loan_type, data in kpi_breakdown(ytd, 'funded').items()
     ]
 
     # Calculate referral sources from real lead data
-    referral_sources = {}
-    for lead in ytd_leads:
-        source = lead.source or "Unknown"
-        if source not in referral_sources:
-            referral_sources[source] = {"count": 0, "volume": 0}
-        referral_sources[source]["count"] += 1
-        # Find corresponding loan for this lead
-        lead_loan = next((l for l in funded_loans if l.borrower_name == lead.name), None)
-        if lead_loan and lead_loan.amount:
-            referral_sources[source]["volume"] += lead_loan.amount
-
+    closed_volume_by_source = _referral_source_closed_volume(db, current_user.id, start_of_year, today)
     referral_sources_list = [
         {
             "source": source,
             "referrals": data["count"],
-            "closedVolume": data["volume"]
+            "closedVolume": closed_volume_by_source.get(source, 0)
         }
-        for source, data in referral_sources.items()
+        for source, data in kpi_breakdown(ytd, 'lead_start').items()
     ]
 
-    # Calculate process timeline from actual loan activities and timestamps
-    def calculate_avg_days(from_stage, to_stage):
-        stage_transitions = []
-        for loan in ytd_loans:
-            if loan.created_at and loan.updated_at:
-                # This is simplified - in reality you'd track stage transitions in activities
-                if from_stage == "start" and to_stage == "app":
-                    # Days from lead creation to loan creation (application start)
-                    lead = next((l for l in ytd_leads if l.name == loan.borrower_name), None)
-                    if lead and lead.created_at:
-                        days = (loan.created_at - lead.created_at).days
-                        stage_transitions.append(days)
-                elif from_stage == "app" and to_stage == "underwriting":
-                    # Days in processing
-                    if loan.stage in [LoanStage.UW_RECEIVED, LoanStage.CTC, LoanStage.FUNDED]:
-                        # Simplified calculation - would be better with activity timestamps
-                        days = 5  # Default assumption
-                        stage_transitions.append(days)
-        
-        return round(sum(stage_transitions) / len(stage_transitions)) if stage_transitions else 10
+    # Calculate process timeline from lead and loan timestamps
+    avg_start_to_app = _avg_days_lead_to_application(db, current_user.id, start_of_year, today)
+    reached_underwriting = kpi_total(ytd, 'loan_app', {LoanStage.UW_RECEIVED.value, LoanStage.CTC.value, LoanStage.FUNDED.value})
 
     process_timeline = [
         {
             "id": "starts-to-app",
             "title": "Avg Starts to App (LE)",
-            "value": f"{calculate_avg_days('start', 'app')} Days",
+            "value": f"{round(avg_start_to_app) if avg_start_to_app is not None else 10} Days",
             "subtitle": "Loan Officer Average"
         },
         {
             "id": "app-to-uw",
+            # Simplified - would be better with stage transition timestamps
             "title": "Avg App (LE) to UW",
-            "value": f"{calculate_avg_days('app', 'underwriting')} Days",
+            "value": f"{5 if reached_underwriting else 10} Days",
             "subtitle": "Loan Officer Average"
         },
         {
             "id": "lock-to-funded",
             "title": "Initial Lock to Funded",
-            "value": len(funded_loans),
+            "value": funded_count,
             "goal": 90,
-            "current": len(processing_loans) + len(underwriting_loans),
-            "total": len(ytd_loans),
+            "current": processing_count + underwriting_count,
+            "total": ytd_loan_count,
             "isPercentage": True
         }
     ]
 
     # Current pipeline status
     pipeline_status = {
-        "prospect": len([l for l in ytd_leads if l.stage == LeadStage.PROSPECT]),
-        "application": len([l for l in ytd_loans if l.stage in [LoanStage.DISCLOSED, LoanStage.PROCESSING]]),
-        "underwriting": len(underwriting_loans),
-        "clear_to_close": len(clear_to_close),
+        "prospect": prospect_leads,
+        "application": kpi_total(ytd, 'loan_app', {LoanStage.DISCLOSED.value, LoanStage.PROCESSING.value}),
+        "underwriting": underwriting_count,
+        "clear_to_close": ctc_count,
         "funded": funded_count
     }
 
@@ -8781,28 +10321,173 @@ async def execute_ai_function(
                         "stage": lead.stage.value,
                         "ai_score": lead.ai_score
                     }
-                    for lead in leads
-                ]
+                    for lead in leads
+                ]
+            }
+
+        else:
+            return {"success": False, "error": f"Unknown function: {function_name}"}
+
+    except Exception as e:
+        logger.error(f"Error executing AI function {function_name}: {e}")
+        return {"success": False, "error": str(e)}
+
+# Functions the AI assistant can call
+AI_CHAT_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "create_task",
+            "description": "Create a new task for a lead or loan. Use this when the user asks you to create a task, reminder, or follow-up.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "title": {
+                        "type": "string",
+                        "description": "The task title (e.g., 'Call John about pre-approval')"
+                    },
+                    "description": {
+                        "type": "string",
+                        "description": "Detailed description of the task"
+                    },
+                    "lead_id": {
+                        "type": "integer",
+                        "description": "The lead ID this task is for (if applicable)"
+                    },
+                    "loan_id": {
+                        "type": "integer",
+                        "description": "The loan ID this task is for (if applicable)"
+                    },
+                    "due_date": {
+                        "type": "string",
+                        "description": "Due date in ISO format (e.g., '2025-11-10T10:00:00')"
+                    },
+                    "priority": {
+                        "type": "string",
+                        "enum": ["high", "medium", "low"],
+                        "description": "Task priority level"
+                    }
+                },
+                "required": ["title"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "update_lead_stage",
+            "description": "Update a lead's stage in the pipeline. Use this when progressing a lead or changing their status.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "lead_id": {
+                        "type": "integer",
+                        "description": "The lead ID to update"
+                    },
+                    "new_stage": {
+                        "type": "string",
+                        "enum": ["New", "Attempted Contact", "Prospect", "Pre-Qualified", "Pre-Approved", "Application", "Completed", "Withdrawn", "Does Not Qualify"],
+                        "description": "The new stage for the lead"
+                    },
+                    "reason": {
+                        "type": "string",
+                        "description": "Brief reason for the stage change"
+                    }
+                },
+                "required": ["lead_id", "new_stage"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "add_activity",
+            "description": "Add a note, activity, or log entry to a lead or loan. Use this to record conversations, notes, or important events.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "lead_id": {
+                        "type": "integer",
+                        "description": "The lead ID (if applicable)"
+                    },
+                    "loan_id": {
+                        "type": "integer",
+                        "description": "The loan ID (if applicable)"
+                    },
+                    "activity_type": {
+                        "type": "string",
+                        "enum": ["note", "call", "email", "meeting", "sms", "other"],
+                        "description": "Type of activity"
+                    },
+                    "description": {
+                        "type": "string",
+                        "description": "The activity description or note content"
+                    }
+                },
+                "required": ["description", "activity_type"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_lead_details",
+            "description": "Retrieve detailed information about a specific lead. Use this when you need more information about a lead.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "lead_id": {
+                        "type": "integer",
+                        "description": "The lead ID to retrieve"
+                    }
+                },
+                "required": ["lead_id"]
             }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_high_priority_leads",
+            "description": "Get a list of high-priority leads that need attention. Use this when asked about priorities or what to work on.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of leads to return (default 10)",
+                        "default": 10
+                    }
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_leads",
+            "description": "Search for leads by name, email, or other criteria.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Search query (name, email, etc.)"
+                    },
+                    "stage": {
+                        "type": "string",
+                        "description": "Filter by stage"
+                    }
+                },
+                "required": ["query"]
+            }
+        }
+    }
+]
 
-        else:
-            return {"success": False, "error": f"Unknown function: {function_name}"}
-
-    except Exception as e:
-        logger.error(f"Error executing AI function {function_name}: {e}")
-        return {"success": False, "error": str(e)}
-
-@app.post("/api/v1/ai/chat", response_model=ConversationResponse)
-async def ai_chat(
-    conversation: ConversationCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """AI Assistant chat endpoint with agentic function calling capabilities"""
-
-    if not openai_client:
-        raise HTTPException(status_code=503, detail="OpenAI API key not configured")
 
+def _ai_chat_messages(db: Session, conversation: ConversationCreate, current_user: User):
+    """Build the OpenAI message list; returns (messages, context_lead, context_loan)"""
     # Build context from lead or loan if provided
     context_info = ""
     context_lead = None
@@ -8818,159 +10503,6 @@ async def ai_chat(
         if context_loan:
             context_info = f"Loan: {context_loan.loan_number}, Borrower: {context_loan.borrower_name}, Stage: {context_loan.stage.value}, Amount: ${context_loan.amount:,.0f}"
 
-    # Define available functions for AI to call
-    tools = [
-        {
-            "type": "function",
-            "function": {
-                "name": "create_task",
-                "description": "Create a new task for a lead or loan. Use this when the user asks you to create a task, reminder, or follow-up.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "title": {
-                            "type": "string",
-                            "description": "The task title (e.g., 'Call John about pre-approval')"
-                        },
-                        "description": {
-                            "type": "string",
-                            "description": "Detailed description of the task"
-                        },
-                        "lead_id": {
-                            "type": "integer",
-                            "description": "The lead ID this task is for (if applicable)"
-                        },
-                        "loan_id": {
-                            "type": "integer",
-                            "description": "The loan ID this task is for (if applicable)"
-                        },
-                        "due_date": {
-                            "type": "string",
-                            "description": "Due date in ISO format (e.g., '2025-11-10T10:00:00')"
-                        },
-                        "priority": {
-                            "type": "string",
-                            "enum": ["high", "medium", "low"],
-                            "description": "Task priority level"
-                        }
-                    },
-                    "required": ["title"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "update_lead_stage",
-                "description": "Update a lead's stage in the pipeline. Use this when progressing a lead or changing their status.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "lead_id": {
-                            "type": "integer",
-                            "description": "The lead ID to update"
-                        },
-                        "new_stage": {
-                            "type": "string",
-                            "enum": ["New", "Attempted Contact", "Prospect", "Pre-Qualified", "Pre-Approved", "Application", "Completed", "Withdrawn", "Does Not Qualify"],
-                            "description": "The new stage for the lead"
-                        },
-                        "reason": {
-                            "type": "string",
-                            "description": "Brief reason for the stage change"
-                        }
-                    },
-                    "required": ["lead_id", "new_stage"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "add_activity",
-                "description": "Add a note, activity, or log entry to a lead or loan. Use this to record conversations, notes, or important events.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "lead_id": {
-                            "type": "integer",
-                            "description": "The lead ID (if applicable)"
-                        },
-                        "loan_id": {
-                            "type": "integer",
-                            "description": "The loan ID (if applicable)"
-                        },
-                        "activity_type": {
-                            "type": "string",
-                            "enum": ["note", "call", "email", "meeting", "sms", "other"],
-                            "description": "Type of activity"
-                        },
-                        "description": {
-                            "type": "string",
-                            "description": "The activity description or note content"
-                        }
-                    },
-                    "required": ["description", "activity_type"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "get_lead_details",
-                "description": "Retrieve detailed information about a specific lead. Use this when you need more information about a lead.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "lead_id": {
-                            "type": "integer",
-                            "description": "The lead ID to retrieve"
-                        }
-                    },
-                    "required": ["lead_id"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "get_high_priority_leads",
-                "description": "Get a list of high-priority leads that need attention. Use this when asked about priorities or what to work on.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "limit": {
-                            "type": "integer",
-                            "description": "Maximum number of leads to return (default 10)",
-                            "default": 10
-                        }
-                    }
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "search_leads",
-                "description": "Search for leads by name, email, or other criteria.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "Search query (name, email, etc.)"
-                        },
-                        "stage": {
-                            "type": "string",
-                            "description": "Filter by stage"
-                        }
-                    },
-                    "required": ["query"]
-                }
-            }
-        }
-    ]
-
     # Get conversation history for context
     history = db.query(Conversation).filter(
         Conversation.user_id == current_user.id
@@ -9008,28 +10540,196 @@ Be proactive, professional, and action-oriented. Always confirm what you've done
     # Add current message
     messages.append({"role": "user", "content": conversation.message})
 
+    return messages, context_lead, context_loan
+
+
+def _save_ai_chat(
+    db: Session,
+    conversation: ConversationCreate,
+    user_id: int,
+    ai_response: str,
+    actions_taken: List[dict]
+) -> Conversation:
+    """Save the user turn (with actions metadata) and the assistant turn"""
+    metadata = conversation.context or {}
+    if actions_taken:
+        metadata["actions_taken"] = actions_taken
+
+    db_conversation = Conversation(
+        user_id=user_id,
+        lead_id=conversation.lead_id,
+        loan_id=conversation.loan_id,
+        message=conversation.message,
+        response=ai_response,
+        role="user",
+        meta_data=metadata
+    )
+    db.add(db_conversation)
+
+    # Save assistant response
+    db_assistant = Conversation(
+        user_id=user_id,
+        lead_id=conversation.lead_id,
+        loan_id=conversation.loan_id,
+        message=ai_response,
+        role="assistant",
+        meta_data={"actions": actions_taken} if actions_taken else None
+    )
+    db.add(db_assistant)
+
+    db.commit()
+    db.refresh(db_conversation)
+    return db_conversation
+
+
+async def _finish_ai_chat_stream(conversation: ConversationCreate, user_id: int, state: dict):
+    """Background work after an AI chat stream: save the conversation"""
+    if not state["completed"]:
+        return
+    db = SessionLocal()
+    try:
+        _save_ai_chat(db, conversation, user_id, state["response"], state["actions_taken"])
+    except Exception as e:
+        logger.error(f"Error saving streamed AI chat: {e}")
+    finally:
+        db.close()
+
+
+def _stream_ai_chat(
+    conversation: ConversationCreate,
+    current_user: User,
+    messages: List[dict],
+    context_lead: Optional[Lead],
+    context_loan: Optional[Loan]
+) -> StreamingResponse:
+    """
+    SSE stream for the agentic chat
+
+    Events: token (text deltas), action (one per executed function), then
+    done or error. When the model calls functions, they run between the
+    first and the follow-up completion, and the follow-up is streamed too.
+    """
+    state = {"completed": False, "response": "", "actions_taken": []}
+
+    async def events():
+        actions_taken = state["actions_taken"]
+        try:
+            first = llm_client.stream(
+                OPENAI, "gpt-4o-mini", messages, tools=AI_CHAT_TOOLS,
+                temperature=0.7, max_tokens=1000, purpose="ai_chat"
+            )
+            async for chunk in first:
+                yield sse_event("token", {"text": chunk})
+            reply = first.response
+
+            if reply.tool_calls:
+                messages.append({
+                    "role": "assistant",
+                    "content": reply.text or None,
+                    "tool_calls": [
+                        {"id": call["id"], "type": "function",
+                         "function": {"name": call["name"], "arguments": call["arguments"]}}
+                        for call in reply.tool_calls
+                    ]
+                })
+
+                # The request session may already be released; functions get their own
+                db = SessionLocal()
+                try:
+                    for call in reply.tool_calls:
+                        function_args = json.loads(call["arguments"] or "{}")
+                        logger.info(f"AI calling function: {call['name']} with args: {function_args}")
+
+                        function_response = await execute_ai_function(
+                            call["name"], function_args, db, current_user, context_lead, context_loan
+                        )
+                        actions_taken.append({
+                            "function": call["name"],
+                            "args": function_args,
+                            "result": function_response
+                        })
+                        yield sse_event("action", actions_taken[-1])
+
+                        messages.append({
+                            "tool_call_id": call["id"],
+                            "role": "tool",
+                            "name": call["name"],
+                            "content": json.dumps(function_response)
+                        })
+                finally:
+                    db.close()
+
+                # Get final response from AI after function execution
+                follow_up = llm_client.stream(
+                    OPENAI, "gpt-4o-mini", messages, temperature=0.7, max_tokens=500, purpose="ai_chat"
+                )
+                async for chunk in follow_up:
+                    yield sse_event("token", {"text": chunk})
+                reply = follow_up.response
+
+        except Exception as e:
+            logger.error(f"AI chat stream failed: {e}")
+            yield sse_event("error", {"error": f"AI service error: {str(e)}", "actions_taken": actions_taken})
+            return
+
+        state["response"] = reply.text
+        state["completed"] = True
+        logger.info(f"AI chat streamed for user {current_user.email}. Actions taken: {len(actions_taken)}")
+        yield sse_event("done", {"response": reply.text, "actions_taken": actions_taken})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+        background=BackgroundTask(_finish_ai_chat_stream, conversation, current_user.id, state)
+    )
+
+
+@app.post("/api/v1/ai/chat", response_model=ConversationResponse)
+async def ai_chat(
+    conversation: ConversationCreate,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    AI Assistant chat endpoint with agentic function calling capabilities
+
+    With "stream": true (or Accept: text/event-stream) the reply is sent as
+    server-sent events and the conversation is saved after the stream ends.
+    """
+
+    stream = wants_event_stream(request, conversation.stream)
+    if not llm_client.available(OPENAI):
+        raise HTTPException(status_code=503, detail="OpenAI API key not configured")
+
+    messages, context_lead, context_loan = _ai_chat_messages(db, conversation, current_user)
+    if stream:
+        return _stream_ai_chat(conversation, current_user, messages, context_lead, context_loan)
+
     try:
         # Call OpenAI with function calling
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            tools=tools,
-            tool_choice="auto",
-            temperature=0.7,
-            max_tokens=1000
+        reply = await llm_client.complete(
+            OPENAI, "gpt-4o-mini", messages, tools=AI_CHAT_TOOLS,
+            temperature=0.7, max_tokens=1000, purpose="ai_chat"
         )
-
-        response_message = response.choices[0].message
-        tool_calls = response_message.tool_calls
         actions_taken = []
 
         # Execute any function calls
-        if tool_calls:
-            messages.append(response_message)
+        if reply.tool_calls:
+            messages.append({
+                "role": "assistant",
+                "content": reply.text or None,
+                "tool_calls": [
+                    {"id": call["id"], "type": "function",
+                     "function": {"name": call["name"], "arguments": call["arguments"]}}
+                    for call in reply.tool_calls
+                ]
+            })
 
-            for tool_call in tool_calls:
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
+            for call in reply.tool_calls:
+                function_name = call["name"]
+                function_args = json.loads(call["arguments"] or "{}")
 
                 logger.info(f"AI calling function: {function_name} with args: {function_args}")
 
@@ -9051,53 +10751,20 @@ Be proactive, professional, and action-oriented. Always confirm what you've done
 
                 # Add function response to messages
                 messages.append({
-                    "tool_call_id": tool_call.id,
+                    "tool_call_id": call["id"],
                     "role": "tool",
                     "name": function_name,
                     "content": json.dumps(function_response)
                 })
 
             # Get final response from AI after function execution
-            second_response = openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500
+            reply = await llm_client.complete(
+                OPENAI, "gpt-4o-mini", messages, temperature=0.7, max_tokens=500, purpose="ai_chat"
             )
 
-            ai_response = second_response.choices[0].message.content
-        else:
-            ai_response = response_message.content
-
-        # Save conversation with actions metadata
-        metadata = conversation.context or {}
-        if actions_taken:
-            metadata["actions_taken"] = actions_taken
-
-        db_conversation = Conversation(
-            user_id=current_user.id,
-            lead_id=conversation.lead_id,
-            loan_id=conversation.loan_id,
-            message=conversation.message,
-            response=ai_response,
-            role="user",
-            metadata=metadata
-        )
-        db.add(db_conversation)
-
-        # Save assistant response
-        db_assistant = Conversation(
-            user_id=current_user.id,
-            lead_id=conversation.lead_id,
-            loan_id=conversation.loan_id,
-            message=ai_response,
-            role="assistant",
-            metadata={"actions": actions_taken} if actions_taken else None
-        )
-        db.add(db_assistant)
+        ai_response = reply.text
 
-        db.commit()
-        db.refresh(db_conversation)
+        db_conversation = _save_ai_chat(db, conversation, current_user.id, ai_response, actions_taken)
 
         logger.info(f"AI chat completed for user {current_user.email}. Actions taken: {len(actions_taken)}")
         return db_conversation
@@ -9428,6 +11095,45 @@ def init_db():
                         CREATE INDEX IF NOT EXISTS ix_api_keys_key ON api_keys(key);
                     """))
 
+                    # Link loans to the lead they originated from
+                    conn.execute(text("""
+                        ALTER TABLE loans ADD COLUMN IF NOT EXISTS lead_id INTEGER REFERENCES leads(id) ON DELETE SET NULL;
+                    """))
+                    conn.execute(text("""
+                        CREATE INDEX IF NOT EXISTS ix_loans_lead_id ON loans(lead_id);
+                    """))
+
+                    # Reconciliation queue: events by user, extracted data by event
+                    conn.execute(text("""
+                        CREATE INDEX IF NOT EXISTS ix_incoming_data_events_user_id ON incoming_data_events(user_id);
+                    """))
+                    conn.execute(text("""
+                        CREATE INDEX IF NOT EXISTS ix_extracted_data_event_id ON extracted_data(event_id);
+                    """))
+
+                    # Delta cursor for incremental Microsoft 365 mailbox sync
+                    conn.execute(text("""
+                        ALTER TABLE microsoft_oauth_tokens ADD COLUMN IF NOT EXISTS mail_delta_link TEXT;
+                    """))
+
+                    # Counters needed to combine daily AI performance rollups
+                    conn.execute(text("""
+                        ALTER TABLE ai_performance_daily ADD COLUMN IF NOT EXISTS scored_actions INTEGER DEFAULT 0;
+                    """))
+                    conn.execute(text("""
+                        ALTER TABLE ai_performance_daily ADD COLUMN IF NOT EXISTS cleared_actions INTEGER DEFAULT 0;
+                    """))
+
+                    # Incremental lead rescoring reads leads by updated_at
+                    conn.execute(text("""
+                        CREATE INDEX IF NOT EXISTS ix_leads_updated_at ON leads(updated_at);
+                    """))
+
+                    # DRE pipeline workers claim events in the database
+                    conn.execute(text("""
+                        ALTER TABLE incoming_data_events ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP;
+                    """))
+
                     conn.commit()
                     logger.info("✅ Schema migrations applied (PostgreSQL)")
         except Exception as e:
@@ -11976,68 +13682,150 @@ async def initialize_mission_control(db: Session = Depends(get_db)):
 
 
 # ============================================================================
-# STARTUP EVENT
+# USER NOTIFICATIONS
 # ============================================================================
 
-async def auto_sync_emails():
-    """Background task to automatically sync emails for all users with sync enabled"""
-    try:
-        db = SessionLocal()
-
-        # Get all users with Microsoft sync enabled
-        oauth_tokens = db.query(MicrosoftOAuthToken).filter(
-            MicrosoftOAuthToken.sync_enabled == True
-        ).all()
-
-        logger.info(f"🔄 Auto-sync: Checking {len(oauth_tokens)} users for email sync")
+# Per-user push channel for open browser tabs, see services/user_notifications.py
+user_notifications = UserNotificationHub()
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_user_notifications(session, flush_context):
+    from sqlalchemy import inspect, select
+
+    pending = session.info.setdefault('user_notifications_pending', {"items": {}, "tasks": set()})
+    review_event_ids = []
+    for obj in session.new:
+        if isinstance(obj, ExtractedData) and obj.event_id and obj.status in RECONCILIATION_REVIEW_STATUSES:
+            review_event_ids.append(obj.event_id)
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, AITask):
+            history = inspect(obj).attrs.assigned_to_id.history
+            pending["tasks"].update(user_id for user_id in (obj.assigned_to_id, *history.deleted) if user_id)
+
+    if review_event_ids:
+        owners = dict(session.connection().execute(
+            select(IncomingDataEvent.id, IncomingDataEvent.user_id).where(IncomingDataEvent.id.in_(set(review_event_ids)))
+        ).all())
+        for event_id in review_event_ids:
+            if owners.get(event_id):
+                pending["items"][owners[event_id]] = pending["items"].get(owners[event_id], 0) + 1
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_user_notifications(session):
+    # Published only once committed, so a stream never announces rolled-back rows
+    pending = session.info.pop('user_notifications_pending', None)
+    if not pending:
+        return
+    for user_id, count in pending["items"].items():
+        user_notifications.publish(user_id, "reconciliation_items", {"new": count})
+    for user_id in pending["tasks"]:
+        user_notifications.publish(user_id, "task_counts_changed")
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_user_notifications(session):
+    session.info.pop('user_notifications_pending', None)
+
+def count_open_tasks(db: Session, user_id: int) -> Dict[str, int]:
+    """Navigation badge counts: tasks assigned to the user that are not completed"""
+    tasks = db.query(func.count(AITask.id)).filter(
+        AITask.assigned_to_id == user_id,
+        AITask.type != TaskType.COMPLETED
+    ).scalar()
+    return {"tasks": tasks or 0}
 
-        for oauth_record in oauth_tokens:
-            try:
-                # Check if it's time to sync based on sync_frequency_minutes
-                if oauth_record.last_sync_at:
-                    last_sync = oauth_record.last_sync_at
-                    # Ensure timezone-aware comparison
-                    if last_sync.tzinfo is None:
-                        last_sync = last_sync.replace(tzinfo=timezone.utc)
-
-                    time_since_sync = datetime.now(timezone.utc) - last_sync
-                    minutes_since_sync = time_since_sync.total_seconds() / 60
-
-                    # Skip if synced recently (within sync_frequency_minutes)
-                    if minutes_since_sync < oauth_record.sync_frequency_minutes:
-                        continue
+def _open_task_counts(user_id: int) -> Dict[str, int]:
+    db = SessionLocal()
+    try:
+        return count_open_tasks(db, user_id)
+    finally:
+        db.close()
 
-                logger.info(f"📧 Auto-syncing emails for user {oauth_record.user_id} ({oauth_record.email_address})")
+@app.get("/api/v1/notifications/stream")
+async def notification_stream(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Server-sent events for the current user's open tabs
 
-                # Fetch emails
-                result = await fetch_microsoft_emails(oauth_record, db, limit=50)
+    Events: connected, task_counts ({tasks}, on connect and after task
+    changes), reconciliation_items ({new}), sync_finished ({status, fetched,
+    new, ingested, finished_at}). Idle streams get a keep-alive comment.
+    """
+    user_id = current_user.id
+    # The stream can stay open for hours; don't hold a pooled connection
+    db.close()
+    queue = user_notifications.subscribe(user_id)
 
-                if "error" in result:
-                    logger.error(f"Auto-sync error for user {oauth_record.user_id}: {result['error']}")
+    async def events():
+        loop = asyncio.get_running_loop()
+        try:
+            yield sse_event("connected", {"user_id": user_id})
+            yield sse_event("task_counts", await loop.run_in_executor(None, _open_task_counts, user_id))
+            while True:
+                try:
+                    batch = [await asyncio.wait_for(queue.get(), timeout=user_notifications.heartbeat_seconds)]
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
                     continue
 
-                # Process each email through DRE
-                emails = result.get("emails", [])
-                processed_count = 0
+                # Coalesce a burst of task changes into one count
+                while not queue.empty():
+                    batch.append(queue.get_nowait())
+                counts_changed = False
+                for name, data in batch:
+                    if name == "task_counts_changed":
+                        counts_changed = True
+                    else:
+                        yield sse_event(name, data)
+                if counts_changed:
+                    yield sse_event("task_counts", await loop.run_in_executor(None, _open_task_counts, user_id))
+        finally:
+            user_notifications.unsubscribe(user_id, queue)
 
-                for email_data in emails:
-                    process_result = await process_microsoft_email_to_dre(email_data, oauth_record.user_id, db)
-                    if process_result.get("status") == "success":
-                        processed_count += 1
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
 
-                # Update last_sync_at
-                oauth_record.last_sync_at = datetime.now(timezone.utc)
-                db.commit()
 
-                logger.info(f"✅ Auto-synced {processed_count}/{len(emails)} emails for user {oauth_record.user_id}")
+# ============================================================================
+# STARTUP EVENT
+# ============================================================================
 
-            except Exception as e:
-                logger.error(f"Error auto-syncing for user {oauth_record.user_id}: {e}")
-                db.rollback()
-                continue
+# Concurrent mailbox sync engine used by the auto-sync scheduler job
+from services.mailbox_sync_engine import MailboxSyncEngine
+
+mailbox_sync_engine = MailboxSyncEngine(
+    session_factory=SessionLocal,
+    token_model=MicrosoftOAuthToken,
+    process_email=process_microsoft_email_to_dre,
+    decrypt_token=decrypt_token,
+    encrypt_token=encrypt_token,
+    filter_new_emails=filter_unprocessed_microsoft_emails,
+    notify=user_notifications.publish
+)
 
-        db.close()
+# Background classification/extraction stage for ingested DRE events
+dre_pipeline = DREPipeline(
+    session_factory=SessionLocal,
+    event_model=IncomingDataEvent,
+    backend=OpenAIDREBackend(llm_client) if llm_client.available(OPENAI) else KeywordDREBackend(),
+    persist_result=finalize_dre_event,
+    cache=llm_result_cache
+)
 
+async def run_dre_pipeline():
+    """Background task draining unprocessed DRE events"""
+    try:
+        await dre_pipeline.drain()
+    except Exception as e:
+        logger.error(f"DRE pipeline task error: {e}")
+
+async def auto_sync_emails():
+    """Background task to automatically sync emails for all users with sync enabled"""
+    try:
+        await mailbox_sync_engine.run_tick()
     except Exception as e:
         logger.error(f"Auto-sync task error: {e}")
 
@@ -12077,6 +13865,34 @@ async def startup_event():
             # Create sample data
             db = SessionLocal()
             try:
+                # One-time backfill of daily KPI rollups for existing data
+                try:
+                    result = backfill_kpi_rollups(db)
+                    if result is not None:
+                        logger.info(f"✅ KPI rollups backfilled: {result['rows']} rows for {result['users']} users")
+                except Exception as e:
+                    db.rollback()
+                    logger.warning(f"⚠️ KPI rollup backfill skipped: {e}")
+
+                # A/B result aggregates: create the table on older installs and
+                # fold in results it does not count yet
+                try:
+                    rebuilt = ensure_result_aggregates(db)
+                    if rebuilt:
+                        logger.info(f"✅ A/B result aggregates rebuilt for experiments {rebuilt}")
+                except Exception as e:
+                    db.rollback()
+                    logger.warning(f"⚠️ A/B result aggregate check skipped: {e}")
+
+                # Roll up AI performance days completed while the app was down
+                try:
+                    rows = catch_up_ai_performance_daily(db)
+                    if rows:
+                        logger.info(f"✅ AI performance rollups caught up: {rows} agent-days")
+                except Exception as e:
+                    db.rollback()
+                    logger.warning(f"⚠️ AI performance rollup catch-up skipped: {e}")
+
                 create_sample_data(db)
             except Exception as e:
                 logger.warning(f"⚠️ Sample data creation skipped: {e}")
@@ -12090,13 +13906,79 @@ async def startup_event():
     try:
         scheduler.add_job(
             auto_sync_emails,
-            trigger=IntervalTrigger(minutes=5),
+            trigger=IntervalTrigger(seconds=mailbox_sync_engine.interval_seconds),
             id='auto_sync_emails',
             name='Auto-sync Microsoft 365 emails',
-            replace_existing=True
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        scheduler.add_job(
+            run_dre_pipeline,
+            trigger=IntervalTrigger(seconds=dre_pipeline.interval_seconds),
+            id='dre_pipeline',
+            name='Classify and extract ingested emails',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        scheduler.add_job(
+            run_ai_performance_rollup,
+            trigger=IntervalTrigger(hours=1),
+            id='ai_performance_rollup',
+            name='Roll up completed days of AI Colleague actions',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        scheduler.add_job(
+            run_lead_rescoring,
+            trigger=IntervalTrigger(seconds=lead_scorer.interval_seconds),
+            id='lead_rescoring',
+            name='Rescore leads changed since the last run',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        scheduler.add_job(
+            flush_api_key_usage,
+            trigger=IntervalTrigger(seconds=api_key_usage.flush_interval_seconds),
+            id='flush_api_key_usage',
+            name='Flush batched API key last_used_at',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        scheduler.add_job(
+            flush_memory_access,
+            trigger=IntervalTrigger(seconds=memory_access.flush_interval_seconds),
+            id='flush_memory_access',
+            name='Flush batched conversation memory access counts',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        scheduler.add_job(
+            flush_experiment_assignments,
+            trigger=IntervalTrigger(seconds=experiment_cache.flush_interval_seconds),
+            id='flush_experiment_assignments',
+            name='Insert batched A/B experiment assignments',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        scheduler.add_job(
+            flush_vector_memory,
+            trigger=IntervalTrigger(seconds=int(os.getenv("VECTOR_FLUSH_SECONDS", "5"))),
+            id='flush_vector_memory',
+            name='Embed and upsert queued conversation vectors',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
         )
         scheduler.start()
-        logger.info("✅ Auto-sync scheduler started (runs every 5 minutes)")
+        logger.info(f"✅ Auto-sync scheduler started (every {mailbox_sync_engine.interval_seconds // 60} minutes, concurrency {mailbox_sync_engine.max_concurrency})")
+        logger.info(f"✅ DRE pipeline scheduled (every {dre_pipeline.interval_seconds}s, backend {dre_pipeline.backend.name}, concurrency {dre_pipeline.max_concurrency})")
     except Exception as e:
         logger.error(f"Failed to start auto-sync scheduler: {e}")
 
@@ -12442,26 +14324,24 @@ async def get_ai_health(
 ):
     """Get AI Colleague health score and metrics"""
     try:
-        period_start = datetime.now(timezone.utc) - timedelta(days=days)
         period_end = datetime.now(timezone.utc)
+        period_start = period_end - timedelta(days=days)
 
-        # Get all actions in period
-        actions = db.query(AIColleagueAction).filter(
-            AIColleagueAction.created_at >= period_start,
-            AIColleagueAction.created_at <= period_end
-        ).all()
+        # Grouped SQL over the daily rollup plus today's actions
+        totals = _add_ai_counters({}, [0] * len(AI_ACTION_COUNTERS))
+        for counters in load_ai_action_counters(db, period_start, period_end).values():
+            _add_ai_counters(totals, (counters[name] for name in AI_ACTION_COUNTERS))
 
-        # Calculate metrics
-        total_actions = len(actions)
-        autonomous_actions = len([a for a in actions if a.autonomy_level == 'full'])
-        successful_actions = len([a for a in actions if a.outcome == 'success'])
-        approved_actions = len([a for a in actions if a.status == 'approved' or not a.required_approval])
+        total_actions = int(totals['total'])
+        autonomous_actions = int(totals['autonomous'])
+        successful_actions = int(totals['successful'])
+        approved_actions = int(totals['cleared'])
 
         # Calculate scores
         autonomy_score = (autonomous_actions / total_actions * 100) if total_actions > 0 else 0
         success_rate = (successful_actions / total_actions * 100) if total_actions > 0 else 0
         approval_rate = (approved_actions / total_actions * 100) if total_actions > 0 else 0
-        avg_confidence = sum([a.confidence_score or 0 for a in actions]) / total_actions if total_actions > 0 else 0
+        avg_confidence = totals['confidence_sum'] / total_actions if total_actions > 0 else 0
 
         # Overall health score (weighted average)
         overall_score = (
@@ -12506,6 +14386,25 @@ async def get_ai_health(
         logger.error(f"Error getting AI health: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v1/mission-control/llm-cache")
+async def get_llm_cache_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Hit/miss counters and size of the DRE LLM result cache"""
+    try:
+        return llm_result_cache.stats(db)
+    except Exception as e:
+        logger.error(f"Error getting LLM cache stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/v1/mission-control/llm-metrics")
+async def get_llm_client_metrics(
+    current_user: User = Depends(get_current_user)
+):
+    """Per-purpose call counts, latency and token usage of the shared LLM client"""
+    return llm_client.get_metrics()
+
 @app.get("/api/v1/mission-control/metrics")
 async def get_ai_metrics(
     days: int = 30,
@@ -12515,58 +14414,31 @@ async def get_ai_metrics(
 ):
     """Get detailed AI performance metrics"""
     try:
-        period_start = datetime.now(timezone.utc) - timedelta(days=days)
-
-        query = db.query(AIColleagueAction).filter(
-            AIColleagueAction.created_at >= period_start
-        )
-
-        if agent_name:
-            query = query.filter(AIColleagueAction.agent_name == agent_name)
-
-        actions = query.all()
+        period_end = datetime.now(timezone.utc)
+        period_start = period_end - timedelta(days=days)
 
-        # Group by agent
         agents_metrics = {}
-        for action in actions:
-            agent = action.agent_name
-            if agent not in agents_metrics:
-                agents_metrics[agent] = {
-                    "total": 0,
-                    "autonomous": 0,
-                    "successful": 0,
-                    "failed": 0,
-                    "approved": 0,
-                    "rejected": 0,
-                    "avg_confidence": 0,
-                    "confidences": []
-                }
-
-            agents_metrics[agent]["total"] += 1
-            if action.autonomy_level == 'full':
-                agents_metrics[agent]["autonomous"] += 1
-            if action.outcome == 'success':
-                agents_metrics[agent]["successful"] += 1
-            elif action.outcome == 'failure':
-                agents_metrics[agent]["failed"] += 1
-            if action.status == 'approved':
-                agents_metrics[agent]["approved"] += 1
-            elif action.status == 'rejected':
-                agents_metrics[agent]["rejected"] += 1
-            if action.confidence_score:
-                agents_metrics[agent]["confidences"].append(action.confidence_score)
-
-        # Calculate averages
-        for agent, metrics in agents_metrics.items():
-            if metrics["confidences"]:
-                metrics["avg_confidence"] = round(sum(metrics["confidences"]) / len(metrics["confidences"]) * 100, 2)
-            metrics["success_rate"] = round((metrics["successful"] / metrics["total"] * 100) if metrics["total"] > 0 else 0, 2)
-            metrics["autonomy_rate"] = round((metrics["autonomous"] / metrics["total"] * 100) if metrics["total"] > 0 else 0, 2)
-            del metrics["confidences"]  # Remove temp list
+        total_actions = 0
+        for agent, counters in load_ai_action_counters(db, period_start, period_end, agent_name).items():
+            total = int(counters["total"])
+            if not total:
+                continue
+            total_actions += total
+            agents_metrics[agent] = {
+                "total": total,
+                "autonomous": int(counters["autonomous"]),
+                "successful": int(counters["successful"]),
+                "failed": int(counters["failed"]),
+                "approved": int(counters["approved"]),
+                "rejected": int(counters["rejected"]),
+                "avg_confidence": round(counters["confidence_sum"] / counters["scored"] * 100, 2) if counters["scored"] else 0,
+                "success_rate": round(counters["successful"] / total * 100, 2),
+                "autonomy_rate": round(counters["autonomous"] / total * 100, 2),
+            }
 
         return {
             "period_days": days,
-            "total_actions": len(actions),
+            "total_actions": total_actions,
             "agents": agents_metrics
         }
     except Exception as e:
@@ -12747,6 +14619,14 @@ async def shutdown_event():
     """Cleanup on shutdown"""
     try:
         scheduler.shutdown()
+        await mailbox_sync_engine.aclose()
+        await llm_client.aclose()
+        flush_api_key_usage()
+        flush_memory_access()
+        flush_experiment_assignments()
+        await flush_vector_memory()
+        from integrations.pinecone_service import vector_memory
+        await vector_memory.aclose()
         logger.info("✅ Auto-sync scheduler stopped")
     except Exception as e:
         logger.error(f"Error stopping scheduler: {e}")
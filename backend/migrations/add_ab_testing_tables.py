@@ -110,6 +110,23 @@ def run_migration():
         );
         """,
 
+        # 6. Result aggregates table (running per-variant, per-metric statistics)
+        """
+        CREATE TABLE IF NOT EXISTS ab_result_aggregates (
+            id SERIAL PRIMARY KEY,
+            experiment_id INTEGER NOT NULL REFERENCES ab_experiments(id) ON DELETE CASCADE,
+            variant_id INTEGER NOT NULL REFERENCES ab_variants(id) ON DELETE CASCADE,
+            metric_name VARCHAR(100) NOT NULL,
+            result_count INTEGER NOT NULL DEFAULT 0,
+            value_sum FLOAT NOT NULL DEFAULT 0,
+            value_sum_sq FLOAT NOT NULL DEFAULT 0,
+            value_min FLOAT,
+            value_max FLOAT,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT uq_ab_result_aggregates UNIQUE (experiment_id, variant_id, metric_name)
+        );
+        """,
+
         # Indices for performance
         "CREATE INDEX IF NOT EXISTS idx_ab_experiments_status ON ab_experiments(status);",
         "CREATE INDEX IF NOT EXISTS idx_ab_experiments_type ON ab_experiments(experiment_type);",
@@ -0,0 +1,51 @@
+"""
+Rebuild A/B Experiment Result Aggregates
+Recomputes ab_result_aggregates from ab_results for one experiment (or all),
+so experiments recorded before the table existed are analysed from
+aggregates instead of rescanning their results
+
+Usage:
+    python backend/rebuild_experiment_aggregates.py [experiment_id]
+"""
+import os
+import sys
+
+# Get database URL from environment
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./mortgage_crm.db")
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+def run_rebuild(experiment_id=None):
+    """Rebuild aggregates for one experiment (or all experiments)"""
+    try:
+        os.environ["DATABASE_URL"] = DATABASE_URL
+        from database import SessionLocal
+        from ab_testing.result_aggregates import rebuild_result_aggregates
+
+        db = SessionLocal()
+
+        print("=" * 70)
+        print("REBUILDING A/B EXPERIMENT RESULT AGGREGATES")
+        print("=" * 70)
+
+        result = rebuild_result_aggregates(db, experiment_id)
+
+        print("\n📊 RESULTS:")
+        print(f"   Experiments: {result['experiments']}")
+        print(f"   Aggregate rows written: {result['rows']}")
+        print(f"   Results folded in: {result['results']}")
+        print(f"{'='*70}\n")
+
+        db.close()
+        return True
+
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    experiment_arg = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    success = run_rebuild(experiment_arg)
+    sys.exit(0 if success else 1)
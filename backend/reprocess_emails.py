@@ -1,6 +1,10 @@
 """
 Reprocess Existing Emails with New Extraction Logic
 Re-runs AI extraction on emails that were synced but not extracted
+
+Usage:
+    python reprocess_emails.py             # reuse cached LLM results where possible
+    python reprocess_emails.py --no-cache  # force fresh classification/extraction
 """
 import os
 import sys
@@ -13,14 +17,14 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./mortgage_crm.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-async def reprocess_unextracted_emails():
+async def reprocess_unextracted_emails(bypass_cache: bool = False):
     """Find and reprocess emails that have no extracted_data record"""
     try:
         engine = create_engine(DATABASE_URL)
         SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-        # Import the processing function from main
-        from main import process_microsoft_email_to_dre, IncomingDataEvent, ExtractedData
+        # Import the DRE pipeline from main
+        from main import dre_pipeline, IncomingDataEvent
 
         db = SessionLocal()
 
@@ -44,53 +48,24 @@ async def reprocess_unextracted_emails():
             db.close()
             return True
 
-        # Reprocess each email
-        success_count = 0
-        error_count = 0
-
-        for email_id, subject, sender, user_id in unextracted:
-            print(f"Processing: {subject[:50]}...")
-
-            # Get the full email event
-            event = db.query(IncomingDataEvent).filter(IncomingDataEvent.id == email_id).first()
-
-            if not event:
-                print(f"   ❌ Event not found")
-                error_count += 1
-                continue
-
-            # Create email_data dict from the event (mimicking Microsoft Graph format)
-            email_data = {
-                "subject": event.subject,
-                "from": {"emailAddress": {"address": event.sender}},
-                "toRecipients": [{"emailAddress": {"address": r}} for r in (event.recipients or [])],
-                "receivedDateTime": event.received_at.isoformat() if event.received_at else None,
-                "body": {
-                    "content": event.raw_text or event.raw_html or "",
-                    "contentType": "text" if event.raw_text else "html"
-                }
-            }
-
-            # Reprocess with new extraction logic
-            try:
-                # Delete the old event to avoid duplicates
-                db.delete(event)
-                db.commit()
-
-                # Process fresh with new logic
-                result = await process_microsoft_email_to_dre(email_data, user_id, db)
-
-                if result.get("status") == "success":
-                    print(f"   ✅ Successfully extracted")
-                    success_count += 1
-                else:
-                    print(f"   ⚠️  Processed but no extraction: {result.get('error', 'No error')}")
-                    success_count += 1  # Still count as success - it was processed
-
-            except Exception as e:
-                print(f"   ❌ Error: {e}")
-                error_count += 1
-                db.rollback()
+        # Put the events back on the DRE queue and drain it here
+        event_ids = [row[0] for row in unextracted]
+        if bypass_cache:
+            print("⚠️  --no-cache: skipping cached LLM results\n")
+            dre_pipeline.request_fresh(event_ids)
+
+        for i in range(0, len(event_ids), 1000):
+            db.query(IncomingDataEvent).filter(
+                IncomingDataEvent.id.in_(event_ids[i:i + 1000])
+            ).update({IncomingDataEvent.processed: False}, synchronize_session=False)
+        db.commit()
+
+        before = dict(dre_pipeline.counters)
+        await dre_pipeline.drain(max_batches=len(event_ids) // dre_pipeline.batch_size + 1)
+        success_count = dre_pipeline.counters["events_processed"] - before["events_processed"]
+        error_count = dre_pipeline.counters["events_failed"] - before["events_failed"]
+        cache = dre_pipeline.get_metrics()["cache"] or {}
+        print(f"   Cache hits: {cache.get('hits', 0)}, misses: {cache.get('misses', 0)}")
 
         print(f"\n{'='*70}")
         print(f"📊 RESULTS:")
@@ -109,5 +84,5 @@ async def reprocess_unextracted_emails():
         return False
 
 if __name__ == "__main__":
-    success = asyncio.run(reprocess_unextracted_emails())
+    success = asyncio.run(reprocess_unextracted_emails(bypass_cache="--no-cache" in sys.argv))
     sys.exit(0 if success else 1)
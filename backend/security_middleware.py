@@ -5,11 +5,16 @@ Protects against common web vulnerabilities and attacks
 from fastapi import Request, HTTPException, status
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
+from dataclasses import dataclass, replace
 from datetime import datetime, timedelta
 from collections import defaultdict
 import re
+import os
+import json
+import math
+import asyncio
 import logging
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 import time
 
 logger = logging.getLogger(__name__)
@@ -43,18 +48,229 @@ def is_websocket_request(request: Request) -> bool:
 # RATE LIMITING MIDDLEWARE
 # ============================================================================
 
+@dataclass(frozen=True)
+class RateLimit:
+    """At most `limit` requests per `window_seconds` (sliding window)"""
+    limit: int
+    window_seconds: int
+    message: str = "Too many requests. Please try again later."
+
+
+@dataclass(frozen=True)
+class RouteGroup:
+    """Requests whose path starts with one of `prefixes` share these limits"""
+    name: str
+    prefixes: Tuple[str, ...]
+    limits: Tuple[RateLimit, ...]
+
+
+def _sliding_window_retry_after(limit: RateLimit, position: float, previous: int, current: int) -> int:
+    """Seconds until a request would fit under the sliding-window estimate"""
+    window = limit.window_seconds
+    if current + 1 <= limit.limit and previous > 0:
+        # Frees up within this bucket as the previous bucket's weight decays
+        wait = window * (1 - (limit.limit - 1 - current) / previous) - position
+    else:
+        # Must wait for the next bucket, then for this bucket's weight to decay
+        wait = (window - position) + window * max(0.0, 1 - (limit.limit - 1) / max(current, 1))
+    return max(1, math.ceil(wait))
+
+
+class RateLimitBackend:
+    """
+    Counter store for RateLimitMiddleware.
+
+    hit() checks every limit for a key and, only if all allow it, counts the
+    request. Returns None when allowed, else (limit, retry_after_seconds).
+    """
+
+    name = "base"
+
+    async def hit(self, key: str, limits: Sequence[RateLimit], now: float) -> Optional[Tuple[RateLimit, int]]:
+        raise NotImplementedError
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Per-process sliding-window counters: two integers per (key, limit) no
+    matter how much traffic a client sends. Idle keys are swept periodically.
+    Limits apply per worker process.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_keys: int = 100000, sweep_interval_seconds: int = 60):
+        # key -> [bucket, previous, current] per limit, in limit order
+        self.counters: Dict[str, List[List[int]]] = {}
+        self.max_keys = max_keys
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._next_sweep = 0.0
+        self._longest_window: Dict[str, int] = {}
+
+    def check_and_count(self, key: str, limits: Sequence[RateLimit], now: float) -> Optional[Tuple[RateLimit, int]]:
+        if now >= self._next_sweep or len(self.counters) > self.max_keys:
+            self._sweep(now)
+
+        state = self.counters.get(key)
+        if state is None:
+            state = self.counters[key] = [[0, 0, 0] for _ in limits]
+            self._longest_window[key] = max(limit.window_seconds for limit in limits)
+
+        for slot, limit in zip(state, limits):
+            bucket, position = divmod(now, limit.window_seconds)
+            bucket = int(bucket)
+            if bucket != slot[0]:
+                # Roll forward; anything older than one bucket no longer counts
+                slot[1] = slot[2] if bucket == slot[0] + 1 else 0
+                slot[2] = 0
+                slot[0] = bucket
+            estimate = slot[1] * (1 - position / limit.window_seconds) + slot[2]
+            if estimate + 1 > limit.limit:
+                return limit, _sliding_window_retry_after(limit, position, slot[1], slot[2])
+
+        for slot in state:
+            slot[2] += 1
+        return None
+
+    async def hit(self, key: str, limits: Sequence[RateLimit], now: float) -> Optional[Tuple[RateLimit, int]]:
+        return self.check_and_count(key, limits, now)
+
+    def _sweep(self, now: float):
+        """Drop keys idle for longer than two of their longest windows"""
+        stale = []
+        for key, state in self.counters.items():
+            window = self._longest_window[key]
+            if max(slot[0] for slot in state) < int(now // window) - 1:
+                stale.append(key)
+        for key in stale:
+            del self.counters[key]
+            del self._longest_window[key]
+
+        # Still over budget (e.g. a flood of spoofed IPs): evict the oldest keys
+        overflow = len(self.counters) - self.max_keys
+        if overflow > 0:
+            for key in list(self.counters)[:overflow]:
+                del self.counters[key]
+                del self._longest_window[key]
+
+        self._next_sweep = now + self.sweep_interval_seconds
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    Sliding-window counters in Redis (services/redis_cache_service.py), shared
+    by every worker and instance. The check-and-count is a single Lua script
+    round trip. If Redis is unreachable, limits fall back to a per-process
+    in-memory backend rather than failing requests.
+    """
+
+    name = "redis"
+
+    def __init__(self, redis_service, fallback: Optional[RateLimitBackend] = None):
+        self.redis_service = redis_service
+        self.fallback = fallback or InMemoryRateLimitBackend()
+        self._last_error_log = 0.0
+
+    def _hit_sync(self, key: str, limits: Sequence[RateLimit], now: float) -> Optional[Tuple[RateLimit, int]]:
+        exceeded, previous, current = self.redis_service.sliding_window_hit(
+            key, [(limit.limit, limit.window_seconds) for limit in limits], now
+        )
+        if not exceeded:
+            return None
+        limit = limits[exceeded - 1]
+        return limit, _sliding_window_retry_after(limit, now % limit.window_seconds, previous, current)
+
+    async def hit(self, key: str, limits: Sequence[RateLimit], now: float) -> Optional[Tuple[RateLimit, int]]:
+        try:
+            return await asyncio.to_thread(self._hit_sync, key, limits, now)
+        except Exception as e:
+            if now - self._last_error_log > 60:
+                self._last_error_log = now
+                logger.warning(f"Redis rate limiter unavailable, using in-process limits: {e}")
+            return await self.fallback.hit(key, limits, now)
+
+
+def create_rate_limit_backend(kind: Optional[str] = None) -> RateLimitBackend:
+    """
+    Backend from RATE_LIMIT_BACKEND ("memory" or "redis"; default memory).
+    Redis reuses RedisCacheService (REDIS_HOST / REDIS_PORT / REDIS_PASSWORD).
+    """
+    kind = (kind or os.getenv("RATE_LIMIT_BACKEND", "memory")).lower()
+    if kind == "redis":
+        try:
+            from services.redis_cache_service import RedisCacheService
+            return RedisRateLimitBackend(RedisCacheService())
+        except Exception as e:
+            logger.warning(f"Redis rate limit backend unavailable, using in-process limits: {e}")
+    return InMemoryRateLimitBackend()
+
+
+_OVERRIDE_KEYS = {60: "per_minute", 3600: "per_hour"}
+
+
+def route_groups_from_env(groups: Sequence[RouteGroup], env_var: str = "RATE_LIMIT_ROUTE_GROUPS") -> List[RouteGroup]:
+    """
+    Apply per-group overrides from JSON, e.g.
+        RATE_LIMIT_ROUTE_GROUPS='{"ai": {"per_minute": 20, "per_hour": 300}}'
+    """
+    raw = os.getenv(env_var)
+    if not raw:
+        return list(groups)
+    try:
+        overrides = json.loads(raw)
+    except ValueError as e:
+        logger.warning(f"Ignoring invalid {env_var}: {e}")
+        return list(groups)
+
+    result = []
+    for group in groups:
+        override = overrides.get(group.name)
+        if override:
+            limits = tuple(
+                replace(limit, limit=int(override.get(_OVERRIDE_KEYS.get(limit.window_seconds), limit.limit)))
+                for limit in group.limits
+            )
+            group = replace(group, limits=limits)
+        result.append(group)
+    return result
+
+
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """
     Rate limiting to prevent brute force attacks and DDoS
-    Tracks requests per IP address
+    Tracks requests per IP address and route group with sliding-window
+    counters (constant memory per client; shared across workers with the
+    Redis backend)
     """
 
-    def __init__(self, app, requests_per_minute: int = 60, requests_per_hour: int = 1000):
+    def __init__(
+        self,
+        app,
+        requests_per_minute: int = 60,
+        requests_per_hour: int = 1000,
+        route_groups: Optional[Sequence[RouteGroup]] = None,
+        backend: Optional[RateLimitBackend] = None,
+    ):
         super().__init__(app)
         self.requests_per_minute = requests_per_minute
         self.requests_per_hour = requests_per_hour
-        # Store: {ip: [(timestamp, path), ...]}
-        self.request_history: Dict[str, list] = defaultdict(list)
+        self.default_limits = (
+            RateLimit(requests_per_minute, 60),
+            RateLimit(requests_per_hour, 3600, "Hourly rate limit exceeded. Please try again later."),
+        )
+        self.backend = backend or create_rate_limit_backend()
+        # Longest prefix wins
+        self._prefixes = sorted(
+            ((prefix, group) for group in route_groups_from_env(route_groups or ()) for prefix in group.prefixes),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+
+    def _route_group(self, path: str) -> Tuple[str, Sequence[RateLimit]]:
+        for prefix, group in self._prefixes:
+            if path.startswith(prefix):
+                return group.name, group.limits
+        return "default", self.default_limits
 
     async def dispatch(self, request: Request, call_next):
         # Skip rate limiting for WebSocket connections
@@ -63,48 +279,24 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             return await call_next(request)
 
         client_ip = self._get_client_ip(request)
-        current_time = time.time()
-
-        # Clean old entries for this IP
-        self.request_history[client_ip] = [
-            (ts, path) for ts, path in self.request_history[client_ip]
-            if current_time - ts < 3600  # Keep last hour
-        ]
+        group, limits = self._route_group(request.url.path)
 
-        # Check rate limits
-        recent_requests = self.request_history[client_ip]
-
-        # Check per-minute limit
-        minute_ago = current_time - 60
-        requests_last_minute = sum(1 for ts, _ in recent_requests if ts > minute_ago)
-
-        if requests_last_minute >= self.requests_per_minute:
-            logger.warning(f"Rate limit exceeded for IP {client_ip}: {requests_last_minute} requests/min")
-            return JSONResponse(
-                status_code=429,
-                content={
-                    "detail": "Too many requests. Please try again later.",
-                    "retry_after": 60
-                }
+        exceeded = await self.backend.hit(f"{group}:{client_ip}", limits, time.time())
+        if exceeded is not None:
+            limit, retry_after = exceeded
+            logger.warning(
+                f"Rate limit exceeded for IP {client_ip} on {group}: "
+                f"{limit.limit} requests/{limit.window_seconds}s"
             )
-
-        # Check per-hour limit
-        hour_ago = current_time - 3600
-        requests_last_hour = sum(1 for ts, _ in recent_requests if ts > hour_ago)
-
-        if requests_last_hour >= self.requests_per_hour:
-            logger.warning(f"Hourly rate limit exceeded for IP {client_ip}: {requests_last_hour} requests/hour")
             return JSONResponse(
                 status_code=429,
                 content={
-                    "detail": "Hourly rate limit exceeded. Please try again later.",
-                    "retry_after": 3600
-                }
+                    "detail": limit.message,
+                    "retry_after": retry_after
+                },
+                headers={"Retry-After": str(retry_after)}
             )
 
-        # Add this request to history
-        self.request_history[client_ip].append((current_time, str(request.url.path)))
-
         response = await call_next(request)
         return response
 
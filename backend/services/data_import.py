@@ -0,0 +1,672 @@
+"""
+Data Import Engine
+Bulk CSV/XLSX import behind /api/v1/data-import/analyze and /execute
+
+Files are read in chunks (pandas for CSV, openpyxl read-only for XLSX), so a
+100k-row upload is never turned into 100k ORM objects. Each chunk becomes one
+batch:
+- mapped columns are converted column-wise: numbers lose $ , % and spaces,
+  dates are parsed, emails lowercased, enum values matched by name or value
+- rows with unparseable values or missing required fields are reported by
+  spreadsheet row number ("Row 12: Email: 'bob@' is not a valid email") and
+  left out; the rest of the batch still imports
+- rows are matched to existing records on the target's key (an IN query per
+  500 keys on the indexed column; case-insensitive keys such as lead emails
+  are loaded once per import instead, since lower(column) cannot use the
+  index), then written with one executemany INSERT and an executemany
+  UPDATE by primary key per set of non-blank columns
+- the batch commits as one transaction; if the bulk statements fail (e.g. a
+  unique constraint raced by another writer), the batch is retried row by row
+  in savepoints so only the offending rows fail
+- after the last batch, after_import runs once for the days touched (KPI
+  rollups), in its own transaction
+
+Targets (the model, its importable fields, the upsert key and owner column)
+are supplied by the caller, so this module does not import main.
+
+Configuration (env):
+    IMPORT_BATCH_SIZE - rows per batch and commit (default 5000)
+"""
+
+import os
+import re
+import difflib
+import logging
+import warnings
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import pandas as pd
+from sqlalchemy import bindparam, func, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+PREVIEW_ROWS = 10
+LOOKUP_CHUNK = 500
+
+# Header -> field suggestions need at least this similarity (difflib ratio)
+MIN_MAPPING_SCORE = 0.85
+
+FIELD_TYPES = ("text", "email", "int", "float", "date", "enum")
+DUPLICATE_ACTIONS = ("update", "skip")
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_NUMBER_NOISE = r"[\s$,%]"
+_EMAIL = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+_TYPE_NAMES = {"email": "email", "int": "whole number", "float": "number", "date": "date"}
+
+
+class DataImportError(ValueError):
+    """Unreadable file or invalid mapping (reported to the client as a 400)"""
+
+
+@dataclass
+class ImportField:
+    """A field the user can map a column to; virtual fields only feed the target's derive()"""
+    name: str
+    label: str
+    type: str = "text"
+    column: Optional[str] = None
+    aliases: Tuple[str, ...] = ()
+    enum: Optional[type] = None
+    virtual: bool = False
+
+    def __post_init__(self):
+        if self.type not in FIELD_TYPES:
+            raise ValueError(f"Unknown field type {self.type!r}")
+        if self.column is None and not self.virtual:
+            self.column = self.name
+
+
+@dataclass
+class ImportTarget:
+    """
+    A model rows can be imported into
+
+    required: groups of field names; every row needs a value for at least one
+        field of each group (and a column must be mapped to one of them)
+    match_on: model columns identifying an existing record for upserts
+    owner_column: set to the importing user on new rows; with scope_to_owner
+        matching is limited to the user's records, otherwise matches owned by
+        someone else are rejected
+    defaults: column values for new rows when the file has none
+    day_columns: date columns whose days (old and new values) are passed to
+        after_import(session, user_id, days) once the last batch is committed
+    derive: DataFrame -> DataFrame run on the converted values, e.g. to build
+        a full name from first/last name; new columns must be model columns
+    """
+    key: str
+    label: str
+    description: str
+    icon: str
+    model: Any
+    fields: List[ImportField]
+    required: Tuple[Tuple[str, ...], ...] = ()
+    match_on: Tuple[str, ...] = ()
+    match_case_insensitive: bool = False
+    owner_column: Optional[str] = None
+    scope_to_owner: bool = True
+    defaults: Dict[str, Any] = field(default_factory=dict)
+    day_columns: Tuple[str, ...] = ()
+    derive: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None
+    after_import: Optional[Callable[[Any, int, Set[date]], None]] = None
+
+    def field_map(self) -> Dict[str, ImportField]:
+        return {spec.name: spec for spec in self.fields}
+
+    def describe_fields(self) -> List[Dict[str, Any]]:
+        return [
+            {"value": spec.name, "label": spec.label, "type": spec.type,
+             "required": (spec.name,) in self.required,
+             **({"options": [member.value for member in spec.enum]} if spec.enum else {})}
+            for spec in self.fields
+        ]
+
+
+@dataclass
+class ImportPlan:
+    """A validated import: which file columns feed which fields of which target"""
+    target: ImportTarget
+    kind: str
+    columns: Dict[str, ImportField]
+    on_duplicate: str = "update"
+
+
+# ----------------------------------------------------------------------------
+# Reading
+# ----------------------------------------------------------------------------
+
+def file_kind(filename: str) -> str:
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".xlsx", ".xlsm")):
+        return "xlsx"
+    if name.endswith(".xls"):
+        raise DataImportError("Legacy .xls workbooks are not supported; save the sheet as .xlsx or CSV")
+    raise DataImportError("Upload a CSV or Excel (.xlsx) file")
+
+
+def _clean_headers(raw) -> List[str]:
+    headers, seen = [], {}
+    for position, value in enumerate(raw, start=1):
+        header = "" if value is None else str(value).strip()
+        if not header or header.startswith("Unnamed: "):
+            header = f"Column {position}"
+        if header in seen:
+            seen[header] += 1
+            header = f"{header} ({seen[header]})"
+        else:
+            seen[header] = 1
+        headers.append(header)
+    return headers
+
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+_CSV_OPTIONS = {"dtype": str, "keep_default_na": False, "encoding": "utf-8-sig", "encoding_errors": "replace"}
+
+
+def read_headers(source: BinaryIO, kind: str) -> List[str]:
+    """Column headers from the first row (duplicates numbered, blanks named by position)"""
+    source.seek(0)
+    if kind == "csv":
+        try:
+            return _clean_headers(pd.read_csv(source, nrows=0, **_CSV_OPTIONS).columns)
+        except pd.errors.EmptyDataError:
+            raise DataImportError("The file is empty")
+        except (pd.errors.ParserError, UnicodeError) as e:
+            raise DataImportError(f"Could not read the CSV file: {e}")
+    workbook, _, headers = _open_sheet(source)
+    workbook.close()
+    return headers
+
+
+def read_chunks(source: BinaryIO, kind: str, chunk_size: int = IMPORT_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    DataFrames of string cells ("" when blank) with the read_headers()
+    columns, indexed by spreadsheet row number (the header is row 1).
+    Entirely blank rows are dropped.
+    """
+    if kind == "csv":
+        headers = read_headers(source, kind)
+        source.seek(0)
+        reader = pd.read_csv(source, chunksize=chunk_size, header=0, names=headers, **_CSV_OPTIONS)
+        try:
+            for chunk in reader:
+                chunk.index = chunk.index + 2
+                yield chunk[(chunk != "").any(axis=1)]
+        except pd.errors.ParserError as e:
+            raise DataImportError(f"Could not read the CSV file: {e}")
+        return
+
+    workbook, rows, headers = _open_sheet(source)
+    width = len(headers)
+
+    def frame(buffer, numbers):
+        chunk = pd.DataFrame(buffer, columns=headers, index=numbers, dtype=str)
+        return chunk[(chunk != "").any(axis=1)]
+
+    buffer, numbers = [], []
+    try:
+        for number, row in enumerate(rows, start=2):
+            cells = [_cell_text(value) for value in row[:width]]
+            buffer.append(cells + [""] * (width - len(cells)))
+            numbers.append(number)
+            if len(buffer) >= chunk_size:
+                yield frame(buffer, numbers)
+                buffer, numbers = [], []
+        if buffer:
+            yield frame(buffer, numbers)
+    finally:
+        workbook.close()
+
+
+def _open_sheet(source: BinaryIO):
+    """(workbook, iterator over the data rows, headers) for the first sheet"""
+    from openpyxl import load_workbook
+
+    try:
+        workbook = load_workbook(source, read_only=True, data_only=True)
+    except Exception as e:
+        raise DataImportError(f"Could not read the workbook: {e}")
+    rows = workbook.active.iter_rows(values_only=True)
+    header = list(next(rows, None) or ())
+    while header and header[-1] in (None, ""):
+        header.pop()
+    if not header:
+        workbook.close()
+        raise DataImportError("The first sheet has no header row")
+    return workbook, rows, _clean_headers(header)
+
+
+# ----------------------------------------------------------------------------
+# Column mapping
+# ----------------------------------------------------------------------------
+
+def normalize_header(value: str) -> str:
+    return _NON_ALNUM.sub("", str(value).lower())
+
+
+def map_columns(headers: List[str], fields: List[ImportField]) -> Dict[str, str]:
+    """Suggest {header: field name}: exact name/label/alias matches first, then close spellings"""
+    candidates = []
+    for header in headers:
+        normalized = normalize_header(header)
+        if not normalized:
+            continue
+        for spec in fields:
+            names = {normalize_header(name) for name in (spec.name, spec.label, *spec.aliases)}
+            if normalized in names:
+                score = 1.0
+            else:
+                score = max(difflib.SequenceMatcher(None, normalized, name).ratio() for name in names)
+            if score >= MIN_MAPPING_SCORE:
+                candidates.append((score, header, spec.name))
+
+    mapping, used = {}, set()
+    for score, header, name in sorted(candidates, key=lambda candidate: -candidate[0]):
+        if header not in mapping and name not in used:
+            mapping[header] = name
+            used.add(name)
+    return {header: mapping[header] for header in headers if header in mapping}
+
+
+# ----------------------------------------------------------------------------
+# Conversion
+# ----------------------------------------------------------------------------
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    """Naive datetimes (UTC) or NaT; the common format is inferred once, odd rows retried one by one"""
+    parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    present = values.dropna()
+    if present.empty:
+        return parsed
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        first = pd.to_datetime(present, errors="coerce", utc=True)
+        retry = present[first.isna()]
+        if not retry.empty:
+            first[retry.index] = pd.to_datetime(retry, errors="coerce", utc=True, format="mixed")
+    parsed[present.index] = first.dt.tz_localize(None)
+    return parsed
+
+
+def convert_column(raw: pd.Series, spec: ImportField) -> Tuple[pd.Series, pd.Series]:
+    """Typed values (None/NaN/NaT when blank) and a mask of cells that could not be converted"""
+    text = raw.str.strip()
+    blank = text == ""
+    no_errors = pd.Series(False, index=raw.index)
+
+    if spec.type == "text":
+        return text.where(~blank, None), no_errors
+
+    if spec.type == "email":
+        lowered = text.str.lower()
+        bad = ~blank & ~lowered.str.match(_EMAIL)
+        return lowered.where(~blank & ~bad, None), bad
+
+    if spec.type in ("int", "float"):
+        numbers = pd.to_numeric(text.str.replace(_NUMBER_NOISE, "", regex=True), errors="coerce")
+        bad = ~blank & numbers.isna()
+        if spec.type == "int":
+            numbers = numbers.round().astype("Int64")
+        return numbers, bad
+
+    if spec.type == "date":
+        parsed = _parse_dates(text.where(~blank))
+        return parsed, ~blank & parsed.isna()
+
+    lookup = {}
+    for member in spec.enum:
+        for name in (member.value, member.name):
+            lookup[normalize_header(name)] = member
+    matched = text.map(lambda value: lookup.get(normalize_header(value)))
+    return matched, ~blank & matched.isna()
+
+
+def _error_message(spec: ImportField, value: str) -> str:
+    if spec.enum:
+        return f"{spec.label}: '{value}' is not one of {', '.join(member.value for member in spec.enum)}"
+    return f"{spec.label}: '{value}' is not a valid {_TYPE_NAMES[spec.type]}"
+
+
+def _python_values(series: pd.Series) -> list:
+    """Column values as Python objects with None for blanks (what the DB driver expects)"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return [None if value is pd.NaT else value.to_pydatetime() for value in series]
+    if pd.api.types.is_float_dtype(series):
+        return [None if value != value else value for value in series.tolist()]
+    return [None if value is None or value is pd.NA or value is pd.NaT else value for value in series.tolist()]
+
+
+def _day(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.date()
+    return value
+
+
+# ----------------------------------------------------------------------------
+# Engine
+# ----------------------------------------------------------------------------
+
+class DataImporter:
+    """Analyzes uploads and imports them into the registered targets"""
+
+    def __init__(self, targets: List[ImportTarget], batch_size: int = None):
+        self.targets: Dict[str, ImportTarget] = {target.key: target for target in targets}
+        self.batch_size = batch_size or IMPORT_BATCH_SIZE
+
+    def analyze(self, source: BinaryIO, filename: str) -> Dict[str, Any]:
+        """Headers, a preview, the row count and suggested mappings for every target"""
+        kind = file_kind(filename)
+        headers = read_headers(source, kind)
+        preview, total = [], 0
+        for chunk in read_chunks(source, kind, self.batch_size):
+            if len(preview) < PREVIEW_ROWS:
+                preview.extend(chunk.head(PREVIEW_ROWS - len(preview)).values.tolist())
+            total += len(chunk)
+
+        mappings = {key: map_columns(headers, target.fields) for key, target in self.targets.items()}
+        # The destination whose fields the most columns map to (first registered wins ties)
+        destination = max(self.targets, key=lambda key: len(mappings[key]))
+        return {
+            "file_type": kind,
+            "headers": headers,
+            "rows": preview,
+            "total_rows": total,
+            "destination": destination,
+            "mappings": mappings,
+        }
+
+    def questions(self, destination: str) -> List[Dict[str, Any]]:
+        return [
+            {
+                "id": "destination",
+                "question": "Where should these records go?",
+                "type": "choice",
+                "default": destination,
+                "options": [
+                    {"value": target.key, "label": target.label, "description": target.description, "icon": target.icon}
+                    for target in self.targets.values()
+                ],
+            },
+            {
+                "id": "on_duplicate",
+                "question": "What should happen when a row matches an existing record?",
+                "type": "choice",
+                "default": "update",
+                "options": [
+                    {"value": "update", "label": "Update it", "icon": "🔄",
+                     "description": "Fill in the existing record with the values from the file"},
+                    {"value": "skip", "label": "Skip the row", "icon": "⏭️",
+                     "description": "Leave existing records untouched and only add new ones"},
+                ],
+            },
+        ]
+
+    def plan(self, filename: str, headers: List[str], destination: str, mappings: Dict[str, str],
+             on_duplicate: str = "update") -> ImportPlan:
+        """Validate a mapping of file columns to target fields"""
+        target = self.targets.get(destination)
+        if target is None:
+            raise DataImportError(f"Unknown destination '{destination}'")
+        if on_duplicate not in DUPLICATE_ACTIONS:
+            raise DataImportError(f"on_duplicate must be one of: {', '.join(DUPLICATE_ACTIONS)}")
+
+        fields = target.field_map()
+        columns: Dict[str, ImportField] = {}
+        for header, name in (mappings or {}).items():
+            if not name:
+                continue
+            if header not in headers:
+                raise DataImportError(f"Column '{header}' is not in the file")
+            if name not in fields:
+                raise DataImportError(f"'{name}' is not a {target.label} field")
+            if any(spec.name == name for spec in columns.values()):
+                raise DataImportError(f"More than one column is mapped to {fields[name].label}")
+            columns[header] = fields[name]
+        if not columns:
+            raise DataImportError("Map at least one column")
+
+        mapped = {spec.name for spec in columns.values()}
+        missing = [" or ".join(fields[name].label for name in group) for group in target.required
+                   if not mapped.intersection(group)]
+        if missing:
+            raise DataImportError(f"Map a column to: {', '.join(missing)}")
+        return ImportPlan(target=target, kind=file_kind(filename), columns=columns, on_duplicate=on_duplicate)
+
+    def run(self, session, plan: ImportPlan, source: BinaryIO, user_id: int) -> Iterator[Dict[str, Any]]:
+        """
+        Import the file batch by batch, committing each one. Yields running
+        totals after every batch with that batch's row errors:
+            {"batch", "total", "imported", "inserted", "updated", "skipped", "failed",
+             "errors": [{"row", "error"}]}
+        """
+        target = plan.target
+        totals = {"total": 0, "imported": 0, "inserted": 0, "updated": 0, "skipped": 0, "failed": 0}
+        known = self._existing(session, target, None, user_id) if target.match_case_insensitive else None
+        days: Set[date] = set()
+        try:
+            for number, chunk in enumerate(read_chunks(source, plan.kind, self.batch_size), start=1):
+                if chunk.empty:
+                    continue
+                outcome = self._import_batch(session, plan, chunk, user_id, known)
+                days.update(outcome.pop("days"))
+                totals["total"] += len(chunk)
+                for key in ("inserted", "updated", "skipped", "failed"):
+                    totals[key] += outcome[key]
+                totals["imported"] = totals["inserted"] + totals["updated"]
+                yield {"batch": number, **totals, "errors": outcome["errors"]}
+        finally:
+            # Also runs when the file breaks part way or the client goes away
+            if target.after_import and target.owner_column and days:
+                try:
+                    target.after_import(session, user_id, days)
+                    session.commit()
+                except SQLAlchemyError as e:
+                    session.rollback()
+                    logger.warning(f"after_import for {target.key} failed: {e}")
+
+    # -- one batch ------------------------------------------------------------
+
+    def _convert(self, plan: ImportPlan, chunk: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[int, List[str]]]:
+        target = plan.target
+        values = pd.DataFrame(index=chunk.index)
+        errors: Dict[int, List[str]] = {}
+        for header, spec in plan.columns.items():
+            converted, bad = convert_column(chunk[header], spec)
+            values[spec.name] = converted
+            for row, value in chunk[header][bad].items():
+                errors.setdefault(row, []).append(_error_message(spec, value.strip()))
+
+        fields = target.field_map()
+        for group in target.required:
+            present = [name for name in group if name in values]
+            missing = ~values[present].notna().any(axis=1)
+            for row in values.index[missing]:
+                errors.setdefault(row, []).append(f"{' or '.join(fields[name].label for name in group)} is required")
+
+        values = values.drop(index=list(errors))
+        if target.derive and not values.empty:
+            values = target.derive(values)
+
+        output = pd.DataFrame(index=values.index)
+        for name, series in values.items():
+            spec = fields.get(name)
+            if spec is None:
+                output[name] = series
+            elif not spec.virtual:
+                output[spec.column] = series
+        return output, errors
+
+    def _key(self, target: ImportTarget, values) -> Optional[tuple]:
+        parts = []
+        for value in values:
+            text = "" if value is None else str(value).strip()
+            parts.append(text.lower() if target.match_case_insensitive else text)
+        return tuple(parts) if any(parts) else None
+
+    def _existing(self, session, target: ImportTarget, keys: Optional[List[tuple]], user_id: int) -> Dict[tuple, tuple]:
+        """key -> (id, owner, *day column values) for records matching keys (keys=None: every record in scope)"""
+        model = target.model
+        key_columns = [getattr(model, column) for column in target.match_on]
+        if target.match_case_insensitive:
+            key_columns = [func.lower(func.coalesce(column, "")) for column in key_columns]
+        owner = getattr(model, target.owner_column) if target.owner_column else None
+
+        found = {}
+        for start in range(0, len(keys) if keys is not None else 1, LOOKUP_CHUNK):
+            query = session.query(model.id, *key_columns, *([owner] if owner is not None else []),
+                                  *(getattr(model, column) for column in target.day_columns))
+            if keys is not None:
+                chunk = keys[start:start + LOOKUP_CHUNK]
+                if len(key_columns) == 1:
+                    query = query.filter(key_columns[0].in_([key[0] for key in chunk]))
+                else:
+                    query = query.filter(tuple_(*key_columns).in_(chunk))
+            if owner is not None and target.scope_to_owner:
+                query = query.filter(owner == user_id)
+            width = len(key_columns)
+            for row in query:
+                key = self._key(target, row[1:1 + width])
+                found[key] = (row[0], row[1 + width] if owner is not None else None, *row[1 + width + (owner is not None):])
+        return found
+
+    def _import_batch(self, session, plan: ImportPlan, chunk: pd.DataFrame, user_id: int,
+                      known: Optional[Dict[tuple, Optional[tuple]]] = None) -> Dict[str, Any]:
+        target = plan.target
+        table = target.model.__table__
+        values, errors = self._convert(plan, chunk)
+        outcome = {"inserted": 0, "updated": 0, "skipped": 0, "failed": len(errors), "errors": []}
+
+        columns = list(values.columns)
+        rows = list(zip(values.index.tolist(), *(_python_values(values[column]) for column in columns)))
+
+        # Rows without the key columns always insert; a later row with the same
+        # key replaces an earlier one in the same batch
+        row_keys: List[Optional[tuple]] = [None] * len(rows)
+        if target.match_on and all(column in columns for column in target.match_on):
+            positions = [columns.index(column) + 1 for column in target.match_on]
+            row_keys = [self._key(target, [row[p] for p in positions]) for row in rows]
+        last = {key: index for index, key in enumerate(row_keys) if key is not None}
+        if known is None:
+            existing = self._existing(session, target, list(last), user_id) if last else {}
+        else:
+            # Preloaded keys; rows inserted by earlier batches (None) are looked up
+            existing = {key: known[key] for key in last if known.get(key)}
+            inserted_earlier = [key for key in last if key in known and known[key] is None]
+            if inserted_earlier:
+                existing.update(self._existing(session, target, inserted_earlier, user_id))
+
+        # Column defaults for blank cells, and target defaults for new rows
+        fill = {column: table.c[column].default.arg for column in columns
+                if column in table.c and table.c[column].default is not None and table.c[column].default.is_scalar}
+        fill.update(target.defaults)
+        if target.owner_column:
+            fill[target.owner_column] = user_id
+        now = datetime.now(timezone.utc)
+        day_positions = [(column, columns.index(column) + 1) for column in target.day_columns if column in columns]
+
+        inserts, updates, new_keys, days = [], [], [], set()
+        for index, row in enumerate(rows):
+            number, key = row[0], row_keys[index]
+            if key is not None and last[key] != index:
+                outcome["skipped"] += 1
+                continue
+            match = existing.get(key)
+            if match is None:
+                record = dict(fill)
+                for column, value in zip(columns, row[1:]):
+                    if value is not None or column not in fill:
+                        record[column] = value
+                inserts.append((number, record))
+                if key is not None:
+                    new_keys.append(key)
+                days.add(now.date())
+            elif target.owner_column and not target.scope_to_owner and match[1] not in (None, user_id):
+                errors[number] = [f"{' / '.join(str(part) for part in key)} belongs to another user"]
+                outcome["failed"] += 1
+            elif plan.on_duplicate == "skip":
+                outcome["skipped"] += 1
+            else:
+                record = {"_id": match[0]}
+                record.update((column, value) for column, value in zip(columns, row[1:]) if value is not None)
+                if "updated_at" in table.c:
+                    record["updated_at"] = now
+                updates.append((number, record))
+                days.update(_day(value) for value in match[2:])
+            for column, position in day_positions:
+                days.add(_day(row[position]))
+        days.discard(None)
+
+        try:
+            self._write(session, table, [record for _, record in inserts], [record for _, record in updates])
+            session.commit()
+            outcome["inserted"], outcome["updated"] = len(inserts), len(updates)
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.warning(f"Bulk import batch into {target.key} failed ({e.__class__.__name__}); retrying row by row")
+            self._import_rows(session, target, inserts, updates, outcome, errors)
+
+        if known is not None:
+            known.update((key, None) for key in new_keys if key not in known)
+        outcome["days"] = days
+        outcome["errors"] = [{"row": row, "error": "; ".join(messages)} for row, messages in sorted(errors.items())]
+        return outcome
+
+    def _write(self, session, table, inserts: List[dict], updates: List[dict]):
+        # Core executemany: new rows share one key set (blanks are explicit
+        # None); updates only set non-blank cells, so group them by key set
+        if inserts:
+            session.execute(table.insert(), inserts)
+        by_columns: Dict[tuple, List[dict]] = {}
+        for record in updates:
+            by_columns.setdefault(tuple(record), []).append(record)
+        for group in by_columns.values():
+            session.execute(table.update().where(table.c.id == bindparam("_id")), group)
+
+    def _import_rows(self, session, target: ImportTarget, inserts, updates, outcome, errors):
+        """Fallback for a failed batch: one savepoint per row so only bad rows fail"""
+        table = target.model.__table__
+        written = {"inserted": 0, "updated": 0}
+        for kind, records in (("inserted", inserts), ("updated", updates)):
+            for number, record in records:
+                try:
+                    with session.begin_nested():
+                        if kind == "inserted":
+                            self._write(session, table, [record], [])
+                        else:
+                            self._write(session, table, [], [record])
+                    written[kind] += 1
+                except SQLAlchemyError as e:
+                    errors[number] = [str(getattr(e, "orig", e)).splitlines()[0]]
+                    outcome["failed"] += 1
+        try:
+            session.commit()
+            outcome.update(written)
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.error(f"Import batch into {target.key} could not be committed: {e}")
+            for number, _ in inserts + updates:
+                errors.setdefault(number, [f"Batch failed: {str(getattr(e, 'orig', e)).splitlines()[0]}"])
+            outcome["failed"] += written["inserted"] + written["updated"]
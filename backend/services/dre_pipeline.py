@@ -0,0 +1,647 @@
+"""
+DRE Extraction Pipeline
+Async, batched classification + field extraction for the Data Reconciliation Engine
+
+Ingestion only stores IncomingDataEvent rows (processed = False). This stage
+drains that queue in the background:
+
+    claim batch -> classify (LLM) -> extract (LLM) -> persist (match + ExtractedData)
+
+Features:
+- Async LLM backend (shared ai_providers.llm_client) so the event loop is never blocked
+- Bounded concurrency across all in-flight LLM calls
+- Exponential backoff with jitter on rate limits (honours Retry-After)
+- Per-stage latency (classify / extract / persist / queue wait) with p50/p95
+- Optional content-hash result cache (services/llm_result_cache.py); cached
+  classifications are resolved while claiming, cached extractions in one
+  lookup per batch, so only misses reach the LLM
+- Pluggable backend; FakeDREBackend runs tests without network access
+
+Configuration (env):
+    DRE_BATCH_SIZE               - events claimed per batch (default 25)
+    DRE_LLM_CONCURRENCY          - max concurrent LLM calls (default 4)
+    DRE_PIPELINE_INTERVAL_SECONDS - scheduler interval (default 30)
+    DRE_MAX_RETRIES              - rate-limit retries per call (default 5)
+    DRE_CLAIM_LEASE_SECONDS      - how long a claim holds before another
+                                   worker may take the event (default 600)
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import and_, or_, select, update
+
+from services.llm_result_cache import LLMResultCache, prompt_version
+
+logger = logging.getLogger(__name__)
+
+CLASSIFY_MODEL = "gpt-4o-mini"
+EXTRACT_MODEL = "gpt-4o"
+
+# Emails below this classification confidence are not sent to extraction
+MIN_CLASSIFICATION_CONFIDENCE = 0.3
+
+CLASSIFY_SYSTEM_PROMPT = """You are an email classification expert for mortgage loan processing.
+
+Classify emails into categories:
+- lead_update: New lead information or lead status changes
+- loan_update: Active loan milestone updates
+- rate_lock: Rate lock confirmations or expirations
+- appraisal: Appraisal scheduling or results
+- title: Title work, clear to close
+- insurance: HOI binders, insurance updates
+- closing: Closing date/time, CD delivery
+- document: Document receipt confirmations
+- portfolio: Servicing, escrow, tax updates
+- unrelated: Not mortgage-related
+
+Return JSON: {"category": "...", "subcategory": "...", "confidence": 0.0-1.0}"""
+
+
+def extract_system_prompt(category: str) -> str:
+    return f"""Extract mortgage loan fields from this {category} email.
+
+Extract any present fields:
+- loan_number: string
+- borrower_name: string
+- property_address: string
+- loan_amount: float
+- rate: float (as decimal, e.g., 6.125)
+- rate_lock_date: ISO date
+- lock_expiration: ISO date
+- appraisal_date: ISO date
+- appraisal_value: float
+- closing_date: ISO datetime
+- milestone: string (e.g., "RateLocked", "AppraisalOrdered", "ClearToClose")
+- documents_received: list of strings
+- lender: string
+- realtor_name: string
+- title_company: string
+
+For each field found, return:
+{{"field_name": {{"value": actual_value, "confidence": 0.0-1.0}}}}
+
+Return JSON object. Only include fields you found. Use null for missing."""
+
+
+def classify_user_message(content: str, subject: str) -> str:
+    return f"Subject: {subject}\n\nContent: {content[:1000]}"
+
+
+def extract_user_message(content: str) -> str:
+    return content[:2000]
+
+
+def keyword_classification(content: str, subject: str) -> Dict[str, Any]:
+    """Fallback classification when no LLM is configured"""
+    content_lower = (content or "").lower()
+    subject_lower = (subject or "").lower()
+    if any(word in subject_lower or word in content_lower for word in ['loan', 'mortgage', 'borrower', 'closing', 'rate lock']):
+        return {"category": "loan_update", "subcategory": "general", "confidence": 0.5}
+    return {"category": "loan_update", "subcategory": "general", "confidence": 0.3}
+
+
+class LLMRateLimitError(Exception):
+    """Raised by backends when the provider asks us to slow down"""
+
+    def __init__(self, message: str = "rate limited", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+class DRELLMBackend:
+    """Interface for the two LLM calls the pipeline makes"""
+
+    name = "base"
+    classify_model: Optional[str] = None
+    extract_model: Optional[str] = None
+    # Only real model output is worth caching (not keyword fallbacks)
+    cacheable = False
+
+    async def classify(self, content: str, subject: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def extract(self, content: str, category: str) -> Dict[str, Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class OpenAIDREBackend(DRELLMBackend):
+    """OpenAI chat completions via the shared async LLM client"""
+
+    name = "openai"
+    cacheable = True
+
+    def __init__(self, llm_client, classify_model: str = CLASSIFY_MODEL, extract_model: str = EXTRACT_MODEL):
+        self.llm = llm_client
+        self.classify_model = classify_model
+        self.extract_model = extract_model
+
+    async def _complete_json(self, model: str, system: str, user: str, temperature: float, purpose: str) -> Dict[str, Any]:
+        from ai_providers.llm_client import OPENAI, LLMRateLimitError as ClientRateLimitError
+
+        try:
+            # Retries are handled by the pipeline so backoff is visible in metrics
+            response = await self.llm.complete(
+                OPENAI, model, [{"role": "user", "content": user}],
+                system=system, temperature=temperature, max_tokens=2000,
+                json_mode=True, purpose=purpose, max_retries=0,
+            )
+        except ClientRateLimitError as e:
+            raise LLMRateLimitError(str(e), e.retry_after)
+        return response.json()
+
+    async def classify(self, content: str, subject: str) -> Dict[str, Any]:
+        return await self._complete_json(self.classify_model, CLASSIFY_SYSTEM_PROMPT,
+                                         classify_user_message(content, subject), 0.3, "dre_classify")
+
+    async def extract(self, content: str, category: str) -> Dict[str, Dict[str, Any]]:
+        return await self._complete_json(self.extract_model, extract_system_prompt(category),
+                                         extract_user_message(content), 0.2, "dre_extract")
+
+
+class KeywordDREBackend(DRELLMBackend):
+    """Used when no OpenAI key is configured: keyword classification, no extraction"""
+
+    name = "keyword"
+
+    async def classify(self, content: str, subject: str) -> Dict[str, Any]:
+        return keyword_classification(content, subject)
+
+    async def extract(self, content: str, category: str) -> Dict[str, Dict[str, Any]]:
+        return {}
+
+
+class FakeDREBackend(DRELLMBackend):
+    """
+    Deterministic in-memory backend for tests and benchmarks.
+
+    - latency: seconds each call sleeps (simulates network time)
+    - rate_limit_first: the first N calls raise LLMRateLimitError
+    - Emails mentioning "unsubscribe" classify as unrelated; a "Loan #XYZ"
+      token in the body is returned as loan_number
+    """
+
+    name = "fake"
+    classify_model = "fake-classify"
+    extract_model = "fake-extract"
+    cacheable = True
+
+    def __init__(self, latency: float = 0.0, rate_limit_first: int = 0):
+        self.latency = latency
+        self.rate_limit_remaining = rate_limit_first
+        self.calls = {"classify": 0, "extract": 0}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _call(self, stage: str):
+        self.calls[stage] += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.rate_limit_remaining > 0:
+                self.rate_limit_remaining -= 1
+                raise LLMRateLimitError("fake 429", retry_after=0.01)
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+    async def classify(self, content: str, subject: str) -> Dict[str, Any]:
+        await self._call("classify")
+        if "unsubscribe" in (content or "").lower():
+            return {"category": "unrelated", "subcategory": None, "confidence": 0.95}
+        return {"category": "loan_update", "subcategory": "general", "confidence": 0.9}
+
+    async def extract(self, content: str, category: str) -> Dict[str, Dict[str, Any]]:
+        await self._call("extract")
+        for token in (content or "").split():
+            if token.startswith("#"):
+                return {"loan_number": {"value": token[1:], "confidence": 0.95}}
+        return {}
+
+
+# ============================================================================
+# PIPELINE
+# ============================================================================
+
+@dataclass
+class QueuedEvent:
+    id: int
+    user_id: int
+    subject: str
+    content: str
+    created_at: Optional[datetime]
+    claimed_at: Optional[datetime] = None
+    bypass_cache: bool = False
+    cached_classification: Optional[Dict[str, Any]] = None
+    classify_key: Optional[str] = None
+
+
+@dataclass
+class EventAnalysis:
+    event: QueuedEvent
+    classification: Optional[Dict[str, Any]] = None
+    fields: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    deferred: bool = False  # rate-limited past the retry budget; retry next run
+    extract_key: Optional[str] = None
+    cached_fields: Optional[Dict[str, Dict[str, Any]]] = None
+    cache_writes: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def needs_extraction(self) -> bool:
+        return (
+            not self.deferred
+            and self.classification.get("category") != "unrelated"
+            and self.classification.get("confidence", 0) >= MIN_CLASSIFICATION_CONFIDENCE
+        )
+
+
+class StageTimer:
+    """Rolling latency samples for one pipeline stage"""
+
+    def __init__(self, size: int = 500):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.count = 0
+
+    def record(self, seconds: float):
+        self.samples.append(seconds * 1000)
+        self.count += 1
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.samples:
+            return {"count": self.count, "p50_ms": None, "p95_ms": None, "max_ms": None}
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "p50_ms": round(ordered[len(ordered) // 2], 1),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+            "max_ms": round(ordered[-1], 1),
+        }
+
+
+class DREPipeline:
+    """
+    Background DRE classification/extraction stage.
+
+    Usage:
+        pipeline = DREPipeline(
+            session_factory=SessionLocal,
+            event_model=IncomingDataEvent,
+            backend=OpenAIDREBackend(llm_client),
+            persist_result=finalize_dre_event,
+            cache=llm_result_cache,
+        )
+        await pipeline.drain()
+
+    persist_result(db, event, classification, fields) runs in a worker thread
+    with its own session; it must mark the event processed.
+
+    Batches are claimed in the database, so several workers can drain the
+    same queue: one UPDATE stamps claimed_at on unprocessed, unclaimed rows
+    (FOR UPDATE SKIP LOCKED on PostgreSQL) and returns them. Claims are
+    released after the batch; a worker that dies holding one loses it once
+    claim_lease_seconds pass. The event model needs a claimed_at column.
+
+    request_fresh(event_ids) makes the next run of those events skip cache
+    lookups (forced reprocessing); their fresh results overwrite the cache.
+
+    Fresh requests live in this process only: one is honoured when this
+    process next runs the event, not when another worker claims it first.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable,
+        event_model: Any,
+        backend: DRELLMBackend,
+        persist_result: Callable,
+        batch_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        base_backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 30.0,
+        cache: Optional[LLMResultCache] = None,
+        claim_lease_seconds: Optional[int] = None,
+    ):
+        self.session_factory = session_factory
+        self.event_model = event_model
+        self.backend = backend
+        self.persist_result = persist_result
+        self.batch_size = batch_size or int(os.getenv("DRE_BATCH_SIZE", "25"))
+        self.max_concurrency = max_concurrency or int(os.getenv("DRE_LLM_CONCURRENCY", "4"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("DRE_MAX_RETRIES", "5"))
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.interval_seconds = int(os.getenv("DRE_PIPELINE_INTERVAL_SECONDS", "30"))
+        self.cache = cache
+        self.claim_lease_seconds = claim_lease_seconds or int(os.getenv("DRE_CLAIM_LEASE_SECONDS", "600"))
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._drain_lock: Optional[asyncio.Lock] = None
+        self._fresh: Set[int] = set()
+
+        self.stages = {name: StageTimer() for name in ("classify", "extract", "persist", "queue_wait")}
+        self.counters = {
+            "events_processed": 0,
+            "events_extracted": 0,
+            "events_deferred": 0,
+            "events_failed": 0,
+            "rate_limit_retries": 0,
+            "llm_errors": 0,
+            "batches": 0,
+        }
+        self.last_queue_depth = 0
+        self.last_run_at: Optional[str] = None
+
+    @property
+    def cache_enabled(self) -> bool:
+        return self.cache is not None and self.cache.enabled and self.backend.cacheable
+
+    def request_fresh(self, event_ids: Iterable[int]):
+        """Skip cache lookups the next time this process runs these events"""
+        self._fresh.update(event_ids)
+
+    # ------------------------------------------------------------------
+    # Queue
+    # ------------------------------------------------------------------
+
+    def _claim_batch(self) -> List[QueuedEvent]:
+        model = self.event_model
+        # Naive UTC, as the DateTime columns store it
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        claimable = and_(
+            model.processed == False,
+            or_(model.claimed_at.is_(None), model.claimed_at < now - timedelta(seconds=self.claim_lease_seconds)),
+        )
+        db = self.session_factory()
+        try:
+            candidates = (
+                select(model.id).where(claimable).order_by(model.id).limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            # Re-checking claimable in the UPDATE skips rows another worker claimed meanwhile
+            rows = db.execute(
+                update(model).where(model.id.in_(candidates), claimable).values(claimed_at=now)
+                .returning(model.id, model.user_id, model.subject, model.raw_text, model.raw_html, model.created_at)
+                .execution_options(synchronize_session=False)
+            ).all()
+            db.commit()
+            self.last_queue_depth = db.query(model.id).filter(model.processed == False).count()
+
+            batch = [
+                QueuedEvent(row.id, row.user_id, row.subject or "", row.raw_text or row.raw_html or "",
+                            row.created_at, claimed_at=now, bypass_cache=row.id in self._fresh)
+                for row in sorted(rows, key=lambda row: row.id)
+            ]
+
+            if self.cache_enabled and batch:
+                for event in batch:
+                    event.classify_key = self.cache.classification_key(
+                        self.backend.classify_model, CLASSIFY_SYSTEM_PROMPT, event.content, event.subject
+                    )
+                lookup = [event for event in batch if not event.bypass_cache]
+                self.cache.count_bypass(len(batch) - len(lookup))
+                cached = self.cache.get_many(db, [event.classify_key for event in lookup])
+                db.commit()
+                for event in lookup:
+                    event.cached_classification = cached.get(event.classify_key)
+        finally:
+            db.close()
+
+        return batch
+
+    def _release_batch(self, batch: List[QueuedEvent]):
+        """Clear this run's claims (processed events are done; the rest are retried next run)"""
+        model = self.event_model
+        db = self.session_factory()
+        try:
+            db.execute(
+                update(model)
+                .where(model.id.in_([event.id for event in batch]), model.claimed_at == batch[0].claimed_at)
+                .values(claimed_at=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _lookup_extractions(self, analyses: List[EventAnalysis]):
+        db = self.session_factory()
+        try:
+            for analysis in analyses:
+                category = analysis.classification["category"]
+                analysis.extract_key = self.cache.extraction_key(
+                    self.backend.extract_model, extract_system_prompt(category), analysis.event.content
+                )
+            lookup = [a for a in analyses if not a.event.bypass_cache]
+            self.cache.count_bypass(len(analyses) - len(lookup))
+            cached = self.cache.get_many(db, [a.extract_key for a in lookup])
+            db.commit()
+            for analysis in lookup:
+                analysis.cached_fields = cached.get(analysis.extract_key)
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------------
+    # LLM calls
+    # ------------------------------------------------------------------
+
+    async def _call_with_backoff(self, stage: str, call: Callable):
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                started = time.perf_counter()
+                try:
+                    result = await call()
+                    self.stages[stage].record(time.perf_counter() - started)
+                    return result
+                except LLMRateLimitError as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    delay = e.retry_after or min(self.max_backoff_seconds, self.base_backoff_seconds * (2 ** attempt))
+            # Sleep outside the semaphore so other events keep flowing
+            attempt += 1
+            self.counters["rate_limit_retries"] += 1
+            await asyncio.sleep(delay * (1 + random.random() * 0.25))
+
+    async def _classify(self, analysis: EventAnalysis):
+        event = analysis.event
+        if event.cached_classification is not None:
+            analysis.classification = event.cached_classification
+            return
+        try:
+            analysis.classification = await self._call_with_backoff(
+                "classify", lambda: self.backend.classify(event.content, event.subject)
+            )
+            if event.classify_key:
+                analysis.cache_writes.append({
+                    "key": event.classify_key, "stage": "classify", "model": self.backend.classify_model,
+                    "version": prompt_version(CLASSIFY_SYSTEM_PROMPT), "result": analysis.classification,
+                })
+        except LLMRateLimitError:
+            analysis.deferred = True
+        except Exception as e:
+            logger.error(f"Email classification error (event {event.id}): {e}")
+            self.counters["llm_errors"] += 1
+            # Same fallback as the synchronous path: keep the email reviewable
+            analysis.classification = {"category": "loan_update", "subcategory": "error", "confidence": 0.3}
+
+    async def _extract(self, analysis: EventAnalysis):
+        if analysis.cached_fields is not None:
+            analysis.fields = analysis.cached_fields
+            return
+        event = analysis.event
+        category = analysis.classification["category"]
+        try:
+            analysis.fields = await self._call_with_backoff(
+                "extract", lambda: self.backend.extract(event.content, category)
+            ) or {}
+            if analysis.extract_key:
+                analysis.cache_writes.append({
+                    "key": analysis.extract_key, "stage": "extract", "model": self.backend.extract_model,
+                    "version": prompt_version(extract_system_prompt(category)), "result": analysis.fields,
+                })
+        except LLMRateLimitError:
+            analysis.deferred = True
+        except Exception as e:
+            logger.error(f"Field extraction error (event {event.id}): {e}")
+            self.counters["llm_errors"] += 1
+            analysis.fields = {}
+
+    # ------------------------------------------------------------------
+    # Persistence (worker thread, own session)
+    # ------------------------------------------------------------------
+
+    def _persist_batch(self, analyses: List[EventAnalysis]) -> Dict[str, int]:
+        outcome = {"processed": 0, "extracted": 0, "failed": 0}
+        db = self.session_factory()
+        try:
+            events = {
+                event.id: event for event in db.query(self.event_model).filter(
+                    self.event_model.id.in_([a.event.id for a in analyses])
+                ).all()
+            }
+            for analysis in analyses:
+                event = events.get(analysis.event.id)
+                if event is None or event.processed:
+                    continue  # deleted, or handled by a manual /extract meanwhile
+                started = time.perf_counter()
+                try:
+                    extracted = self.persist_result(db, event, analysis.classification, analysis.fields)
+                    outcome["processed"] += 1
+                    if extracted is not None:
+                        outcome["extracted"] += 1
+                except Exception as e:
+                    db.rollback()
+                    outcome["failed"] += 1
+                    logger.error(f"DRE pipeline failed to persist event {event.id}: {e}")
+                self.stages["persist"].record(time.perf_counter() - started)
+
+            cache_writes = [write for analysis in analyses for write in analysis.cache_writes]
+            if self.cache_enabled and cache_writes:
+                try:
+                    self.cache.put_many(db, cache_writes)
+                    db.commit()
+                    self.cache.maybe_prune(db)
+                except Exception as e:
+                    # Another worker cached the same content first; results are already persisted
+                    db.rollback()
+                    logger.warning(f"DRE pipeline could not write {len(cache_writes)} cache entries: {e}")
+        finally:
+            db.close()
+        return outcome
+
+    # ------------------------------------------------------------------
+    # Runs
+    # ------------------------------------------------------------------
+
+    def _ensure_primitives(self):
+        # Created lazily so they bind to the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._drain_lock = asyncio.Lock()
+
+    async def run_once(self) -> int:
+        """
+        Process one batch; returns the number of events claimed, or 0 when
+        any were deferred for rate limiting so drain() backs off until the
+        next scheduled run.
+        """
+        self._ensure_primitives()
+        loop = asyncio.get_running_loop()
+        batch = await loop.run_in_executor(None, self._claim_batch)
+        if not batch:
+            return 0
+
+        try:
+            now = datetime.now(timezone.utc)
+            for event in batch:
+                if event.created_at:
+                    created = event.created_at if event.created_at.tzinfo else event.created_at.replace(tzinfo=timezone.utc)
+                    self.stages["queue_wait"].record((now - created).total_seconds())
+
+            analyses = [EventAnalysis(event=event) for event in batch]
+            await asyncio.gather(*(self._classify(a) for a in analyses))
+
+            to_extract = [a for a in analyses if a.needs_extraction]
+            if self.cache_enabled and to_extract:
+                await loop.run_in_executor(None, self._lookup_extractions, to_extract)
+            await asyncio.gather(*(self._extract(a) for a in to_extract))
+
+            ready = [a for a in analyses if not a.deferred]
+            deferred = len(analyses) - len(ready)
+
+            outcome = await loop.run_in_executor(None, self._persist_batch, ready) if ready else {"processed": 0, "extracted": 0, "failed": 0}
+        finally:
+            await loop.run_in_executor(None, self._release_batch, batch)
+        self._fresh.difference_update(a.event.id for a in ready)
+
+        self.counters["batches"] += 1
+        self.counters["events_processed"] += outcome["processed"]
+        self.counters["events_extracted"] += outcome["extracted"]
+        self.counters["events_failed"] += outcome["failed"]
+        self.counters["events_deferred"] += deferred
+        self.last_run_at = datetime.now(timezone.utc).isoformat()
+
+        logger.info(
+            f"🧠 DRE pipeline batch: {outcome['processed']}/{len(batch)} processed, "
+            f"{outcome['extracted']} extracted, {deferred} deferred (rate limited)"
+        )
+        return len(batch) if not deferred else 0
+
+    async def drain(self, max_batches: int = 20) -> int:
+        """Run batches until the queue is empty (or the batch cap is hit)"""
+        self._ensure_primitives()
+        if self._drain_lock.locked():
+            return 0
+        total = 0
+        async with self._drain_lock:
+            for _ in range(max_batches):
+                claimed = await self.run_once()
+                total += claimed
+                if claimed < self.batch_size:
+                    break
+        return total
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend.name,
+            "batch_size": self.batch_size,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.last_queue_depth,
+            "last_run_at": self.last_run_at,
+            "counters": dict(self.counters),
+            "stages": {name: timer.summary() for name, timer in self.stages.items()},
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
@@ -8,6 +8,7 @@ import os
 import logging
 from typing import Dict, Any, Optional
 from datetime import datetime
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 # Import AI providers
@@ -21,8 +22,13 @@ from models.mum_client_profile import MUMClientProfile
 from models.team_member_profile import TeamMemberProfile
 from models.data_conflict import DataConflict
 
+from services.entity_name_index import entity_name_registry
+
 logger = logging.getLogger(__name__)
 
+# Profile name matches below this score are treated as new profiles
+NAME_MATCH_MIN_SCORE = 0.9
+
 
 class EmailProcessor:
     """
@@ -219,8 +225,8 @@ class EmailProcessor:
     ) -> Dict[str, Any]:
         """
         Match extracted fields to existing profile
-        Simple matching for Phase 1 (exact email/phone/loan_number match)
-        Phase 2 will add advanced fuzzy matching
+        Exact email/phone/loan_number match first, then an indexed
+        (token + trigram) name match
         """
 
         # Get appropriate model
@@ -268,6 +274,18 @@ class EmailProcessor:
                     'reasoning': f'Exact loan number match: {loan_num}'
                 }
 
+        # Try name match against the profile name index
+        if query_name := self._extracted_name(extracted_fields):
+            matches = self._profile_name_index(model, db).search(query_name, limit=1, min_score=NAME_MATCH_MIN_SCORE)
+            if matches:
+                match = matches[0]
+                return {
+                    'match_type': 'name',
+                    'profile_id': match['key'],
+                    'confidence': int(match['score'] * 90),
+                    'reasoning': f"Name match: {match['name']} (score {match['score']})"
+                }
+
         # No match found - new profile
         return {
             'match_type': 'new',
@@ -276,6 +294,43 @@ class EmailProcessor:
             'reasoning': 'No existing profile found'
         }
 
+    @staticmethod
+    def _extracted_name(extracted_fields: Dict[str, Any]) -> Optional[str]:
+        if name := extracted_fields.get('name'):
+            return name
+        full_name = " ".join(
+            part for part in (extracted_fields.get('first_name'), extracted_fields.get('last_name')) if part
+        )
+        return full_name or extracted_fields.get('borrower_name')
+
+    @staticmethod
+    def _profile_name_rows(model, db: Session):
+        """(id, [names], updated_at) for live profiles; loan profiles use the linked lead's name"""
+        if model is LeadProfile:
+            query = db.query(model.id, model.first_name, model.last_name, model.updated_at)
+        elif model is ActiveLoanProfile:
+            query = db.query(model.id, LeadProfile.first_name, LeadProfile.last_name, model.updated_at).outerjoin(
+                LeadProfile, LeadProfile.id == model.lead_profile_id
+            )
+        else:
+            query = db.query(model.id, model.name, model.updated_at)
+
+        for row in query.filter(model.is_deleted == False).yield_per(5000):
+            if len(row) == 4:
+                profile_id, first_name, last_name, updated_at = row
+                name = " ".join(part for part in (first_name, last_name) if part)
+            else:
+                profile_id, name, updated_at = row
+            yield profile_id, [name], updated_at
+
+    def _profile_name_index(self, model, db: Session):
+        def fingerprint():
+            return db.query(func.count(model.id), func.max(model.updated_at)).filter(model.is_deleted == False).one()
+
+        return entity_name_registry.get(
+            f"profile:{model.__tablename__}", fingerprint, lambda: self._profile_name_rows(model, db)
+        )
+
     async def _create_profile(
         self,
         extracted_fields: Dict[str, Any],
@@ -346,6 +401,16 @@ class EmailProcessor:
         db.commit()
         db.refresh(profile)
 
+        # Keep the name index in step; new loan profiles have no linked lead yet,
+        # so they are found by the borrower names on the email
+        if profile_type == 'lead':
+            names = [" ".join(part for part in (profile.first_name, profile.last_name) if part)]
+        elif profile_type == 'active_loan':
+            names = [extracted_fields.get('borrower_name'), extracted_fields.get('coborrower_name')]
+        else:
+            names = [getattr(profile, 'name', None)]
+        entity_name_registry.upsert(f"profile:{type(profile).__tablename__}", profile.id, names, profile.updated_at)
+
         logger.info(f"Created new {profile_type} profile with ID: {profile.id}")
         return profile
 
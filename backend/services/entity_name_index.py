@@ -0,0 +1,189 @@
+"""
+Entity Name Index
+Token + trigram index for matching extracted person names to CRM entities
+
+match_entity used to load every Lead and Loan for the user and substring-test
+each name, for every extracted email. This index keeps, per scope (a user's
+leads/loans, or one profile table):
+- Token postings: normalized name token -> entity keys
+- Trigram postings (pg_trgm style) over the distinct token vocabulary
+
+A search expands each query token to similar vocabulary tokens (via the
+trigram index over distinct tokens, so typos still match), takes candidates
+from the postings of the most selective query token, and scores only those:
+the mean over query tokens of the best token similarity in the name. Every
+query token appearing exactly scores 1.0 (the old substring case).
+
+Indexes are fingerprinted per scope (see services.fingerprint_index); the
+fingerprint is re-checked at most every VERIFY_INTERVAL_SECONDS.
+"""
+
+import re
+import heapq
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+
+from services.fingerprint_index import FingerprintedIndex, FingerprintedIndexRegistry
+
+VERIFY_INTERVAL_SECONDS = 30
+
+# Query tokens expand to vocabulary tokens at least this similar (trigram Jaccard)
+MIN_TOKEN_SIMILARITY = 0.35
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_STOP_TOKENS = {"jr", "sr", "ii", "iii", "iv", "mr", "mrs", "ms", "dr", "and"}
+
+
+def name_tokens(name: Optional[str]) -> List[str]:
+    if not name:
+        return []
+    return [t for t in _NON_ALNUM.sub(" ", name.lower()).split() if t not in _STOP_TOKENS]
+
+
+def token_trigrams(tokens: Iterable[str]) -> Set[str]:
+    grams = set()
+    for token in tokens:
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class EntityNameIndex(FingerprintedIndex):
+    """Name index over one scope; keys are any hashable, e.g. ("lead", 42)"""
+
+    def __init__(self):
+        super().__init__()
+        # key -> [(display name, tokens)]; an entity may carry several names
+        self.records: Dict[Hashable, List[Tuple[str, Tuple[str, ...]]]] = {}
+        self.token_postings: Dict[str, Set[Hashable]] = defaultdict(set)
+        # Vocabulary index: trigram -> distinct name tokens containing it
+        self.vocab_grams: Dict[str, Set[str]] = defaultdict(set)
+        self.token_grams: Dict[str, Set[str]] = {}
+
+    def add(self, key: Hashable, names: Sequence[Optional[str]], updated_at: Optional[datetime] = None):
+        """Insert or replace an entity"""
+        self.remove(key)
+        entries = []
+        for name in names:
+            tokens = tuple(name_tokens(name))
+            if tokens:
+                entries.append((name, tokens))
+        # Nameless entities still count toward the fingerprint
+        self.records[key] = entries
+        for _, tokens in entries:
+            for token in tokens:
+                if token not in self.token_postings:
+                    grams = token_trigrams([token])
+                    self.token_grams[token] = grams
+                    for gram in grams:
+                        self.vocab_grams[gram].add(token)
+                self.token_postings[token].add(key)
+        self.touch(updated_at)
+
+    def remove(self, key: Hashable):
+        entries = self.records.pop(key, None)
+        if not entries:
+            return
+        for _, tokens in entries:
+            for token in tokens:
+                members = self.token_postings.get(token)
+                if members is None:
+                    continue
+                members.discard(key)
+                if not members:
+                    del self.token_postings[token]
+                    for gram in self.token_grams.pop(token, ()):
+                        vocab = self.vocab_grams.get(gram)
+                        if vocab is not None:
+                            vocab.discard(token)
+                            if not vocab:
+                                del self.vocab_grams[gram]
+
+    def _expand(self, token: str) -> Dict[str, float]:
+        """Vocabulary tokens similar to a query token -> trigram similarity (exact = 1.0)"""
+        grams = token_trigrams([token])
+        hits: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for candidate in self.vocab_grams.get(gram, ()):
+                hits[candidate] += 1
+        similar = {}
+        for candidate, shared in hits.items():
+            similarity = shared / (len(grams) + len(self.token_grams[candidate]) - shared)
+            if similarity >= MIN_TOKEN_SIMILARITY:
+                similar[candidate] = similarity
+        if token in self.token_postings:
+            similar[token] = 1.0
+        return similar
+
+    def search(self, query: str, limit: int = 5, min_score: float = 0.6) -> List[Dict[str, Any]]:
+        """
+        Ranked [{key, name, score}] for entities whose name resembles the query.
+
+        Each query token is expanded to similar vocabulary tokens; candidates
+        come from the postings of the most selective query token, and score
+        as the mean over query tokens of the best token similarity in the name.
+        """
+        query_tokens = list(dict.fromkeys(name_tokens(query)))
+        if not query_tokens:
+            return []
+
+        expansions = [self._expand(token) for token in query_tokens]
+        postings_size = [sum(len(self.token_postings[t]) for t in exp) for exp in expansions]
+
+        # Drive candidate generation from the rarest token that matched anything
+        # (usually the surname); a single unmatched token cannot reach min_score
+        # on its own unless the query is one token long
+        order = sorted((size, i) for i, size in enumerate(postings_size) if size)
+        if not order:
+            return []
+        if len(expansions) == 1:
+            return self._search_single(expansions[0], limit, min_score)
+        driver = expansions[order[0][1]]
+        candidates: Set[Hashable] = set()
+        for token in driver:
+            candidates |= self.token_postings[token]
+
+        results = []
+        for key in candidates:
+            best_score, best_name = 0.0, None
+            for display, tokens in self.records.get(key, ()):
+                total = 0.0
+                for expansion in expansions:
+                    total += max((expansion.get(t, 0.0) for t in tokens), default=0.0)
+                score = total / len(expansions)
+                if score > best_score:
+                    best_score, best_name = score, display
+            if best_score >= min_score:
+                results.append({"key": key, "name": best_name, "score": round(best_score, 4)})
+
+        results.sort(key=lambda r: (-r["score"], str(r["key"])))
+        return results[:limit]
+
+    def _search_single(self, expansion: Dict[str, float], limit: int, min_score: float) -> List[Dict[str, Any]]:
+        """One-token query: an entity scores as its best-matching token, so walk
+        the expanded tokens best-first instead of scoring every posting"""
+        results = []
+        seen: Set[Hashable] = set()
+        for token, similarity in sorted(expansion.items(), key=lambda item: (-item[1], item[0])):
+            if similarity < min_score or len(results) >= limit:
+                break
+            fresh = (key for key in self.token_postings[token] if key not in seen)
+            for key in heapq.nsmallest(limit - len(results), fresh, key=str):
+                seen.add(key)
+                display = next(name for name, tokens in self.records[key] if token in tokens)
+                results.append({"key": key, "name": display, "score": round(similarity, 4)})
+        return results
+
+
+class EntityNameIndexRegistry(FingerprintedIndexRegistry):
+    """Name indexes keyed by scope; rows_loader() yields (key, [names], updated_at)"""
+
+    index_class = EntityNameIndex
+
+    def __init__(self, verify_interval_seconds: float = VERIFY_INTERVAL_SECONDS):
+        super().__init__(verify_interval_seconds)
+
+
+# Global registry instance
+entity_name_registry = EntityNameIndexRegistry()
@@ -0,0 +1,125 @@
+"""
+Fingerprinted In-Memory Indexes
+Shared plumbing for per-scope indexes kept in process memory
+
+An index is built lazily per scope (e.g. one user's leads) and updated
+incrementally on writes. A cheap (count, max updated_at) fingerprint is
+compared with the database, at most every verify_interval_seconds, so writes
+from other workers or bulk paths trigger a rebuild.
+
+Subclasses of FingerprintedIndex keep their entries in self.records and
+implement add(key, *values, updated_at) and remove(key).
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_ts(value: Optional[datetime]) -> Optional[datetime]:
+    """Naive UTC, so stored and in-memory timestamps compare equal"""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class FingerprintedIndex:
+    """Base for an index over one scope"""
+
+    def __init__(self):
+        self.records: Dict[Hashable, Any] = {}
+        self.max_updated_at: Optional[datetime] = None
+        self.verified_at = time.monotonic()
+
+    @property
+    def fingerprint(self) -> Tuple[int, Optional[datetime]]:
+        return len(self.records), self.max_updated_at
+
+    def touch(self, updated_at: Optional[datetime]):
+        updated_at = normalize_ts(updated_at)
+        if updated_at and (self.max_updated_at is None or updated_at > self.max_updated_at):
+            self.max_updated_at = updated_at
+
+    def add(self, key: Hashable, *values):
+        raise NotImplementedError
+
+    def remove(self, key: Hashable):
+        raise NotImplementedError
+
+
+class FingerprintedIndexRegistry:
+    """
+    Process-wide registry of indexes keyed by scope.
+
+    Callers supply loaders so index modules stay free of ORM imports:
+        fingerprint_loader() -> (count, max_updated_at)
+        rows_loader() -> iterable of (key, *values, updated_at), as add() takes them
+    """
+
+    index_class = FingerprintedIndex
+
+    def __init__(self, verify_interval_seconds: float = 0):
+        self.verify_interval_seconds = verify_interval_seconds
+        self._indexes: Dict[Hashable, FingerprintedIndex] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        scope: Hashable,
+        fingerprint_loader: Callable[[], Tuple[int, Optional[datetime]]],
+        rows_loader: Callable[[], Iterable[Tuple]],
+    ) -> FingerprintedIndex:
+        """Return a fresh index for the scope, rebuilding it if the fingerprint drifted"""
+        with self._lock:
+            index = self._indexes.get(scope)
+            if index is not None and time.monotonic() - index.verified_at < self.verify_interval_seconds:
+                return index
+
+        count, max_updated = fingerprint_loader()
+        db_fingerprint = (count, normalize_ts(max_updated))
+        if index is not None and index.fingerprint == db_fingerprint:
+            index.verified_at = time.monotonic()
+            return index
+
+        started = time.perf_counter()
+        index = self.index_class()
+        for row in rows_loader():
+            index.add(*row)
+        # Rows may be loaded without timestamps; trust the fingerprint's
+        index.max_updated_at = db_fingerprint[1]
+
+        with self._lock:
+            self._indexes[scope] = index
+        logger.info(
+            f"Built {type(index).__name__} for {scope}: {len(index.records)} entries "
+            f"in {(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+        return index
+
+    def upsert(self, scope: Hashable, key: Hashable, *values):
+        """Apply a create/update to an already-built index (no-op if not built)"""
+        with self._lock:
+            index = self._indexes.get(scope)
+            if index is not None:
+                index.add(key, *values)
+
+    def touch(self, scope: Hashable, updated_at: Optional[datetime]):
+        """Record a write that did not change indexed fields so the fingerprint stays in step"""
+        with self._lock:
+            index = self._indexes.get(scope)
+            if index is not None:
+                index.touch(updated_at)
+
+    def remove(self, scope: Hashable, key: Hashable):
+        with self._lock:
+            index = self._indexes.get(scope)
+            if index is not None:
+                index.remove(key)
+
+    def invalidate(self, scope: Hashable):
+        with self._lock:
+            self._indexes.pop(scope, None)
@@ -0,0 +1,199 @@
+"""
+Lead Duplicate Blocking Index
+Candidate generation for duplicate lead detection
+
+Instead of scoring every pair of leads (O(n²)), each lead is assigned a small
+set of blocking keys:
+- Normalized email (trimmed, lower-cased)
+- Digits-only phone (last 10 digits, so +1 prefixes still block together;
+  scoring compares phones the same way)
+- Phonetic name keys (Soundex of first + last name token, order-insensitive)
+
+Only leads that share at least one block are scored, so detection cost grows
+with the number of near-duplicates rather than with the square of the
+portfolio size. A block larger than MAX_BLOCK_SIZE (e.g. a shared office phone
+number) is split into overlapping windows of its members sorted by name, so a
+single degenerate key cannot reintroduce quadratic work.
+
+The index is kept per user in process memory and fingerprinted per user (see
+services.fingerprint_index); the fingerprint is checked on every read.
+"""
+
+import difflib
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from services.fingerprint_index import FingerprintedIndex, FingerprintedIndexRegistry
+
+# Blocks larger than this are compared in sorted windows of this many leads
+MAX_BLOCK_SIZE = 500
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+
+def normalize_email(email: Optional[str]) -> str:
+    return email.strip().lower() if email else ""
+
+
+def normalize_phone(phone: Optional[str]) -> str:
+    """Last 10 digits, so "+1 (555) 010-0199" and "555-010-0199" are the same phone"""
+    if not phone:
+        return ""
+    return "".join(filter(str.isdigit, phone))[-10:]
+
+
+def soundex(word: str) -> str:
+    """Classic 4-character American Soundex code"""
+    word = "".join(ch for ch in word.lower() if ch.isalpha())
+    if not word:
+        return ""
+
+    code = word[0].upper()
+    last = _SOUNDEX_CODES.get(word[0], "")
+    for ch in word[1:]:
+        digit = _SOUNDEX_CODES.get(ch, "")
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        if ch not in "hw":
+            last = digit
+
+    return code.ljust(4, "0")
+
+
+def name_keys(name: Optional[str]) -> Set[str]:
+    """Phonetic blocking keys for a person name"""
+    if not name:
+        return set()
+
+    tokens = [t for t in name.lower().replace(",", " ").split() if t]
+    if not tokens:
+        return set()
+
+    if len(tokens) == 1:
+        code = soundex(tokens[0])
+        return {f"n:{code}"} if code else set()
+
+    first, last = soundex(tokens[0]), soundex(tokens[-1])
+    # Order-insensitive so "Smith John" blocks with "John Smith"
+    return {"n:" + "|".join(sorted([first, last]))}
+
+
+def blocking_keys(name: Optional[str], email: Optional[str], phone: Optional[str]) -> Set[str]:
+    keys = name_keys(name)
+
+    email_key = normalize_email(email)
+    if email_key:
+        keys.add(f"e:{email_key}")
+
+    phone_key = normalize_phone(phone)
+    if len(phone_key) >= 7:
+        keys.add(f"p:{phone_key}")
+
+    return keys
+
+
+def score_pair(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    """
+    Similarity score for two indexed leads.
+    Same weighting as the original all-pairs detector:
+    name 40% (SequenceMatcher ratio), email 30%, phone 30%
+    (phones compared as normalize_phone, like their blocking key).
+    """
+    total = 0.0
+
+    if a["name"] and b["name"]:
+        total += difflib.SequenceMatcher(None, a["name"], b["name"]).ratio() * 0.4
+
+    if a["email"] and b["email"]:
+        total += (1.0 if a["email"] == b["email"] else 0.0) * 0.3
+
+    if a["phone"] and b["phone"]:
+        total += (1.0 if a["phone"] == b["phone"] else 0.0) * 0.3
+
+    return total
+
+
+class LeadBlockingIndex(FingerprintedIndex):
+    """Blocking-key index over one user's leads"""
+
+    def __init__(self):
+        super().__init__()
+        self.records: Dict[int, Dict[str, Any]] = {}
+        self.blocks: Dict[str, Set[int]] = defaultdict(set)
+
+    def add(self, lead_id: int, name: Optional[str], email: Optional[str],
+            phone: Optional[str], updated_at: Optional[datetime] = None):
+        """Insert or replace a lead in the index"""
+        self.remove(lead_id)
+
+        keys = blocking_keys(name, email, phone)
+        self.records[lead_id] = {
+            "name": name.lower() if name else "",
+            "email": normalize_email(email),
+            "phone": normalize_phone(phone),
+            "keys": keys,
+        }
+        for key in keys:
+            self.blocks[key].add(lead_id)
+        self.touch(updated_at)
+
+    def remove(self, lead_id: int):
+        record = self.records.pop(lead_id, None)
+        if not record:
+            return
+        for key in record["keys"]:
+            members = self.blocks.get(key)
+            if members is not None:
+                members.discard(lead_id)
+                if not members:
+                    del self.blocks[key]
+
+    def candidate_pairs(self) -> Iterator[Tuple[int, int]]:
+        """Yield each (low_id, high_id) pair sharing at least one block, once"""
+        seen: Set[Tuple[int, int]] = set()
+        for key, members in self.blocks.items():
+            if len(members) < 2:
+                continue
+            if len(members) > MAX_BLOCK_SIZE:
+                # Sorted neighbourhood: similar names end up within a window of each other
+                ordered = sorted(members, key=lambda lead_id: (self.records[lead_id]["name"], lead_id))
+                window = MAX_BLOCK_SIZE
+            else:
+                ordered = sorted(members)
+                window = len(ordered)
+            for i, id1 in enumerate(ordered):
+                for id2 in ordered[i + 1:i + window]:
+                    pair = (id1, id2) if id1 < id2 else (id2, id1)
+                    if pair not in seen:
+                        seen.add(pair)
+                        yield pair
+
+    def find_duplicates(self, threshold: float) -> List[Tuple[int, int, float]]:
+        """Score candidate pairs and return (lead_id_1, lead_id_2, similarity) above threshold"""
+        results = []
+        for id1, id2 in self.candidate_pairs():
+            similarity = score_pair(self.records[id1], self.records[id2])
+            if similarity >= threshold:
+                results.append((id1, id2, similarity))
+        results.sort(key=lambda r: (-r[2], r[0], r[1]))
+        return results
+
+
+class LeadIndexRegistry(FingerprintedIndexRegistry):
+    """Blocking indexes keyed by user; rows_loader() yields (id, name, email, phone, updated_at)"""
+
+    index_class = LeadBlockingIndex
+
+
+# Global registry instance
+lead_index_registry = LeadIndexRegistry()
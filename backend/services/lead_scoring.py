@@ -0,0 +1,177 @@
+"""
+Lead Scoring
+Rule-based lead AI score, for one lead or for the whole leads table at once
+
+The score rules are defined once below and evaluated two ways:
+- score_lead() on one object, for ORM writes (create, update, merges,
+  reconciliation) as they flush
+- score_expression() as a SQL CASE expression, so a rescore is one UPDATE
+  per id range computed inside the database instead of loading and saving
+  every Lead object
+
+Only stale rows are written: the UPDATE is filtered to rows whose stored
+ai_score or sentiment differs from the computed one. The scheduled job is
+incremental - after the first full pass it only looks at leads updated
+since its previous run (with an overlap for transactions that committed
+late). Rescoring does not touch updated_at.
+
+Configuration (env):
+    LEAD_RESCORE_INTERVAL_SECONDS  - scheduled job interval (default 900)
+    LEAD_RESCORE_CHUNK_SIZE        - lead ids per UPDATE/commit (default 20000)
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import case, func, or_, select
+
+BASE_SCORE = 50
+# (minimum credit score, points); a credit score below the last band loses points
+CREDIT_SCORE_BANDS = ((740, 30), (680, 20), (620, 10))
+LOW_CREDIT_SCORE_POINTS = -10
+PREAPPROVAL_POINTS = 15
+EMAIL_POINTS = 5
+PHONE_POINTS = 5
+LOW_DTI, LOW_DTI_POINTS = 0.36, 10
+HIGH_DTI, HIGH_DTI_POINTS = 0.50, -15
+# (minimum score, sentiment); below the last band a lead needs attention
+SENTIMENT_BANDS = ((75, "positive"), (50, "neutral"))
+LOW_SENTIMENT = "needs-attention"
+
+# Lead columns the score depends on
+SCORE_INPUTS = ("credit_score", "preapproval_amount", "email", "phone", "debt_to_income")
+
+# Rows updated up to this long before the previous run started are looked at again
+RESCORE_OVERLAP = timedelta(minutes=5)
+
+
+def score_lead(lead: Any) -> int:
+    """AI score (0-100) for any object with the SCORE_INPUTS attributes"""
+    score = BASE_SCORE
+
+    if lead.credit_score:
+        for minimum, points in CREDIT_SCORE_BANDS:
+            if lead.credit_score >= minimum:
+                score += points
+                break
+        else:
+            score += LOW_CREDIT_SCORE_POINTS
+
+    if lead.preapproval_amount and lead.preapproval_amount > 0:
+        score += PREAPPROVAL_POINTS
+
+    if lead.email:
+        score += EMAIL_POINTS
+
+    if lead.phone:
+        score += PHONE_POINTS
+
+    if lead.debt_to_income:
+        if lead.debt_to_income < LOW_DTI:
+            score += LOW_DTI_POINTS
+        elif lead.debt_to_income > HIGH_DTI:
+            score += HIGH_DTI_POINTS
+
+    return min(max(score, 0), 100)
+
+
+def sentiment_for(score: int) -> str:
+    for minimum, sentiment in SENTIMENT_BANDS:
+        if score >= minimum:
+            return sentiment
+    return LOW_SENTIMENT
+
+
+def score_expression(columns):
+    """score_lead() as a SQL expression over a leads table's columns"""
+    c = columns
+    # NULL comparisons fall through to else_, matching the falsy checks in score_lead
+    credit = case(
+        *((c.credit_score >= minimum, points) for minimum, points in CREDIT_SCORE_BANDS),
+        (c.credit_score != 0, LOW_CREDIT_SCORE_POINTS),
+        else_=0,
+    )
+    preapproval = case((c.preapproval_amount > 0, PREAPPROVAL_POINTS), else_=0)
+    email = case((c.email != "", EMAIL_POINTS), else_=0)
+    phone = case((c.phone != "", PHONE_POINTS), else_=0)
+    dti = case(
+        (c.debt_to_income == 0, 0),
+        (c.debt_to_income < LOW_DTI, LOW_DTI_POINTS),
+        (c.debt_to_income > HIGH_DTI, HIGH_DTI_POINTS),
+        else_=0,
+    )
+    raw = BASE_SCORE + credit + preapproval + email + phone + dti
+    return case((raw > 100, 100), (raw < 0, 0), else_=raw)
+
+
+def sentiment_expression(score):
+    return case(*((score >= minimum, sentiment) for minimum, sentiment in SENTIMENT_BANDS), else_=LOW_SENTIMENT)
+
+
+class LeadScorer:
+    """Bulk and incremental rescoring of a leads table"""
+
+    def __init__(self, lead_model, interval_seconds: Optional[int] = None, chunk_size: Optional[int] = None):
+        self.table = lead_model.__table__
+        self.interval_seconds = interval_seconds or int(os.getenv("LEAD_RESCORE_INTERVAL_SECONDS", "900"))
+        self.chunk_size = chunk_size or int(os.getenv("LEAD_RESCORE_CHUNK_SIZE", "20000"))
+        # Start of the last successful run; None means the next run is a full pass
+        self.last_run_started_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self.counters = {"runs": 0, "full_runs": 0, "leads_rescored": 0}
+
+    def rescore(self, connection, *criteria, changed_since: Optional[datetime] = None) -> int:
+        """
+        Rescore the stale leads matching criteria with one UPDATE (caller commits).
+        changed_since limits it to leads updated since then. Returns leads written.
+        """
+        c = self.table.c
+        score = score_expression(c)
+        sentiment = sentiment_expression(score)
+        statement = self.table.update().where(
+            or_(c.ai_score.is_(None), c.ai_score != score, c.sentiment.is_(None), c.sentiment != sentiment),
+            *criteria,
+        )
+        if changed_since is not None:
+            statement = statement.where(c.updated_at >= changed_since)
+        # Setting updated_at to itself keeps the column's onupdate from firing
+        statement = statement.values(ai_score=score, sentiment=sentiment, updated_at=c.updated_at)
+        return connection.execute(statement).rowcount
+
+    def run(self, db, full: bool = False) -> Dict[str, Any]:
+        """
+        Rescore leads changed since the previous run through the updated_at
+        index. The first run (or full=True) rescores every lead, one id range
+        and commit at a time.
+        """
+        with self._lock:
+            started_at = datetime.now(timezone.utc)
+            since = None if full or self.last_run_started_at is None else self.last_run_started_at - RESCORE_OVERLAP
+            c = self.table.c
+
+            written = 0
+            if since is not None:
+                written = self.rescore(db.connection(), changed_since=since)
+                db.commit()
+            else:
+                low, high = db.execute(select(func.min(c.id), func.max(c.id))).one()
+                for start in range(low or 0, (high or -1) + 1, self.chunk_size):
+                    written += self.rescore(db.connection(), c.id >= start, c.id < start + self.chunk_size)
+                    db.commit()
+
+            self.last_run_started_at = started_at
+            self.counters["runs"] += 1
+            self.counters["full_runs"] += since is None
+            self.counters["leads_rescored"] += written
+            return {"rescored": written, "full": since is None,
+                    "seconds": round((datetime.now(timezone.utc) - started_at).total_seconds(), 3)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval_seconds,
+            "chunk_size": self.chunk_size,
+            "last_run_started_at": self.last_run_started_at.isoformat() if self.last_run_started_at else None,
+            **self.counters,
+        }
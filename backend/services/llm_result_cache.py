@@ -0,0 +1,219 @@
+"""
+LLM Result Cache
+Persistent cache for DRE classification/extraction results
+
+Reprocessing, forwarded threads and the reprocess script send the same email
+bodies through the LLM again. Results are cached in the database keyed by:
+
+    sha256(stage | model | prompt version | normalized input)
+
+- Normalization collapses whitespace, drops reply-quote markers and
+  RE:/FW: subject prefixes so trivially different copies share an entry
+- The prompt version is derived from the system prompt text, so editing a
+  prompt invalidates its entries automatically
+- Entries expire after a TTL; the table is bounded by evicting the least
+  recently hit rows
+- Hit/miss/write/eviction counters for Mission Control
+
+Configuration (env):
+    DRE_CACHE_ENABLED      - "false" disables lookups and writes (default true)
+    DRE_CACHE_TTL_DAYS     - entry lifetime (default 30)
+    DRE_CACHE_MAX_ENTRIES  - rows kept after pruning (default 50000)
+"""
+
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_QUOTE_MARKERS = re.compile(r"^(\s*>)+", re.MULTILINE)
+_SUBJECT_PREFIXES = re.compile(r"^\s*((re|fw|fwd)\s*:\s*)+", re.IGNORECASE)
+
+PRUNE_INTERVAL_SECONDS = 600
+
+
+def normalize_text(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    return _WHITESPACE.sub(" ", _QUOTE_MARKERS.sub("", value)).strip()
+
+
+def normalize_subject(value: Optional[str]) -> str:
+    return normalize_text(_SUBJECT_PREFIXES.sub("", value or ""))
+
+
+def prompt_version(system_prompt: str) -> str:
+    return hashlib.sha1(system_prompt.encode("utf-8")).hexdigest()[:12]
+
+
+class LLMResultCache:
+    """
+    Database-backed result cache.
+
+    entry_model is the ORM class for the cache table (cache_key, stage, model,
+    prompt_version, result, hit_count, created_at, last_hit_at, expires_at),
+    passed in so this module stays free of main.py imports.
+    """
+
+    def __init__(
+        self,
+        entry_model: Any,
+        ttl_seconds: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        enabled: Optional[bool] = None,
+    ):
+        self.entry_model = entry_model
+        self.ttl_seconds = ttl_seconds or int(os.getenv("DRE_CACHE_TTL_DAYS", "30")) * 86400
+        self.max_entries = max_entries or int(os.getenv("DRE_CACHE_MAX_ENTRIES", "50000"))
+        self.enabled = enabled if enabled is not None else os.getenv("DRE_CACHE_ENABLED", "true").lower() != "false"
+
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self.counters = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "bypassed": 0}
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def count_bypass(self, amount: int = 1):
+        self._count("bypassed", amount)
+
+    @staticmethod
+    def make_key(stage: str, model: str, version: str, *parts: str) -> str:
+        payload = "\x1f".join([stage, model or "", version, *parts])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def classification_key(self, model: str, system_prompt: str, content: str, subject: str) -> str:
+        return self.make_key("classify", model, prompt_version(system_prompt),
+                             normalize_subject(subject), normalize_text((content or "")[:1000]))
+
+    def extraction_key(self, model: str, system_prompt: str, content: str) -> str:
+        # The category is part of the extraction prompt, so it is covered by the version
+        return self.make_key("extract", model, prompt_version(system_prompt), normalize_text((content or "")[:2000]))
+
+    # ------------------------------------------------------------------
+    # Reads / writes
+    # ------------------------------------------------------------------
+
+    def get_many(self, db, keys: Iterable[str]) -> Dict[str, Any]:
+        """Cached results for the given keys (one SELECT + one hit-count UPDATE). Caller commits."""
+        keys = list(dict.fromkeys(k for k in keys if k))
+        if not self.enabled or not keys:
+            return {}
+
+        model = self.entry_model
+        now = datetime.now(timezone.utc)
+        rows = db.query(model.cache_key, model.result).filter(
+            model.cache_key.in_(keys),
+            model.expires_at > now
+        ).all()
+        found = {key: result for key, result in rows}
+
+        if found:
+            db.query(model).filter(model.cache_key.in_(list(found))).update({
+                model.hit_count: model.hit_count + 1,
+                model.last_hit_at: now,
+            }, synchronize_session=False)
+
+        self._count("hits", len(found))
+        self._count("misses", len(keys) - len(found))
+        return found
+
+    def get(self, db, key: str) -> Optional[Any]:
+        return self.get_many(db, [key]).get(key)
+
+    def put_many(self, db, entries: List[Dict[str, Any]]):
+        """
+        Store results; entries are dicts with key, stage, model, version, result.
+        Existing keys are refreshed in place. Caller commits.
+        """
+        if not self.enabled or not entries:
+            return
+
+        model = self.entry_model
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        by_key = {entry["key"]: entry for entry in entries}
+        existing = {
+            row.cache_key: row for row in db.query(model).filter(model.cache_key.in_(list(by_key))).all()
+        }
+
+        for key, entry in by_key.items():
+            row = existing.get(key)
+            if row is None:
+                db.add(model(
+                    cache_key=key,
+                    stage=entry["stage"],
+                    model=entry["model"],
+                    prompt_version=entry["version"],
+                    result=entry["result"],
+                    hit_count=0,
+                    created_at=now,
+                    last_hit_at=now,
+                    expires_at=expires_at,
+                ))
+            else:
+                row.result = entry["result"]
+                row.expires_at = expires_at
+                row.last_hit_at = now
+
+        self._count("writes", len(by_key))
+
+    def put(self, db, key: str, stage: str, model: str, version: str, result: Any):
+        self.put_many(db, [{"key": key, "stage": stage, "model": model, "version": version, "result": result}])
+
+    # ------------------------------------------------------------------
+    # Eviction
+    # ------------------------------------------------------------------
+
+    def prune(self, db) -> int:
+        """Delete expired rows, then the least recently hit rows above max_entries"""
+        model = self.entry_model
+        now = datetime.now(timezone.utc)
+        evicted = db.query(model).filter(model.expires_at <= now).delete(synchronize_session=False)
+
+        overflow = (db.query(func.count(model.id)).scalar() or 0) - self.max_entries
+        if overflow > 0:
+            cutoff_ids = [row_id for (row_id,) in db.query(model.id).order_by(
+                model.last_hit_at.asc(), model.id.asc()
+            ).limit(overflow).all()]
+            for i in range(0, len(cutoff_ids), 1000):
+                evicted += db.query(model).filter(model.id.in_(cutoff_ids[i:i + 1000])).delete(synchronize_session=False)
+
+        db.commit()
+        self._last_prune = time.monotonic()
+        if evicted:
+            self._count("evictions", evicted)
+            logger.info(f"LLM result cache: evicted {evicted} entries")
+        return evicted
+
+    def maybe_prune(self, db) -> int:
+        if not self.enabled or time.monotonic() - self._last_prune < PRUNE_INTERVAL_SECONDS:
+            return 0
+        return self.prune(db)
+
+    def stats(self, db=None) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = counters["hits"] + counters["misses"]
+        stats = {
+            "enabled": self.enabled,
+            "ttl_days": round(self.ttl_seconds / 86400, 2),
+            "max_entries": self.max_entries,
+            **counters,
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else None,
+        }
+        if db is not None:
+            model = self.entry_model
+            stats["entries"] = db.query(func.count(model.id)).scalar() or 0
+            stats["entries_by_stage"] = dict(db.query(model.stage, func.count(model.id)).group_by(model.stage).all())
+        return stats
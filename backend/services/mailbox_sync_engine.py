@@ -0,0 +1,524 @@
+"""
+Mailbox Sync Engine
+Bounded-parallel Microsoft 365 auto-sync for all connected mailboxes
+
+Features:
+- One task per due mailbox, capped by a configurable concurrency limit
+- Shared async HTTP client (httpx) with connection pooling for Graph calls
+- Separate database session per worker; DRE ingestion runs off the event loop
+- Tick deadline: mailboxes not finished inside the budget are deferred to the
+  next tick, so a run never overlaps the scheduler interval (a sync that a
+  manual request joined keeps running for that request)
+- Incremental sync via Graph delta queries: every page is followed and the
+  resulting deltaLink is stored on the OAuth token row as the next cursor
+- Batched duplicate check (one IN query per sync instead of one per message)
+- Per-user single flight: a manual sync joins the one already running for
+  that user (scheduled or manual) instead of pulling the mailbox again, and
+  repeat manual requests within M365_SYNC_MIN_INTERVAL_SECONDS reuse the
+  last result
+- notify(user_id, "sync_finished", payload) after every sync, for pushing
+  status to the user's open browser tabs
+- Per-run metrics (mailboxes synced, emails ingested, sync lag)
+
+Configuration (env):
+    M365_SYNC_CONCURRENCY        - max mailboxes synced in parallel (default 8)
+    M365_SYNC_INTERVAL_MINUTES   - scheduler interval (default 5)
+    M365_SYNC_INITIAL_DAYS       - history pulled on the first sync of a folder (default 7)
+    M365_SYNC_MAX_PAGES          - pages read per sync before resuming next tick (default 200)
+    M365_SYNC_MIN_INTERVAL_SECONDS - manual syncs within this long of the last one reuse its result (default 60)
+    MICROSOFT_GRAPH_BASE_URL     - Graph endpoint override (e.g. a local stub server for tests)
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+GRAPH_BASE_URL = os.getenv("MICROSOFT_GRAPH_BASE_URL", "https://graph.microsoft.com/v1.0")
+TOKEN_URL = "https://login.microsoftonline.com/common/oauth2/v2.0/token"
+
+
+def _aware(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+@dataclass
+class SyncRunMetrics:
+    """Outcome of one auto-sync tick"""
+    started_at: str
+    finished_at: Optional[str] = None
+    duration_seconds: float = 0.0
+    mailboxes_connected: int = 0
+    mailboxes_due: int = 0
+    users_synced: int = 0
+    users_failed: int = 0
+    users_deferred: int = 0
+    emails_fetched: int = 0
+    emails_new: int = 0
+    emails_ingested: int = 0
+    max_lag_seconds: float = 0.0
+    avg_lag_seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+
+class DeltaCursorExpired(Exception):
+    """Graph no longer accepts the stored delta cursor; a full resync is needed"""
+
+
+class MailboxSyncEngine:
+    """
+    Runs Microsoft 365 mailbox syncs concurrently.
+
+    Usage:
+        engine = MailboxSyncEngine(
+            session_factory=SessionLocal,
+            token_model=MicrosoftOAuthToken,
+            process_email=process_microsoft_email_to_dre,
+            decrypt_token=decrypt_token,
+            encrypt_token=encrypt_token,
+            filter_new_emails=filter_unprocessed_microsoft_emails,
+        )
+        metrics = await engine.run_tick()
+
+    process_email(email_data, user_id, db, deduplicated=True) is called for
+    messages that filter_new_emails(db, user_id, emails) reported as unseen.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable,
+        token_model: Any,
+        process_email: Callable,
+        decrypt_token: Callable[[str], str],
+        encrypt_token: Callable[[str], str],
+        filter_new_emails: Callable,
+        notify: Optional[Callable[[int, str, Dict[str, Any]], None]] = None,
+        max_concurrency: Optional[int] = None,
+        interval_seconds: Optional[int] = None,
+        page_size: int = 50,
+        graph_base_url: str = GRAPH_BASE_URL,
+        token_url: str = TOKEN_URL,
+    ):
+        self.session_factory = session_factory
+        self.token_model = token_model
+        self.process_email = process_email
+        self.decrypt_token = decrypt_token
+        self.encrypt_token = encrypt_token
+        self.filter_new_emails = filter_new_emails
+        self.notify = notify
+        self.max_concurrency = max_concurrency or int(os.getenv("M365_SYNC_CONCURRENCY", "8"))
+        self.interval_seconds = interval_seconds or int(os.getenv("M365_SYNC_INTERVAL_MINUTES", "5")) * 60
+        # Leave headroom so a tick always finishes before the next one is due
+        self.tick_budget_seconds = self.interval_seconds * 0.8
+        self.page_size = page_size
+        self.initial_days = int(os.getenv("M365_SYNC_INITIAL_DAYS", "7"))
+        self.max_pages = int(os.getenv("M365_SYNC_MAX_PAGES", "200"))
+        self.min_interval_seconds = float(os.getenv("M365_SYNC_MIN_INTERVAL_SECONDS", "60"))
+        self.graph_base_url = graph_base_url.rstrip("/")
+        self.token_url = token_url
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="mailbox-sync")
+        # Users with a sync in progress; ingestion threads outlive cancelled tasks
+        self._in_flight: Set[int] = set()
+        self._ingesting: Dict[int, Future] = {}
+        self._in_flight_lock = threading.Lock()
+        self._tick_lock = asyncio.Lock()
+        # Running sync per user, shared by every caller that asks for one
+        self._flights: Dict[int, asyncio.Task] = {}
+        # Manual requests waiting on each user's flight
+        self._waiters: Dict[int, int] = {}
+        # user_id -> (monotonic time, result) of the last successful sync
+        self._last_results: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+        self.flight_counters = {"started": 0, "joined": 0, "reused": 0}
+        self.history: Deque[SyncRunMetrics] = deque(maxlen=50)
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency * 2,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._executor.shutdown(wait=False)
+
+    async def refresh_token(self, oauth_record, db) -> bool:
+        """Refresh an expiring Microsoft access token (async)"""
+        client_id = os.getenv("MICROSOFT_CLIENT_ID")
+        client_secret = os.getenv("MICROSOFT_CLIENT_SECRET")
+        if not client_id or not client_secret:
+            logger.error("Microsoft OAuth credentials not configured")
+            return False
+
+        response = await self.client.post(self.token_url, data={
+            "client_id": client_id,
+            "client_secret": client_secret,
+            "refresh_token": self.decrypt_token(oauth_record.refresh_token),
+            "grant_type": "refresh_token",
+            "scope": "https://graph.microsoft.com/Mail.Read offline_access",
+        })
+        if response.status_code != 200:
+            logger.error(f"Failed to refresh Microsoft token for user {oauth_record.user_id}: {response.text[:200]}")
+            return False
+
+        token_data = response.json()
+        oauth_record.access_token = self.encrypt_token(token_data["access_token"])
+        oauth_record.refresh_token = self.encrypt_token(token_data["refresh_token"])
+        oauth_record.token_expires_at = datetime.now(timezone.utc) + timedelta(seconds=token_data["expires_in"])
+        oauth_record.updated_at = datetime.now(timezone.utc)
+        db.commit()
+        return True
+
+    async def ensure_fresh_token(self, oauth_record, db):
+        expiry = _aware(oauth_record.token_expires_at)
+        if expiry and expiry < datetime.now(timezone.utc) + timedelta(minutes=5):
+            if not await self.refresh_token(oauth_record, db):
+                raise RuntimeError("Failed to refresh token")
+
+    def initial_delta_url(self, folder: str) -> str:
+        since = (datetime.now(timezone.utc) - timedelta(days=self.initial_days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        query = httpx.QueryParams({
+            "$select": "id,subject,from,toRecipients,receivedDateTime,body",
+            "$filter": f"receivedDateTime ge {since}",
+        })
+        return f"{self.graph_base_url}/me/mailFolders/{folder}/messages/delta?{query}"
+
+    async def _read_delta(self, url: str, headers: Dict[str, str]) -> Tuple[List[Dict[str, Any]], str]:
+        """Follow @odata.nextLink pages until Graph hands back a deltaLink"""
+        messages: List[Dict[str, Any]] = []
+        for _ in range(self.max_pages):
+            response = await self.client.get(url, headers=headers)
+            if response.status_code == 410:
+                raise DeltaCursorExpired(response.text[:200])
+            if response.status_code != 200:
+                raise RuntimeError(f"Microsoft API error: {response.status_code} - {response.text[:200]}")
+
+            page = response.json()
+            # Deleted/moved-out messages come back as tombstones; nothing to ingest
+            messages.extend(m for m in page.get("value", []) if "@removed" not in m)
+
+            if page.get("@odata.deltaLink"):
+                return messages, page["@odata.deltaLink"]
+            url = page.get("@odata.nextLink")
+            if not url:
+                raise RuntimeError("Microsoft API error: delta response had neither nextLink nor deltaLink")
+
+        # Page cap reached: the nextLink is itself a valid cursor, so the next
+        # sync resumes from here instead of starting over
+        logger.warning(f"Delta sync stopped after {self.max_pages} pages; resuming next sync")
+        return messages, url
+
+    async def fetch_messages(self, oauth_record, db, page_size: Optional[int] = None) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Fetch every message added or changed since the stored delta cursor.
+
+        Returns (messages, cursor). The cursor is NOT persisted here: callers
+        save it once the messages are safely ingested, so a failed run re-reads
+        the same window rather than losing mail.
+        """
+        await self.ensure_fresh_token(oauth_record, db)
+
+        folder = oauth_record.sync_folder or "Inbox"
+        headers = {
+            "Authorization": f"Bearer {self.decrypt_token(oauth_record.access_token)}",
+            "Prefer": f"odata.maxpagesize={page_size or self.page_size}",
+        }
+
+        if oauth_record.mail_delta_link:
+            try:
+                return await self._read_delta(oauth_record.mail_delta_link, headers)
+            except DeltaCursorExpired as e:
+                logger.warning(f"Delta cursor expired for user {oauth_record.user_id}, resyncing: {e}")
+
+        return await self._read_delta(self.initial_delta_url(folder), headers)
+
+    # ------------------------------------------------------------------
+    # Ingestion (runs in a worker thread with its own session)
+    # ------------------------------------------------------------------
+
+    def _ingest_blocking(self, user_id: int, emails: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """(new, ingested) for a batch of fetched messages"""
+        async def ingest_all(db, new_emails) -> int:
+            ingested = 0
+            for email_data in new_emails:
+                result = await self.process_email(email_data, user_id, db, deduplicated=True)
+                if result.get("status") == "success":
+                    ingested += 1
+            return ingested
+
+        db = self.session_factory()
+        try:
+            new_emails = self.filter_new_emails(db, user_id, emails)
+            if not new_emails:
+                return 0, 0
+            # process_email does blocking DB and LLM work; give it a private loop
+            return len(new_emails), asyncio.run(ingest_all(db, new_emails))
+        finally:
+            db.close()
+
+    async def ingest(self, user_id: int, emails: List[Dict[str, Any]]) -> Tuple[int, int]:
+        future = self._executor.submit(self._ingest_blocking, user_id, emails)
+        with self._in_flight_lock:
+            self._ingesting[user_id] = future
+
+        def release(_):
+            # Only release the user once the thread is done, even if the tick gave up waiting
+            with self._in_flight_lock:
+                self._ingesting.pop(user_id, None)
+                self._in_flight.discard(user_id)
+
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    # ------------------------------------------------------------------
+    # Per-user sync
+    # ------------------------------------------------------------------
+
+    async def sync_user(self, token_id: int) -> Dict[str, Any]:
+        """Sync one mailbox end to end with a dedicated session"""
+        db = self.session_factory()
+        try:
+            oauth_record = db.query(self.token_model).filter(self.token_model.id == token_id).first()
+            if not oauth_record or not oauth_record.sync_enabled:
+                return {"status": "skipped"}
+
+            user_id = oauth_record.user_id
+            last_sync = _aware(oauth_record.last_sync_at) or _aware(oauth_record.created_at)
+            lag = (datetime.now(timezone.utc) - last_sync).total_seconds() if last_sync else 0.0
+
+            emails, cursor = await self.fetch_messages(oauth_record, db)
+            new, ingested = await self.ingest(user_id, emails) if emails else (0, 0)
+
+            # Advance the cursor only after ingestion finished
+            oauth_record.mail_delta_link = cursor
+            oauth_record.last_sync_at = datetime.now(timezone.utc)
+            db.commit()
+
+            logger.info(f"✅ Synced {ingested}/{new} new emails ({len(emails)} changed) for user {user_id}")
+            return {
+                "status": "success", "user_id": user_id, "fetched": len(emails),
+                "new": new, "ingested": ingested, "lag": lag,
+            }
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _due_tokens(self) -> Tuple[int, List[Any]]:
+        """(connected count, due mailboxes ordered by most lagged first)"""
+        db = self.session_factory()
+        try:
+            rows = db.query(
+                self.token_model.id,
+                self.token_model.user_id,
+                self.token_model.last_sync_at,
+                self.token_model.sync_frequency_minutes,
+            ).filter(self.token_model.sync_enabled == True).all()
+        finally:
+            db.close()
+
+        now = datetime.now(timezone.utc)
+        due = [
+            row for row in rows
+            if not row.last_sync_at
+            or (now - _aware(row.last_sync_at)).total_seconds() / 60 >= (row.sync_frequency_minutes or 15)
+        ]
+        due.sort(key=lambda row: _aware(row.last_sync_at) or datetime.min.replace(tzinfo=timezone.utc))
+        return len(rows), due
+
+    async def _guarded_sync(self, row, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        async with semaphore:
+            task, _ = self._flight(row.id, row.user_id)
+            try:
+                # Shielded so the tick budget cannot cancel a sync a manual request joined
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not self._waiters.get(row.user_id):
+                    task.cancel()
+                raise
+
+    async def sync_user_exclusive(self, token_id: int, user_id: int) -> Dict[str, Any]:
+        """sync_user, unless a sync for this user is already running"""
+        with self._in_flight_lock:
+            if user_id in self._in_flight:
+                return {"status": "skipped", "reason": "sync_in_progress"}
+            self._in_flight.add(user_id)
+        try:
+            return await self.sync_user(token_id)
+        finally:
+            with self._in_flight_lock:
+                if user_id not in self._ingesting:
+                    self._in_flight.discard(user_id)
+
+    # ------------------------------------------------------------------
+    # Single flight
+    # ------------------------------------------------------------------
+
+    def _flight(self, token_id: int, user_id: int) -> Tuple[asyncio.Task, bool]:
+        """(running sync for a user, joined): starts one if there is none"""
+        task = self._flights.get(user_id)
+        if task is not None and not task.done():
+            self.flight_counters["joined"] += 1
+            return task, True
+
+        task = asyncio.create_task(self._run_flight(token_id, user_id))
+        self._flights[user_id] = task
+        self.flight_counters["started"] += 1
+
+        def finished(done: asyncio.Task):
+            if self._flights.get(user_id) is done:
+                del self._flights[user_id]
+
+        task.add_done_callback(finished)
+        return task, False
+
+    async def _run_flight(self, token_id: int, user_id: int) -> Dict[str, Any]:
+        try:
+            result = await self.sync_user_exclusive(token_id, user_id)
+        except Exception as e:
+            self._notify(user_id, {"status": "error", "error": str(e)[:200]})
+            raise
+
+        if result.get("status") == "success":
+            self._last_results[user_id] = (time.monotonic(), result)
+            self._notify(user_id, {key: result[key] for key in ("status", "fetched", "new", "ingested")})
+        return result
+
+    def _notify(self, user_id: int, payload: Dict[str, Any]):
+        if self.notify is None:
+            return
+        try:
+            self.notify(user_id, "sync_finished", {**payload, "finished_at": datetime.now(timezone.utc).isoformat()})
+        except Exception as e:
+            logger.error(f"Sync notification failed for user {user_id}: {e}")
+
+    async def sync_user_shared(self, token_id: int, user_id: int) -> Dict[str, Any]:
+        """
+        Sync a mailbox, joining the sync already running for the user if any
+
+        The result carries "shared": True when another caller started the
+        sync. The tick budget only cancels a scheduled sync nobody else is
+        waiting for; if the joined sync was cancelled anyway, returns skipped
+        with reason "deferred".
+        """
+        task, shared = self._flight(token_id, user_id)
+        self._waiters[user_id] = self._waiters.get(user_id, 0) + 1
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                return {"status": "skipped", "reason": "deferred"}
+            raise
+        finally:
+            self._waiters[user_id] -= 1
+            if not self._waiters[user_id]:
+                del self._waiters[user_id]
+        return {**result, "shared": True} if shared else result
+
+    async def request_sync(self, token_id: int, user_id: int) -> Dict[str, Any]:
+        """
+        Manual sync: reuse a result younger than min_interval_seconds,
+        otherwise sync_user_shared. Reused results carry "cached": True.
+        """
+        last = self._last_results.get(user_id)
+        if last and time.monotonic() - last[0] < self.min_interval_seconds and user_id not in self._flights:
+            self.flight_counters["reused"] += 1
+            return {**last[1], "cached": True, "synced_seconds_ago": round(time.monotonic() - last[0], 1)}
+        return await self.sync_user_shared(token_id, user_id)
+
+    # ------------------------------------------------------------------
+    # Tick
+    # ------------------------------------------------------------------
+
+    async def run_tick(self) -> Optional[SyncRunMetrics]:
+        """Sync every due mailbox, bounded by concurrency and the tick budget"""
+        if self._tick_lock.locked():
+            logger.warning("🔄 Auto-sync: previous tick still running, skipping")
+            return None
+
+        async with self._tick_lock:
+            started = time.monotonic()
+            metrics = SyncRunMetrics(started_at=datetime.now(timezone.utc).isoformat())
+
+            connected, due = await asyncio.get_running_loop().run_in_executor(self._executor, self._due_tokens)
+            metrics.mailboxes_connected = connected
+            metrics.mailboxes_due = len(due)
+            logger.info(f"🔄 Auto-sync: {len(due)}/{connected} mailboxes due (concurrency {self.max_concurrency})")
+
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            tasks = {asyncio.create_task(self._guarded_sync(row, semaphore)): row for row in due}
+            done, pending = (await asyncio.wait(tasks, timeout=self.tick_budget_seconds)) if tasks else (set(), set())
+
+            for task in pending:
+                task.cancel()
+            metrics.users_deferred = len(pending)
+
+            lags = []
+            for task in done:
+                row = tasks[task]
+                try:
+                    result = task.result()
+                except Exception as e:
+                    metrics.users_failed += 1
+                    metrics.errors.append(f"user {row.user_id}: {str(e)[:200]}")
+                    logger.error(f"Error auto-syncing for user {row.user_id}: {e}")
+                    continue
+                if result.get("status") == "success":
+                    metrics.users_synced += 1
+                    metrics.emails_fetched += result["fetched"]
+                    metrics.emails_new += result["new"]
+                    metrics.emails_ingested += result["ingested"]
+                    lags.append(result["lag"])
+
+            if lags:
+                metrics.max_lag_seconds = round(max(lags), 1)
+                metrics.avg_lag_seconds = round(sum(lags) / len(lags), 1)
+            metrics.duration_seconds = round(time.monotonic() - started, 3)
+            metrics.finished_at = datetime.now(timezone.utc).isoformat()
+            self.history.append(metrics)
+
+            if pending:
+                logger.warning(f"⏱️ Auto-sync: {len(pending)} mailboxes deferred to next tick (budget {self.tick_budget_seconds:.0f}s)")
+            logger.info(
+                f"✅ Auto-sync tick: {metrics.users_synced} synced, {metrics.users_failed} failed, "
+                f"{metrics.emails_ingested} emails ingested in {metrics.duration_seconds}s"
+            )
+            return metrics
+
+    def get_metrics(self, limit: int = 10) -> Dict[str, Any]:
+        runs = list(self.history)[-limit:]
+        return {
+            "max_concurrency": self.max_concurrency,
+            "interval_seconds": self.interval_seconds,
+            "tick_budget_seconds": self.tick_budget_seconds,
+            "in_flight_users": len(self._in_flight),
+            "single_flight": dict(self.flight_counters),
+            "last_run": asdict(runs[-1]) if runs else None,
+            "recent_runs": [asdict(run) for run in reversed(runs)],
+        }
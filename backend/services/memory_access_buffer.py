@@ -0,0 +1,93 @@
+"""
+Memory Access Buffer
+Coalesces ConversationMemory access tracking into periodic bulk updates
+
+Smart chat used to load and commit each retrieved memory to bump
+access_count / last_accessed_at before the model call, i.e. up to top_k
+SELECT + UPDATE + COMMIT round trips on the critical path. Retrievals now
+only record the vector IDs here; a background job writes the accumulated
+counts with one executemany UPDATE.
+
+Configuration (env):
+    MEMORY_ACCESS_FLUSH_SECONDS   - flush interval (default 30)
+"""
+
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, func
+
+
+class MemoryAccessBuffer:
+    """Access counts and latest access time per memory (by vector ID), written in batches"""
+
+    def __init__(self, flush_interval_seconds: Optional[int] = None):
+        self.flush_interval_seconds = flush_interval_seconds or int(os.getenv("MEMORY_ACCESS_FLUSH_SECONDS", "30"))
+        self._pending: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+        self.counters = {"accesses": 0, "flushes": 0, "rows_written": 0, "accesses_written": 0}
+
+    def record(self, pinecone_ids: Iterable[str], accessed_at: Optional[datetime] = None):
+        accessed_at = accessed_at or datetime.now(timezone.utc)
+        with self._lock:
+            for pinecone_id in pinecone_ids:
+                entry = self._pending.get(pinecone_id)
+                if entry is None:
+                    self._pending[pinecone_id] = [1, accessed_at]
+                else:
+                    entry[0] += 1
+                    entry[1] = max(entry[1], accessed_at)
+                self.counters["accesses"] += 1
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self, db, memory_model) -> int:
+        """Write buffered accesses with one executemany UPDATE; returns memories written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        table = memory_model.__table__
+        statement = table.update().where(table.c.pinecone_id == bindparam("memory_id")).values(
+            access_count=func.coalesce(table.c.access_count, 0) + bindparam("accesses"),
+            last_accessed_at=bindparam("accessed_at"),
+        )
+        try:
+            db.execute(statement, [
+                {"memory_id": pinecone_id, "accesses": count, "accessed_at": accessed_at}
+                for pinecone_id, (count, accessed_at) in pending.items()
+            ])
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Merge the counts back in with anything recorded meanwhile
+            with self._lock:
+                for pinecone_id, (count, accessed_at) in pending.items():
+                    entry = self._pending.setdefault(pinecone_id, [0, accessed_at])
+                    entry[0] += count
+                    entry[1] = max(entry[1], accessed_at)
+            raise
+
+        accesses = sum(count for count, _ in pending.values())
+        with self._lock:
+            self.counters["flushes"] += 1
+            self.counters["rows_written"] += len(pending)
+            self.counters["accesses_written"] += accesses
+        return len(pending)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+            pending = len(self._pending)
+        return {
+            "flush_interval_seconds": self.flush_interval_seconds,
+            "pending": pending,
+            **counters,
+            # Each access used to be its own SELECT + UPDATE + COMMIT
+            "writes_saved": counters["accesses_written"] - counters["flushes"],
+        }
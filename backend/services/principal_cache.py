@@ -0,0 +1,161 @@
+"""
+Principal Cache
+Short-lived cache of authenticated principals for the auth dependencies
+
+get_current_user / get_current_user_flexible used to look up the User row on
+every request, and API-key requests also wrote ApiKey.last_used_at and
+committed before the handler ran. This module provides:
+
+- PrincipalCache: JWT subject / API key -> detached User snapshot (plus the
+  key id), with a short TTL. Entries are dropped when the user or key is
+  written, so revocation and role changes take effect on the next request
+  in this process (other workers pick them up within the TTL)
+- ApiKeyUsageBuffer: coalesces last_used_at per key and writes them in one
+  batched UPDATE from a background job, keeping the auth path read-only
+
+API keys are cached under a SHA-256 digest, never the raw secret.
+
+Configuration (env):
+    AUTH_CACHE_TTL_SECONDS           - principal lifetime (default 30, 0 disables)
+    AUTH_CACHE_MAX_ENTRIES           - cached principals per process (default 10000)
+    API_KEY_USAGE_FLUSH_SECONDS      - last_used_at flush interval (default 60)
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Hashable, Optional
+
+from sqlalchemy import bindparam
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedPrincipal:
+    user: Any
+    user_id: int
+    api_key_id: Optional[int]
+    expires_at: float
+
+
+class PrincipalCache:
+    """TTL + LRU cache of detached User snapshots keyed by credential"""
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+        self.max_entries = max_entries or int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+        self._entries: "OrderedDict[Hashable, CachedPrincipal]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    @staticmethod
+    def jwt_key(subject: str) -> Hashable:
+        return ("jwt", subject)
+
+    @staticmethod
+    def api_key_key(api_key: str) -> Hashable:
+        return ("api_key", hashlib.sha256(api_key.encode("utf-8")).hexdigest())
+
+    def get(self, key: Hashable) -> Optional[CachedPrincipal]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry
+            if entry is not None:
+                del self._entries[key]
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, key: Hashable, user: Any, api_key_id: Optional[int] = None) -> CachedPrincipal:
+        entry = CachedPrincipal(user=user, user_id=user.id, api_key_id=api_key_id,
+                                expires_at=time.monotonic() + self.ttl_seconds)
+        if self.enabled:
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def _drop(self, predicate) -> int:
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if predicate(entry)]
+            for key in stale:
+                del self._entries[key]
+            self.counters["invalidations"] += len(stale)
+        return len(stale)
+
+    def invalidate_user(self, user_id: int) -> int:
+        return self._drop(lambda entry: entry.user_id == user_id)
+
+    def invalidate_api_key(self, api_key_id: int) -> int:
+        return self._drop(lambda entry: entry.api_key_id == api_key_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+            size = len(self._entries)
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "entries": size,
+            **counters,
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else None,
+        }
+
+
+class ApiKeyUsageBuffer:
+    """Latest last_used_at per API key, written in batches"""
+
+    def __init__(self, flush_interval_seconds: Optional[int] = None):
+        self.flush_interval_seconds = flush_interval_seconds or int(os.getenv("API_KEY_USAGE_FLUSH_SECONDS", "60"))
+        self._pending: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+
+    def record(self, api_key_id: int, used_at: Optional[datetime] = None):
+        with self._lock:
+            self._pending[api_key_id] = used_at or datetime.now(timezone.utc)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self, db, api_key_model) -> int:
+        """Write buffered timestamps with one executemany UPDATE; returns keys written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        table = api_key_model.__table__
+        statement = table.update().where(table.c.id == bindparam("key_id")).values(last_used_at=bindparam("used_at"))
+        try:
+            db.execute(statement, [{"key_id": key_id, "used_at": used_at} for key_id, used_at in pending.items()])
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put the timestamps back unless a newer use was recorded meanwhile
+            with self._lock:
+                for key_id, used_at in pending.items():
+                    self._pending.setdefault(key_id, used_at)
+            raise
+        return len(pending)
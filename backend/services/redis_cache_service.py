@@ -20,7 +20,7 @@ Date: 2025-11-15
 
 import redis
 from redis.cluster import RedisCluster
-from typing import Optional, Any, Dict, List
+from typing import Optional, Any, Dict, List, Tuple
 import json
 import os
 from datetime import datetime, timedelta
@@ -28,6 +28,28 @@ from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 
+# KEYS: (previous bucket, current bucket) per limit; ARGV: now, then (window, limit) per limit
+SLIDING_WINDOW_LUA = """
+local now = tonumber(ARGV[1])
+local n = #KEYS / 2
+for i = 1, n do
+    local window = tonumber(ARGV[2 * i])
+    local limit = tonumber(ARGV[2 * i + 1])
+    local previous = tonumber(redis.call('GET', KEYS[2 * i - 1]) or '0')
+    local current = tonumber(redis.call('GET', KEYS[2 * i]) or '0')
+    local weight = 1 - (now % window) / window
+    if previous * weight + current + 1 > limit then
+        return {i, previous, current}
+    end
+end
+for i = 1, n do
+    redis.call('INCR', KEYS[2 * i])
+    redis.call('EXPIRE', KEYS[2 * i], 2 * tonumber(ARGV[2 * i]))
+end
+return {0, 0, 0}
+"""
+
+
 class RedisCacheService:
     """
     Redis caching service optimized for 10,000 users
@@ -86,6 +108,8 @@ class RedisCacheService:
         self.employee_info_ttl = 300  # 5 minutes for employee info
         self.template_ttl = 3600  # 1 hour for templates (rarely change)
 
+        self._sliding_window_script = None
+
         print(f"✅ Redis cache initialized ({'cluster' if self.cluster_mode else 'standalone'} mode)")
 
     def _init_standalone_client(self) -> redis.Redis:
@@ -499,6 +523,43 @@ class RedisCacheService:
             print(f"❌ Redis error: {e}")
             return False
 
+    # ============================================================================
+    # RATE LIMIT COUNTERS (SLIDING WINDOW)
+    # ============================================================================
+
+    def sliding_window_hit(
+        self,
+        key: str,
+        limits: List[Tuple[int, int]],
+        now: float
+    ) -> Tuple[int, int, int]:
+        """
+        Atomically check and count one request against sliding-window limits
+
+        Args:
+            key: Client key (e.g. "<route group>:<ip>")
+            limits: (max requests, window seconds) pairs
+            now: Current unix time
+
+        Returns:
+            (0, 0, 0) if allowed and counted, otherwise
+            (1-based index of the exceeded limit, previous bucket count, current bucket count)
+        """
+
+        if self._sliding_window_script is None:
+            self._sliding_window_script = self.client.register_script(SLIDING_WINDOW_LUA)
+
+        # Hash tag keeps a client's buckets in one cluster slot
+        keys, args = [], [now]
+        for max_requests, window in limits:
+            bucket = int(now // window)
+            keys.append(f"rl:{{{key}}}:{window}:{bucket - 1}")
+            keys.append(f"rl:{{{key}}}:{window}:{bucket}")
+            args.extend([window, max_requests])
+
+        exceeded, previous, current = self._sliding_window_script(keys=keys, args=args)
+        return int(exceeded), int(previous), int(current)
+
     # ============================================================================
     # STATISTICS & MONITORING
     # ============================================================================
@@ -0,0 +1,96 @@
+"""
+User Notification Hub
+Per-user push channel behind GET /api/v1/notifications/stream (server-sent events)
+
+Browser tabs used to poll for changes: the ReconciliationCenter triggered a
+mailbox sync on load and every 5 minutes, and the app shell re-read the task
+list every 2 minutes. Instead, each open stream subscribes here and the
+server publishes when something the user sees has changed:
+
+    sync_finished          - a mailbox sync for the user completed (or failed)
+    reconciliation_items   - new extracted items are waiting for review
+    task_counts_changed    - the user's tasks were created, updated or deleted
+
+publish() is thread-safe (syncs ingest and DRE extraction commit from worker
+threads); events are handed to each subscriber's event loop. Queues are
+bounded, and a slow subscriber loses its oldest events rather than growing
+without limit.
+
+The hub is in-process: with several web workers, a stream only receives
+events published by the worker that serves it.
+
+Configuration (env):
+    NOTIFICATION_QUEUE_SIZE          - events buffered per open stream (default 100)
+    NOTIFICATION_HEARTBEAT_SECONDS   - keep-alive comment interval on idle streams (default 25)
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+Notification = Tuple[str, Dict[str, Any]]
+
+
+class UserNotificationHub:
+    """Fan-out of (event, data) notifications to each user's open streams"""
+
+    def __init__(self, queue_size: int = None, heartbeat_seconds: float = None):
+        self.queue_size = queue_size or int(os.getenv("NOTIFICATION_QUEUE_SIZE", "100"))
+        self.heartbeat_seconds = heartbeat_seconds or float(os.getenv("NOTIFICATION_HEARTBEAT_SECONDS", "25"))
+        self._subscribers: Dict[int, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self.counters = {"published": 0, "delivered": 0, "dropped": 0}
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        """Queue of notifications for one open stream; call unsubscribe when it closes"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[user_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if not subscribers:
+                return
+            subscribers.difference_update({entry for entry in subscribers if entry[1] is queue})
+            if not subscribers:
+                del self._subscribers[user_id]
+
+    def publish(self, user_id: int, event: str, data: Dict[str, Any] = None):
+        """Send a notification to every open stream of a user (any thread)"""
+        with self._lock:
+            targets = list(self._subscribers.get(user_id, ()))
+            self.counters["published"] += 1
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, (event, data or {}))
+            except RuntimeError:
+                # The subscriber's loop has closed; it unsubscribes on its way out
+                pass
+
+    def _put(self, queue: asyncio.Queue, notification: Notification):
+        if queue.full():
+            queue.get_nowait()
+            with self._lock:
+                self.counters["dropped"] += 1
+        queue.put_nowait(notification)
+        with self._lock:
+            self.counters["delivered"] += 1
+
+    def subscriber_count(self, user_id: int) -> int:
+        with self._lock:
+            return len(self._subscribers.get(user_id, ()))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "users": len(self._subscribers),
+                "streams": sum(len(s) for s in self._subscribers.values()),
+                **self.counters,
+            }
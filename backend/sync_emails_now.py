@@ -5,6 +5,7 @@ Fetches and processes emails through the DRE
 import os
 import sys
 import asyncio
+from datetime import datetime, timezone
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
@@ -63,6 +64,9 @@ async def sync_emails():
 
         if len(emails) == 0:
             print("   No new emails to process")
+            oauth.mail_delta_link = result.get("delta_link")
+            oauth.last_sync_at = datetime.now(timezone.utc)
+            db.commit()
             db.close()
             return True
 
@@ -80,7 +84,7 @@ async def sync_emails():
             print(f"   From: {sender}")
 
             # Process through DRE
-            process_result = await process_microsoft_email_to_dre(email_data, user.id, db)
+            process_result = await process_microsoft_email_to_dre(email_data, user.id, db, deduplicated=True)
 
             if process_result.get("status") == "success":
                 print(f"   ✅ Processed successfully")
@@ -88,6 +92,11 @@ async def sync_emails():
             else:
                 print(f"   ⚠️  Processing failed: {process_result.get('error', 'Unknown error')}")
 
+        # Advance the delta cursor now that the batch is ingested
+        oauth.mail_delta_link = result.get("delta_link")
+        oauth.last_sync_at = datetime.now(timezone.utc)
+        db.commit()
+
         # Summary
         print("\n" + "=" * 60)
         print("📊 SYNC SUMMARY")
@@ -0,0 +1,162 @@
+"""
+Test A/B Result Aggregates
+Checks the running ab_result_aggregates rows:
+- record_result keeps count, sum, sum of squares, min and max per variant and metric
+- analysis and summaries read the aggregates, not ab_results
+- the rebuild reproduces the aggregates for results recorded without them
+- on installs without the aggregates table, results are still recorded and
+  the startup check creates the table and folds them in
+- the first aggregate row for a variant and metric includes older results
+
+Run with: python backend/test_ab_result_aggregates.py
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_ab_result_aggregates.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+if os.path.exists(DB_PATH):
+    os.remove(DB_PATH)
+
+import numpy as np
+from sqlalchemy import Column, Integer, Table, event, func, inspect
+
+from database import Base, engine, SessionLocal
+
+# ab_testing_models reference users.id, which lives in main's metadata
+if "users" not in Base.metadata.tables:
+    Table("users", Base.metadata, Column("id", Integer, primary_key=True))
+
+from ab_testing_models import ExperimentResult, ExperimentResultAggregate, ExperimentType
+from ab_testing.assignment_cache import ExperimentCache
+from ab_testing.experiment_service import ExperimentService
+from ab_testing.result_aggregates import ensure_result_aggregates, rebuild_result_aggregates, stale_aggregate_experiments
+from ab_testing.statistical_analysis import StatisticalAnalyzer
+
+USERS = 400
+VARIANTS = [
+    {"name": "Control", "is_control": True, "traffic_allocation": 50.0, "config": {"prompt": "v1"}},
+    {"name": "Treatment", "traffic_allocation": 50.0, "config": {"prompt": "v2"}},
+]
+
+
+def aggregates(db, experiment_id):
+    return {
+        (row.variant_id, row.metric_name): (row.result_count, row.value_sum, row.value_sum_sq, row.value_min, row.value_max)
+        for row in db.query(ExperimentResultAggregate).filter(ExperimentResultAggregate.experiment_id == experiment_id)
+    }
+
+
+async def test_ab_result_aggregates():
+    print("=" * 80)
+    print("A/B RESULT AGGREGATES TEST")
+    print("=" * 80)
+
+    Base.metadata.create_all(engine)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(" ".join(statement.split()))
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    db = SessionLocal()
+    service = ExperimentService(db, ExperimentCache(ttl_seconds=60))
+    try:
+        experiment = service.create_experiment("Prompt test", "Two prompts", ExperimentType.PROMPT, "resolution_rate", VARIANTS)
+        service.start_experiment(experiment.id)
+
+        print(f"\n1️⃣  Recording results for {USERS} users...")
+        rng = np.random.default_rng(5)
+        values = {}
+        for user_id in range(1, USERS + 1):
+            variant_id = service.get_variant_for_user("Prompt test", user_id=user_id)["variant_id"]
+            for metric, value in (("resolution_rate", float(rng.random() < 0.6)), ("satisfaction", float(rng.integers(1, 6)))):
+                service.record_result("Prompt test", metric, value, user_id=user_id)
+                values.setdefault((variant_id, metric), []).append(value)
+
+        rows = aggregates(db, experiment.id)
+        check(f"{len(rows)} aggregate rows (variant x metric)", len(rows) == 4)
+        check("aggregates match the recorded values", all(
+            rows[key][0] == len(v) and np.isclose(rows[key][1], sum(v)) and np.isclose(rows[key][2], sum(x * x for x in v))
+            and rows[key][3] == min(v) and rows[key][4] == max(v)
+            for key, v in values.items()
+        ))
+
+        event.listen(engine, "before_cursor_execute", record)
+        statements.clear()
+        service.record_result("Prompt test", "satisfaction", 5.0, user_id=1)
+        writes = [s.split()[0] for s in statements if s.split()[0] in ("INSERT", "UPDATE", "DELETE")]
+        check(f"one result costs {writes}", sorted(writes) == ["INSERT", "UPDATE"])
+
+        print("\n2️⃣  Analysis reads aggregates...")
+        statements.clear()
+        analyzer = StatisticalAnalyzer(db)
+        insight = analyzer.analyze_experiment(experiment.id)
+        summary = analyzer.get_experiment_summary(experiment.id)
+        scans = [s for s in statements if "FROM ab_results" in s]
+        check(f"analysis + summary scanned ab_results {len(scans)} times", insight is not None and not scans)
+        check(f"summary sample size {summary['current_sample_size']}", summary["current_sample_size"] == USERS)
+
+        print("\n3️⃣  Rebuild...")
+        expected = aggregates(db, experiment.id)
+        db.query(ExperimentResultAggregate).delete()
+        db.commit()
+        fallback = StatisticalAnalyzer(db).analyze_experiment(experiment.id)
+        check("analysis falls back to ab_results without aggregates", fallback is not None and fallback.current_sample_size == USERS)
+        result = rebuild_result_aggregates(db, experiment.id)
+        check(f"rebuild wrote {result['rows']} rows from {result['results']} results",
+              result == {"experiments": 1, "rows": 4, "results": USERS * 2 + 1})
+        rebuilt = aggregates(db, experiment.id)
+        check("rebuilt aggregates match the incremental ones", rebuilt.keys() == expected.keys() and all(
+            np.allclose(rebuilt[key], expected[key]) for key in expected))
+        check("rebuild is idempotent", rebuild_result_aggregates(db) == result and aggregates(db, experiment.id) == rebuilt)
+        check("raw results untouched", db.query(ExperimentResult).count() == USERS * 2 + 1)
+
+        print("\n4️⃣  Installs without the aggregates table...")
+        ExperimentResultAggregate.__table__.drop(engine)
+        recorded = service.record_result("Prompt test", "satisfaction", 4.0, user_id=2)
+        check("result recorded without the aggregates table",
+              recorded and db.query(ExperimentResult).count() == USERS * 2 + 2)
+        check("startup check rebuilds the experiment", ensure_result_aggregates(db) == [experiment.id]
+              and inspect(engine).has_table(ExperimentResultAggregate.__tablename__))
+        check("aggregates count every result",
+              sum(row[0] for row in aggregates(db, experiment.id).values()) == USERS * 2 + 2)
+        check("second startup check has nothing to do", ensure_result_aggregates(db) == [])
+
+        db.query(ExperimentResultAggregate).filter(ExperimentResultAggregate.metric_name == "satisfaction").delete()
+        db.commit()
+        check("experiment with uncounted results is stale", stale_aggregate_experiments(db) == [experiment.id])
+        service.record_result("Prompt test", "satisfaction", 3.0, user_id=3)
+        raw = {
+            (variant_id, metric): count for variant_id, metric, count in
+            db.query(ExperimentResult.variant_id, ExperimentResult.metric_name, func.count())
+            .group_by(ExperimentResult.variant_id, ExperimentResult.metric_name)
+        }
+        check("first new aggregate rows fold in the older results",
+              {key: row[0] for key, row in aggregates(db, experiment.id).items()} == raw)
+        check("nothing left stale", stale_aggregate_experiments(db) == [])
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        db.close()
+        engine.dispose()
+        os.remove(DB_PATH)
+
+    print("\n" + "=" * 80)
+    print("✅ All A/B result aggregate checks passed" if passed else "❌ Some A/B result aggregate checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_ab_result_aggregates())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,142 @@
+"""
+Test A/B Statistics
+Checks the StatisticalAnalyzer engine:
+- Student-t tail probabilities and quantiles match closed forms and tables
+- per-variant stats come from SQL aggregates and match NumPy on the raw values
+- every treatment is compared with the is_control variant (Welch, Holm-adjusted)
+- analysis memory does not grow with the number of results
+
+Run with: python backend/test_ab_statistics.py
+"""
+
+import os
+import sys
+import math
+import asyncio
+import tempfile
+import tracemalloc
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_ab_statistics.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+if os.path.exists(DB_PATH):
+    os.remove(DB_PATH)
+
+import numpy as np
+from sqlalchemy import Column, Integer, Table
+
+from database import Base, engine, SessionLocal
+
+# ab_testing_models reference users.id, which lives in main's metadata
+if "users" not in Base.metadata.tables:
+    Table("users", Base.metadata, Column("id", Integer, primary_key=True))
+
+from ab_testing_models import Experiment, ExperimentVariant, ExperimentResult, ExperimentStatus, ExperimentType
+from ab_testing.statistical_analysis import StatisticalAnalyzer, student_t_sf, student_t_ppf
+
+RESULTS_PER_VARIANT = 40000
+METRIC = "resolution_rate"
+
+
+async def test_ab_statistics():
+    print("=" * 80)
+    print("A/B STATISTICS TEST")
+    print("=" * 80)
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    print("\n1️⃣  Student-t distribution...")
+    t = np.array([0.25, 1.0, 2.0, 5.0, 40.0])
+    check("sf matches the Cauchy closed form (df=1)", np.allclose(student_t_sf(t, 1), 0.5 - np.arctan(t) / math.pi, atol=1e-14))
+    check("sf matches the closed form for df=2", np.allclose(student_t_sf(t, 2), 0.5 * (1 - t / np.sqrt(t * t + 2)), atol=1e-14))
+    check("sf is symmetric", np.allclose(student_t_sf(-t, 7) + student_t_sf(t, 7), 1.0))
+    table = {1: 12.706205, 10: 2.228139, 30: 2.042272, 1000: 1.962339, 10 ** 7: 1.959964}
+    quantiles = student_t_ppf(0.975, list(table))
+    check(f"97.5% quantiles match tables {np.round(quantiles, 4).tolist()}", np.allclose(quantiles, list(table.values()), atol=1e-6))
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        experiment = Experiment(name="Prompt test", experiment_type=ExperimentType.PROMPT, status=ExperimentStatus.RUNNING,
+                                primary_metric=METRIC, min_sample_size=1000, confidence_level=0.95)
+        db.add(experiment)
+        db.commit()
+        # Control is deliberately not the lowest ID
+        variants = [ExperimentVariant(experiment_id=experiment.id, name=name, is_control=name == "Control", config={})
+                    for name in ("Treatment A", "Treatment B", "Control")]
+        db.add_all(variants)
+        db.commit()
+        treatment_a, treatment_b, control = (v.id for v in variants)
+
+        rng = np.random.default_rng(11)
+        values = {
+            control: rng.normal(0.60, 0.2, RESULTS_PER_VARIANT),
+            treatment_a: rng.normal(0.62, 0.2, RESULTS_PER_VARIANT),
+            treatment_b: rng.normal(0.60, 0.3, RESULTS_PER_VARIANT),
+        }
+        for variant_id, samples in values.items():
+            db.execute(ExperimentResult.__table__.insert(), [
+                {"experiment_id": experiment.id, "variant_id": variant_id, "metric_name": METRIC, "metric_value": float(v)}
+                for v in samples
+            ])
+        db.commit()
+
+        print(f"\n2️⃣  Variant stats over {RESULTS_PER_VARIANT * 3} results...")
+        analyzer = StatisticalAnalyzer(db)
+        tracemalloc.start()
+        insight = analyzer.analyze_experiment(experiment.id)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        check("analysis succeeded", insight is not None)
+        stats = {int(k): v for k, v in insight.variant_stats.items()}
+        check("stats match NumPy (mean, sample std, min, max)", all(
+            np.isclose(stats[i]["mean"], s.mean()) and np.isclose(stats[i]["std"], s.std(ddof=1))
+            and np.isclose(stats[i]["min"], s.min()) and np.isclose(stats[i]["max"], s.max())
+            and stats[i]["count"] == len(s)
+            for i, s in values.items()
+        ))
+        check("raw values are not stored on the insight", not any("values" in s for s in stats.values()))
+        check(f"peak analysis memory {peak / 1024:.0f} KiB", peak < 2 * 1024 * 1024)
+
+        print("\n3️⃣  Comparisons against the control...")
+        check("is_control variant used as control", stats[control]["is_control"] and "vs_control" not in stats[control])
+        a, b = stats[treatment_a]["vs_control"], stats[treatment_b]["vs_control"]
+
+        # Welch by hand for treatment A
+        x, y = values[treatment_a], values[control]
+        va, vc = x.var(ddof=1) / len(x), y.var(ddof=1) / len(y)
+        df = (va + vc) ** 2 / (va ** 2 / (len(x) - 1) + vc ** 2 / (len(y) - 1))
+        t_stat = (x.mean() - y.mean()) / math.sqrt(va + vc)
+        check(f"Welch t={a['t_stat']:.3f}, df={a['df']:.0f}", np.isclose(a["t_stat"], t_stat) and np.isclose(a["df"], df))
+        check(f"treatment A p={a['p_value']:.2e} (adjusted {a['adjusted_p_value']:.2e})", a["adjusted_p_value"] < 0.05)
+        check(f"treatment B p={b['p_value']:.3f} not significant", b["adjusted_p_value"] >= 0.05)
+        check(f"95% CI for A [{a['ci_lower']:.4f}, {a['ci_upper']:.4f}] covers the true lift 0.02",
+              a["ci_lower"] < 0.02 < a["ci_upper"])
+        check("Holm adjustment never lowers a p-value", all(c["adjusted_p_value"] >= c["p_value"] for c in (a, b)))
+
+        print("\n4️⃣  Recommendation...")
+        check("treatment A recommended", insight.recommended_winner_id == treatment_a and insight.is_significant)
+        check("confidence interval recorded", insight.confidence_interval["variant_id"] == treatment_a)
+        print(f"   {insight.recommendation_reason}")
+        summary = analyzer.get_experiment_summary(experiment.id)
+        check("summary lists every variant with its lift", len(summary["variants"]) == 3 and all(
+            v["relative_lift"] is not None for v in summary["variants"] if not v["is_control"]))
+    finally:
+        db.close()
+        engine.dispose()
+        os.remove(DB_PATH)
+
+    print("\n" + "=" * 80)
+    print("✅ All A/B statistics checks passed" if passed else "❌ Some A/B statistics checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_ab_statistics())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,215 @@
+"""
+Test Streamed AI Chat
+Drives /api/v1/ai/chat with "stream": true against a scripted OpenAI provider:
+- every chunk is one well-formed server-sent event (event line, JSON data
+  line, blank line); tokens arrive as token events and end with done
+- Accept: text/event-stream streams without the body flag
+- function calls run between the two completions and are sent as action events
+- a failing completion ends the stream with an error event (with any
+  actions already taken) and saves nothing
+- the user and assistant turns are saved only after the stream ends
+- without streaming, the same tool-calling chat runs on the async LLM client
+
+Run with: python backend/test_ai_chat_stream.py
+"""
+
+import os
+import re
+import sys
+import json
+import asyncio
+import tempfile
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_ai_chat_stream.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from main import Base, engine, SessionLocal, User, Lead, Conversation, ConversationCreate, ai_chat, llm_client
+from ai_providers.llm_client import OPENAI, FakeLLMProvider, LLMRateLimitError, LLMResponse
+
+SSE_CHUNK = re.compile(r"\Aevent: (\w+)\ndata: (.*)\n\n\Z")
+
+
+class ScriptedOpenAI(FakeLLMProvider):
+    """Returns or streams scripted replies in order; a reply is (text, tool_calls) or an exception to raise"""
+
+    def __init__(self, replies):
+        super().__init__(latency=0)
+        self.replies = list(replies)
+        self.requests = []
+
+    async def complete(self, model, messages, system=None, max_tokens=1024, temperature=0.7,
+                       json_mode=False, max_retries=None, tools=None):
+        self.requests.append({"messages": list(messages), "tools": tools})
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        text, tool_calls = reply
+        return LLMResponse(text=text, provider=self.name, model=model, tool_calls=tool_calls)
+
+    async def stream(self, model, messages, response, system=None, max_tokens=1024, temperature=0.7,
+                     tools=None):
+        self.requests.append({"messages": list(messages), "tools": tools})
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        text, tool_calls = reply
+        words = text.split(" ") if text else []
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+        response.tool_calls = tool_calls
+
+
+def make_request(accept: str = "") -> Request:
+    headers = [(b"accept", accept.encode())] if accept else []
+    return Request({"type": "http", "method": "POST", "path": "/api/v1/ai/chat", "headers": headers})
+
+
+async def run_chat(user, replies, message: str, stream_flag: bool = True, accept: str = ""):
+    """
+    Run one streamed chat to the end, including its background save. Returns
+    (provider, [(event, data)], malformed chunks, rows saved before the background task, response)
+    """
+    provider = ScriptedOpenAI(replies)
+    llm_client.register(OPENAI, provider)
+    db = SessionLocal()
+    try:
+        response = await ai_chat(ConversationCreate(message=message, stream=stream_flag), make_request(accept),
+                                 db=db, current_user=user)
+        events, malformed = [], []
+        async for chunk in response.body_iterator:
+            match = SSE_CHUNK.match(chunk)
+            if match is None:
+                malformed.append(chunk)
+                continue
+            events.append((match.group(1), json.loads(match.group(2))))
+        saved_during_stream = db.query(Conversation).filter(Conversation.message == message).count()
+        await response.background()
+        return provider, events, malformed, saved_during_stream, response
+    finally:
+        db.close()
+
+
+async def test_ai_chat_stream():
+    print("=" * 80)
+    print("STREAMED AI CHAT TEST")
+    print("=" * 80)
+
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    Base.metadata.create_all(engine)
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    db = SessionLocal()
+    user = User(email="chat@example.com", hashed_password="x", full_name="Chat Test")
+    db.add(user)
+    db.commit()
+    lead = Lead(name="Riley Stone", email="riley@example.com", credit_score=745, owner_id=user.id)
+    db.add(lead)
+    db.commit()
+    original = llm_client.providers.get(OPENAI)
+
+    try:
+        print("\n1️⃣  Plain reply...")
+        provider, events, malformed, saved_early, response = await run_chat(
+            user, [("Rates are steady this week.", [])], "How are rates?")
+        check("text/event-stream response with SSE headers",
+              response.media_type == "text/event-stream" and response.headers.get("cache-control") == "no-cache")
+        check(f"every chunk is one framed event ({len(events)} events, {len(malformed)} malformed)", not malformed)
+        names = [name for name, _ in events]
+        check(f"tokens then done {names}", names == ["token"] * 5 + ["done"])
+        check("tokens join to the reply",
+              "".join(data["text"] for name, data in events if name == "token") == "Rates are steady this week.")
+        check("done carries the full reply", events[-1][1] == {"response": "Rates are steady this week.",
+                                                               "actions_taken": []})
+        check("the model was offered the CRM tools", provider.requests[0]["tools"])
+        rows = db.query(Conversation).filter(Conversation.user_id == user.id).order_by(Conversation.id).all()
+        check("nothing is saved while streaming", saved_early == 0)
+        check(f"user and assistant turns saved after the stream ({len(rows)})",
+              [(row.role, row.message, row.response) for row in rows] ==
+              [("user", "How are rates?", "Rates are steady this week."),
+               ("assistant", "Rates are steady this week.", None)])
+
+        print("\n2️⃣  Accept header and function calls...")
+        call = {"id": "call_1", "name": "get_lead_details", "arguments": json.dumps({"lead_id": lead.id})}
+        provider, events, malformed, _, _ = await run_chat(
+            user, [("", [call]), ("Riley has a 745 credit score.", [])], "How strong is Riley?",
+            stream_flag=False, accept="text/event-stream")
+        names = [name for name, _ in events]
+        check(f"Accept: text/event-stream streams without the flag {names}",
+              not malformed and names == ["action"] + ["token"] * 6 + ["done"])
+        action = events[0][1]
+        check("action event reports the executed function", action["function"] == "get_lead_details"
+              and action["args"] == {"lead_id": lead.id} and action["result"]["lead"]["credit_score"] == 745)
+        follow_up = provider.requests[1]["messages"]
+        check("follow-up completion sees the tool call and its result",
+              follow_up[-2]["tool_calls"][0]["id"] == "call_1" and follow_up[-1]["role"] == "tool"
+              and json.loads(follow_up[-1]["content"]) == action["result"])
+        saved = db.query(Conversation).filter(Conversation.message == "How strong is Riley?").one()
+        assistant = db.query(Conversation).filter(Conversation.message == "Riley has a 745 credit score.").one()
+        check("actions are saved with both turns",
+              saved.meta_data["actions_taken"][0]["function"] == "get_lead_details"
+              and assistant.meta_data["actions"][0]["function"] == "get_lead_details")
+
+        print("\n3️⃣  Errors...")
+        _, events, malformed, _, _ = await run_chat(
+            user, [LLMRateLimitError("rate limited", retry_after=2)], "Are you there?")
+        check(f"failed completion ends with one error event {events}",
+              not malformed and [name for name, _ in events] == ["error"]
+              and "rate limited" in events[0][1]["error"] and events[0][1]["actions_taken"] == [])
+        check("failed chat is not saved", db.query(Conversation).filter(Conversation.message == "Are you there?").count() == 0)
+
+        _, events, _, _, _ = await run_chat(
+            user, [("", [dict(call, id="call_2")]), RuntimeError("upstream reset")], "Another reminder please")
+        check(f"failure after a function call reports the action taken {[name for name, _ in events]}",
+              [name for name, _ in events] == ["action", "error"]
+              and events[-1][1]["actions_taken"][0]["function"] == "get_lead_details")
+        check("partially failed chat is not saved",
+              db.query(Conversation).filter(Conversation.message == "Another reminder please").count() == 0)
+
+        print("\n4️⃣  Without streaming...")
+        provider = ScriptedOpenAI([("", [dict(call, id="call_3")]), ("Riley looks strong.", [])])
+        llm_client.register(OPENAI, provider)
+        saved = await ai_chat(ConversationCreate(message="Is Riley ready?"), make_request(), db=db, current_user=user)
+        check("reply saved with the actions taken",
+              saved.response == "Riley looks strong."
+              and saved.meta_data["actions_taken"][0]["result"]["lead"]["credit_score"] == 745)
+        follow_up = provider.requests[1]["messages"]
+        check("tools offered, then the tool call and result sent back",
+              provider.requests[0]["tools"] and follow_up[-2]["tool_calls"][0]["id"] == "call_3"
+              and follow_up[-1]["role"] == "tool")
+        llm_client.register(OPENAI, ScriptedOpenAI([LLMRateLimitError("rate limited", retry_after=2)]))
+        try:
+            await ai_chat(ConversationCreate(message="Still there?"), make_request(), db=db, current_user=user)
+            status = None
+        except HTTPException as e:
+            status = e.status_code
+        check(f"failed completion is a 500 ({status}) and not saved", status == 500 and
+              db.query(Conversation).filter(Conversation.message == "Still there?").count() == 0)
+    finally:
+        if original is not None:
+            llm_client.register(OPENAI, original)
+        else:
+            llm_client.providers.pop(OPENAI, None)
+        db.close()
+        engine.dispose()
+        os.remove(DB_PATH)
+
+    print("\n" + "=" * 80)
+    print("✅ All streamed AI chat checks passed" if passed else "❌ Some streamed AI chat checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_ai_chat_stream())
+    sys.exit(0 if success else 1)
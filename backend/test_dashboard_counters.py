@@ -0,0 +1,200 @@
+"""
+Test Dashboard and Scorecard Queries
+Checks the aggregated dashboard counters and the rollup-backed scorecard
+against counts taken directly from the seeded leads and loans:
+- aggregate_dashboard_counters matches a per-row count of every counter,
+  and only counts the requesting officer's rows
+- /api/v1/analytics/scorecard year-to-date totals, loan types, referral
+  sources (with closed volume through linked leads) and portfolio value
+  match the rows they summarize
+
+Run with: python backend/test_dashboard_counters.py
+"""
+
+import os
+import sys
+import random
+import asyncio
+import tempfile
+from collections import Counter, defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_dashboard_counters.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from main import (
+    Base, engine, SessionLocal, User, Lead, Loan, LeadStage, LoanStage,
+    aggregate_dashboard_counters, get_scorecard_metrics, rebuild_kpi_rollups
+)
+
+SOURCES = ["Website", "Zillow", "Referral - Realtor", "Open House"]
+LOAN_TYPES = ["Conventional", "FHA", "VA"]
+
+
+def seed(db, user_id: int, today: date, now: datetime):
+    """Leads and loans spread over this year and last, at noon UTC (stored naive, as the app does)"""
+    start_of_year = today.replace(month=1, day=1)
+    span = (today - start_of_year).days
+
+    def this_year():
+        return datetime.combine(start_of_year + timedelta(days=random.randint(0, span)), time(12))
+
+    def last_year():
+        return datetime.combine(start_of_year - timedelta(days=random.randint(1, 300)), time(12))
+
+    recent = now.replace(tzinfo=None)
+    leads = []
+    for i in range(300):
+        created_at = random.choice([this_year, this_year, last_year])()
+        if i % 10 == 0:
+            created_at = recent - timedelta(hours=random.choice([1, 30]))
+        leads.append(Lead(name=f"Borrower {user_id}-{i}", owner_id=user_id, stage=random.choice(list(LeadStage)),
+                          source=random.choice(SOURCES), ai_score=random.randint(40, 100), created_at=created_at))
+    db.add_all(leads)
+    db.flush()
+
+    for i in range(200):
+        stage = random.choice([LoanStage.FUNDED, LoanStage.FUNDED, *LoanStage])
+        funded_at = random.choice([this_year, this_year, last_year])() if stage == LoanStage.FUNDED else None
+        lead = random.choice(leads) if i % 2 else None
+        db.add(Loan(loan_number=f"DC-{user_id}-{i:05d}", borrower_name=f"Borrower {user_id}-{i}", stage=stage,
+                    amount=random.randint(150, 900) * 1000.0, loan_type=random.choice(LOAN_TYPES),
+                    days_in_stage=random.randint(0, 30), funded_date=funded_at, created_at=this_year(),
+                    lead_id=lead.id if lead else None, loan_officer_id=user_id))
+    db.commit()
+
+
+def expected_dashboard(leads, loans, today: date, now: datetime):
+    start_of_month = today.replace(day=1)
+    start_of_week = today - timedelta(days=today.weekday())
+    now = now.replace(tzinfo=None)
+    start_of_today = now.replace(hour=0, minute=0, second=0)
+
+    funded = [l for l in loans if l.stage == LoanStage.FUNDED]
+    funded_this_month = [l for l in funded if l.funded_date.date() >= start_of_month]
+
+    def in_stage(stage):
+        return [l for l in loans if l.stage == stage]
+
+    new = [l for l in leads if l.stage == LeadStage.NEW]
+    return {
+        "annual_funded": sum(1 for l in funded if l.funded_date.year == today.year),
+        "monthly_funded": len(funded_this_month),
+        "weekly_funded": sum(1 for l in funded if l.funded_date.date() >= start_of_week),
+        "monthly_funded_volume": sum(l.amount for l in funded_this_month),
+        "processing": len(in_stage(LoanStage.PROCESSING)),
+        "processing_volume": sum(l.amount for l in in_stage(LoanStage.PROCESSING)),
+        "processing_delayed": sum(1 for l in in_stage(LoanStage.PROCESSING) if l.days_in_stage > 14),
+        "underwriting": len(in_stage(LoanStage.UW_RECEIVED)),
+        "underwriting_volume": sum(l.amount for l in in_stage(LoanStage.UW_RECEIVED)),
+        "suspended": len(in_stage(LoanStage.SUSPENDED)),
+        "ctc": len(in_stage(LoanStage.CTC)),
+        "ctc_volume": sum(l.amount for l in in_stage(LoanStage.CTC)),
+        "applications": len(loans),
+        "leads_new": len(new),
+        "leads_uncontacted": sum(1 for l in new if l.created_at < now - timedelta(hours=24)),
+        "leads_preapproved": sum(1 for l in leads if l.stage == LeadStage.PRE_APPROVED),
+        "leads_new_today": sum(1 for l in leads if l.created_at >= start_of_today),
+        "leads_hot": sum(1 for l in leads if l.ai_score >= 80
+                         and l.stage in (LeadStage.NEW, LeadStage.ATTEMPTED_CONTACT)),
+        "leads_high_intent": sum(1 for l in leads if l.ai_score >= 75 and l.stage == LeadStage.ATTEMPTED_CONTACT),
+        "leads_total": len(leads),
+    }
+
+
+async def test_dashboard_counters():
+    print("=" * 80)
+    print("DASHBOARD AND SCORECARD QUERY TEST")
+    print("=" * 80)
+
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    Base.metadata.create_all(engine)
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    random.seed(7)
+    db = SessionLocal()
+    officer = User(email="dashboard@example.com", hashed_password="x", full_name="Dashboard Test")
+    other = User(email="other-dashboard@example.com", hashed_password="x", full_name="Other Officer")
+    db.add_all([officer, other])
+    db.commit()
+    today = date.today()
+    now = datetime.now(timezone.utc)
+    seed(db, officer.id, today, now)
+    seed(db, other.id, today, now)
+
+    try:
+        leads = db.query(Lead).filter(Lead.owner_id == officer.id).all()
+        loans = db.query(Loan).filter(Loan.loan_officer_id == officer.id).all()
+
+        print("\n1️⃣  Dashboard counters...")
+        counters = aggregate_dashboard_counters(db, officer.id, today)
+        expected = expected_dashboard(leads, loans, today, now)
+        wrong = {key: (counters[key], value) for key, value in expected.items() if counters[key] != value}
+        check(f"{len(expected)} counters match the rows (differences: {wrong})", not wrong)
+        other_counters = aggregate_dashboard_counters(db, other.id, today)
+        check("each officer only counts their own rows",
+              other_counters["leads_total"] == 300 and other_counters["applications"] == 200
+              and counters["leads_total"] == 300 and counters["applications"] == 200)
+
+        print("\n2️⃣  Scorecard...")
+        rebuild_kpi_rollups(db)
+        scorecard = await get_scorecard_metrics(db=db, current_user=officer)
+        start_of_year = today.replace(month=1, day=1)
+
+        def ytd(value):
+            return value is not None and start_of_year <= value.date() <= today
+
+        funded = [l for l in loans if l.stage == LoanStage.FUNDED and ytd(l.funded_date)]
+        ytd_leads = [l for l in leads if ytd(l.created_at)]
+        cards = {card["id"]: card["value"] for card in scorecard["volumeRevenue"]}
+        check(f"YTD funded loans {cards['total-loans']}", cards["total-loans"] == len(funded))
+        check(f"YTD volume {cards['total-volume']}", cards["total-volume"] == f"${sum(l.amount for l in funded):,.0f}")
+        check(f"portfolio value {cards['portfolio-value']}",
+              cards["portfolio-value"] == f"${sum(l.amount for l in loans):,.0f}")
+
+        types = defaultdict(lambda: [0, 0.0])
+        for loan in funded:
+            types[loan.loan_type][0] += 1
+            types[loan.loan_type][1] += loan.amount
+        check("loan types by units and volume",
+              {t["type"]: [t["units"], t["volume"]] for t in scorecard["loanTypes"]} == dict(types))
+
+        leads_by_id = {lead.id: lead for lead in leads}
+        closed = defaultdict(float)
+        for loan in funded:
+            lead = leads_by_id.get(loan.lead_id)
+            if lead is not None and ytd(lead.created_at):
+                closed[lead.source] += loan.amount
+        sources = {s["source"]: (s["referrals"], s["closedVolume"]) for s in scorecard["referralSources"]}
+        expected_sources = {source: (count, closed.get(source, 0))
+                            for source, count in Counter(l.source for l in ytd_leads).items()}
+        check("referral sources count YTD leads and closed volume through linked leads",
+              sources == expected_sources)
+        conversion = {m["id"]: m for m in scorecard["conversionMetrics"]}
+        check("conversion totals use YTD leads",
+              conversion["starts-to-funded"]["total"] == len(ytd_leads)
+              and conversion["starts-to-funded"]["current"] == len(funded))
+        check("pipeline prospects",
+              scorecard["pipelineStatus"]["prospect"] == sum(1 for l in ytd_leads if l.stage == LeadStage.PROSPECT))
+    finally:
+        db.close()
+        engine.dispose()
+        os.remove(DB_PATH)
+
+    print("\n" + "=" * 80)
+    print("✅ All dashboard and scorecard checks passed" if passed else "❌ Some dashboard and scorecard checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_dashboard_counters())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,264 @@
+"""
+Test Data Import
+Checks /api/v1/data-import/analyze and /execute against SQLite:
+- CSV and XLSX headers are auto-mapped and the destination detected
+- a multi-batch CSV imports with one commit per batch; bad cells and missing
+  names are reported by spreadsheet row number and skipped
+- re-importing updates matched records (or skips them), never duplicates
+- loans owned by another officer are rejected; funded loans refresh KPI rollups
+- a batch whose bulk insert hits a unique constraint falls back to row by row
+- the streamed response sends a progress event per batch and a done summary
+
+Run with: python backend/test_data_import.py
+"""
+
+import io
+import os
+import sys
+import json
+import asyncio
+import tempfile
+from datetime import datetime
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_data_import.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from fastapi import HTTPException, UploadFile
+from openpyxl import Workbook
+from sqlalchemy import event
+from starlette.requests import Request
+
+from main import (
+    Base, engine, SessionLocal, User, Lead, Loan, LoanStage, MUMClient, ReferralPartner, KPIDailyRollup,
+    analyze_data_import, execute_data_import, data_importer
+)
+
+LEADS = 12000
+BATCH_SIZE = 5000
+
+
+def upload(name: str, data: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=name)
+
+
+def make_request(stream: bool = False) -> Request:
+    headers = [(b"accept", b"text/event-stream")] if stream else []
+    return Request({"type": "http", "method": "POST", "path": "/api/v1/data-import/execute", "headers": headers})
+
+
+def lead_csv(rows: int, score_offset: int = 0) -> bytes:
+    lines = ["First Name,Last Name,E-mail Address,Phone,FICO,Loan Amount,Notes"]
+    for i in range(rows):
+        email = "not-an-email" if i == 10 else f"Borrower{i}@Example.com"
+        score = "excellent" if i == 20 else str(650 + (i + score_offset) % 150)
+        first = "" if i == 30 else f"Pat{i}"
+        last = "" if i == 30 else f"Lee{i}"
+        lines.append(f'{first},{last},{email},555-{i:04d},{score},"${250000 + i:,}",note {i}')
+    return ("\n".join(lines) + "\n").encode()
+
+
+def loan_xlsx(rows) -> bytes:
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Loan #", "Borrower", "Loan Amount", "Note Rate", "Term", "Status", "Funding Date", "Processor"])
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+async def test_data_import():
+    print("=" * 80)
+    print("DATA IMPORT TEST")
+    print("=" * 80)
+
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    Base.metadata.create_all(engine)
+    data_importer.batch_size = BATCH_SIZE
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    commits = []
+    db = SessionLocal()
+    event.listen(db, "after_commit", lambda session: commits.append(1))
+    try:
+        user = User(email="import@example.com", hashed_password="x", full_name="Import Test")
+        other = User(email="other@example.com", hashed_password="x", full_name="Other Officer")
+        db.add_all([user, other])
+        db.commit()
+        db.add(Loan(loan_number="TAKEN-1", borrower_name="Someone Else", amount=100000, loan_officer_id=other.id))
+        db.commit()
+        user_id, other_id = user.id, other.id
+
+        print("\n1️⃣  Analyze...")
+        data = lead_csv(LEADS)
+        analysis = await analyze_data_import(file=upload("leads.csv", data), current_user=user)
+        check(f"destination detected as {analysis['default_answers']['destination']}",
+              analysis["default_answers"]["destination"] == "leads")
+        check(f"{analysis['preview']['total_rows']} rows counted", analysis["preview"]["total_rows"] == LEADS)
+        check(f"suggested mappings {analysis['suggested_mappings']}", analysis["suggested_mappings"] == {
+            "First Name": "first_name", "Last Name": "last_name", "E-mail Address": "email", "Phone": "phone",
+            "FICO": "credit_score", "Loan Amount": "loan_amount", "Notes": "notes"})
+        check("every destination has fields", set(analysis["target_fields"]) == {"leads", "loans", "portfolio", "partners"})
+        try:
+            await analyze_data_import(file=upload("old.xls", b"\xd0\xcf"), current_user=user)
+            check("legacy .xls rejected", False)
+        except HTTPException as e:
+            check("legacy .xls rejected with 400", e.status_code == 400)
+
+        print(f"\n2️⃣  Importing {LEADS} leads in batches of {BATCH_SIZE}...")
+        answers = json.dumps({"destination": "leads", "on_duplicate": "update"})
+        mappings = json.dumps(analysis["suggested_mappings"])
+        commits.clear()
+        started = datetime.now()
+        result = await execute_data_import(make_request(), file=upload("leads.csv", data), answers=answers,
+                                           mappings=mappings, stream=False, current_user=user, db=db)
+        elapsed = (datetime.now() - started).total_seconds()
+        print(f"   {result['imported']} imported in {elapsed:.2f}s")
+        check(f"{result['inserted']} inserted, {result['failed']} failed",
+              result["inserted"] == LEADS - 3 and result["failed"] == 3 and result["total"] == LEADS)
+        check(f"{len(commits)} commits, one per batch plus the KPI refresh", len(commits) == -(-LEADS // BATCH_SIZE) + 1)
+        check(f"row errors {result['errors']}", result["errors"] == [
+            "Row 12: Email: 'not-an-email' is not a valid email",
+            "Row 22: Credit Score: 'excellent' is not a valid whole number",
+            "Row 32: Full Name or First Name or Last Name is required",
+        ])
+        lead = db.query(Lead).filter(Lead.email == "borrower5@example.com").one()
+        check("values converted (name, lowercased email, $ amount, int score)",
+              lead.name == "Pat5 Lee5" and lead.loan_amount == 250005 and lead.credit_score == 655
+              and lead.owner_id == user_id and lead.source == "Import")
+        rollup = db.query(KPIDailyRollup).filter(KPIDailyRollup.user_id == user_id,
+                                                 KPIDailyRollup.metric == "lead_start").one()
+        check(f"KPI rollup counts {rollup.count} imported leads", rollup.count == LEADS - 3)
+
+        print("\n3️⃣  Re-import as upsert...")
+        commits.clear()
+        result = await execute_data_import(make_request(), file=upload("leads.csv", lead_csv(LEADS, score_offset=1)),
+                                           answers=answers, mappings=mappings, stream=False, current_user=user, db=db)
+        check(f"{result['updated']} updated, {result['inserted']} inserted",
+              result["updated"] == LEADS - 3 and result["inserted"] == 0)
+        check(f"{len(commits)} commits", len(commits) == -(-LEADS // BATCH_SIZE) + 1)
+        db.expire_all()
+        check("no duplicates created", db.query(Lead).count() == LEADS - 3)
+        check("matched lead updated", db.query(Lead.credit_score).filter(Lead.email == "borrower5@example.com").scalar() == 656)
+        skip = json.dumps({"destination": "leads", "on_duplicate": "skip"})
+        result = await execute_data_import(make_request(), file=upload("leads.csv", lead_csv(100)), answers=skip,
+                                           mappings=mappings, stream=False, current_user=user, db=db)
+        check(f"skip mode skips {result['skipped']} matches", result["skipped"] == 97 and result["imported"] == 0)
+        data_importer.batch_size = 2
+        try:
+            result = await execute_data_import(make_request(), file=upload("dupes.csv", b"Name,Email\nAl,dup@x.com\nBo,bo@x.com\nAl Two,DUP@X.com\n"),
+                                               answers=answers, mappings=json.dumps({"Name": "name", "Email": "email"}),
+                                               stream=False, current_user=user, db=db)
+        finally:
+            data_importer.batch_size = BATCH_SIZE
+        check(f"a key inserted by an earlier batch is updated ({result['inserted']} inserted, {result['updated']} updated)",
+              result["inserted"] == 2 and result["updated"] == 1
+              and db.query(Lead.name).filter(Lead.email == "dup@x.com").all() == [("Al Two",)])
+
+        print("\n4️⃣  Loans from XLSX...")
+        workbook = loan_xlsx([
+            ["LN-1", "Ann Funded", 350000, "6.5%", 360, "Funded", datetime(2025, 3, 14), "Sam"],
+            ["LN-2", "Bo Processing", "$410,000", 6.875, 180, "processing", None, "Sam"],
+            ["TAKEN-1", "Not Mine", 200000, 7, 360, "Disclosed", None, None],
+            ["LN-3", "Bad Date", 300000, 7, 360, "Funded", "someday", None],
+            ["LN-4", "", 300000, 7, 360, "Unknown Stage", None, None],
+        ])
+        analysis = await analyze_data_import(file=upload("loans.xlsx", workbook), current_user=user)
+        check(f"destination detected as {analysis['default_answers']['destination']}",
+              analysis["default_answers"]["destination"] == "loans")
+        mapped = analysis["suggested_mappings"]
+        check(f"loan columns mapped {mapped}", mapped == {
+            "Loan #": "loan_number", "Borrower": "borrower_name", "Loan Amount": "loan_amount",
+            "Note Rate": "interest_rate", "Term": "loan_term", "Status": "stage",
+            "Funding Date": "funded_date", "Processor": "processor"})
+        result = await execute_data_import(make_request(), file=upload("loans.xlsx", workbook),
+                                           answers=json.dumps({"destination": "loans"}), mappings=json.dumps(mapped),
+                                           stream=False, current_user=user, db=db)
+        check(f"2 loans imported, 3 failed: {result['errors']}",
+              result["inserted"] == 2 and result["failed"] == 3 and result["errors"][0] == "Row 4: TAKEN-1 belongs to another user")
+        check("bad date and enum reported", "Funded Date: 'someday'" in result["errors"][1]
+              and "Borrower Name is required" in result["errors"][2] and "Stage: 'Unknown Stage'" in result["errors"][2])
+        funded = db.query(Loan).filter(Loan.loan_number == "LN-1").one()
+        check("stage, rate and funded date converted",
+              funded.stage == LoanStage.FUNDED and funded.rate == 6.5 and funded.funded_date == datetime(2025, 3, 14)
+              and funded.loan_officer_id == user_id)
+        check("other officer's loan untouched",
+              db.query(Loan.loan_officer_id).filter(Loan.loan_number == "TAKEN-1").scalar() == other_id)
+        funded_rollup = db.query(KPIDailyRollup).filter(KPIDailyRollup.user_id == user_id,
+                                                        KPIDailyRollup.metric == "funded").one()
+        check("funded-day KPI rollup written", str(funded_rollup.day) == "2025-03-14" and funded_rollup.volume == 350000)
+
+        print("\n5️⃣  Constraint fallback...")
+        real_existing = data_importer._existing
+        data_importer._existing = lambda *args: {}  # as if another writer inserted LN-1 after the lookup
+        try:
+            csv = b"Loan Number,Borrower Name,Loan Amount\nLN-1,Ann Again,1\nLN-9,New Loan,250000\n"
+            result = await execute_data_import(make_request(), file=upload("race.csv", csv),
+                                               answers=json.dumps({"destination": "loans"}),
+                                               mappings=json.dumps({"Loan Number": "loan_number", "Borrower Name": "borrower_name",
+                                                                    "Loan Amount": "loan_amount"}),
+                                               stream=False, current_user=user, db=db)
+        finally:
+            data_importer._existing = real_existing
+        check(f"only the conflicting row fails {result['errors']}",
+              result["inserted"] == 1 and result["failed"] == 1 and result["errors"][0].startswith("Row 2:"))
+
+        print("\n6️⃣  Portfolio and partners, streamed...")
+        csv = (b"Loan Number,Borrower Name,Close Date,Rate,Current Balance\n"
+               b"P-1,Cam Client,2021-06-30,2.875,\"$312,000.50\"\nP-2,Dee Client,06/15/2020,3.1,280000\n")
+        analysis = await analyze_data_import(file=upload("mum.csv", csv), current_user=user)
+        response = await execute_data_import(make_request(stream=True), file=upload("mum.csv", csv),
+                                             answers=json.dumps({"destination": "portfolio"}),
+                                             mappings=json.dumps(analysis["mappings_by_destination"]["portfolio"]),
+                                             stream=False, current_user=user, db=db)
+        events = []
+        async for chunk in response.body_iterator:
+            name, payload = chunk.strip().split("\n")
+            events.append((name.split(": ", 1)[1], json.loads(payload.split(": ", 1)[1])))
+        check(f"events {[name for name, _ in events]}", [name for name, _ in events] == ["progress", "done"])
+        check("done summary", events[-1][1]["inserted"] == 2 and events[-1][1]["destination"] == "portfolio")
+        client = db.query(MUMClient).filter(MUMClient.loan_number == "P-2").one()
+        check("mixed date formats parsed, days since funding set",
+              client.original_close_date == datetime(2020, 6, 15) and client.days_since_funding > 1000)
+
+        csv = (b"Partner Name,Brokerage,Role,Email\nJo Realtor,Acme Realty,Realtor,JO@ACME.COM\n"
+               b"jo realtor,ACME REALTY,Realtor,jo@acme.com\nKim Builder,,Builder,\n")
+        partners = json.dumps({"Partner Name": "name", "Brokerage": "company", "Role": "type", "Email": "email"})
+        for _ in range(2):
+            result = await execute_data_import(make_request(), file=upload("partners.csv", csv),
+                                               answers=json.dumps({"destination": "partners"}), mappings=partners,
+                                               stream=False, current_user=user, db=db)
+        check(f"partners matched on name + company ({result})",
+              db.query(ReferralPartner).count() == 2 and result["updated"] == 2 and result["skipped"] == 1)
+
+        try:
+            await execute_data_import(make_request(), file=upload("loans.csv", b"Loan Number\nLN-5\n"),
+                                      answers=json.dumps({"destination": "loans"}),
+                                      mappings=json.dumps({"Loan Number": "loan_number"}),
+                                      stream=False, current_user=user, db=db)
+            check("missing required mapping rejected", False)
+        except HTTPException as e:
+            check(f"missing required mapping rejected: {e.detail}", e.status_code == 400 and "Borrower Name" in e.detail)
+    finally:
+        db.close()
+        engine.dispose()
+        os.remove(DB_PATH)
+
+    print("\n" + "=" * 80)
+    print("✅ All data import checks passed" if passed else "❌ Some data import checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_data_import())
+    sys.exit(0 if success else 1)
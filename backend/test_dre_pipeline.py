@@ -0,0 +1,199 @@
+"""
+Test DRE Pipeline
+Drives the background classification/extraction stage with FakeDREBackend:
+- every queued IncomingDataEvent is processed exactly once
+- LLM calls never exceed the concurrency limit
+- rate limits are retried with backoff
+- unrelated emails are marked processed without a review item
+- reprocessing reuses cached LLM results unless the cache is bypassed
+- two workers draining the same queue never claim the same event, and a
+  claim whose lease ran out is taken over
+- the synchronous helpers cache results in a savepoint, never committing
+  or rolling back the caller's session
+
+Run with: python backend/test_dre_pipeline.py
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_dre_pipeline.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from main import (
+    Base, User, IncomingDataEvent, ExtractedData, LLMResultCacheEntry, finalize_dre_event, _store_llm_result
+)
+from services.dre_pipeline import DREPipeline, FakeDREBackend
+from services.llm_result_cache import LLMResultCache
+
+EVENTS = 60
+
+
+async def test_pipeline():
+    print("=" * 80)
+    print("DRE PIPELINE TEST")
+    print("=" * 80)
+
+    engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    db = session_factory()
+    user = User(email="dre@example.com", hashed_password="x", full_name="DRE Test")
+    db.add(user)
+    db.commit()
+    for i in range(EVENTS):
+        body = "Please unsubscribe me" if i % 10 == 0 else f"Appraisal received for Loan #L{i:04d}"
+        db.add(IncomingDataEvent(source="microsoft365", external_message_id=f"msg-{i}",
+                                 subject=f"Update {i}", raw_text=body, user_id=user.id, processed=False))
+    db.commit()
+    db.close()
+
+    backend = FakeDREBackend(latency=0.02, rate_limit_first=3)
+    pipeline = DREPipeline(
+        session_factory=session_factory,
+        event_model=IncomingDataEvent,
+        backend=backend,
+        persist_result=finalize_dre_event,
+        batch_size=20,
+        max_concurrency=5,
+        base_backoff_seconds=0.01,
+        cache=LLMResultCache(LLMResultCacheEntry, enabled=True),
+    )
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    try:
+        print(f"\n1️⃣  Draining {EVENTS} queued events (batch 20, concurrency 5, 20ms fake latency)...")
+        started = time.perf_counter()
+        await pipeline.drain()
+        elapsed = time.perf_counter() - started
+
+        db = session_factory()
+        unprocessed = db.query(IncomingDataEvent).filter(IncomingDataEvent.processed == False).count()
+        extracted = db.query(ExtractedData).count()
+        db.close()
+
+        metrics = pipeline.get_metrics()
+        check(f"queue drained ({unprocessed} left)", unprocessed == 0)
+        check(f"{extracted} review items (expected {EVENTS - EVENTS // 10})", extracted == EVENTS - EVENTS // 10)
+        check(f"max {backend.max_in_flight} concurrent LLM calls (limit 5)", backend.max_in_flight <= 5)
+        check(f"{metrics['counters']['rate_limit_retries']} rate-limit retries recorded", metrics['counters']['rate_limit_retries'] >= 3)
+        check(f"classify called {backend.calls['classify']}x for {EVENTS} events", backend.calls["classify"] == EVENTS + 3)
+
+        print(f"\n   Elapsed: {elapsed:.2f}s")
+        for stage, summary in metrics["stages"].items():
+            print(f"   {stage:<11} count {summary['count']:>4}   p50 {summary['p50_ms']} ms   p95 {summary['p95_ms']} ms")
+
+        print("\n2️⃣  Re-running on an empty queue...")
+        check("nothing reprocessed", await pipeline.drain() == 0)
+
+        def requeue():
+            session = session_factory()
+            session.query(ExtractedData).delete()
+            session.query(IncomingDataEvent).update({IncomingDataEvent.processed: False})
+            session.commit()
+            event_ids = [row[0] for row in session.query(IncomingDataEvent.id).all()]
+            session.close()
+            return event_ids
+
+        print("\n3️⃣  Reprocessing the same emails (cache warm)...")
+        requeue()
+        calls_before = dict(backend.calls)
+        await pipeline.drain()
+        check(f"no LLM calls on reprocess (classify +{backend.calls['classify'] - calls_before['classify']}, "
+              f"extract +{backend.calls['extract'] - calls_before['extract']})",
+              backend.calls == calls_before)
+        cache_stats = pipeline.get_metrics()["cache"]
+        check(f"cache hits {cache_stats['hits']} / misses {cache_stats['misses']}", cache_stats["hits"] >= EVENTS)
+
+        print("\n4️⃣  Forced reprocessing bypasses the cache...")
+        pipeline.request_fresh(requeue())
+        calls_before = dict(backend.calls)
+        await pipeline.drain()
+        check(f"classify called {backend.calls['classify'] - calls_before['classify']}x (expected {EVENTS})",
+              backend.calls["classify"] - calls_before["classify"] == EVENTS)
+
+        print("\n5️⃣  Two workers share the queue...")
+        requeue()
+        workers = [
+            DREPipeline(session_factory=session_factory, event_model=IncomingDataEvent,
+                        backend=FakeDREBackend(latency=0.02), persist_result=finalize_dre_event, batch_size=10)
+            for _ in range(2)
+        ]
+        await asyncio.gather(*(worker.drain() for worker in workers))
+        calls = [worker.backend.calls["classify"] for worker in workers]
+        db = session_factory()
+        unprocessed = db.query(IncomingDataEvent).filter(IncomingDataEvent.processed == False).count()
+        claimed = db.query(IncomingDataEvent).filter(IncomingDataEvent.claimed_at.isnot(None)).count()
+        extracted = db.query(ExtractedData).count()
+        db.close()
+        check(f"each event classified once across workers {calls}", sum(calls) == EVENTS and min(calls) > 0)
+        check(f"queue drained with one review item per event ({extracted})",
+              unprocessed == 0 and extracted == EVENTS - EVENTS // 10)
+        check("claims are released after the batch", claimed == 0)
+
+        event_ids = requeue()
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        db = session_factory()
+        db.query(IncomingDataEvent).filter(IncomingDataEvent.id.in_(event_ids[:10])).update(
+            {IncomingDataEvent.claimed_at: now - timedelta(hours=1)}, synchronize_session=False)
+        db.query(IncomingDataEvent).filter(IncomingDataEvent.id.in_(event_ids[10:20])).update(
+            {IncomingDataEvent.claimed_at: now}, synchronize_session=False)
+        db.commit()
+        db.close()
+        worker = workers[0]
+        calls_before = worker.backend.calls["classify"]
+        await worker.drain()
+        db = session_factory()
+        left = sorted(row[0] for row in db.query(IncomingDataEvent.id).filter(IncomingDataEvent.processed == False))
+        db.close()
+        check(f"expired claims are taken over, live ones left alone ({len(left)} left)",
+              left == sorted(event_ids[10:20]) and worker.backend.calls["classify"] - calls_before == EVENTS - 10)
+
+        print("\n6️⃣  Request sessions own their transactions...")
+        db = session_factory()
+        event = db.get(IncomingDataEvent, left[0])
+        event.processed = True
+        _store_llm_result(db, "request-key", "classify", "fake-classify", "prompt", {"category": "loan_update"})
+        _store_llm_result(db, "bad-key", "classify", "fake-classify", "prompt", {"unserializable": {1, 2}})
+        other = session_factory()
+        committed = other.get(IncomingDataEvent, left[0]).processed
+        other.close()
+        check("caching a result leaves the caller's change uncommitted and loaded",
+              not committed and "processed" in event.__dict__ and db.is_modified(event) is False and event.processed)
+        db.commit()
+        other = session_factory()
+        keys = {row[0] for row in other.query(LLMResultCacheEntry.cache_key)}
+        committed = other.get(IncomingDataEvent, left[0]).processed
+        other.close()
+        db.close()
+        check("the caller's commit stores the entry; a failed write is dropped on its own",
+              committed and "request-key" in keys and "bad-key" not in keys)
+    finally:
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+
+    print("\n" + "=" * 80)
+    print("✅ All DRE pipeline checks passed" if passed else "❌ Some DRE pipeline checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_pipeline())
+    sys.exit(0 if success else 1)
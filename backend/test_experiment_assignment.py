@@ -0,0 +1,144 @@
+"""
+Test Experiment Assignment Cache
+Checks ExperimentService with the in-process ExperimentCache:
+- cached assignment matches the database path for every user, including sampling
+- repeat and new assignments issue no SQL; rows are inserted in one batch on flush
+- rows that already exist are not inserted again
+- record_result uses the cached assignment, and stopping an experiment takes effect at once
+- another worker records results for assignments still in this worker's buffer
+
+Run with: python backend/test_experiment_assignment.py
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_experiment_assignment.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+if os.path.exists(DB_PATH):
+    os.remove(DB_PATH)
+
+from sqlalchemy import Column, Integer, Table, event
+
+from database import Base, engine, SessionLocal
+
+# ab_testing_models reference users.id, which lives in main's metadata
+if "users" not in Base.metadata.tables:
+    Table("users", Base.metadata, Column("id", Integer, primary_key=True))
+
+from ab_testing_models import ExperimentAssignment, ExperimentResult, ExperimentType
+from ab_testing.assignment_cache import ExperimentCache
+from ab_testing.experiment_service import ExperimentService
+
+USERS = 600
+VARIANTS = [
+    {"name": "Control", "is_control": True, "traffic_allocation": 34.0, "config": {"prompt": "v1"}},
+    {"name": "Concise", "traffic_allocation": 33.0, "config": {"prompt": "v2"}},
+    {"name": "Detailed", "traffic_allocation": 33.0, "config": {"prompt": "v3"}},
+]
+
+
+async def test_experiment_assignment():
+    print("=" * 80)
+    print("EXPERIMENT ASSIGNMENT CACHE TEST")
+    print("=" * 80)
+
+    Base.metadata.create_all(engine)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.lstrip().split()[0].upper())
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    db = SessionLocal()
+    cache = ExperimentCache(ttl_seconds=60)
+    uncached = ExperimentService(db, ExperimentCache(ttl_seconds=0))
+    cached = ExperimentService(db, cache)
+    try:
+        full = cached.create_experiment("Prompt test", "Three prompts", ExperimentType.PROMPT, "resolution_rate", VARIANTS)
+        sampled = cached.create_experiment("Sampled test", "Half the users", ExperimentType.PROMPT, "resolution_rate",
+                                           VARIANTS, target_percentage=50.0)
+        cached.start_experiment(full.id)
+        cached.start_experiment(sampled.id)
+
+        print("\n1️⃣  Cached assignment matches the database path...")
+        half = USERS // 2
+        expected = {u: uncached.get_variant_for_user("Prompt test", user_id=u) for u in range(1, half + 1)}
+        matches = all(cached.get_variant_for_user("Prompt test", user_id=u) == v for u, v in expected.items())
+        check(f"{half} users get the same variant", matches)
+        counts = {}
+        for variant in expected.values():
+            counts[variant["variant_name"]] = counts.get(variant["variant_name"], 0) + 1
+        check(f"every variant used {counts}", len(counts) == 3)
+        sampled_matches = all(
+            cached.get_variant_for_user("Sampled test", user_id=u, context={}) ==
+            uncached.get_variant_for_user("Sampled test", user_id=u, context={})
+            for u in range(1, 201)
+        )
+        check("target_percentage sampling matches", sampled_matches)
+
+        print("\n2️⃣  Hot path...")
+        cache.flush(db)
+        event.listen(engine, "before_cursor_execute", record)
+        statements.clear()
+        for u in range(1, USERS + 1):
+            for _ in range(3):
+                cached.get_variant_for_user("Prompt test", user_id=u)
+        check(f"{USERS * 3} assignments issued {len(statements)} queries", not statements)
+        check(f"{cache.pending()} new assignments buffered", cache.pending() == USERS - half)
+        written = cache.flush(db)
+        check(f"flush inserted {written} rows with {statements.count('INSERT')} INSERT",
+              written == USERS - half and statements.count("INSERT") == 1)
+        rows = db.query(ExperimentAssignment).filter(ExperimentAssignment.experiment_id == full.id).count()
+        check(f"{rows} assignment rows, no duplicates", rows == USERS)
+
+        print("\n3️⃣  Results and lifecycle...")
+        statements.clear()
+        check("record_result uses the cached assignment",
+              cached.record_result("Prompt test", "resolution_rate", 1.0, user_id=USERS))
+        check(f"recording issued no reads {statements}", "SELECT" not in statements)
+        result = db.query(ExperimentResult).filter(ExperimentResult.user_id == USERS).one()
+        check("result stored against the assigned variant",
+              result.variant_id == cached.get_variant_for_user("Prompt test", user_id=USERS)["variant_id"])
+        fresh = ExperimentService(db, ExperimentCache(ttl_seconds=60))
+        check("another process finds the persisted assignment",
+              fresh.record_result("Prompt test", "resolution_rate", 0.0, user_id=1))
+        buffered_user = USERS + 1
+        variant = cached.get_variant_for_user("Prompt test", user_id=buffered_user)
+        other_worker = ExperimentService(db, ExperimentCache(ttl_seconds=60))
+        check("another worker records a result for a still-buffered assignment",
+              cache.pending() == 1 and other_worker.record_result("Prompt test", "resolution_rate", 1.0,
+                                                                   user_id=buffered_user))
+        result = db.query(ExperimentResult).filter(ExperimentResult.user_id == buffered_user).one()
+        check("stored against the deterministic variant", result.variant_id == variant["variant_id"])
+        excluded = next(u for u in range(1, 201)
+                        if cached.get_variant_for_user("Sampled test", user_id=u, context={}) is None)
+        check("users outside the sample still record nothing",
+              not other_worker.record_result("Sampled test", "resolution_rate", 1.0, user_id=excluded))
+        cached.stop_experiment(full.id)
+        check("stopped experiment no longer assigns", cached.get_variant_for_user("Prompt test", user_id=1) is None)
+        print(f"   stats: {cache.stats()}")
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        db.close()
+        engine.dispose()
+        os.remove(DB_PATH)
+
+    print("\n" + "=" * 80)
+    print("✅ All experiment assignment checks passed" if passed else "❌ Some experiment assignment checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_experiment_assignment())
+    sys.exit(0 if success else 1)
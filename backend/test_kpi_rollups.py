@@ -0,0 +1,208 @@
+"""
+Test Daily KPI Rollups
+Checks the per-officer, per-day counters kept in kpi_daily_rollups:
+- lead and loan creates, updates, stage changes, day moves and deletes
+  refresh the rollups of the days they touch, old and new
+- a rolled-back write leaves the rollups alone
+- rebuild_kpi_rollups reproduces what the flush hooks maintained, and a
+  single-user rebuild only touches that user
+- the startup backfill runs once and is recorded, even with no data
+- a refresh scans only runs of touched days, and upserts rows that already
+  exist (as a concurrent refresh of the same day leaves them)
+
+Run with: python backend/test_kpi_rollups.py
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+from datetime import date, datetime, time, timedelta
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_kpi_rollups.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import event
+
+from main import (
+    Base, engine, SessionLocal, User, Lead, Loan, LeadStage, LoanStage, KPIDailyRollup, SystemJobsLog,
+    KPI_ROLLUP_BACKFILL_JOB, rebuild_kpi_rollups, backfill_kpi_rollups, refresh_kpi_rollups
+)
+
+
+def _day(value) -> date:
+    return value.date() if isinstance(value, datetime) else date.fromisoformat(value[:10])
+
+
+def snapshot(db, user_id: int):
+    """{(day, metric, dimension): (count, volume)} as stored"""
+    return {
+        (row.day, row.metric, row.dimension): (row.count, row.volume)
+        for row in db.query(KPIDailyRollup).filter(KPIDailyRollup.user_id == user_id)
+    }
+
+
+async def test_kpi_rollups():
+    print("=" * 80)
+    print("DAILY KPI ROLLUP TEST")
+    print("=" * 80)
+
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    Base.metadata.create_all(engine)
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    db = SessionLocal()
+    try:
+        print("\n1️⃣  Startup backfill...")
+        first = backfill_kpi_rollups(db)
+        second = backfill_kpi_rollups(db)
+        jobs = db.query(SystemJobsLog).filter(SystemJobsLog.job_name == KPI_ROLLUP_BACKFILL_JOB).all()
+        check(f"runs once on an empty install ({first}, then {second})",
+              first == {"users": 0, "rows": 0} and second is None)
+        check("the run is recorded in system_jobs_log", len(jobs) == 1 and jobs[0].status == "success")
+
+        officer = User(email="rollups@example.com", hashed_password="x", full_name="Rollup Test")
+        other = User(email="other-rollups@example.com", hashed_password="x", full_name="Other Officer")
+        db.add_all([officer, other])
+        db.commit()
+        monday, tuesday = date(2026, 3, 2), date(2026, 3, 3)
+        noon = datetime.combine(monday, time(12))
+
+        print("\n2️⃣  Lead writes...")
+        lead = Lead(name="Avery Hale", owner_id=officer.id, source="Zillow", stage=LeadStage.NEW,
+                    credit_score=720, created_at=noon)
+        db.add_all([lead, Lead(name="Blake Moss", owner_id=officer.id, source="Website", stage=LeadStage.NEW,
+                               created_at=noon + timedelta(hours=2))])
+        db.commit()
+        check("create counts lead starts, stages and credit pulls", snapshot(db, officer.id) == {
+            (monday, "lead_start", "Zillow"): (1, 0), (monday, "lead_start", "Website"): (1, 0),
+            (monday, "lead_stage", LeadStage.NEW.value): (2, 0), (monday, "credit_pull", ""): (1, 0)})
+
+        lead.stage = LeadStage.PROSPECT
+        db.commit()
+        stages = {key[2]: value[0] for key, value in snapshot(db, officer.id).items() if key[1] == "lead_stage"}
+        check(f"stage change moves the lead between stages {stages}",
+              stages == {LeadStage.NEW.value: 1, LeadStage.PROSPECT.value: 1})
+
+        lead.created_at = datetime.combine(tuesday, time(9))
+        db.commit()
+        days = {key[0] for key in snapshot(db, officer.id) if key[2] in ("Zillow", "")}
+        check(f"moving created_at refreshes the old and the new day {sorted(days)}", days == {tuesday})
+
+        lead.notes = "called back"
+        db.commit()
+        check("writes to other fields leave the rollups alone", (tuesday, "lead_start", "Zillow") in snapshot(db, officer.id))
+
+        print("\n3️⃣  Loan writes...")
+        loan = Loan(loan_number="KPI-1", borrower_name="Avery Hale", amount=400000.0, loan_type="FHA",
+                    stage=LoanStage.PROCESSING, loan_officer_id=officer.id, created_at=noon)
+        db.add(loan)
+        db.commit()
+        check("create counts the application with its volume",
+              snapshot(db, officer.id).get((monday, "loan_app", LoanStage.PROCESSING.value)) == (1, 400000.0))
+
+        loan.stage = LoanStage.FUNDED
+        loan.funded_date = datetime.combine(tuesday, time(15))
+        loan.amount = 410000.0
+        db.commit()
+        rows = snapshot(db, officer.id)
+        check("funding counts the loan on its funded day",
+              rows.get((tuesday, "funded", "FHA")) == (1, 410000.0)
+              and rows.get((monday, "loan_app", LoanStage.FUNDED.value)) == (1, 410000.0)
+              and (monday, "loan_app", LoanStage.PROCESSING.value) not in rows)
+
+        print("\n4️⃣  Deletes and rollbacks...")
+        before = snapshot(db, officer.id)
+        db.add(Lead(name="Casey Rowe", owner_id=officer.id, source="Zillow", created_at=noon))
+        loan.amount = 1.0
+        db.flush()
+        db.rollback()
+        check("a rolled-back write leaves the rollups alone", snapshot(db, officer.id) == before)
+
+        db.delete(loan)
+        db.commit()
+        rows = snapshot(db, officer.id)
+        check("deleting a loan clears its application and funding",
+              not any(key[1] in ("loan_app", "funded") for key in rows))
+        db.delete(db.query(Lead).filter(Lead.name == "Blake Moss").one())
+        db.commit()
+        check("deleting a lead clears its day", not any(key[0] == monday for key in snapshot(db, officer.id)))
+
+        print("\n5️⃣  Rebuild...")
+        for i in range(30):
+            day = noon - timedelta(days=i % 7)
+            db.add(Lead(name=f"Lead {i}", owner_id=officer.id, source=["Zillow", "Website"][i % 2],
+                        credit_score=700 if i % 3 else None, created_at=day))
+            db.add(Loan(loan_number=f"KPI-R{i}", borrower_name=f"Lead {i}", amount=1000.0 * (i + 1),
+                        loan_type="VA", stage=LoanStage.FUNDED if i % 2 else LoanStage.CTC,
+                        funded_date=day + timedelta(days=1) if i % 2 else None,
+                        loan_officer_id=officer.id, created_at=day))
+        db.add(Lead(name="Other Lead", owner_id=other.id, source="Website", created_at=noon))
+        db.commit()
+        maintained = snapshot(db, officer.id)
+        other_rows = snapshot(db, other.id)
+
+        result = rebuild_kpi_rollups(db)
+        check(f"rebuild ({result['rows']} rows) matches what the hooks maintained",
+              result["users"] == 2 and snapshot(db, officer.id) == maintained and snapshot(db, other.id) == other_rows)
+
+        db.query(KPIDailyRollup).delete()
+        db.commit()
+        result = rebuild_kpi_rollups(db, officer.id)
+        check(f"a single-user rebuild restores that user only ({result})",
+              result["users"] == 1 and snapshot(db, officer.id) == maintained and not snapshot(db, other.id))
+
+        print("\n6️⃣  Refresh ranges and upserts...")
+        bounds = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().startswith("SELECT") and "FROM leads" in statement:
+                bounds.extend(p for p in parameters if isinstance(p, (datetime, str)) and str(p)[:4] == "2026")
+
+        summer = monday + timedelta(days=120)
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            refresh_kpi_rollups(db.connection(), officer.id, {monday, tuesday, summer})
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+        db.commit()
+        check(f"days months apart are scanned as separate ranges ({len(bounds)} bounds)",
+              sorted(_day(b) for b in bounds) == [monday, tuesday + timedelta(days=1), summer, summer + timedelta(days=1)])
+
+        key = (monday, "lead_start", "Zillow")
+        existing = db.query(KPIDailyRollup).filter(
+            KPIDailyRollup.user_id == officer.id, KPIDailyRollup.day == monday,
+            KPIDailyRollup.metric == "lead_start", KPIDailyRollup.dimension == "Zillow"
+        ).one()
+        row_id = existing.id
+        existing.count = 99
+        db.add(KPIDailyRollup(user_id=officer.id, day=monday, metric="lead_start", dimension="Fax", count=3))
+        db.commit()
+        db.add(Lead(name="Dana Reed", owner_id=officer.id, source="Zillow", created_at=noon))
+        db.commit()
+        rows = snapshot(db, officer.id)
+        check(f"an existing row is updated in place ({rows.get(key)}), a stale one dropped",
+              rows.get(key) == (maintained[key][0] + 1, 0) and db.get(KPIDailyRollup, row_id).count == rows[key][0]
+              and (monday, "lead_start", "Fax") not in rows)
+    finally:
+        db.close()
+        engine.dispose()
+        os.remove(DB_PATH)
+
+    print("\n" + "=" * 80)
+    print("✅ All daily KPI rollup checks passed" if passed else "❌ Some daily KPI rollup checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_kpi_rollups())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,157 @@
+"""
+Test Lead Duplicate Blocking Index
+Checks candidate generation and upkeep of the duplicate lead index:
+- blocked detection finds the same pairs as scoring every pair
+- phones block and score on the same normalization (last 10 digits)
+- blocks over MAX_BLOCK_SIZE are compared in sorted windows, not skipped
+- lead create/update/delete reach a built index through the flush
+  hooks without a rebuild; rolled-back writes never do
+
+Run with: python backend/test_lead_dedupe_index.py
+"""
+
+import os
+import sys
+import random
+import string
+import asyncio
+import tempfile
+from itertools import combinations
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_lead_dedupe_index.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from main import (
+    Base, engine, SessionLocal, User, Lead, LeadCreate, LeadUpdate, create_lead, update_lead, delete_lead,
+    find_duplicate_leads
+)
+from services import lead_dedupe_index
+from services.lead_dedupe_index import LeadBlockingIndex, lead_index_registry, score_pair
+
+FIRST_NAMES = ["John", "Jon", "Sarah", "Sara", "Michael", "Maria", "Marie", "David", "Linda", "James"]
+LAST_NAMES = ["Smith", "Smyth", "Lopez", "Lopes", "Nguyen", "Brown", "Browne", "Clark", "Clarke", "Reed"]
+
+
+def all_pairs(index: LeadBlockingIndex, threshold: float):
+    """The pre-index detector: score every pair"""
+    found = []
+    for id1, id2 in combinations(sorted(index.records), 2):
+        similarity = score_pair(index.records[id1], index.records[id2])
+        if similarity >= threshold:
+            found.append((id1, id2, similarity))
+    return sorted(found, key=lambda r: (-r[2], r[0], r[1]))
+
+
+async def test_lead_dedupe_index():
+    print("=" * 80)
+    print("LEAD DUPLICATE BLOCKING INDEX TEST")
+    print("=" * 80)
+
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    Base.metadata.create_all(engine)
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    random.seed(11)
+    db = SessionLocal()
+    try:
+        print("\n1️⃣  Blocked detection vs all pairs...")
+        index = LeadBlockingIndex()
+        for i in range(400):
+            first, last = random.choice(FIRST_NAMES), random.choice(LAST_NAMES)
+            email = f"{first}.{last}@example.com".lower() if random.random() < 0.6 else None
+            phone = random.choice([f"555-01{random.randint(0, 3):02d}-000", f"+1 (555) 01{random.randint(0, 3):02d}-000",
+                                   None])
+            index.add(i, f"{first} {last}", email, phone)
+        blocked = index.find_duplicates(0.75)
+        check(f"{len(blocked)} duplicates, same as scoring every pair", blocked == all_pairs(index, 0.75))
+
+        print("\n2️⃣  Phone normalization...")
+        index = LeadBlockingIndex()
+        index.add(1, "Dana Fox", "dana@example.com", "+1 (555) 010-0199")
+        index.add(2, "Dana Fox", "dana@example.com", "555.010.0199")
+        index.add(3, "Dana Fox", None, "N/A")
+        index.add(4, "Dana Fox", None, "none")
+        check("a +1 prefix blocks and scores as the same phone",
+              index.find_duplicates(0.75) == [(1, 2, 1.0)])
+        check("phones without digits never count as a match", score_pair(index.records[3], index.records[4]) == 0.4)
+
+        print("\n3️⃣  Oversized blocks...")
+        original = lead_dedupe_index.MAX_BLOCK_SIZE
+        lead_dedupe_index.MAX_BLOCK_SIZE = 50
+        try:
+            index = LeadBlockingIndex()
+            for i in range(1000):
+                surname = "".join(random.choices(string.ascii_lowercase, k=7))
+                index.add(i, f"Tenant {surname}", None, "555-010-0000")
+            index.add(1000, "Jon Whitfield", None, "555-010-0000")
+            index.add(1001, "John Whitfield", None, "(555) 010-0000")
+            pairs = list(index.candidate_pairs())
+            check(f"{len(pairs)} candidate pairs from a 1002-lead office phone block (all pairs: 501501)",
+                  len(pairs) < 1002 * 50 and len(pairs) == len(set(pairs)))
+            check("pairs are (low, high)", all(id1 < id2 for id1, id2 in pairs))
+            check("near-identical names in the block are still compared", (1000, 1001) in pairs)
+            check("and reported above threshold", (1000, 1001) in [(a, b) for a, b, _ in index.find_duplicates(0.6)])
+        finally:
+            lead_dedupe_index.MAX_BLOCK_SIZE = original
+
+        print("\n4️⃣  Flush hooks keep the index current...")
+        user = User(email="dedupe@example.com", hashed_password="x", full_name="Dedupe Test")
+        db.add(user)
+        db.commit()
+        first = await create_lead(LeadCreate(name="Riley Stone", email="riley@example.com", phone="555-010-0101"),
+                                  db=db, current_user=user)
+        second = await create_lead(LeadCreate(name="Riley Stone", email="riley@example.com", phone="555-010-0101"),
+                                   db=db, current_user=user)
+        check("created duplicates are found",
+              [(d["lead1"].id, d["lead2"].id) for d in find_duplicate_leads(user.id, db)] == [(first.id, second.id)])
+        built = lead_index_registry._indexes[user.id]
+
+        third = await create_lead(LeadCreate(name="Morgan Hale", email="morgan@example.com", phone="555-010-0202"),
+                                  db=db, current_user=user)
+        await update_lead(second.id, LeadUpdate(email="other@example.com", phone="555-010-0303"),
+                          db=db, current_user=user)
+        check("create and update reach the built index", set(built.records) == {first.id, second.id, third.id}
+              and built.records[second.id]["email"] == "other@example.com")
+        check("no duplicates after the update", find_duplicate_leads(user.id, db) == [])
+        check("the index was not rebuilt", lead_index_registry._indexes[user.id] is built)
+
+        lead = db.get(Lead, third.id)
+        lead.email, lead.phone, lead.name = "riley@example.com", "555-010-0101", "Riley Stone"
+        db.flush()
+        db.rollback()
+        check("a rolled-back write never reaches the index", built.records[third.id]["email"] == "morgan@example.com")
+
+        await delete_lead(first.id, db=db, current_user=user)
+        check("delete reaches the index", first.id not in built.records)
+        check("and still no rebuild", find_duplicate_leads(user.id, db) == []
+              and lead_index_registry._indexes[user.id] is built)
+
+        db.execute(Lead.__table__.insert(), [{"name": "Morgan Hale", "email": "morgan@example.com",
+                                              "phone": "555-010-0202", "owner_id": user.id}])
+        db.commit()
+        duplicates = find_duplicate_leads(user.id, db)
+        check("a bulk insert outside the ORM is picked up by the fingerprint",
+              lead_index_registry._indexes[user.id] is not built and len(duplicates) == 1
+              and duplicates[0]["lead1"].id == third.id)
+    finally:
+        db.close()
+        engine.dispose()
+        os.remove(DB_PATH)
+
+    print("\n" + "=" * 80)
+    print("✅ All lead duplicate index checks passed" if passed else "❌ Some lead duplicate index checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_lead_dedupe_index())
+    sys.exit(0 if success else 1)
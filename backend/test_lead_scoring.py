@@ -0,0 +1,175 @@
+"""
+Test Lead Scoring
+Checks the shared scoring rules and the bulk/incremental rescoring job:
+- the SQL CASE score and sentiment match score_lead() for every edge value
+- ORM writes (create, update, reconciliation-style setattr) rescore on flush;
+  writes that do not touch a score input leave the score alone
+- the first job run rescores every stale lead without touching updated_at,
+  later runs only look at leads updated since the previous run
+- imported leads are scored, and /admin/rescore-leads repairs the rest
+
+Run with: python backend/test_lead_scoring.py
+"""
+
+import io
+import os
+import sys
+import json
+import asyncio
+import itertools
+import tempfile
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_lead_scoring.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from fastapi import UploadFile
+from sqlalchemy import select
+from starlette.requests import Request
+
+from main import (
+    Base, engine, SessionLocal, User, Lead, LeadCreate, LeadUpdate, create_lead, update_lead,
+    analyze_data_import, execute_data_import, rescore_leads_endpoint
+)
+from services.lead_scoring import LeadScorer, score_lead, sentiment_for, score_expression, sentiment_expression
+
+CREDIT_SCORES = [None, 0, 540, 619, 620, 679, 680, 739, 740, 810]
+PREAPPROVALS = [None, 0.0, -5.0, 350000.0]
+CONTACTS = [None, "", "x"]
+DTIS = [None, 0.0, 0.2, 0.36, 0.45, 0.5, 0.62]
+
+
+async def test_lead_scoring():
+    print("=" * 80)
+    print("LEAD SCORING TEST")
+    print("=" * 80)
+
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    Base.metadata.create_all(engine)
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    db = SessionLocal()
+    user = User(email="scoring@example.com", hashed_password="x", full_name="Scoring Test")
+    other = User(email="other@example.com", hashed_password="x", full_name="Other User")
+    db.add_all([user, other])
+    db.commit()
+    table = Lead.__table__
+
+    try:
+        print("\n1️⃣  SQL expression parity...")
+        combos = list(itertools.product(CREDIT_SCORES, PREAPPROVALS, CONTACTS, CONTACTS, DTIS))
+        db.execute(table.insert(), [
+            {"name": f"Parity {i}", "owner_id": other.id, "credit_score": credit, "preapproval_amount": preapproval,
+             "email": email, "phone": phone, "debt_to_income": dti}
+            for i, (credit, preapproval, email, phone, dti) in enumerate(combos)
+        ])
+        db.commit()
+        score = score_expression(table.c)
+        rows = db.execute(select(table.c.credit_score, table.c.preapproval_amount, table.c.email, table.c.phone,
+                                 table.c.debt_to_income, score, sentiment_expression(score))
+                          .where(table.c.owner_id == other.id)).all()
+        mismatches = [row for row in rows if (row[5], row[6]) != (score_lead(row), sentiment_for(score_lead(row)))]
+        check(f"{len(rows)} input combinations score the same in SQL and Python ({len(mismatches)} differ)",
+              len(rows) == len(combos) and not mismatches)
+        check("sentiment bands", [sentiment_for(s) for s in (100, 75, 74, 50, 49)] ==
+              ["positive", "positive", "neutral", "neutral", "needs-attention"])
+
+        print("\n2️⃣  ORM writes rescore on flush...")
+        created = await create_lead(LeadCreate(name="Dana Fox", email="dana@example.com", credit_score=600),
+                                    db=db, current_user=user)
+        check(f"new lead scored {created.ai_score} ({created.sentiment})",
+              (created.ai_score, created.sentiment) == (45, "needs-attention"))
+        updated = await update_lead(created.id, LeadUpdate(credit_score=760, phone="555-0100"),
+                                    db=db, current_user=user)
+        check(f"update_lead rescored to {updated.ai_score} ({updated.sentiment})",
+              (updated.ai_score, updated.sentiment) == (90, "positive"))
+        lead = db.get(Lead, created.id)
+        lead.debt_to_income = 0.55  # as reconciliation and merges apply fields
+        db.commit()
+        check(f"setattr of a score input rescored to {lead.ai_score}", lead.ai_score == 75)
+        lead.ai_score = 12
+        db.commit()
+        lead.notes = "called, left voicemail"
+        db.commit()
+        check("writes that do not touch score inputs keep the score", lead.ai_score == 12)
+
+        print("\n3️⃣  Incremental rescoring job...")
+        scorer = LeadScorer(Lead, chunk_size=100)
+        stale_at = db.execute(select(table.c.updated_at).where(table.c.id == created.id)).scalar()
+        db.execute(table.update().where(table.c.owner_id == other.id)
+                   .values(credit_score=800, updated_at=table.c.updated_at))
+        db.commit()
+        # Rows inserted through Core kept the column defaults (50, neutral)
+        expected_stale = sum(1 for _, preapproval, email, phone, dti in combos
+                             if score_lead(SimpleNamespace(credit_score=800, preapproval_amount=preapproval, email=email,
+                                                           phone=phone, debt_to_income=dti)) != 50)
+        first = scorer.run(db)
+        check(f"first run is a full pass: {first['rescored']} stale leads rescored (expected {expected_stale + 1})",
+              first["full"] and first["rescored"] == expected_stale + 1)
+        check("manual score drift repaired", db.get(Lead, created.id).ai_score == 75)
+        check("updated_at untouched by rescoring",
+              db.execute(select(table.c.updated_at).where(table.c.id == created.id)).scalar() == stale_at)
+        mismatched = db.execute(select(table.c.id).where(
+            (table.c.ai_score != score) | (table.c.sentiment != sentiment_expression(score)))).all()
+        check("every lead now matches its inputs", not mismatched)
+        second = scorer.run(db)
+        check("second run finds nothing to do", not second["full"] and second["rescored"] == 0)
+
+        ids = [row.id for row in db.execute(select(table.c.id).where(table.c.owner_id == other.id)
+                                            .order_by(table.c.id).limit(40)).all()]
+        now = datetime.now(timezone.utc)
+        db.execute(table.update().where(table.c.id.in_(ids[:20])).values(credit_score=500, updated_at=now))
+        # Changed long before the last run started, so outside the incremental window
+        db.execute(table.update().where(table.c.id.in_(ids[20:])).values(credit_score=500,
+                                                                          updated_at=now - timedelta(days=1)))
+        db.commit()
+        third = scorer.run(db)
+        check(f"incremental run rescored only the {third['rescored']} recently changed leads",
+              not third["full"] and third["rescored"] == 20)
+        full = scorer.run(db, full=True)
+        check(f"full run catches the rest ({full['rescored']})", full["full"] and full["rescored"] == 20)
+        print(f"   stats: {scorer.stats()}")
+
+        print("\n4️⃣  Imports and the admin endpoint...")
+        csv = b"Name,Email,Phone,Credit Score\nIvy Reed,ivy@example.com,555-0101,760\nJon Park,,,590\n"
+        analysis = await analyze_data_import(file=UploadFile(file=io.BytesIO(csv), filename="leads.csv"),
+                                             current_user=user)
+        request = Request({"type": "http", "method": "POST", "path": "/api/v1/data-import/execute", "headers": []})
+        result = await execute_data_import(request, file=UploadFile(file=io.BytesIO(csv), filename="leads.csv"),
+                                           answers=json.dumps(analysis["default_answers"]),
+                                           mappings=json.dumps(analysis["suggested_mappings"]),
+                                           stream=False, current_user=user, db=db)
+        imported = {lead.name: (lead.ai_score, lead.sentiment) for lead in
+                    db.query(Lead).filter(Lead.owner_id == user.id, Lead.source == "Import")}
+        check(f"{result['inserted']} imported leads scored {imported}",
+              imported == {"Ivy Reed": (90, "positive"), "Jon Park": (40, "needs-attention")})
+
+        db.execute(table.update().where(table.c.owner_id == user.id).values(ai_score=0))
+        db.commit()
+        response = await rescore_leads_endpoint(db=db, current_user=user)
+        untouched = db.query(Lead).filter(Lead.owner_id == other.id, Lead.ai_score == 0).count()
+        check(f"/admin/rescore-leads rescored the user's {response['rescored']} leads only",
+              response["rescored"] == 3 and untouched == 0)
+    finally:
+        db.close()
+        engine.dispose()
+        os.remove(DB_PATH)
+
+    print("\n" + "=" * 80)
+    print("✅ All lead scoring checks passed" if passed else "❌ Some lead scoring checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_lead_scoring())
+    sys.exit(0 if success else 1)
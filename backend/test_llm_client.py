@@ -0,0 +1,124 @@
+"""
+Test Async LLM Client
+Load-tests the shared LLM client with FakeLLMProvider:
+- concurrent completions never exceed the per-provider cap
+- the event loop stays responsive while completions are in flight
+- slow completions raise LLMTimeoutError and are counted
+- latency / token metrics are recorded per purpose
+- streamed completions deliver the first token at model latency, release
+  their slot when the consumer stops early, and record time-to-first-token
+
+Run with: python backend/test_llm_client.py
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ai_providers.llm_client import LLMClient, FakeLLMProvider, LLMTimeoutError, ANTHROPIC
+
+CALLS = 200
+CONCURRENCY = 10
+LATENCY = 0.05
+
+
+async def test_llm_client():
+    print("=" * 80)
+    print("ASYNC LLM CLIENT TEST")
+    print("=" * 80)
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    fake = FakeLLMProvider(latency=LATENCY)
+    client = LLMClient(max_concurrency=CONCURRENCY, timeout_seconds=5)
+    client.register(ANTHROPIC, fake)
+
+    print(f"\n1️⃣  {CALLS} concurrent chats (cap {CONCURRENCY}, {int(LATENCY * 1000)}ms fake latency)...")
+    gaps = []
+
+    async def ticker(stop: asyncio.Event):
+        last = time.perf_counter()
+        while not stop.is_set():
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(stop))
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(
+        client.complete(ANTHROPIC, "fake-model", [{"role": "user", "content": f"Question {i} " * 20}], purpose="smart_chat")
+        for i in range(CALLS)
+    ))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick_task
+
+    expected = CALLS / CONCURRENCY * LATENCY
+    check(f"{len(responses)} responses in {elapsed:.2f}s (ideal {expected:.2f}s)", len(responses) == CALLS and elapsed < expected * 2)
+    check(f"peak {fake.max_in_flight} in flight (cap {CONCURRENCY})", fake.max_in_flight <= CONCURRENCY)
+    check(f"event loop max stall {max(gaps) * 1000:.1f}ms", max(gaps) < 0.05)
+
+    print("\n2️⃣  Timeouts...")
+    slow = FakeLLMProvider(latency=0.5)
+    client.register("slow", slow)
+    try:
+        await client.complete("slow", "fake-model", [{"role": "user", "content": "hi"}], purpose="slow", timeout=0.05)
+        check("slow call timed out", False)
+    except LLMTimeoutError:
+        check("slow call raised LLMTimeoutError", True)
+
+    print("\n3️⃣  Metrics...")
+    metrics = client.get_metrics()["calls"]
+    chat = metrics["anthropic:smart_chat"]
+    check(f"smart_chat calls {chat['calls']}, p50 {chat['latency_p50_ms']}ms, p95 {chat['latency_p95_ms']}ms",
+          chat["calls"] == CALLS and chat["latency_p50_ms"] >= LATENCY * 1000)
+    check(f"tokens in {chat['input_tokens']} / out {chat['output_tokens']}", chat["input_tokens"] > 0 and chat["output_tokens"] > 0)
+    check(f"timeouts recorded ({metrics['slow:slow']['timeouts']})", metrics["slow:slow"]["timeouts"] == 1)
+
+    print("\n4️⃣  Streaming...")
+    words = 40
+    streamer = FakeLLMProvider(latency=LATENCY, token_delay=0.01,
+                               responder=lambda *args: " ".join(f"word{i}" for i in range(words)))
+    client.register("stream", streamer)
+    stream = client.stream("stream", "fake-model", [{"role": "user", "content": "hi"}], purpose="smart_chat")
+    started = time.perf_counter()
+    arrivals = []
+    async for _ in stream:
+        arrivals.append(time.perf_counter() - started)
+    check(f"first token after {arrivals[0] * 1000:.0f}ms, full reply after {arrivals[-1] * 1000:.0f}ms",
+          arrivals[0] < LATENCY * 2 and arrivals[-1] > LATENCY + (words - 1) * 0.01 * 0.8)
+    check(f"{len(arrivals)} deltas reassemble the reply", len(stream.response.text.split()) == words)
+
+    abandoned = client.stream("stream", "fake-model", [{"role": "user", "content": "hi"}], purpose="abandoned")
+    deltas = abandoned.__aiter__()
+    await deltas.__anext__()
+    await deltas.aclose()
+    check(f"early close releases the slot (in flight: {client.get_metrics()['providers']['stream']['in_flight']})",
+          client.get_metrics()["providers"]["stream"]["in_flight"] == 0 and streamer.in_flight == 0)
+    check(f"partial text kept ({abandoned.response.text!r})", abandoned.response.text == "word0 ")
+
+    streamed = client.get_metrics()["calls"]["stream:smart_chat"]
+    check(f"first token p50 {streamed['first_token_p50_ms']}ms < latency p50 {streamed['latency_p50_ms']}ms",
+          streamed["first_token_p50_ms"] < streamed["latency_p50_ms"])
+
+    await client.aclose()
+
+    print("\n" + "=" * 80)
+    print("✅ All LLM client checks passed" if passed else "❌ Some LLM client checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_llm_client())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,108 @@
+"""
+Test Loan -> Lead Links
+Checks how loans are linked to the lead they originated from by borrower name:
+- create_loan links the officer's most recent lead with the same name,
+  ignoring case and runs of whitespace on both sides
+- LIKE wildcards in names match only themselves, other officers' leads never match
+- the backfill links existing loans the same way and leaves linked loans alone
+
+Run with: python backend/test_loan_lead_links.py
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_loan_lead_links.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from main import (
+    Base, engine, SessionLocal, User, Lead, Loan, LoanCreate, create_loan,
+    find_lead_for_borrower, backfill_loan_lead_links
+)
+
+
+async def test_loan_lead_links():
+    print("=" * 80)
+    print("LOAN -> LEAD LINKS TEST")
+    print("=" * 80)
+
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    Base.metadata.create_all(engine)
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    db = SessionLocal()
+    officer = User(email="links@example.com", hashed_password="x", full_name="Link Test")
+    other = User(email="other-links@example.com", hashed_password="x", full_name="Other Officer")
+    db.add_all([officer, other])
+    db.commit()
+    now = datetime.now(timezone.utc)
+
+    def add_lead(owner, name, days_ago):
+        lead = Lead(name=name, owner_id=owner.id, created_at=now - timedelta(days=days_ago))
+        db.add(lead)
+        db.commit()
+        return lead.id
+
+    older = add_lead(officer, "maria lopez", 30)
+    newest = add_lead(officer, "  Maria   Lopez ", 2)
+    add_lead(officer, "Mario Lopez", 1)
+    add_lead(other, "Maria Lopez", 0)
+    wildcard = add_lead(officer, "Ann 100%_Smith", 5)
+    add_lead(officer, "Ann 100xySmith", 1)
+
+    try:
+        print("\n1️⃣  New loans...")
+        check("double spaces in the lead name still match", find_lead_for_borrower(db, officer.id, "Maria Lopez") == newest)
+        check("case and spacing in the borrower name are ignored",
+              find_lead_for_borrower(db, officer.id, "MARIA \t LOPEZ ") == newest)
+        check("LIKE wildcards only match themselves",
+              find_lead_for_borrower(db, officer.id, "ann 100%_smith") == wildcard)
+        check("no match for a partial name or an empty one",
+              find_lead_for_borrower(db, officer.id, "Maria") is None and find_lead_for_borrower(db, officer.id, "  ") is None)
+        check("other officers' leads never match", find_lead_for_borrower(db, other.id, "Mario Lopez") is None)
+
+        loan = await create_loan(LoanCreate(loan_number="LN-1", borrower_name="Maria  Lopez", amount=350000.0),
+                                 db=db, current_user=officer)
+        check("create_loan links the most recent matching lead", loan.lead_id == newest)
+        pinned = await create_loan(LoanCreate(loan_number="LN-2", borrower_name="Maria Lopez", amount=280000.0,
+                                              lead_id=older), db=db, current_user=officer)
+        check("an explicit lead_id is kept", pinned.lead_id == older)
+
+        print("\n2️⃣  Backfill...")
+        db.execute(Loan.__table__.insert(), [
+            {"loan_number": "LN-3", "borrower_name": "maria  LOPEZ", "amount": 1.0, "loan_officer_id": officer.id},
+            {"loan_number": "LN-4", "borrower_name": "Ann 100%_Smith", "amount": 1.0, "loan_officer_id": officer.id},
+            {"loan_number": "LN-5", "borrower_name": "Nobody Known", "amount": 1.0, "loan_officer_id": officer.id},
+        ])
+        db.commit()
+        result = backfill_loan_lead_links(db, officer.id)
+        links = dict(db.query(Loan.loan_number, Loan.lead_id).filter(Loan.loan_officer_id == officer.id))
+        check(f"backfill scanned {result['loans_scanned']} unlinked loans, linked {result['loans_linked']}",
+              result == {"users": 1, "loans_scanned": 3, "loans_linked": 2})
+        check("backfill agrees with create_loan",
+              links == {"LN-1": newest, "LN-2": older, "LN-3": newest, "LN-4": wildcard, "LN-5": None})
+    finally:
+        db.close()
+        engine.dispose()
+        os.remove(DB_PATH)
+
+    print("\n" + "=" * 80)
+    print("✅ All loan -> lead link checks passed" if passed else "❌ Some loan -> lead link checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_loan_lead_links())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,135 @@
+"""
+Test Local Vector Store
+Checks the memory-mapped store's write path and graph upkeep:
+- upserts write in a worker thread, one at a time per namespace, and
+  concurrent upserts all land in the record log
+- re-upserting an ID with a new vector relinks its HNSW node, so graph
+  search finds it by the new vector; an unchanged re-upsert relinks nothing
+- a vector of the wrong dimension is rejected before anything is written,
+  and the write-behind queue drops it instead of retrying it forever
+
+Run with: python backend/test_local_vector_store.py
+"""
+
+import os
+import sys
+import shutil
+import asyncio
+import tempfile
+import threading
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from integrations.embeddings import CachedEmbedder, HashingEmbedder
+from integrations.local_vector_store import LocalVectorStore, _Namespace
+from integrations.pinecone_service import VectorMemoryService
+from integrations.vector_store import VectorDimensionError
+
+DIM = 32
+ROWS = 2000
+CHANGED = 200
+
+
+def records(ids, vectors):
+    return [(f"vec_{i}", vector.tolist(), {"row": int(i)}) for i, vector in zip(ids, vectors)]
+
+
+async def test_local_vector_store():
+    print("=" * 80)
+    print("LOCAL VECTOR STORE TEST")
+    print("=" * 80)
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    path = tempfile.mkdtemp(prefix="local_vector_store_")
+    rng = np.random.default_rng(5)
+    write = _Namespace.write
+    writers = []
+
+    def tracked(ns, vectors):
+        writers.append(threading.current_thread() is threading.main_thread())
+        return write(ns, vectors)
+
+    _Namespace.write = tracked
+    try:
+        print("\n1️⃣  Upserts off the event loop...")
+        store = LocalVectorStore(path, search="hnsw", hnsw_ef=64)
+        vectors = rng.standard_normal((ROWS, DIM)).astype(np.float32)
+        batches = [records(range(start, start + 100), vectors[start:start + 100]) for start in range(0, ROWS, 100)]
+        await asyncio.gather(*(store.upsert("user_1", batch) for batch in batches))
+        check(f"{len(writers)} writes, none on the event loop thread", len(writers) == 20 and not any(writers))
+        with open(os.path.join(path, "user_1", "records.jsonl")) as f:
+            lines = sum(1 for _ in f)
+        check(f"concurrent upserts all landed ({await store.count('user_1')} rows, {lines} record lines)",
+              await store.count("user_1") == ROWS and lines == ROWS)
+        reopened = LocalVectorStore(path, search="exact")
+        check("the namespace reloads with every row", await reopened.count("user_1") == ROWS)
+        reopened.close()
+
+        print("\n2️⃣  Re-upserts relink the graph...")
+        await store.build_index("user_1")
+        ns = store._namespace("user_1")
+        changed = rng.choice(ROWS, CHANGED, replace=False)
+        await store.upsert("user_1", records(changed[:100], vectors[changed[:100]]))
+        check("an unchanged re-upsert relinks nothing", not ns.relink)
+
+        fresh = rng.standard_normal((CHANGED, DIM)).astype(np.float32)
+        await store.upsert("user_1", records(changed, fresh))
+        check(f"{len(ns.relink)} changed rows queued for relinking", len(ns.relink) == CHANGED)
+        await store.build_index("user_1")
+        check("relinking done by the indexing thread", not ns.relink and ns.graph.nodes == ROWS)
+        found = sum(store.search_rows("user_1", vector.tolist(), 1)[0][1] == row for row, vector in zip(changed, fresh))
+        # Left on the old vector's links, about half are unreachable by the new one
+        check(f"graph search finds {found}/{CHANGED} re-upserted rows by their new vector", found >= CHANGED * 0.95)
+        check("no node links to itself",
+              all(node not in links for layer in ns.graph.layers for node, links in layer.items()))
+
+        print("\n3️⃣  Dimension mismatches...")
+        writes = len(writers)
+        try:
+            await store.upsert("user_1", records([ROWS], rng.standard_normal((1, DIM + 1))))
+            rejected = False
+        except VectorDimensionError:
+            rejected = True
+        check("a wrong-dimension vector is rejected", rejected and await store.count("user_1") == ROWS)
+        try:
+            await store.upsert("user_2", records([0, 1], [np.ones(DIM), np.ones(DIM + 1)]))
+            rejected = False
+        except VectorDimensionError:
+            rejected = True
+        check("a mixed first batch creates nothing",
+              rejected and not os.path.exists(os.path.join(path, "user_2")) and len(writers) == writes + 2)
+
+        memory = VectorMemoryService(store=store, embedder=CachedEmbedder(HashingEmbedder(DIM * 2)))
+        await memory.store_conversation(1, "User: embedded with another model", memory_id=1)
+        await memory.store_conversation(3, "User: a fresh namespace", memory_id=2)
+        await memory.flush()
+        links = []
+
+        async def record(written):
+            links.extend(written)
+
+        await memory.record_written(record)
+        check(f"the queue drops rejected vectors ({memory.pending_count()} left queued)", memory.pending_count() == 0)
+        check(f"only the written vector is linked {links}", [memory_id for memory_id, _ in links] == [2])
+        store.close()
+    finally:
+        _Namespace.write = write
+        shutil.rmtree(path, ignore_errors=True)
+
+    print("\n" + "=" * 80)
+    print("✅ All local vector store checks passed" if passed else "❌ Some local vector store checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_local_vector_store())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,160 @@
+"""
+Test Mailbox Delta Sync
+Runs MailboxSyncEngine against a local stub Graph server to verify:
+- delta pagination is followed to completion (no 50-message cap)
+- the deltaLink cursor is stored on the OAuth token row
+- a follow-up sync only fetches messages added since the cursor
+- duplicates are filtered with one batched query per sync
+- an expired cursor (410 Gone) falls back to a full resync without re-ingesting
+
+Run with: python backend/test_mailbox_delta_sync.py
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_mailbox_delta_sync.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from main import Base, User, MicrosoftOAuthToken, IncomingDataEvent, filter_unprocessed_microsoft_emails
+from services.mailbox_sync_engine import MailboxSyncEngine
+from tests.stub_graph_server import StubGraphServer
+
+
+async def fake_process_email(email_data: dict, user_id: int, db, deduplicated: bool = False):
+    """Stand-in for process_microsoft_email_to_dre without the LLM calls"""
+    db.add(IncomingDataEvent(
+        source="microsoft365",
+        external_message_id=email_data["id"],
+        subject=email_data.get("subject"),
+        raw_text=email_data.get("body", {}).get("content"),
+        user_id=user_id,
+        processed=False,
+    ))
+    db.commit()
+    return {"status": "success"}
+
+
+async def test_delta_sync():
+    print("=" * 80)
+    print("MAILBOX DELTA SYNC TEST")
+    print("=" * 80)
+
+    engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    dedupe_queries = []
+
+    def count_dedupe(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "incoming_data_events.external_message_id" in statement:
+            dedupe_queries.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count_dedupe)
+
+    db = session_factory()
+    user = User(email="delta@example.com", hashed_password="x", full_name="Delta Test")
+    db.add(user)
+    db.commit()
+    token = MicrosoftOAuthToken(
+        user_id=user.id,
+        access_token="stub-access",
+        refresh_token="stub-refresh",
+        token_expires_at=datetime.now(timezone.utc) + timedelta(hours=1),
+        sync_enabled=True,
+        sync_folder="Inbox",
+    )
+    db.add(token)
+    db.commit()
+    token_id, user_id = token.id, user.id
+    db.close()
+
+    server = StubGraphServer()
+    server.start()
+    sync_engine = MailboxSyncEngine(
+        session_factory=session_factory,
+        token_model=MicrosoftOAuthToken,
+        process_email=fake_process_email,
+        decrypt_token=lambda value: value,
+        encrypt_token=lambda value: value,
+        filter_new_emails=filter_unprocessed_microsoft_emails,
+        max_concurrency=2,
+        interval_seconds=60,
+        page_size=25,
+        graph_base_url=server.base_url,
+    )
+
+    def stored_cursor():
+        session = session_factory()
+        try:
+            return session.query(MicrosoftOAuthToken).get(token_id).mail_delta_link
+        finally:
+            session.close()
+
+    def event_count():
+        session = session_factory()
+        try:
+            return session.query(IncomingDataEvent).filter(IncomingDataEvent.user_id == user_id).count()
+        finally:
+            session.close()
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    try:
+        print("\n1️⃣  Initial sync of a 120-message inbox (page size 25)...")
+        server.add_messages(120)
+        dedupe_queries.clear()
+        result = await sync_engine.sync_user(token_id)
+        check(f"fetched {result['fetched']} / ingested {result['ingested']} (expected 120)", result["ingested"] == 120)
+        check(f"followed {len(server.requests)} pages (expected 5)", len(server.requests) == 5)
+        check("delta cursor stored on token row", "$deltatoken=120" in (stored_cursor() or ""))
+        check(f"duplicate check used {len(dedupe_queries)} query (expected 1)", len(dedupe_queries) == 1)
+
+        print("\n2️⃣  Incremental sync after 7 new messages...")
+        server.add_messages(7)
+        server.requests.clear()
+        result = await sync_engine.sync_user(token_id)
+        check(f"fetched {result['fetched']} changed messages (expected 7)", result["fetched"] == 7)
+        check(f"single delta request (got {len(server.requests)})", len(server.requests) == 1)
+        check(f"{event_count()} events stored (expected 127)", event_count() == 127)
+
+        print("\n3️⃣  Quiet inbox...")
+        result = await sync_engine.sync_user(token_id)
+        check(f"nothing re-downloaded (fetched {result['fetched']})", result["fetched"] == 0)
+
+        print("\n4️⃣  Expired cursor forces a resync...")
+        server.expire_cursors()
+        server.add_messages(3)
+        result = await sync_engine.sync_user(token_id)
+        check(f"resync fetched {result['fetched']}, new {result['new']} (expected 130 / 3)",
+              result["fetched"] == 130 and result["new"] == 3)
+        check(f"{event_count()} events stored, no duplicates (expected 130)", event_count() == 130)
+    finally:
+        await sync_engine.aclose()
+        server.stop()
+        event.remove(engine, "before_cursor_execute", count_dedupe)
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+
+    print("\n" + "=" * 80)
+    print("✅ All delta sync checks passed" if passed else "❌ Some delta sync checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_delta_sync())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,121 @@
+"""
+Test Memory Access Buffer
+Checks the coalesced ConversationMemory access tracking used by smart chat:
+- recording retrieved memories issues no SQL
+- one flush writes every buffered memory with a single executemany UPDATE
+- access counts add to existing values and keep the latest access time
+- a failed flush keeps the counts for the next one
+
+Run with: python backend/test_memory_access_buffer.py
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+from datetime import datetime, timedelta
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_memory_access_buffer.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import event
+
+from main import Base, engine, SessionLocal, User, ConversationMemory, flush_memory_access, memory_access
+
+MEMORIES = 10
+RETRIEVALS = 50
+
+
+async def test_memory_access_buffer():
+    print("=" * 80)
+    print("MEMORY ACCESS BUFFER TEST")
+    print("=" * 80)
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    db = SessionLocal()
+    user = User(email="memory@example.com", hashed_password="x", full_name="Memory Test", role="loan_officer")
+    db.add(user)
+    db.commit()
+    for i in range(MEMORIES):
+        db.add(ConversationMemory(user_id=user.id, conversation_summary=f"memory {i}",
+                                  pinecone_id=f"conv_{user.id}_{i}", access_count=3 if i == 0 else None))
+    db.commit()
+    ids = [f"conv_{user.id}_{i}" for i in range(MEMORIES)]
+    db.close()
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.lstrip().split()[0].upper())
+
+    event.listen(engine, "before_cursor_execute", record)
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    try:
+        print(f"\n1️⃣  Recording {RETRIEVALS} retrievals of {MEMORIES} memories...")
+        base = datetime(2026, 1, 1, 12, 0)
+        statements.clear()
+        for i in range(RETRIEVALS):
+            # Each retrieval returns five memories, like top_k=5 in smart chat
+            memory_access.record((ids[(i + j) % MEMORIES] for j in range(5)), base + timedelta(seconds=i))
+        check(f"recording issued {len(statements)} queries", not statements)
+        check(f"{memory_access.pending()} memories pending", memory_access.pending() == MEMORIES)
+
+        print("\n2️⃣  Flush...")
+        check("flush wrote every memory", flush_memory_access() == MEMORIES)
+        check(f"flush issued {statements.count('UPDATE')} UPDATE", statements.count("UPDATE") == 1)
+
+        session = SessionLocal()
+        rows = {row.pinecone_id: row for row in session.query(ConversationMemory).all()}
+        session.close()
+        total = sum(row.access_count for row in rows.values())
+        check(f"access counts total {total}", total == RETRIEVALS * 5 + 3)
+        check("existing count is added to", rows[ids[0]].access_count == 3 + RETRIEVALS * 5 // MEMORIES)
+        check("latest access time kept", rows[ids[0]].last_accessed_at == base + timedelta(seconds=RETRIEVALS - 1))
+
+        stats = memory_access.stats()
+        check(f"writes_saved = {stats['writes_saved']}", stats["writes_saved"] == RETRIEVALS * 5 - 1)
+        check("nothing pending after flush", stats["pending"] == 0 and flush_memory_access() == 0)
+
+        print("\n3️⃣  Failed flush...")
+        memory_access.record([ids[1]], base)
+
+        class BrokenSession:
+            def execute(self, *args, **kwargs):
+                raise RuntimeError("database unavailable")
+
+            def rollback(self):
+                pass
+
+        try:
+            memory_access.flush(BrokenSession(), ConversationMemory)
+        except RuntimeError:
+            pass
+        memory_access.record([ids[1]], base)
+        check("counts kept for the next flush", memory_access.pending() == 1 and flush_memory_access() == 1)
+        session = SessionLocal()
+        count = session.query(ConversationMemory).filter_by(pinecone_id=ids[1]).one().access_count
+        session.close()
+        check(f"retried accesses written ({count})", count == RETRIEVALS * 5 // MEMORIES + 2)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        Base.metadata.drop_all(engine)
+
+    print("\n" + "=" * 80)
+    print("✅ All memory access buffer checks passed" if passed else "❌ Some memory access buffer checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_memory_access_buffer())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,121 @@
+"""
+Test Principal Cache
+Checks the authenticated-principal cache behind get_current_user:
+- repeat JWT / API-key requests are served without database queries
+- the API-key auth path issues no writes; last_used_at is flushed in a batch
+- revoking a key or changing a user invalidates the cached principal
+
+Run with: python backend/test_principal_cache.py
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_principal_cache.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import event
+
+from main import (
+    Base, engine, SessionLocal, User, ApiKey, create_access_token,
+    resolve_api_key_principal, resolve_jwt_principal, flush_api_key_usage, principal_cache
+)
+
+
+async def test_principal_cache():
+    print("=" * 80)
+    print("PRINCIPAL CACHE TEST")
+    print("=" * 80)
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    db = SessionLocal()
+    user = User(email="auth@example.com", hashed_password="x", full_name="Auth Test", role="loan_officer")
+    db.add(user)
+    db.commit()
+    api_key = ApiKey(key="sk_test_principal_cache", name="Zapier", user_id=user.id, is_active=True)
+    db.add(api_key)
+    db.commit()
+    user_id, key_id = user.id, api_key.id
+    db.close()
+    principal_cache.clear()
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.lstrip().split()[0].upper())
+
+    event.listen(engine, "before_cursor_execute", record)
+    token = create_access_token({"sub": "auth@example.com"})
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    def authenticate(resolver, credential):
+        session = SessionLocal()
+        try:
+            principal = resolver(session, credential)
+            return principal.id if principal is not None else None
+        finally:
+            session.close()
+
+    try:
+        print("\n1️⃣  JWT requests...")
+        statements.clear()
+        check("first request resolves the user", authenticate(resolve_jwt_principal, token) == user_id)
+        first = len(statements)
+        statements.clear()
+        for _ in range(20):
+            authenticate(resolve_jwt_principal, token)
+        check(f"20 repeat requests ran {len(statements)} queries (first ran {first})", len(statements) == 0)
+
+        print("\n2️⃣  API-key requests...")
+        statements.clear()
+        for _ in range(20):
+            check_id = authenticate(resolve_api_key_principal, "sk_test_principal_cache")
+        check("API key resolves the user", check_id == user_id)
+        check(f"auth path issued no writes ({statements})", not any(s in ("UPDATE", "INSERT") for s in statements))
+        statements.clear()
+        check("one key flushed", flush_api_key_usage() == 1)
+        check(f"flush issued {statements.count('UPDATE')} UPDATE", statements.count("UPDATE") == 1)
+
+        session = SessionLocal()
+        check("last_used_at persisted", session.query(ApiKey).get(key_id).last_used_at is not None)
+        session.close()
+
+        print("\n3️⃣  Invalidation...")
+        session = SessionLocal()
+        session.query(ApiKey).get(key_id).is_active = False
+        session.commit()
+        session.close()
+        check("revoked key is rejected immediately", authenticate(resolve_api_key_principal, "sk_test_principal_cache") is None)
+
+        session = SessionLocal()
+        principal = resolve_jwt_principal(session, token)
+        principal.full_name = "Renamed"
+        session.commit()
+        session.close()
+        session = SessionLocal()
+        check("user change is visible on the next request", resolve_jwt_principal(session, token).full_name == "Renamed")
+        session.close()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        Base.metadata.drop_all(engine)
+
+    print("\n" + "=" * 80)
+    print("✅ All principal cache checks passed" if passed else "❌ Some principal cache checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_principal_cache())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,221 @@
+"""
+Test Sliding-Window Rate Limiter
+Checks the RateLimitMiddleware counters in security_middleware.py:
+- the window rolls over: the previous bucket's count decays across the
+  next window and anything older than one bucket stops counting
+- Retry-After is the first whole second a request fits again, and the
+  429 response carries it in the header and the body
+- the Redis backend (RedisCacheService.sliding_window_hit against a client
+  that runs the Lua script's steps) makes the same decisions as the
+  in-memory backend, and falls back to it when Redis is down
+
+Run with: python backend/test_rate_limiter.py
+"""
+
+import os
+import sys
+import copy
+import random
+import asyncio
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+import security_middleware
+from security_middleware import (
+    RateLimit, RouteGroup, RateLimitMiddleware, InMemoryRateLimitBackend, RedisRateLimitBackend
+)
+from services.redis_cache_service import RedisCacheService, SLIDING_WINDOW_LUA
+
+MINUTE = RateLimit(10, 60)
+
+
+class ScriptedRedis:
+    """Just enough of a redis client for SLIDING_WINDOW_LUA, one step per redis.call"""
+
+    def __init__(self):
+        self.values = {}
+        self.expires = {}
+        self.now = 0.0
+
+    def register_script(self, script):
+        assert script == SLIDING_WINDOW_LUA
+        return self.run
+
+    def get(self, key):
+        if key in self.expires and self.expires[key] <= self.now:
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+        return self.values.get(key)
+
+    def run(self, keys, args):
+        self.now = now = float(args[0])
+        for i in range(len(keys) // 2):
+            window, limit = args[2 * i + 1], args[2 * i + 2]
+            previous = self.get(keys[2 * i]) or 0
+            current = self.get(keys[2 * i + 1]) or 0
+            weight = 1 - (now % window) / window
+            if previous * weight + current + 1 > limit:
+                return [i + 1, previous, current]
+        for i in range(len(keys) // 2):
+            key = keys[2 * i + 1]
+            self.values[key] = (self.get(key) or 0) + 1
+            self.expires[key] = now + 2 * args[2 * i + 1]
+        return [0, 0, 0]
+
+
+def scripted_redis_service() -> RedisCacheService:
+    service = RedisCacheService.__new__(RedisCacheService)
+    service.client = ScriptedRedis()
+    service._sliding_window_script = None
+    return service
+
+
+class UnreachableRedis:
+    def sliding_window_hit(self, key, limits, now):
+        raise ConnectionError("Connection refused")
+
+
+def allowed_at(backend: InMemoryRateLimitBackend, key: str, limits, now: float) -> bool:
+    """Would a request at `now` pass, without counting it"""
+    return copy.deepcopy(backend).check_and_count(key, limits, now) is None
+
+
+def make_request(ip: str, path: str) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": b"",
+        "headers": [(b"x-forwarded-for", ip.encode())],
+        "server": ("testserver", 80),
+        "scheme": "http",
+    })
+
+
+async def call_next(request):
+    return Response("ok")
+
+
+async def test_rate_limiter():
+    print("=" * 80)
+    print("SLIDING-WINDOW RATE LIMITER TEST")
+    print("=" * 80)
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    random.seed(3)
+
+    print("\n1️⃣  Window rollover...")
+    backend = InMemoryRateLimitBackend()
+    start = 6000.0  # bucket 100 of the 60s window
+    results = [backend.check_and_count("k", [MINUTE], start + i) is None for i in range(11)]
+    check("10 requests fit in a fresh window, the 11th does not", results == [True] * 10 + [False])
+    check("a denied request is not counted", backend.counters["k"][0] == [100, 0, 10])
+    check("the full previous bucket still blocks at the start of the next",
+          not allowed_at(backend, "k", [MINUTE], start + 60))
+    admitted = sum(backend.check_and_count("k", [MINUTE], start + 90) is None for _ in range(10))
+    check(f"halfway through the next window half the previous count remains ({admitted} admitted)", admitted == 5)
+    check("counters rolled forward", backend.counters["k"][0] == [101, 10, 5])
+    admitted = sum(backend.check_and_count("k", [MINUTE], start + 200) is None for _ in range(12))
+    check(f"a bucket skipped entirely no longer counts ({admitted} admitted)",
+          admitted == 10 and backend.counters["k"][0] == [103, 0, 10])
+    backend.check_and_count("idle", [MINUTE], start)
+    backend.check_and_count("k", [MINUTE], start + 400)
+    check("idle keys are swept", "idle" not in backend.counters)
+
+    print("\n2️⃣  Retry-After...")
+    exact = late = 0
+    for _ in range(300):
+        limit = RateLimit(random.randint(1, 30), random.choice([10, 60, 3600]))
+        backend = InMemoryRateLimitBackend(sweep_interval_seconds=10 ** 9)
+        now = random.uniform(0, 10 ** 6)
+        # Random traffic over the last two windows, then a denied request
+        times = sorted(now - random.uniform(0, 2 * limit.window_seconds) for _ in range(3 * limit.limit))
+        for t in times:
+            backend.check_and_count("k", [limit], t)
+        while backend.check_and_count("k", [limit], now) is None:
+            now += random.uniform(0, limit.window_seconds / limit.limit)
+        _, retry_after = backend.check_and_count("k", [limit], now)
+        exact += allowed_at(backend, "k", [limit], now + retry_after)
+        late += retry_after > 1 and allowed_at(backend, "k", [limit], now + retry_after - 1)
+    check(f"a request fits again after Retry-After ({exact}/300)", exact == 300)
+    check(f"and not a second earlier ({late} too late)", late == 0)
+
+    limits = (RateLimit(3, 10), RateLimit(5, 3600, "Hourly rate limit exceeded. Please try again later."))
+    middleware = RateLimitMiddleware(
+        None, route_groups=[RouteGroup("auth", ("/token",), limits)], backend=InMemoryRateLimitBackend()
+    )
+    clock = [36000.0]
+    original_time = security_middleware.time.time
+    security_middleware.time.time = lambda: clock[0]
+    try:
+        statuses = []
+        for _ in range(4):
+            statuses.append((await middleware.dispatch(make_request("10.0.0.1", "/token"), call_next)).status_code)
+            clock[0] += 1
+        denied = await middleware.dispatch(make_request("10.0.0.1", "/token"), call_next)
+        check(f"the route group's limit applies {statuses}", statuses == [200, 200, 200, 429])
+        expected = middleware.backend.check_and_count("auth:10.0.0.1", limits, clock[0])[1]
+        check(f"the 429 carries Retry-After {denied.headers.get('retry-after')} (expected {expected})",
+              denied.status_code == 429 and denied.headers.get("retry-after") == str(expected)
+              and f'"retry_after":{expected}' in denied.body.decode())
+        other = await middleware.dispatch(make_request("10.0.0.2", "/token"), call_next)
+        check("other clients are unaffected", other.status_code == 200)
+
+        clock[0] += 20
+        statuses = [(await middleware.dispatch(make_request("10.0.0.1", "/token"), call_next)).status_code
+                    for _ in range(3)]
+        hourly = await middleware.dispatch(make_request("10.0.0.1", "/token"), call_next)
+        check(f"the hourly limit takes over once the short window clears {statuses}",
+              statuses == [200, 200, 429] and b"Hourly" in hourly.body
+              and int(hourly.headers["retry-after"]) > 3000)
+    finally:
+        security_middleware.time.time = original_time
+
+    print("\n3️⃣  Redis and in-memory backends agree...")
+    memory = InMemoryRateLimitBackend()
+    service = scripted_redis_service()
+    redis = RedisRateLimitBackend(service)
+    groups = {"auth": (RateLimit(5, 10), RateLimit(20, 60)), "ai": (RateLimit(3, 1), RateLimit(40, 3600))}
+    now = 50000.0
+    steps = mismatches = denied = 0
+    for _ in range(3000):
+        now += random.expovariate(4.0)
+        group = random.choice(list(groups))
+        key = f"{group}:10.0.0.{random.randint(1, 4)}"
+        expected = await memory.hit(key, groups[group], now)
+        result = await redis.hit(key, groups[group], now)
+        steps += 1
+        mismatches += result != expected
+        denied += expected is not None
+    check(f"{steps} hits, {denied} denied, {mismatches} disagreements", mismatches == 0 and 0 < denied < steps)
+    check("redis never fell back", not redis.fallback.counters)
+    written = len(service.client.values)
+    live = [key for key in list(service.client.values) if service.client.get(key) is not None]
+    # At most three buckets per client and limit outlive their 2-window expiry
+    check(f"expired buckets drop out of redis ({len(live)} live of {written} written)",
+          len(live) <= 3 * 4 * len(groups) * 2 < written)
+
+    fallback = RedisRateLimitBackend(UnreachableRedis())
+    results = [await fallback.hit("auth:10.0.0.9", groups["auth"], now + i / 10) for i in range(7)]
+    memory_results = [await memory.hit("auth:10.0.0.9", groups["auth"], now + i / 10) for i in range(7)]
+    check("an unreachable redis falls back to in-process limits",
+          results == memory_results and results[:5] == [None] * 5 and results[5] is not None)
+
+    print("\n" + "=" * 80)
+    print("✅ All rate limiter checks passed" if passed else "❌ Some rate limiter checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_rate_limiter())
+    sys.exit(0 if success else 1)
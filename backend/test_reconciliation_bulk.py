@@ -0,0 +1,165 @@
+"""
+Test Bulk Reconciliation
+Checks POST /api/v1/reconciliation/bulk against SQLite:
+- hundreds of approvals load items and loans/leads in a fixed number of queries
+- one commit per target loan or lead, newest item's values win
+- a bad field value fails only that item; unmatched, reviewed and unknown IDs are reported
+- rejections record training labels
+- the streamed response sends progress per entity and a done summary
+
+Run with: python backend/test_reconciliation_bulk.py
+"""
+
+import os
+import sys
+import json
+import asyncio
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_reconciliation_bulk.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from main import (
+    Base, User, Lead, Loan, IncomingDataEvent, ExtractedData, AITrainingEvent,
+    ReconciliationBulkAction, bulk_reconciliation
+)
+
+LOANS = 40
+LEADS = 20
+ITEMS_PER_ENTITY = 5
+
+
+def make_request(stream: bool = False) -> Request:
+    headers = [(b"accept", b"text/event-stream")] if stream else []
+    return Request({"type": "http", "method": "POST", "path": "/api/v1/reconciliation/bulk", "headers": headers})
+
+
+async def test_reconciliation_bulk():
+    print("=" * 80)
+    print("BULK RECONCILIATION TEST")
+    print("=" * 80)
+
+    engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.lstrip().split()[0].upper())
+
+    commits = []
+    db = session_factory()
+    event.listen(db, "after_commit", lambda session: commits.append(1))
+    try:
+        user = User(email="bulk@example.com", hashed_password="x", full_name="Bulk Test")
+        db.add(user)
+        db.commit()
+        loans = [Loan(loan_number=f"LN-{i}", borrower_name=f"Borrower {i}", amount=300000, rate=7.0,
+                      loan_officer_id=user.id) for i in range(LOANS)]
+        leads = [Lead(name=f"Lead {i}", owner_id=user.id) for i in range(LEADS)]
+        db.add_all(loans + leads)
+        db.commit()
+
+        created = datetime.now(timezone.utc) - timedelta(hours=1)
+
+        def add_item(entity_type, entity_id, fields, status="pending_review"):
+            email = IncomingDataEvent(source="microsoft365", subject="Update", user_id=user.id)
+            db.add(email)
+            db.flush()
+            item = ExtractedData(event_id=email.id, category=f"{entity_type}_update", fields=fields,
+                                 match_entity_type=entity_type, match_entity_id=entity_id,
+                                 ai_confidence=0.9, status=status, created_at=created)
+            db.add(item)
+            db.flush()
+            return item.id
+
+        approve_ids = []
+        for step in range(ITEMS_PER_ENTITY):
+            for loan in loans:
+                approve_ids.append(add_item("loan", loan.id, {
+                    "rate": {"value": 6.0 + step / 10, "confidence": 0.95},
+                    "loan_amount": {"value": 400000 + step, "confidence": 0.95},
+                }))
+            for lead in leads:
+                approve_ids.append(add_item("lead", lead.id, {"credit_score": {"value": 700 + step, "confidence": 0.9}}))
+        bad_id = add_item("loan", loans[0].id, {"rate": {"value": "not a rate", "confidence": 0.95}})
+        unmatched_id = add_item("loan", 999999, {"rate": {"value": 5.0, "confidence": 0.95}})
+        reviewed_id = add_item("lead", leads[0].id, {}, status="approved")
+        reject_ids = [add_item("lead", leads[1].id, {"credit_score": {"value": 640, "confidence": 0.7},
+                                                      "loan_amount": {"value": 1, "confidence": 0.5}})
+                      for _ in range(10)]
+        db.commit()
+        db.refresh(user)
+
+        print(f"\n1️⃣  Approving {len(approve_ids)} items for {LOANS + LEADS} entities...")
+        event.listen(engine, "before_cursor_execute", record)
+        commits.clear()
+        statements.clear()
+        ids = approve_ids + [bad_id, unmatched_id, reviewed_id, 424242]
+        response = await bulk_reconciliation(ReconciliationBulkAction(extracted_data_ids=ids, action="approve"),
+                                             make_request(), current_user=user, db=db)
+        summary = response["summary"]
+        print(f"   summary: {summary}")
+        check(f"{summary['approved']} approved", summary["approved"] == len(approve_ids))
+        check(f"{statements.count('SELECT')} SELECTs (items + loans + leads)", statements.count("SELECT") == 3)
+        check(f"{len(commits)} commits, one per entity plus the unmatched group", len(commits) == LOANS + LEADS + 1)
+        results = {item["id"]: item for item in response["results"]}
+        check("results in request order", [item["id"] for item in response["results"]] == ids)
+        check("bad value fails only that item",
+              results[bad_id]["status"] == "failed" and "Invalid field value" in results[bad_id]["error"])
+        check("unmatched loan reported", results[unmatched_id]["status"] == "failed")
+        check("already reviewed skipped", results[reviewed_id]["status"] == "skipped")
+        check("unknown ID reported", results[424242]["status"] == "not_found")
+        event.remove(engine, "before_cursor_execute", record)
+
+        db.expire_all()
+        check("newest rate wins on every loan", all(loan.rate == 6.4 for loan in loans))
+        check("loan_amount applied to the amount column", all(loan.amount == 400004 for loan in loans))
+        check("newest credit score wins on every lead", all(lead.credit_score == 704 for lead in leads))
+        statuses = {status for (status,) in db.query(ExtractedData.status).filter(ExtractedData.id.in_(approve_ids))}
+        check("approved items marked approved", statuses == {"approved"})
+
+        print("\n2️⃣  Streaming rejections...")
+        response = await bulk_reconciliation(
+            ReconciliationBulkAction(extracted_data_ids=reject_ids + [bad_id], action="reject", reason="Wrong borrower"),
+            make_request(stream=True), current_user=user, db=db
+        )
+        events = []
+        async for chunk in response.body_iterator:
+            name, data = chunk.strip().split("\n")
+            events.append((name.split(": ", 1)[1], json.loads(data.split(": ", 1)[1])))
+        names = [name for name, _ in events]
+        check(f"events {names}", names[-1] == "done" and set(names[:-1]) == {"progress"})
+        check("progress counts up to the total", events[-2][1]["processed"] == len(reject_ids) + 1)
+        check(f"done summary {events[-1][1]}", events[-1][1]["rejected"] == len(reject_ids) + 1)
+        labels = db.query(AITrainingEvent).filter(AITrainingEvent.extracted_data_id.in_(reject_ids)).count()
+        check(f"{labels} training labels recorded", labels == len(reject_ids) * 2)
+    finally:
+        db.close()
+        engine.dispose()
+        os.remove(DB_PATH)
+
+    print("\n" + "=" * 80)
+    print("✅ All bulk reconciliation checks passed" if passed else "❌ Some bulk reconciliation checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_reconciliation_bulk())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,155 @@
+"""
+Test Reconciliation Queue API
+Checks /api/v1/reconciliation/pending and /pending/count against SQLite:
+- keyset pages cover every pending item once, newest first
+- each page is one query, with the email subject/sender included
+- category and confidence band filters are applied in the query
+- the count endpoint matches the list in one aggregate query
+- other users' and already-reviewed items are excluded
+
+Run with: python backend/test_reconciliation_queue.py
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_reconciliation_queue.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from main import (
+    Base, User, IncomingDataEvent, ExtractedData,
+    get_pending_reconciliation, get_pending_reconciliation_count
+)
+
+ITEMS = 125
+CATEGORIES = ["loan_update", "lead_update", "portfolio_update"]
+CONFIDENCES = [0.95, 0.7, 0.4, None]
+
+
+def band(confidence):
+    if confidence is not None and confidence >= 0.85:
+        return "high"
+    if confidence is not None and confidence >= 0.65:
+        return "medium"
+    return "low"
+
+
+async def test_reconciliation_queue():
+    print("=" * 80)
+    print("RECONCILIATION QUEUE TEST")
+    print("=" * 80)
+
+    engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    selects = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append(statement)
+
+    db = session_factory()
+    try:
+        user = User(email="queue@example.com", hashed_password="x", full_name="Queue Test")
+        other = User(email="other@example.com", hashed_password="x", full_name="Other User")
+        db.add_all([user, other])
+        db.commit()
+
+        started = datetime.now(timezone.utc) - timedelta(days=1)
+        expected = []
+        for i in range(ITEMS):
+            owner = other if i % 10 == 9 else user
+            email = IncomingDataEvent(source="microsoft365", subject=f"Subject {i}", sender=f"sender{i}@example.com",
+                                      raw_text="body " * 200, user_id=owner.id, received_at=started)
+            db.add(email)
+            db.flush()
+            status = "auto_applied" if i % 7 == 6 else ("needs_review" if i % 2 else "pending_review")
+            item = ExtractedData(event_id=email.id, category=CATEGORIES[i % 3], fields={"n": {"value": i}},
+                                 ai_confidence=CONFIDENCES[i % 4], status=status,
+                                 created_at=started + timedelta(minutes=i))
+            db.add(item)
+            db.flush()
+            if owner is user and status != "auto_applied":
+                expected.append((item.id, item.category, band(item.ai_confidence), email.subject))
+        db.commit()
+        db.refresh(user)
+        expected.sort(reverse=True)
+        print(f"\n   {len(expected)} pending items for the user out of {ITEMS}")
+
+        print("\n1️⃣  Keyset pagination...")
+        event.listen(engine, "before_cursor_execute", record)
+        pages, seen, cursor = 0, [], None
+        while True:
+            selects.clear()
+            page = await get_pending_reconciliation(limit=20, cursor=cursor, category=None, confidence=None,
+                                                    current_user=user, db=db)
+            pages += 1
+            check(f"page {pages}: {page['count']} items in {len(selects)} query", len(selects) == 1)
+            seen.extend(page["items"])
+            if not page["has_more"]:
+                check("last page has no cursor", page["next_cursor"] is None)
+                break
+            cursor = page["next_cursor"]
+        ids = [item["id"] for item in seen]
+        check(f"{len(ids)} items across {pages} pages, no duplicates", len(ids) == len(set(ids)) == len(expected))
+        check("newest first", ids == [e[0] for e in expected])
+        check("email subject included", all(item["email"]["subject"] == e[3] for item, e in zip(seen, expected)))
+        check("raw email body not loaded", all("raw_text" not in s for s in selects))
+
+        print("\n2️⃣  Filters...")
+        loans = await get_pending_reconciliation(limit=200, cursor=None, category="loan_update", confidence=None,
+                                                 current_user=user, db=db)
+        check(f"category filter returns {loans['count']} items",
+              [i["id"] for i in loans["items"]] == [e[0] for e in expected if e[1] == "loan_update"])
+        for name in ("high", "medium", "low"):
+            banded = await get_pending_reconciliation(limit=200, cursor=None, category=None, confidence=name,
+                                                      current_user=user, db=db)
+            check(f"{name} confidence returns {banded['count']} items",
+                  [i["id"] for i in banded["items"]] == [e[0] for e in expected if e[2] == name])
+        try:
+            await get_pending_reconciliation(limit=20, cursor="not-a-cursor", category=None, confidence=None,
+                                             current_user=user, db=db)
+            check("invalid cursor rejected", False)
+        except HTTPException as e:
+            check("invalid cursor rejected with 400", e.status_code == 400)
+
+        print("\n3️⃣  Badge counts...")
+        selects.clear()
+        counts = await get_pending_reconciliation_count(current_user=user, db=db)
+        check(f"total {counts['total']} in {len(selects)} query", counts["total"] == len(expected) and len(selects) == 1)
+        check(f"by category {counts['by_category']}",
+              counts["by_category"] == {c: sum(1 for e in expected if e[1] == c) for c in CATEGORIES})
+        check(f"by confidence {counts['by_confidence']}",
+              counts["by_confidence"] == {b: sum(1 for e in expected if e[2] == b) for b in ("high", "medium", "low")})
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        db.close()
+        engine.dispose()
+        os.remove(DB_PATH)
+
+    print("\n" + "=" * 80)
+    print("✅ All reconciliation queue checks passed" if passed else "❌ Some reconciliation queue checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_reconciliation_queue())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,236 @@
+"""
+Test User Notifications and Single-Flight Sync
+Checks the push channel that replaces client polling:
+- the hub delivers events published from other threads to each of a user's streams only
+- committed AITask and ExtractedData changes publish task_counts_changed / reconciliation_items;
+  rolled-back changes publish nothing
+- /api/v1/notifications/stream sends initial task counts, then pushes updates
+- concurrent sync requests for one user pull the mailbox once, repeat manual
+  requests reuse the last result, and sync_finished is published per real sync
+- the tick budget cancels a scheduled sync only when no manual request joined
+  it; sync-now answers 409 only for a sync that holds the mailbox
+
+Run with: python backend/test_user_notifications.py
+"""
+
+import os
+import json
+import sys
+import asyncio
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_user_notifications.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from main import (
+    Base, engine, SessionLocal, User, AITask, TaskType, IncomingDataEvent, ExtractedData,
+    MicrosoftOAuthToken, filter_unprocessed_microsoft_emails, notification_stream, user_notifications,
+    _manual_sync_not_run
+)
+from services.mailbox_sync_engine import MailboxSyncEngine
+from services.user_notifications import UserNotificationHub
+from tests.stub_graph_server import StubGraphServer
+
+
+async def fake_process_email(email_data: dict, user_id: int, db, deduplicated: bool = False):
+    """Stand-in for process_microsoft_email_to_dre without the LLM calls"""
+    db.add(IncomingDataEvent(source="microsoft365", external_message_id=email_data["id"],
+                             subject=email_data.get("subject"), user_id=user_id, processed=False))
+    db.commit()
+    return {"status": "success"}
+
+
+async def next_event(stream, timeout: float = 2.0):
+    chunk = await asyncio.wait_for(stream.__anext__(), timeout)
+    name, data = chunk.strip().split("\n")
+    return name.split(": ", 1)[1], json.loads(data.split(": ", 1)[1])
+
+
+async def test_user_notifications():
+    print("=" * 80)
+    print("USER NOTIFICATIONS TEST")
+    print("=" * 80)
+
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    Base.metadata.create_all(engine)
+
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    db = SessionLocal()
+    user = User(email="notify@example.com", hashed_password="x", full_name="Notify Test")
+    other = User(email="other@example.com", hashed_password="x", full_name="Other User")
+    db.add_all([user, other])
+    db.commit()
+    user_id, other_id = user.id, other.id
+
+    server = StubGraphServer()
+    server.start()
+    try:
+        print("\n1️⃣  Hub fan-out...")
+        hub = UserNotificationHub(queue_size=3)
+        first, second, unrelated = hub.subscribe(1), hub.subscribe(1), hub.subscribe(2)
+        worker = threading.Thread(target=hub.publish, args=(1, "sync_finished", {"ingested": 4}))
+        worker.start()
+        worker.join()
+        await asyncio.sleep(0)
+        check("both streams of the user receive a cross-thread publish",
+              first.get_nowait() == second.get_nowait() == ("sync_finished", {"ingested": 4}))
+        check("other users receive nothing", unrelated.empty())
+        for n in range(5):
+            hub.publish(1, "reconciliation_items", {"new": n})
+        await asyncio.sleep(0)
+        kept = [first.get_nowait()[1]["new"] for _ in range(first.qsize())]
+        check(f"slow stream keeps the newest events {kept}", kept == [2, 3, 4])
+        hub.unsubscribe(1, first)
+        hub.unsubscribe(1, second)
+        check(f"unsubscribed streams removed {hub.stats()}", hub.subscriber_count(1) == 0)
+
+        print("\n2️⃣  Commit hooks...")
+        queue = user_notifications.subscribe(user_id)
+        db.add(AITask(title="Call borrower", type=TaskType.HUMAN_NEEDED, assigned_to_id=user_id))
+        db.rollback()
+        await asyncio.sleep(0)
+        check("rolled-back task publishes nothing", queue.empty())
+        task = AITask(title="Call borrower", type=TaskType.HUMAN_NEEDED, assigned_to_id=user_id)
+        db.add(task)
+        db.commit()
+        await asyncio.sleep(0)
+        check("new task publishes task_counts_changed", queue.get_nowait()[0] == "task_counts_changed")
+        db.refresh(task)  # as update_task loads it
+        task.assigned_to_id = other_id
+        db.commit()
+        await asyncio.sleep(0)
+        check("reassigning notifies the previous assignee", queue.get_nowait()[0] == "task_counts_changed")
+        email = IncomingDataEvent(source="microsoft365", subject="Rate lock", user_id=user_id)
+        db.add(email)
+        db.flush()
+        db.add_all([ExtractedData(event_id=email.id, category="loan_update", status="pending_review"),
+                    ExtractedData(event_id=email.id, category="loan_update", status="needs_review"),
+                    ExtractedData(event_id=email.id, category="loan_update", status="auto_applied")])
+        db.commit()
+        await asyncio.sleep(0)
+        check("new review items publish their count",
+              queue.get_nowait() == ("reconciliation_items", {"new": 2}) and queue.empty())
+        user_notifications.unsubscribe(user_id, queue)
+
+        print("\n3️⃣  Notification stream...")
+        request = Request({"type": "http", "method": "GET", "path": "/api/v1/notifications/stream", "headers": []})
+        response = await notification_stream(request, current_user=db.get(User, user_id), db=SessionLocal())
+        stream = response.body_iterator
+        check("connected event", (await next_event(stream))[0] == "connected")
+        check("initial task counts", await next_event(stream) == ("task_counts", {"tasks": 0}))
+        pending = asyncio.ensure_future(next_event(stream))
+        await asyncio.sleep(0.05)
+        db.add_all([AITask(title=f"Task {n}", type=TaskType.HUMAN_NEEDED, assigned_to_id=user_id) for n in range(3)])
+        db.add(AITask(title="Done", type=TaskType.COMPLETED, assigned_to_id=user_id))
+        db.commit()
+        check("task changes push fresh counts", await pending == ("task_counts", {"tasks": 3}))
+        user_notifications.publish(user_id, "sync_finished", {"status": "success", "ingested": 2})
+        check("sync status is forwarded", (await next_event(stream))[0] == "sync_finished")
+        await stream.aclose()
+        check("closed stream unsubscribes", user_notifications.subscriber_count(user_id) == 0)
+
+        print("\n4️⃣  Single-flight sync...")
+        token = MicrosoftOAuthToken(user_id=user_id, access_token="stub-access", refresh_token="stub-refresh",
+                                    token_expires_at=datetime.now(timezone.utc) + timedelta(hours=1),
+                                    sync_enabled=True, sync_folder="Inbox")
+        db.add(token)
+        db.commit()
+        token_id = token.id
+        notifications = []
+        sync_engine = MailboxSyncEngine(
+            session_factory=SessionLocal,
+            token_model=MicrosoftOAuthToken,
+            process_email=fake_process_email,
+            decrypt_token=lambda value: value,
+            encrypt_token=lambda value: value,
+            filter_new_emails=filter_unprocessed_microsoft_emails,
+            notify=lambda *args: notifications.append(args),
+            max_concurrency=2,
+            interval_seconds=60,
+            page_size=25,
+            graph_base_url=server.base_url,
+        )
+        try:
+            server.add_messages(60)
+            results = await asyncio.gather(*(sync_engine.request_sync(token_id, user_id) for _ in range(5)))
+            check(f"5 concurrent requests made {len(server.requests)} Graph calls (one 3-page sync)",
+                  len(server.requests) == 3)
+            check("every caller gets the result", all(r["status"] == "success" and r["ingested"] == 60 for r in results))
+            check("4 callers joined the running sync", sum(1 for r in results if r.get("shared")) == 4)
+            check(f"one sync_finished notification {notifications}",
+                  len(notifications) == 1 and notifications[0][:2] == (user_id, "sync_finished"))
+
+            server.requests.clear()
+            again = await sync_engine.request_sync(token_id, user_id)
+            check("repeat manual request reuses the last result", again.get("cached") and not server.requests)
+            sync_engine.min_interval_seconds = 0
+            server.add_messages(2)
+            fresh = await sync_engine.request_sync(token_id, user_id)
+            check(f"after the interval a real sync runs ({fresh['ingested']} new)",
+                  fresh["ingested"] == 2 and len(server.requests) == 1 and len(notifications) == 2)
+
+            print("\n5️⃣  Tick budget...")
+
+            async def slow_sync(token_id):
+                await asyncio.sleep(0.4)
+                return {"status": "success", "user_id": user_id, "fetched": 0, "new": 0, "ingested": 0, "lag": 0.0}
+
+            sync_engine.sync_user = slow_sync
+            sync_engine._due_tokens = lambda: (1, [SimpleNamespace(id=token_id, user_id=user_id, last_sync_at=None)])
+            sync_engine.tick_budget_seconds = 0.15
+            tick = asyncio.create_task(sync_engine.run_tick())
+            await asyncio.sleep(0.05)
+            manual = await sync_engine.request_sync(token_id, user_id)
+            metrics = await tick
+            check("tick deferred the mailbox", metrics.users_deferred == 1)
+            check(f"manual request that joined the scheduled sync still succeeds {manual}",
+                  manual["status"] == "success" and manual.get("shared"))
+
+            tick = asyncio.create_task(sync_engine.run_tick())
+            await asyncio.sleep(0.05)
+            flight = sync_engine._flights[user_id]
+            await tick
+            await asyncio.sleep(0)
+            check("scheduled sync nobody joined is cancelled at the budget", flight.cancelled())
+
+            check("sync-now reports a deferred sync as skipped",
+                  _manual_sync_not_run({"status": "skipped", "reason": "deferred"})["reason"] == "deferred"
+                  and _manual_sync_not_run({"status": "success"}) is None)
+            try:
+                _manual_sync_not_run({"status": "skipped", "reason": "sync_in_progress"})
+                status = None
+            except HTTPException as e:
+                status = e.status_code
+            check(f"sync-now conflicts only while a sync holds the mailbox ({status})", status == 409)
+            print(f"   stats: {sync_engine.get_metrics()['single_flight']}")
+        finally:
+            await sync_engine.aclose()
+    finally:
+        server.stop()
+        db.close()
+        engine.dispose()
+        os.remove(DB_PATH)
+
+    print("\n" + "=" * 80)
+    print("✅ All user notification checks passed" if passed else "❌ Some user notification checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_user_notifications())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,196 @@
+"""
+Test Vector Memory
+Checks VectorMemoryService on the in-memory and memory-mapped local stores
+with the hashing embedder (no network):
+- stores are queued and written in batched embedding calls / upserts
+- repeated texts are served from the embedding cache
+- retrieval sees queued writes and honours the lead_id filter
+- the on-disk store survives a restart; deleting a user clears queue and store
+- while the store fails nothing queued is dropped: a full queue refuses new
+  stores, and memory rows are linked only to vectors that were written
+
+Run with: python backend/test_vector_memory.py
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+import shutil
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from integrations.embeddings import CachedEmbedder, HashingEmbedder
+from integrations.vector_store import InMemoryVectorStore
+from integrations.local_vector_store import LocalVectorStore
+from integrations.pinecone_service import VectorMemoryService, VectorQueueFullError
+
+CONVERSATIONS = 100
+BATCH = 32
+
+
+STORES = {
+    "in-memory store": InMemoryVectorStore,
+    "local store (exact)": lambda path: LocalVectorStore(path, search="exact"),
+    "local store (hnsw)": lambda path: LocalVectorStore(path, search="hnsw"),
+}
+
+
+def counting(store):
+    """Count upsert calls on a store instance"""
+    store.upserts = 0
+    upsert = store.upsert
+
+    async def counted(namespace, vectors):
+        store.upserts += 1
+        await upsert(namespace, vectors)
+
+    store.upsert = counted
+    return store
+
+
+async def test_vector_memory():
+    print("=" * 80)
+    print("VECTOR MEMORY TEST")
+    print("=" * 80)
+
+    passed = True
+    for label, make_store in STORES.items():
+        print(f"\n--- {label} ---")
+        passed = await check_store(make_store) and passed
+    print("\n--- failing store ---")
+    passed = await check_failing_store() and passed
+
+    print("\n" + "=" * 80)
+    print("✅ All vector memory checks passed" if passed else "❌ Some vector memory checks failed")
+    return passed
+
+
+async def check_store(make_store) -> bool:
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    path = tempfile.mkdtemp(prefix="vector_memory_")
+    os.environ["VECTOR_EMBED_BATCH_SIZE"] = str(BATCH)
+    hashing = HashingEmbedder()
+    store = counting(make_store(path))
+    memory = VectorMemoryService(store=store, embedder=CachedEmbedder(hashing))
+
+    try:
+        print(f"\n1️⃣  Storing {CONVERSATIONS} conversations (batch {BATCH})...")
+        ids = []
+        for i in range(CONVERSATIONS):
+            ids.append(await memory.store_conversation(
+                user_id=1 + i % 2,
+                conversation_text=f"User: what is the rate lock status for borrower {i}?\n\nAssistant: The rate lock for borrower {i} expires Friday.",
+                metadata={"lead_id": i % 5, "loan_id": None}
+            ))
+        check(f"{len(set(ids))} unique vector ids", len(set(ids)) == CONVERSATIONS)
+        check(f"{hashing.calls} embedding calls, {store.upserts} upserts so far", hashing.calls == CONVERSATIONS // BATCH)
+        check(f"{memory.pending_count()} queued", memory.pending_count() == CONVERSATIONS % BATCH)
+        written = await memory.flush()
+        check(f"flush wrote the remaining {written}", written == CONVERSATIONS % BATCH and memory.pending_count() == 0)
+
+        print("\n2️⃣  Retrieval...")
+        await memory.store_conversation(1, "User: pre-approval letter for the Johnson purchase\n\nAssistant: Sent today.", {"lead_id": 42})
+        results = await memory.retrieve_relevant_context(1, "pre-approval letter for the Johnson purchase", top_k=3)
+        check("queued write is visible to the next retrieval", bool(results) and "Johnson" in results[0]["text"])
+        filtered = await memory.retrieve_relevant_context(1, "rate lock status for borrower 10", top_k=5, filter_metadata={"lead_id": 0})
+        check(f"lead_id filter ({len(filtered)} matches)", bool(filtered) and all(r["metadata"]["lead_id"] == 0 for r in filtered))
+        other_user = await memory.retrieve_relevant_context(2, "pre-approval letter for the Johnson purchase", top_k=3)
+        check("namespaces isolate users", not any("Johnson" in r["text"] for r in other_user))
+
+        print("\n3️⃣  Embedding cache...")
+        calls = hashing.calls
+        for _ in range(10):
+            await memory.retrieve_relevant_context(1, "rate lock status for borrower 10", top_k=5)
+        stats = memory.get_stats()["embedding_cache"]
+        check(f"repeat queries hit the cache ({hashing.calls - calls} new calls, hit rate {stats['hit_rate']})", hashing.calls == calls)
+
+        print("\n4️⃣  Persistence and deletion...")
+        restarted = VectorMemoryService(store=make_store(path), embedder=CachedEmbedder(HashingEmbedder()))
+        count = await restarted.get_conversation_count(1)
+        check(f"{count} vectors reloaded for user 1", count == CONVERSATIONS // 2 + 1)
+        await restarted.store_conversation(1, "User: queued then deleted")
+        await restarted.delete_user_conversations(1)
+        check("delete clears store and queue", await restarted.get_conversation_count(1) == 0)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    return passed
+
+
+async def check_failing_store() -> bool:
+    passed = True
+
+    def check(label, condition):
+        nonlocal passed
+        print(f"   {'✅' if condition else '❌'} {label}")
+        passed = passed and condition
+
+    os.environ["VECTOR_EMBED_BATCH_SIZE"] = "4"
+    os.environ["VECTOR_MAX_PENDING"] = "10"
+    store = InMemoryVectorStore()
+    upsert = store.upsert
+    store.failing = True
+
+    async def flaky(namespace, vectors):
+        if store.failing:
+            raise ConnectionError("vector store unavailable")
+        await upsert(namespace, vectors)
+
+    store.upsert = flaky
+    memory = VectorMemoryService(store=store, embedder=CachedEmbedder(HashingEmbedder()))
+    links = []
+
+    async def record(written):
+        links.extend(written)
+
+    try:
+        print("\n1️⃣  Store down...")
+        ids = {}
+        for memory_id in range(10):
+            ids[memory_id] = await memory.store_conversation(1, f"User: question {memory_id}", memory_id=memory_id)
+        check(f"failed flushes keep every queued vector ({memory.pending_count()})", memory.pending_count() == 10)
+        try:
+            await memory.store_conversation(1, "User: one too many", memory_id=10)
+            refused = False
+        except VectorQueueFullError:
+            refused = True
+        check("a full queue refuses new stores instead of dropping queued ones", refused and memory.pending_count() == 10)
+        check("nothing to link while no vector is written", await memory.record_written(record) == 0 and not links)
+
+        print("\n2️⃣  Store back...")
+        store.failing = False
+        written = await memory.flush()
+        linked = await memory.record_written(record)
+        check(f"{written} queued vectors written, {linked} memory rows linked",
+              written == 10 and linked == 10 and dict(links) == ids)
+        check("linked IDs are in the store", await store.count("user_1") == 10)
+        check("links are handed out once", await memory.record_written(record) == 0)
+
+        await memory.store_conversation(1, "User: linked later", memory_id=11)
+        await memory.flush()
+
+        async def broken(written):
+            raise RuntimeError("database unavailable")
+
+        try:
+            await memory.record_written(broken)
+        except RuntimeError:
+            pass
+        check("links survive a failed recording", await memory.record_written(record) == 1 and links[-1][0] == 11)
+    finally:
+        os.environ.pop("VECTOR_MAX_PENDING", None)
+
+    return passed
+
+
+if __name__ == "__main__":
+    success = asyncio.run(test_vector_memory())
+    sys.exit(0 if success else 1)
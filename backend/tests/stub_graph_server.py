@@ -0,0 +1,125 @@
+"""
+Stub Microsoft Graph server for mailbox sync tests
+Serves /me/mailFolders/{folder}/messages/delta from an in-memory mailbox
+
+- Pages honour the "Prefer: odata.maxpagesize" header and chain via @odata.nextLink
+- The last page carries an @odata.deltaLink; following it later returns only
+  messages added since
+- expire_cursors() makes stored delta links answer 410 Gone (forces a resync)
+
+Usage:
+    server = StubGraphServer()
+    server.start()
+    server.add_messages(120)
+    engine = MailboxSyncEngine(..., graph_base_url=server.base_url)
+    ...
+    server.stop()
+"""
+
+import json
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubGraphServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.messages = []
+        self.requests = []
+        self.cursor_generation = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1.0"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def add_messages(self, count: int):
+        with self._lock:
+            start = len(self.messages)
+            for i in range(start, start + count):
+                self.messages.append({
+                    "id": f"msg-{i:06d}",
+                    "subject": f"Loan update {i}",
+                    "from": {"emailAddress": {"address": f"processor{i % 7}@title.example.com"}},
+                    "toRecipients": [{"emailAddress": {"address": "lo@example.com"}}],
+                    "receivedDateTime": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "body": {"contentType": "text", "content": f"Status update for file {i}"},
+                })
+
+    def expire_cursors(self):
+        with self._lock:
+            self.cursor_generation += 1
+
+    def _page(self, start: int, offset: int, page_size: int, generation: int):
+        with self._lock:
+            if generation != self.cursor_generation:
+                return 410, {"error": {"code": "SyncStateNotFound", "message": "Delta token expired"}}
+            window = self.messages[start:]
+            end = len(self.messages)
+
+        page = window[offset:offset + page_size]
+        body = {"value": page}
+        if offset + page_size < len(window):
+            body["@odata.nextLink"] = (
+                f"{self.base_url}/me/mailFolders/Inbox/messages/delta"
+                f"?$skiptoken={start}.{offset + page_size}.{generation}"
+            )
+        else:
+            body["@odata.deltaLink"] = (
+                f"{self.base_url}/me/mailFolders/Inbox/messages/delta"
+                f"?$deltatoken={end}.{generation}"
+            )
+        return 200, body
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                stub.requests.append(self.path)
+
+                if not parsed.path.endswith("/messages/delta"):
+                    return self._send(404, {"error": {"code": "NotFound"}})
+                if not self.headers.get("Authorization", "").startswith("Bearer "):
+                    return self._send(401, {"error": {"code": "InvalidAuthenticationToken"}})
+
+                prefer = self.headers.get("Prefer", "")
+                page_size = int(prefer.split("=", 1)[1]) if "maxpagesize=" in prefer else 10
+                query = parse_qs(parsed.query)
+
+                if "$skiptoken" in query:
+                    start, offset, generation = map(int, query["$skiptoken"][0].split("."))
+                elif "$deltatoken" in query:
+                    start, generation = map(int, query["$deltatoken"][0].split("."))
+                    offset = 0
+                else:
+                    start, offset, generation = 0, 0, stub.cursor_generation
+
+                status, body = stub._page(start, offset, page_size, generation)
+                self._send(status, body)
+
+            def _send(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
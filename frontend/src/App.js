@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import { BrowserRouter as Router, Routes, Route, Navigate } from 'react-router-dom';
 import { isAuthenticated } from './utils/auth';
+import { subscribeToNotifications } from './services/notifications';
 import Navigation from './components/Navigation';
 import AIAssistant from './components/AIAssistant';
 import CoachCorner from './components/CoachCorner';
@@ -141,36 +142,17 @@ function App() {
     checkOnboardingStatus();
   }, []);
 
-  // Fetch task counts for navigation badges
+  // Task counts for navigation badges, pushed by the server on connect and
+  // whenever the user's tasks change
   useEffect(() => {
-    const fetchTaskCounts = async () => {
-      if (!isAuthenticated()) return;
-
-      try {
-        const response = await fetch(`${API_BASE_URL}/api/v1/tasks`, {
-          headers: {
-            'Authorization': `Bearer ${localStorage.getItem('token')}`
-          }
-        });
-
-        if (response.ok) {
-          const tasks = await response.json();
-          // Count outstanding tasks (not completed)
-          const outstandingTasks = tasks.filter(t => t.status !== 'completed' && t.status !== 'done').length;
-          setTaskCounts(prev => ({
-            ...prev,
-            tasks: outstandingTasks
-          }));
-        }
-      } catch (error) {
-        console.error('Error fetching task counts:', error);
+    return subscribeToNotifications((event, data) => {
+      if (event === 'task_counts') {
+        setTaskCounts(prev => ({
+          ...prev,
+          tasks: data.tasks
+        }));
       }
-    };
-
-    fetchTaskCounts();
-    // Refresh task counts every 2 minutes
-    const interval = setInterval(fetchTaskCounts, 120000);
-    return () => clearInterval(interval);
+    });
   }, []);
 
   return (
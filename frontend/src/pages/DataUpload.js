@@ -10,6 +10,9 @@ function DataUpload() {
   const [aiQuestions, setAiQuestions] = useState([]);
   const [answers, setAnswers] = useState({});
   const [columnMappings, setColumnMappings] = useState({});
+  const [mappingsByDestination, setMappingsByDestination] = useState({});
+  const [serverFields, setServerFields] = useState(null);
+  const [importProgress, setImportProgress] = useState(null);
   const [importResults, setImportResults] = useState(null);
   const [isProcessing, setIsProcessing] = useState(false);
   const [error, setError] = useState(null);
@@ -85,7 +88,10 @@ function DataUpload() {
       const data = await response.json();
       setParsedData(data.preview);
       setAiQuestions(data.questions || []);
+      setAnswers(data.default_answers || {});
       setColumnMappings(data.suggested_mappings || {});
+      setMappingsByDestination(data.mappings_by_destination || {});
+      setServerFields(data.target_fields || null);
       setUploadState('questions');
     } catch (err) {
       console.error('Analysis error:', err);
@@ -107,6 +113,10 @@ function DataUpload() {
       ...answers,
       [questionId]: answer
     });
+    // Column suggestions differ per destination
+    if (questionId === 'destination' && mappingsByDestination[answer]) {
+      setColumnMappings(mappingsByDestination[answer]);
+    }
   };
 
   const proceedToMapping = () => {
@@ -123,6 +133,7 @@ function DataUpload() {
   const importData = async () => {
     setIsProcessing(true);
     setUploadState('importing');
+    setImportProgress(null);
     setError(null);
 
     try {
@@ -130,12 +141,14 @@ function DataUpload() {
       formData.append('file', file);
       formData.append('answers', JSON.stringify(answers));
       formData.append('mappings', JSON.stringify(columnMappings));
+      formData.append('stream', 'true');
 
       // Use relative URL to leverage Vercel proxy (see vercel.json)
       const response = await fetch('/api/v1/data-import/execute', {
         method: 'POST',
         headers: {
-          'Authorization': `Bearer ${localStorage.getItem('token')}`
+          'Authorization': `Bearer ${localStorage.getItem('token')}`,
+          'Accept': 'text/event-stream'
         },
         body: formData
       });
@@ -145,7 +158,33 @@ function DataUpload() {
         throw new Error(errorData.detail || `Server error: ${response.status}`);
       }
 
-      const result = await response.json();
+      // Progress arrives after each committed batch, then a done summary
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let result = null;
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const raw of events) {
+          const name = raw.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+          if (name === 'progress') {
+            setImportProgress(data);
+          } else if (name === 'done') {
+            result = data;
+          } else if (name === 'error') {
+            throw new Error(data.error);
+          }
+        }
+      }
+      if (!result) {
+        throw new Error('Import ended before completing');
+      }
+
       setImportResults(result);
       setUploadState('complete');
     } catch (err) {
@@ -170,11 +209,15 @@ function DataUpload() {
     setAiQuestions([]);
     setAnswers({});
     setColumnMappings({});
+    setMappingsByDestination({});
+    setServerFields(null);
+    setImportProgress(null);
     setImportResults(null);
     setError(null);
   };
 
-  const targetFields = {
+  // Fallback when the server does not send its field list
+  const defaultTargetFields = {
     leads: [
       { value: 'first_name', label: 'First Name' },
       { value: 'last_name', label: 'Last Name' },
@@ -221,6 +264,14 @@ function DataUpload() {
       { value: 'payment_status', label: 'Payment Status' }
     ]
   };
+  const targetFields = serverFields || defaultTargetFields;
+
+  const destinationPages = {
+    leads: '/leads',
+    loans: '/loans',
+    portfolio: '/portfolio',
+    partners: '/referral-partners'
+  };
 
   // Determine destination based on answers
   const getDestination = () => {
@@ -423,10 +474,10 @@ function DataUpload() {
                         onChange={(e) => handleColumnMappingChange(header, e.target.value)}
                       >
                         <option value="">Skip this column</option>
-                        <optgroup label="Lead Fields">
+                        <optgroup label="CRM Fields">
                           {targetFields[getDestination()]?.map(field => (
                             <option key={field.value} value={field.value}>
-                              {field.label}
+                              {field.label}{field.required ? ' *' : ''}
                             </option>
                           ))}
                         </optgroup>
@@ -458,7 +509,14 @@ function DataUpload() {
             <div className="importing-card">
               <div className="spinner"></div>
               <h2>Importing your data...</h2>
-              <p>Please wait while we add records to your CRM</p>
+              {importProgress ? (
+                <p>
+                  {importProgress.total.toLocaleString()} of {(parsedData?.total_rows || importProgress.total).toLocaleString()} rows processed
+                  {' '}({importProgress.imported.toLocaleString()} imported, {importProgress.failed.toLocaleString()} failed)
+                </p>
+              ) : (
+                <p>Please wait while we add records to your CRM</p>
+              )}
             </div>
           </div>
         )}
@@ -512,7 +570,7 @@ function DataUpload() {
                 <button className="btn-secondary" onClick={reset}>
                   Upload Another File
                 </button>
-                <button className="btn-primary" onClick={() => navigate('/leads')}>
+                <button className="btn-primary" onClick={() => navigate(destinationPages[importResults?.destination] || '/leads')}>
                   View Imported Data →
                 </button>
               </div>
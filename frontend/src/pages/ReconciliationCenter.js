@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import './ReconciliationCenter.css';
+import { subscribeToNotifications } from '../services/notifications';
 
 // Use HTTPS Railway URL in production, localhost for development
 const isProduction = window.location.hostname.includes('vercel.app');
@@ -9,6 +10,9 @@ const API_BASE_URL = isProduction
 
 function ReconciliationCenter() {
   const [pendingItems, setPendingItems] = useState([]);
+  const [pendingTotal, setPendingTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [selectedItem, setSelectedItem] = useState(null);
   const [editedFields, setEditedFields] = useState({});
@@ -23,29 +27,37 @@ function ReconciliationCenter() {
   useEffect(() => {
     fetchPendingItems();
 
-    // Auto-sync emails every 5 minutes
-    const syncInterval = setInterval(() => {
-      syncEmails(true); // silent sync
-    }, 5 * 60 * 1000); // 5 minutes
-
-    // Initial sync on load
-    syncEmails(true);
-
-    return () => clearInterval(syncInterval);
+    // The server syncs mailboxes on its own schedule and tells open tabs
+    // when new items are ready, so the page no longer triggers syncs itself
+    return subscribeToNotifications((event, data) => {
+      if (event === 'reconciliation_items') {
+        fetchPendingItems();
+      } else if (event === 'sync_finished' && data.status === 'success') {
+        setLastSyncTime(new Date(data.finished_at));
+      }
+    });
   }, []);
 
   const fetchPendingItems = async () => {
     try {
       setLoading(true);
-      const response = await fetch(`${API_BASE_URL}/api/v1/reconciliation/pending`, {
-        headers: {
-          'Authorization': `Bearer ${localStorage.getItem('token')}`
-        }
-      });
+      const headers = {
+        'Authorization': `Bearer ${localStorage.getItem('token')}`
+      };
+      // First page of the queue plus the total for the badge
+      const [response, countResponse] = await Promise.all([
+        fetch(`${API_BASE_URL}/api/v1/reconciliation/pending?limit=50`, { headers }),
+        fetch(`${API_BASE_URL}/api/v1/reconciliation/pending/count`, { headers })
+      ]);
 
       if (response.ok) {
         const data = await response.json();
         setPendingItems(data.items || []);
+        setNextCursor(data.has_more ? data.next_cursor : null);
+      }
+      if (countResponse.ok) {
+        const counts = await countResponse.json();
+        setPendingTotal(counts.total || 0);
       }
     } catch (error) {
       console.error('Error fetching pending items:', error);
@@ -54,6 +66,31 @@ function ReconciliationCenter() {
     }
   };
 
+  const loadMoreItems = async () => {
+    if (!nextCursor || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const response = await fetch(
+        `${API_BASE_URL}/api/v1/reconciliation/pending?limit=50&cursor=${encodeURIComponent(nextCursor)}`,
+        { headers: { 'Authorization': `Bearer ${localStorage.getItem('token')}` } }
+      );
+
+      if (response.ok) {
+        const data = await response.json();
+        // A refresh may have raced this request; never list an item twice
+        setPendingItems(prev => {
+          const seen = new Set(prev.map(item => item.id));
+          return [...prev, ...(data.items || []).filter(item => !seen.has(item.id))];
+        });
+        setNextCursor(data.has_more ? data.next_cursor : null);
+      }
+    } catch (error) {
+      console.error('Error loading more pending items:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const syncEmails = async (silent = false) => {
     try {
       if (!silent) {
@@ -73,7 +110,11 @@ function ReconciliationCenter() {
         setLastSyncTime(new Date());
 
         if (!silent) {
-          setSyncStatus(`✓ Synced ${data.processed_count} emails successfully`);
+          if (data.status !== 'success') {
+            setSyncStatus(`⚠ ${data.message}`);
+          } else {
+            setSyncStatus(data.cached ? `✓ ${data.message}` : `✓ Synced ${data.processed_count} emails successfully`);
+          }
           // Refresh pending items to show new data
           fetchPendingItems();
 
@@ -119,6 +160,7 @@ function ReconciliationCenter() {
       if (response.ok) {
         // Remove from list and reset
         setPendingItems(prev => prev.filter(item => item.id !== itemId));
+        setPendingTotal(prev => Math.max(prev - 1, 0));
         setSelectedItem(null);
         setEditedFields({});
       } else {
@@ -149,6 +191,7 @@ function ReconciliationCenter() {
 
       if (response.ok) {
         setPendingItems(prev => prev.filter(item => item.id !== itemId));
+        setPendingTotal(prev => Math.max(prev - 1, 0));
         setSelectedItem(null);
         setEditedFields({});
       } else {
@@ -193,6 +236,54 @@ function ReconciliationCenter() {
     setSelectedItems(new Set());
   };
 
+  // Runs one bulk request and reads its progress events; returns the final summary
+  const runBulkAction = async (action, reason = null) => {
+    const response = await fetch(`${API_BASE_URL}/api/v1/reconciliation/bulk`, {
+      method: 'POST',
+      headers: {
+        'Authorization': `Bearer ${localStorage.getItem('token')}`,
+        'Content-Type': 'application/json',
+        'Accept': 'text/event-stream'
+      },
+      body: JSON.stringify({
+        extracted_data_ids: Array.from(selectedItems),
+        action: action,
+        reason: reason,
+        stream: true
+      })
+    });
+    if (!response.ok) {
+      throw new Error(`Bulk ${action} failed (${response.status})`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let summary = null;
+    let counted = 0;
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const events = buffer.split('\n\n');
+      buffer = events.pop();
+      for (const raw of events) {
+        const name = raw.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+        if (name === 'progress' && action === 'approve') {
+          const newlyApproved = data.approved - counted;
+          counted = data.approved;
+          setApprovalProgress(prev => ({ ...prev, approved: prev.approved + newlyApproved }));
+        } else if (name === 'done') {
+          summary = data;
+        } else if (name === 'error') {
+          throw new Error(data.error);
+        }
+      }
+    }
+    return summary;
+  };
+
   const bulkApprove = async () => {
     if (selectedItems.size === 0) {
       alert('Please select items to approve');
@@ -206,30 +297,11 @@ function ReconciliationCenter() {
     setBulkProcessing(true);
     let successCount = 0;
 
-    for (const itemId of selectedItems) {
-      try {
-        const response = await fetch(`${API_BASE_URL}/api/v1/reconciliation/approve`, {
-          method: 'POST',
-          headers: {
-            'Authorization': `Bearer ${localStorage.getItem('token')}`,
-            'Content-Type': 'application/json'
-          },
-          body: JSON.stringify({
-            extracted_data_id: itemId,
-            corrections: null
-          })
-        });
-
-        if (response.ok) {
-          successCount++;
-          setApprovalProgress(prev => ({
-            ...prev,
-            approved: prev.approved + 1
-          }));
-        }
-      } catch (error) {
-        console.error(`Error approving item ${itemId}:`, error);
-      }
+    try {
+      const summary = await runBulkAction('approve');
+      successCount = summary?.approved || 0;
+    } catch (error) {
+      console.error('Error approving items:', error);
     }
 
     // Refresh the list
@@ -258,26 +330,11 @@ function ReconciliationCenter() {
     setBulkProcessing(true);
     let successCount = 0;
 
-    for (const itemId of selectedItems) {
-      try {
-        const response = await fetch(`${API_BASE_URL}/api/v1/reconciliation/reject`, {
-          method: 'POST',
-          headers: {
-            'Authorization': `Bearer ${localStorage.getItem('token')}`,
-            'Content-Type': 'application/json'
-          },
-          body: JSON.stringify({
-            extracted_data_id: itemId,
-            reason: reason
-          })
-        });
-
-        if (response.ok) {
-          successCount++;
-        }
-      } catch (error) {
-        console.error(`Error rejecting item ${itemId}:`, error);
-      }
+    try {
+      const summary = await runBulkAction('reject', reason);
+      successCount = summary?.rejected || 0;
+    } catch (error) {
+      console.error('Error rejecting items:', error);
     }
 
     // Refresh the list
@@ -383,7 +440,7 @@ function ReconciliationCenter() {
           </div>
           <div className="header-stats">
             <div className="stat-card">
-              <div className="stat-value">{pendingItems.length}</div>
+              <div className="stat-value">{Math.max(pendingTotal, pendingItems.length)}</div>
               <div className="stat-label">Pending Review</div>
             </div>
             <div className="stat-card">
@@ -457,7 +514,7 @@ function ReconciliationCenter() {
           <div className="reconciliation-content">
             {/* Items List */}
             <div className="items-list">
-              {pendingItems.slice(0, 20).map((item) => (
+              {pendingItems.map((item) => (
                 <div
                   key={item.id}
                   className={`reconciliation-item ${selectedItem?.id === item.id ? 'selected' : ''} ${selectedItems.has(item.id) ? 'checked' : ''}`}
@@ -501,6 +558,15 @@ function ReconciliationCenter() {
                   </div>
                 </div>
               ))}
+              {nextCursor && (
+                <button
+                  className="btn-load-more"
+                  onClick={loadMoreItems}
+                  disabled={loadingMore}
+                >
+                  {loadingMore ? 'Loading...' : `Load more (${pendingItems.length} of ${pendingTotal})`}
+                </button>
+              )}
             </div>
 
             {/* Detail Panel */}
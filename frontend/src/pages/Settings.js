@@ -654,7 +654,11 @@ const API_BASE_URL = isProduction
         // Update with actual final counts
         setSyncProgress({ current: data.processed_count, total: data.fetched_count });
 
-        alert(`Synced ${data.processed_count}/${data.fetched_count} emails successfully!`);
+        if (data.status !== 'success') {
+          alert(data.message);
+        } else {
+          alert(`Synced ${data.processed_count}/${data.fetched_count} emails successfully!`);
+        }
         await checkMicrosoftStatus();
 
         // Show "Synced" status for 3 seconds
@@ -0,0 +1,95 @@
+import { API_BASE_URL } from './api';
+
+// One server-sent event stream per tab, shared by every component that
+// subscribes (/api/v1/notifications/stream). Events: task_counts,
+// reconciliation_items, sync_finished. fetch() is used instead of
+// EventSource so the bearer token goes in a header, not the URL.
+
+const listeners = new Set();
+let controller = null;
+let retryTimer = null;
+let retryDelay = 1000;
+
+const dispatch = (event, data) => {
+  listeners.forEach((listener) => {
+    try {
+      listener(event, data);
+    } catch (error) {
+      console.error('Notification handler error:', error);
+    }
+  });
+};
+
+const scheduleReconnect = () => {
+  if (listeners.size === 0 || retryTimer) return;
+  retryTimer = setTimeout(() => {
+    retryTimer = null;
+    connect();
+  }, retryDelay);
+  retryDelay = Math.min(retryDelay * 2, 60000);
+};
+
+const connect = async () => {
+  if (controller) return;
+  const token = localStorage.getItem('token');
+  if (!token) {
+    // Not logged in yet; check again later
+    scheduleReconnect();
+    return;
+  }
+
+  controller = new AbortController();
+  try {
+    const response = await fetch(`${API_BASE_URL}/api/v1/notifications/stream`, {
+      headers: {
+        'Authorization': `Bearer ${token}`,
+        'Accept': 'text/event-stream'
+      },
+      signal: controller.signal
+    });
+    if (!response.ok) {
+      throw new Error(`Notification stream failed (${response.status})`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const events = buffer.split('\n\n');
+      buffer = events.pop();
+      for (const raw of events) {
+        const name = raw.match(/^event: (.*)$/m)?.[1];
+        const data = raw.match(/^data: (.*)$/m)?.[1];
+        if (!name) continue; // keep-alive comment
+        if (name === 'connected') retryDelay = 1000;
+        dispatch(name, data ? JSON.parse(data) : {});
+      }
+    }
+  } catch (error) {
+    if (error.name !== 'AbortError') {
+      console.error('Notification stream error:', error);
+    }
+  } finally {
+    const aborted = controller?.signal.aborted;
+    controller = null;
+    if (!aborted) scheduleReconnect();
+  }
+};
+
+// Subscribe to notifications; returns an unsubscribe function
+export const subscribeToNotifications = (listener) => {
+  listeners.add(listener);
+  connect();
+
+  return () => {
+    listeners.delete(listener);
+    if (listeners.size === 0) {
+      clearTimeout(retryTimer);
+      retryTimer = null;
+      controller?.abort();
+    }
+  };
+};